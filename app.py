@@ -1,8 +1,9 @@
-import base64
 import re
 import json
 import io
 import csv
+import hashlib
+import itertools
 import requests
 import os
 import secrets
@@ -14,16 +15,68 @@ from decimal import Decimal, InvalidOperation
 from dotenv import load_dotenv
 from xml.sax.saxutils import escape
 
-from flask import Flask, abort, render_template, request, redirect, url_for, jsonify, Response
+from flask import Flask, abort, render_template, request, redirect, url_for, jsonify, make_response, Response, stream_with_context
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.exceptions import HTTPException
 from configuracao_ambiente import configurar_aplicacao
 from logging_operacional import registrar_evento, resposta_erro_interno
+from busca_textual import condicao_busca, preparar_busca_textual
+from cache_relatorios import (
+    chave_relatorio,
+    incrementar_versao_dados,
+    ler_versao_dados,
+    preparar_versoes_dados,
+)
+from consultas_cadastrais import preparar_consultas_cadastrais
+from dados_referencia import (
+    incrementar_versao_referencia,
+    preparar_dados_referencia,
+    registrar_referencias,
+)
+from fila_relatorios import (
+    STATUS_CONCLUIDA,
+    STATUS_FALHOU,
+    STATUS_FINAIS,
+    STATUS_PENDENTE,
+    STATUS_SEM_DADOS,
+    RelatorioSemDados,
+    concluir_tarefa,
+    consultar_tarefa,
+    enfileirar_relatorio,
+    finalizar_sem_arquivo,
+    ler_arquivo_tarefa,
+    limpar_tarefas,
+    preparar_fila_relatorios,
+    registrar_falha,
+    reservar_proxima_tarefa,
+)
+from fotos import (
+    SQL_REMOVER_FOTOS_ORFAS,
+    TABELAS_COM_FOTO,
+    TIPO_MIME_FOTO,
+    FotoInvalida,
+    consultar_foto,
+    decodificar_data_url,
+    gravar_foto,
+    ler_foto_enviada,
+    migrar_lote_fotos,
+    preparar_fotos,
+    processar_foto,
+)
+from metricas import contar_linhas_relatorio, registrar_linhas_relatorio
+from paginacao import CursorInvalido, OrdemKeyset, consultar_pagina, ler_parametros_pagina
+from relatorio_pdf import ColunaPdf, renderizar_tabela_paginada
 from seguranca_rate_limit import aplicar_limites_rotas
 from seguranca_csrf import configurar_csrf
 from modulos.fiscalizacao_contratos import criar_blueprint_fiscalizacao
 from modulos.fiscalizacao_contratos.permissions import admin_json_required, admin_required
+from modulos.fiscalizacao_contratos.services.consultas_externas import (
+    ConsultaExternaError,
+    ConsultaNaoEncontradaError,
+    consultar_cep,
+    consultar_cnpj,
+)
 
 # ReportLab Imports (Para PDF)
 from reportlab.lib.pagesizes import letter, A4, landscape
@@ -69,10 +122,20 @@ HASH_SENHA_FICTICIO = generate_password_hash(secrets.token_urlsafe(32))
 DATABASE_URL = app.config.get('DATABASE_URL')
 
 def conectar_banco():
-    """Estabelece conexão com o banco de dados."""
+    """Retorna a conexão única da requisição, emprestada do pool do processo."""
     if not DATABASE_URL:
         raise RuntimeError("DATABASE_URL não está configurada.")
-    return psycopg2.connect(DATABASE_URL)
+    return app.extensions["recic3_banco_dados"].conectar()
+
+
+def conectar_banco_streaming():
+    """Retorna a conexão da requisição para um gerador de resposta.
+
+    Quem recebe passa a ser dono da conexão e deve fechá-la ao terminar.
+    """
+    if not DATABASE_URL:
+        raise RuntimeError("DATABASE_URL não está configurada.")
+    return app.extensions["recic3_banco_dados"].conectar_para_streaming()
 
 
 def desativada_online(view_function):
@@ -99,6 +162,31 @@ def login_json_required(view_function):
     return protected_view
 
 
+def json_condicional(view_function):
+    """Responde 304 quando a lista JSON não mudou desde o ETag enviado pelo cliente.
+
+    O ETag fraco é o hash do corpo junto com o papel e a UVR de quem pede, então
+    o ETag obtido por uma UVR nunca confirma a resposta de outra. A consulta
+    continua sendo feita; o ganho é não reenviar listas que a tela pede de novo
+    a cada troca de formulário. As respostas seguem com `no-store`: quem guarda
+    a cópia é o script da página, em memória.
+    """
+
+    @wraps(view_function)
+    def conditional_view(*args, **kwargs):
+        resposta = make_response(view_function(*args, **kwargs))
+        if request.method != "GET" or resposta.status_code != 200 or not resposta.is_json:
+            return resposta
+        escopo = "{}:{}".format(
+            getattr(current_user, "role", ""), getattr(current_user, "uvr_acesso", None) or "*"
+        )
+        resumo = hashlib.sha256(escopo.encode("utf-8") + b"\0" + resposta.get_data())
+        resposta.set_etag(resumo.hexdigest()[:32], weak=True)
+        return resposta.make_conditional(request)
+
+    return conditional_view
+
+
 JSON_MAX_BYTES = 64 * 1024
 JSON_MAX_LIST_ITEMS = 200
 JSON_MAX_STRING_LENGTH = 5000
@@ -178,6 +266,17 @@ def _requisicao_endpoint_json():
 
 app.config["JSON_ENDPOINT_CLASSIFIER"] = _requisicao_endpoint_json
 
+# Relatórios usam POST apenas para receber filtros; como não gravam nada,
+# compartilham a mesma transação somente leitura das requisições GET. Os PDFs
+# ficam de fora: a rota grava a tarefa em `tarefas_relatorio`.
+ENDPOINTS_SOMENTE_LEITURA = frozenset({
+    "baixar_csv_extrato",
+    "baixar_csv_relatorio",
+    "gerar_extrato_bancario_json",
+    "gerar_relatorio",
+})
+app.config["DB_READ_ONLY_ENDPOINTS"] = ENDPOINTS_SOMENTE_LEITURA
+
 
 def _resposta_erro_http_json(codigo, mensagem, erro_original):
     if _requisicao_endpoint_json():
@@ -374,6 +473,12 @@ def _autorizar_relatorio_financeiro(filtros):
     negado = _aplicar_escopo_uvr(filtros, "uvr", resposta_json=True)
     if negado:
         return negado
+    # Entra na chave do cache de relatórios, inclusive quando o worker gera o PDF.
+    filtros["_uvr_autorizada"] = (
+        None
+        if getattr(current_user, "role", None) == "admin"
+        else str(getattr(current_user, "uvr_acesso", None) or "").strip()
+    )
 
     identificador = filtros.get("id_entidade")
     if not identificador:
@@ -592,6 +697,44 @@ def _texto_csv_seguro(valor):
     return texto
 
 
+TAMANHO_LOTE_EXPORTACAO = 2000
+
+
+class _LinhaCsv:
+    """Destino do csv.writer que devolve a linha formatada em vez de guardá-la."""
+
+    def write(self, linha):
+        return linha
+
+
+def _celula_csv(valor):
+    """Formata um valor vindo do banco para o CSV em uma única passagem."""
+    if valor is None:
+        return ""
+    if isinstance(valor, (int, float, Decimal)) and not isinstance(valor, bool):
+        return str(valor).replace(".", ",")
+    if isinstance(valor, datetime):
+        return valor.strftime("%d/%m/%Y %H:%M:%S")
+    if isinstance(valor, date):
+        return valor.strftime("%d/%m/%Y")
+    return _texto_csv_seguro(valor)
+
+
+def _blocos_csv(linhas, linhas_por_bloco=500):
+    """Converte linhas em blocos de texto CSV sem acumular o arquivo inteiro."""
+    escritor = csv.writer(
+        _LinhaCsv(), delimiter=";", quotechar='"', quoting=csv.QUOTE_MINIMAL
+    )
+    bloco = []
+    for linha in linhas:
+        bloco.append(escritor.writerow(linha))
+        if len(bloco) >= linhas_por_bloco:
+            yield "".join(bloco)
+            bloco = []
+    if bloco:
+        yield "".join(bloco)
+
+
 def _texto_pdf_seguro(valor):
     """Escapa texto externo antes de entregá-lo ao parser XML do ReportLab."""
     return escape(unescape(str(valor or "")))
@@ -772,6 +915,15 @@ def criar_tabelas_se_nao_existir():
             )
         """)
         
+        preparar_alocacao_pagamentos(cur)
+        preparar_saldos_conta(cur)
+        preparar_paginacao(cur)
+        preparar_busca_textual(cur)
+        preparar_fotos(cur)
+        preparar_fila_relatorios(cur)
+        preparar_versoes_dados(cur)
+        preparar_consultas_cadastrais(cur)
+
         cur.execute("""
             CREATE TABLE IF NOT EXISTS denuncias (
                 id SERIAL PRIMARY KEY, numero_denuncia VARCHAR(50) UNIQUE NOT NULL, data_registro TIMESTAMP NOT NULL,
@@ -793,6 +945,7 @@ def criar_tabelas_se_nao_existir():
                 data_solicitacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP, status VARCHAR(20) DEFAULT 'PENDENTE', observacoes_admin TEXT
             )
         """)
+        preparar_dados_referencia(cur)
 
         conn.commit()
     except psycopg2.Error:
@@ -842,7 +995,10 @@ def migrar_dados_antigos_produtos():
                 WHERE subgrupo = %s AND tipo_atividade = %s
             """, (novo_id, nome_sub, atividade_pai))
             
-        conn.commit()
+        if pendentes:
+            _confirmar_alteracao_catalogo(conn, cur)
+        else:
+            conn.commit()
         if migrados > 0:
             registrar_evento(
                 "maintenance_completed",
@@ -861,6 +1017,460 @@ def migrar_dados_antigos_produtos():
     finally:
         if conn: conn.close()
 
+# --- ALOCAÇÃO DE PAGAMENTOS POR ITEM ---
+# O valor pago de cada item e a data do último pagamento da NF ficam gravados,
+# em vez de recalculados por janela sobre todo o histórico a cada relatório.
+# Todo código que altera valor_pago_recebido, itens ou vínculos de fluxo deve
+# chamar _atualizar_alocacao_pagamentos() na mesma transação.
+DDL_ALOCACAO_PAGAMENTOS = (
+    "ALTER TABLE itens_transacao ADD COLUMN IF NOT EXISTS valor_pago_item DECIMAL(12, 2) NOT NULL DEFAULT 0.00;",
+    "ALTER TABLE transacoes_financeiras ADD COLUMN IF NOT EXISTS data_ultimo_pagamento DATE;",
+    "CREATE INDEX IF NOT EXISTS idx_itens_transacao_id_transacao ON itens_transacao (id_transacao);",
+    "CREATE INDEX IF NOT EXISTS idx_transacoes_financeiras_uvr_data_documento ON transacoes_financeiras (uvr, data_documento);",
+    "CREATE INDEX IF NOT EXISTS idx_transacoes_financeiras_data_documento ON transacoes_financeiras (data_documento);",
+    "CREATE INDEX IF NOT EXISTS idx_transacoes_financeiras_data_ultimo_pagamento ON transacoes_financeiras (data_ultimo_pagamento);",
+    "CREATE INDEX IF NOT EXISTS idx_fluxo_caixa_transacoes_link_transacao ON fluxo_caixa_transacoes_link (id_transacao_financeira);",
+)
+
+SQL_ALOCACAO_VALOR_PAGO_ITENS = """
+    UPDATE itens_transacao it
+    SET valor_pago_item = calculo.valor_pago
+    FROM (
+        SELECT
+            it2.id,
+            LEAST(
+                it2.valor_total_item,
+                GREATEST(0, COALESCE(tf.valor_pago_recebido, 0) - COALESCE(SUM(it2.valor_total_item) OVER (
+                    PARTITION BY tf.id
+                    ORDER BY it2.valor_total_item ASC, it2.id ASC
+                    ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                ), 0))
+            ) AS valor_pago
+        FROM transacoes_financeiras tf
+        JOIN itens_transacao it2 ON it2.id_transacao = tf.id
+        WHERE ({filtro})
+    ) calculo
+    WHERE it.id = calculo.id
+      AND it.valor_pago_item IS DISTINCT FROM calculo.valor_pago
+"""
+
+SQL_ALOCACAO_ULTIMO_PAGAMENTO = """
+    UPDATE transacoes_financeiras tf
+    SET data_ultimo_pagamento = ultimo.data_ultimo_pagamento
+    FROM (
+        SELECT
+            tf2.id,
+            (
+                SELECT MAX(fc.data_efetiva)
+                FROM fluxo_caixa_transacoes_link fctl
+                JOIN fluxo_caixa fc ON fc.id = fctl.id_fluxo_caixa
+                WHERE fctl.id_transacao_financeira = tf2.id
+            ) AS data_ultimo_pagamento
+        FROM transacoes_financeiras tf2
+        WHERE ({filtro})
+    ) ultimo
+    WHERE tf.id = ultimo.id
+      AND tf.data_ultimo_pagamento IS DISTINCT FROM ultimo.data_ultimo_pagamento
+"""
+
+
+def preparar_alocacao_pagamentos(cur):
+    """Cria, sem apagar nada, as colunas e os índices da alocação de pagamentos."""
+    for comando in DDL_ALOCACAO_PAGAMENTOS:
+        cur.execute(comando)
+
+
+def _atualizar_alocacao_pagamentos(cur, ids_transacao=None, uvr=None):
+    """Recalcula a alocação das NFs informadas; sem IDs, de todas as NFs.
+
+    Rotas limitadas por UVR informam `uvr` para manter o escopo também aqui.
+    """
+    if ids_transacao is None:
+        cur.execute(SQL_ALOCACAO_VALOR_PAGO_ITENS.format(filtro="TRUE"))
+        cur.execute(SQL_ALOCACAO_ULTIMO_PAGAMENTO.format(filtro="TRUE"))
+        return
+    ids = sorted({int(id_transacao) for id_transacao in ids_transacao})
+    if not ids:
+        return
+    for sql, alias in (
+        (SQL_ALOCACAO_VALOR_PAGO_ITENS, "tf"),
+        (SQL_ALOCACAO_ULTIMO_PAGAMENTO, "tf2"),
+    ):
+        filtro = f"{alias}.id = ANY(%s)"
+        parametros = [ids]
+        if uvr is not None:
+            filtro += f" AND {alias}.uvr = %s"
+            parametros.append(uvr)
+        cur.execute(sql.format(filtro=filtro), tuple(parametros))
+
+
+def recalcular_alocacao_pagamentos():
+    """Recalcula a alocação de todas as NFs.
+
+    As colunas e os índices vêm de `atualizar_esquema.py`.
+    """
+    conn = None
+    try:
+        conn = conectar_banco()
+        cur = conn.cursor()
+        _atualizar_alocacao_pagamentos(cur)
+        conn.commit()
+        registrar_evento(
+            "maintenance_completed",
+            mensagem="Alocação de pagamentos recalculada.",
+        )
+    except Exception:
+        if conn: conn.rollback()
+        registrar_evento(
+            "internal_error",
+            nivel="ERROR",
+            mensagem="Falha em atualização interna.",
+            error_type="MaintenanceError",
+        )
+        raise
+    finally:
+        if conn: conn.close()
+
+# --- PERSISTÊNCIA DE ITENS DA TRANSAÇÃO ---
+# Os itens viajam como arrays em um único comando, qualquer que seja a
+# quantidade de linhas da NF. Na edição, cada linha do formulário traz o id do
+# item que mostrou: ids iguais aos gravados ficam intactos ou recebem UPDATE,
+# ids gravados que não voltaram são removidos e linhas sem id são inseridas.
+SQL_ITENS_INFORMADOS = """
+    SELECT *
+    FROM UNNEST(%s::varchar[], %s::varchar[], %s::numeric[], %s::numeric[], %s::numeric[])
+        WITH ORDINALITY AS item(descricao, unidade, quantidade, valor_unitario, valor_total_item, posicao)
+"""
+
+SQL_INSERIR_ITENS_TRANSACAO = """
+    INSERT INTO itens_transacao
+    (id_transacao, descricao, unidade, quantidade, valor_unitario, valor_total_item)
+    SELECT %s, item.descricao, item.unidade, item.quantidade, item.valor_unitario, item.valor_total_item
+    FROM ({itens}) item
+    ORDER BY item.posicao
+""".format(itens=SQL_ITENS_INFORMADOS)
+
+SQL_ITENS_EDITADOS = """
+    SELECT *
+    FROM UNNEST(%s::integer[], %s::varchar[], %s::varchar[], %s::numeric[], %s::numeric[], %s::numeric[])
+        WITH ORDINALITY AS item(id, descricao, unidade, quantidade, valor_unitario, valor_total_item, posicao)
+"""
+
+SQL_SINCRONIZAR_ITENS_TRANSACAO = """
+    WITH novos AS ({itens}),
+    atuais AS (
+        SELECT id
+        FROM itens_transacao
+        WHERE id_transacao = %s
+    ),
+    alterados AS (
+        UPDATE itens_transacao it SET
+            descricao = novos.descricao, unidade = novos.unidade,
+            quantidade = novos.quantidade, valor_unitario = novos.valor_unitario,
+            valor_total_item = novos.valor_total_item
+        FROM novos
+        WHERE it.id = novos.id
+          AND it.id_transacao = %s
+          AND (it.descricao, it.unidade, it.quantidade, it.valor_unitario, it.valor_total_item)
+              IS DISTINCT FROM
+              (novos.descricao, novos.unidade, novos.quantidade, novos.valor_unitario, novos.valor_total_item)
+        RETURNING it.id
+    ),
+    removidos AS (
+        DELETE FROM itens_transacao it
+        WHERE it.id_transacao = %s
+          AND it.id NOT IN (SELECT novos.id FROM novos WHERE novos.id IS NOT NULL)
+        RETURNING it.id
+    )
+    INSERT INTO itens_transacao
+    (id_transacao, descricao, unidade, quantidade, valor_unitario, valor_total_item)
+    SELECT %s, novos.descricao, novos.unidade, novos.quantidade, novos.valor_unitario, novos.valor_total_item
+    FROM novos
+    WHERE novos.id IS NULL OR novos.id NOT IN (SELECT id FROM atuais)
+    ORDER BY novos.posicao
+""".format(itens=SQL_ITENS_EDITADOS)
+
+
+def _colunas_itens(itens):
+    return (
+        [item["descricao"] for item in itens],
+        [item["unidade"] for item in itens],
+        [item["quantidade"] for item in itens],
+        [item["valor_unitario"] for item in itens],
+        [item["valor_total_item"] for item in itens],
+    )
+
+
+def _inserir_itens_transacao(cur, id_transacao, itens):
+    """Grava todos os itens de uma NF nova com um único INSERT."""
+    if not itens:
+        return
+    cur.execute(SQL_INSERIR_ITENS_TRANSACAO, (id_transacao, *_colunas_itens(itens)))
+
+
+LIMITE_ID_ITEM = 2**31 - 1  # itens_transacao.id é SERIAL
+
+
+def _ids_itens(itens):
+    """Ids informados pelo formulário; repetidos e inválidos viram linha nova."""
+    ids, vistos = [], set()
+    for item in itens:
+        item_id = str(item.get("id") or "")
+        if item_id.isdigit() and int(item_id) <= LIMITE_ID_ITEM and item_id not in vistos:
+            vistos.add(item_id)
+            ids.append(int(item_id))
+        else:
+            ids.append(None)
+    return ids
+
+
+def _sincronizar_itens_transacao(cur, id_transacao, itens):
+    """Aplica a lista editada aos itens gravados com um único comando."""
+    cur.execute(
+        SQL_SINCRONIZAR_ITENS_TRANSACAO,
+        (
+            _ids_itens(itens), *_colunas_itens(itens),
+            id_transacao, id_transacao, id_transacao, id_transacao,
+        ),
+    )
+
+# --- SALDOS MENSAIS DAS CONTAS CORRENTES ---
+# saldos_conta_mensais guarda o saldo de fechamento de cada conta ao fim de
+# cada mês. O saldo inicial do extrato passa a ser o último fechamento anterior
+# ao período somado às movimentações do mês em curso, em vez da soma de todo o
+# histórico. Todo código que insere ou exclui fluxo_caixa deve chamar
+# _atualizar_saldos_conta() na mesma transação.
+VALOR_COM_SINAL_FLUXO = (
+    "CASE fc.tipo_movimentacao WHEN 'Recebimento' THEN fc.valor_efetivo "
+    "ELSE -fc.valor_efetivo END"
+)
+
+DDL_SALDOS_CONTA = (
+    """
+    CREATE TABLE IF NOT EXISTS saldos_conta_mensais (
+        id_conta_corrente INTEGER NOT NULL REFERENCES contas_correntes(id) ON DELETE CASCADE,
+        mes DATE NOT NULL,
+        saldo_fechamento DECIMAL(14, 2) NOT NULL,
+        PRIMARY KEY (id_conta_corrente, mes)
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_fluxo_caixa_conta_data_efetiva ON fluxo_caixa (id_conta_corrente, data_efetiva);",
+)
+
+# Parâmetros: conta, data, UVR, UVR (fechamento) e conta, data, UVR, UVR (delta).
+SQL_SALDO_CONTA_EM = """
+    WITH fechamento AS (
+        SELECT s.mes, s.saldo_fechamento
+        FROM saldos_conta_mensais s
+        JOIN contas_correntes cc ON cc.id = s.id_conta_corrente
+        WHERE s.id_conta_corrente = %s
+          AND s.mes < date_trunc('month', %s::date)
+          AND (%s IS NULL OR cc.uvr = %s)
+        ORDER BY s.mes DESC
+        LIMIT 1
+    )
+    SELECT COALESCE((SELECT saldo_fechamento FROM fechamento), 0)
+         + COALESCE(SUM({valor}), 0)
+    FROM fluxo_caixa fc
+    JOIN contas_correntes cc ON cc.id = fc.id_conta_corrente
+    WHERE fc.id_conta_corrente = %s
+      AND fc.data_efetiva < %s
+      AND fc.data_efetiva >= COALESCE(
+          (SELECT (mes + INTERVAL '1 month')::date FROM fechamento), '-infinity'::date
+      )
+      AND (%s IS NULL OR cc.uvr = %s)
+""".format(valor=VALOR_COM_SINAL_FLUXO)
+
+# Recalcula os fechamentos de uma conta do mês informado em diante.
+SQL_ATUALIZAR_SALDOS_CONTA = """
+    WITH parametros AS (
+        SELECT %s::integer AS id_conta, date_trunc('month', %s::date)::date AS inicio
+    ),
+    fechamento AS (
+        SELECT s.mes, s.saldo_fechamento
+        FROM saldos_conta_mensais s, parametros p
+        WHERE s.id_conta_corrente = p.id_conta AND s.mes < p.inicio
+        ORDER BY s.mes DESC
+        LIMIT 1
+    ),
+    abertura AS (
+        SELECT COALESCE((SELECT saldo_fechamento FROM fechamento), 0)
+             + COALESCE(SUM({valor}), 0) AS saldo
+        FROM fluxo_caixa fc, parametros p
+        WHERE fc.id_conta_corrente = p.id_conta
+          AND fc.data_efetiva < p.inicio
+          AND fc.data_efetiva >= COALESCE(
+              (SELECT (mes + INTERVAL '1 month')::date FROM fechamento), '-infinity'::date
+          )
+    ),
+    movimento AS (
+        SELECT date_trunc('month', fc.data_efetiva)::date AS mes, SUM({valor}) AS liquido
+        FROM fluxo_caixa fc, parametros p
+        WHERE fc.id_conta_corrente = p.id_conta AND fc.data_efetiva >= p.inicio
+        GROUP BY 1
+    ),
+    meses AS (
+        SELECT generate_series(
+            p.inicio,
+            GREATEST(
+                p.inicio,
+                (SELECT MAX(mes) FROM movimento),
+                (SELECT MAX(s.mes) FROM saldos_conta_mensais s WHERE s.id_conta_corrente = p.id_conta)
+            ),
+            INTERVAL '1 month'
+        )::date AS mes
+        FROM parametros p
+    )
+    INSERT INTO saldos_conta_mensais (id_conta_corrente, mes, saldo_fechamento)
+    SELECT
+        p.id_conta,
+        meses.mes,
+        (SELECT saldo FROM abertura)
+            + SUM(COALESCE(movimento.liquido, 0)) OVER (ORDER BY meses.mes)
+    FROM meses
+    CROSS JOIN parametros p
+    LEFT JOIN movimento ON movimento.mes = meses.mes
+    ON CONFLICT (id_conta_corrente, mes)
+    DO UPDATE SET saldo_fechamento = EXCLUDED.saldo_fechamento
+""".format(valor=VALOR_COM_SINAL_FLUXO)
+
+SQL_RECONSTRUIR_SALDOS_CONTA = """
+    WITH movimento AS (
+        SELECT
+            fc.id_conta_corrente,
+            date_trunc('month', fc.data_efetiva)::date AS mes,
+            SUM({valor}) AS liquido
+        FROM fluxo_caixa fc
+        GROUP BY 1, 2
+    ),
+    meses AS (
+        SELECT
+            id_conta_corrente,
+            generate_series(MIN(mes), MAX(mes), INTERVAL '1 month')::date AS mes
+        FROM movimento
+        GROUP BY id_conta_corrente
+    )
+    INSERT INTO saldos_conta_mensais (id_conta_corrente, mes, saldo_fechamento)
+    SELECT
+        meses.id_conta_corrente,
+        meses.mes,
+        SUM(COALESCE(movimento.liquido, 0)) OVER (
+            PARTITION BY meses.id_conta_corrente ORDER BY meses.mes
+        )
+    FROM meses
+    LEFT JOIN movimento
+        ON movimento.id_conta_corrente = meses.id_conta_corrente
+       AND movimento.mes = meses.mes
+""".format(valor=VALOR_COM_SINAL_FLUXO)
+
+
+def preparar_saldos_conta(cur):
+    """Cria, sem apagar nada, a tabela de fechamentos mensais e seu índice de apoio."""
+    for comando in DDL_SALDOS_CONTA:
+        cur.execute(comando)
+
+
+def _atualizar_saldos_conta(cur, id_conta_corrente, data_movimento, uvr=None):
+    """Refaz os fechamentos da conta a partir do mês da movimentação.
+
+    A conta é travada antes do cálculo para que dois lançamentos simultâneos
+    na mesma conta não gravem fechamentos que ignoram um ao outro.
+    """
+    cur.execute(
+        """
+        SELECT id FROM contas_correntes
+        WHERE id = %s AND (%s IS NULL OR uvr = %s)
+        FOR UPDATE
+        """,
+        (id_conta_corrente, uvr, uvr),
+    )
+    cur.execute(SQL_ATUALIZAR_SALDOS_CONTA, (id_conta_corrente, data_movimento))
+
+
+def recalcular_saldos_conta():
+    """Reconstrói os fechamentos de todas as contas.
+
+    A tabela e o índice de apoio vêm de `atualizar_esquema.py`.
+    """
+    conn = None
+    try:
+        conn = conectar_banco()
+        cur = conn.cursor()
+        cur.execute("LOCK TABLE saldos_conta_mensais IN EXCLUSIVE MODE")
+        cur.execute("DELETE FROM saldos_conta_mensais")
+        cur.execute(SQL_RECONSTRUIR_SALDOS_CONTA)
+        conn.commit()
+        registrar_evento(
+            "maintenance_completed",
+            mensagem="Saldos mensais das contas reconstruídos.",
+        )
+    except Exception:
+        if conn: conn.rollback()
+        registrar_evento(
+            "internal_error",
+            nivel="ERROR",
+            mensagem="Falha em atualização interna.",
+            error_type="MaintenanceError",
+        )
+        raise
+    finally:
+        if conn: conn.close()
+
+# Índices que mantêm as páginas por cursor das buscas em tempo constante.
+DDL_INDICES_PAGINACAO = (
+    "CREATE INDEX IF NOT EXISTS idx_associados_uvr_nome_id ON associados (uvr, nome, id);",
+    "CREATE INDEX IF NOT EXISTS idx_associados_nome_id ON associados (nome, id);",
+    "CREATE INDEX IF NOT EXISTS idx_cadastros_uvr_razao_social_id ON cadastros (uvr, razao_social, id);",
+    "CREATE INDEX IF NOT EXISTS idx_cadastros_razao_social_id ON cadastros (razao_social, id);",
+    "CREATE INDEX IF NOT EXISTS idx_transacoes_financeiras_uvr_data_id ON transacoes_financeiras (uvr, data_documento DESC, id DESC);",
+    "CREATE INDEX IF NOT EXISTS idx_transacoes_financeiras_data_id ON transacoes_financeiras (data_documento DESC, id DESC);",
+)
+
+
+def preparar_paginacao(cur):
+    for comando in DDL_INDICES_PAGINACAO:
+        cur.execute(comando)
+
+# Estruturas que as rotas exigem além do esquema legado. Bancos já implantados
+# as recebem por `atualizar_esquema.py`; cada preparador só cria o que falta.
+PREPARADORES_ESQUEMA = (
+    preparar_alocacao_pagamentos,
+    preparar_saldos_conta,
+    preparar_paginacao,
+    preparar_busca_textual,
+    preparar_fila_relatorios,
+    preparar_versoes_dados,
+    preparar_dados_referencia,
+    preparar_consultas_cadastrais,
+    preparar_fotos,
+)
+
+
+def atualizar_esquema_aplicacao():
+    """Executa PREPARADORES_ESQUEMA em uma única transação."""
+    conn = None
+    try:
+        conn = conectar_banco()
+        cur = conn.cursor()
+        for preparar in PREPARADORES_ESQUEMA:
+            preparar(cur)
+        conn.commit()
+        registrar_evento(
+            "maintenance_completed",
+            mensagem="Esquema da aplicação atualizado.",
+        )
+    except Exception:
+        if conn: conn.rollback()
+        registrar_evento(
+            "internal_error",
+            nivel="ERROR",
+            mensagem="Falha em atualização interna.",
+            error_type="MaintenanceError",
+        )
+        raise
+    finally:
+        if conn: conn.close()
+
 class User(UserMixin):
     def __init__(self, id, username, role, uvr_acesso):
         self.id = id
@@ -868,8 +1478,33 @@ class User(UserMixin):
         self.role = role
         self.uvr_acesso = uvr_acesso
 
+def _cache_usuarios():
+    return app.extensions["recic3_cache_usuarios"]
+
+
+def _dados_referencia(nome):
+    """Catálogo, subgrupos, UVRs ou atividades da cópia em memória do worker."""
+    return app.extensions["recic3_dados_referencia"].obter(nome, conectar_banco)
+
+
+def _confirmar_alteracao_catalogo(conn, cur):
+    """Confirma a escrita em produtos ou subgrupos junto com a nova versão do catálogo.
+
+    A cópia deste worker é descartada depois do commit; os demais percebem pela
+    versão em até REFERENCE_CACHE_CHECK_SECONDS.
+    """
+    incrementar_versao_referencia(cur, "catalogo", "subgrupos")
+    conn.commit()
+    app.extensions["recic3_dados_referencia"].invalidar("catalogo", "subgrupos")
+
+
 @login_manager.user_loader
 def load_user(user_id):
+    # O cache guarda somente usuários ativos. Inativação ou troca de UVR feitas
+    # fora desta aplicação valem em no máximo USER_CACHE_TTL_SECONDS.
+    dados_cache = _cache_usuarios().obter(user_id)
+    if dados_cache:
+        return User(**dados_cache)
     conn = conectar_banco()
     cur = conn.cursor()
     cur.execute("""
@@ -881,6 +1516,9 @@ def load_user(user_id):
     cur.close()
     conn.close()
     if data:
+        _cache_usuarios().guardar(user_id, {
+            "id": data[0], "username": data[1], "role": data[2], "uvr_acesso": data[3],
+        })
         return User(id=data[0], username=data[1], role=data[2], uvr_acesso=data[3])
     registrar_evento(
         "inactive_session_rejected",
@@ -920,6 +1558,7 @@ def login():
             return render_template('login.html', erro="Usuário ou senha inválidos.")
 
         user_obj = User(id=user_data[0], username=user_data[1], role=user_data[3], uvr_acesso=user_data[4])
+        _cache_usuarios().invalidar(user_obj.id)
         login_user(user_obj)
         registrar_evento(
             "authentication_succeeded",
@@ -969,6 +1608,7 @@ def alterar_senha():
                 novo_hash = generate_password_hash(nova_senha)
                 cur.execute("UPDATE usuarios SET password_hash = %s WHERE id = %s", (novo_hash, current_user.id))
                 conn.commit()
+                _cache_usuarios().invalidar(current_user.id)
                 registrar_evento(
                     "credential_updated",
                     mensagem="Credencial interna atualizada.",
@@ -1007,50 +1647,19 @@ def buscar_cep(cep_numeros):
     if not cep_numeros or not cep_numeros.isdigit() or len(cep_numeros) != 8:
         return jsonify({"erro": "CEP inválido. Forneça 8 dígitos numéricos."}), 400
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-    }
-
+    # Cache, corrida entre BrasilAPI e ViaCEP e deduplicação ficam no serviço
+    # compartilhado com a fiscalização (consultas_cadastrais).
     try:
-        # A URL agora aponta para a BrasilAPI
-        response = requests.get(
-            f"https://brasilapi.com.br/api/cep/v1/{cep_numeros}",
-            headers=headers,
-            timeout=10 # Um timeout um pouco maior para ser seguro
-        )
-        # A BrasilAPI retorna 404 para CEP não encontrado, então raise_for_status cuida disso
-        response.raise_for_status()
-
-        data = response.json()
-
-        # Ajuste os nomes das chaves para corresponder à resposta da BrasilAPI
-        return jsonify({
-            "logradouro": data.get("street", ""),
-            "bairro": data.get("neighborhood", ""),
-            "cidade": data.get("city", ""),
-            "uf": data.get("state", "")
-            # A BrasilAPI não retorna o código IBGE neste endpoint
-        })
-
-    except requests.exceptions.Timeout:
-        app.logger.warning("Consulta de CEP excedeu o tempo limite.")
-        return jsonify({"erro": "O serviço de CEP demorou muito para responder."}), 504
-
-    except requests.exceptions.HTTPError as e:
-        if e.response.status_code == 404:
-            app.logger.info("Consulta de CEP não encontrou resultado.")
-            return jsonify({"erro": "CEP não encontrado."}), 404
-        app.logger.warning(
-            "Consulta de CEP falhou. erro_tipo=%s", type(e).__name__
-        )
-        return jsonify({"erro": "Erro de comunicação ao contatar o serviço de CEP."}), 503
-
-    except requests.exceptions.RequestException as e:
-        app.logger.warning(
-            "Consulta de CEP falhou. erro_tipo=%s", type(e).__name__
-        )
+        dados = consultar_cep(cep_numeros)
+        return jsonify({campo: dados[campo] for campo in ("logradouro", "bairro", "cidade", "uf")})
+    except ValueError:
+        return jsonify({"erro": "CEP inválido. Forneça 8 dígitos numéricos."}), 400
+    except ConsultaNaoEncontradaError:
+        app.logger.info("Consulta de CEP não encontrou resultado.")
+        return jsonify({"erro": "CEP não encontrado."}), 404
+    except ConsultaExternaError:
+        app.logger.warning("Consulta de CEP falhou em todos os serviços.")
         return jsonify({"erro": "Erro de comunicação ao contatar o serviço de CEP."}), 503
-
     except Exception as e:
         app.logger.error(
             "Falha interna na consulta de CEP. erro_tipo=%s", type(e).__name__
@@ -1150,27 +1759,17 @@ def cadastrar_associado():
         except ValueError:
             return "Formato de data inválido.", 400
 
-        # --- LÓGICA DE FOTO INTELIGENTE (CORREÇÃO) ---
-        foto_final = ""
-        
-        # 1. Verifica se veio da WEBCAM (string base64 já pronta)
-        foto_webcam = dados.get("foto_webcam_base64", "")
-        if foto_webcam and len(foto_webcam) > 100:
-            foto_final = foto_webcam
-        
-        # 2. Se não tem webcam, verifica se veio ARQUIVO (upload)
-        elif 'foto_associado' in request.files:
-            arquivo = request.files['foto_associado']
-            if arquivo and arquivo.filename:
-                # Converte o arquivo enviado para Base64 para salvar no banco igual à webcam
-                conteudo_arquivo = arquivo.read()
-                encoded_string = base64.b64encode(conteudo_arquivo).decode('utf-8')
-                mime_type = arquivo.content_type or "image/jpeg"
-                foto_final = f"data:{mime_type};base64,{encoded_string}"
-        # -----------------------------------------------
+        # Foto: webcam tem prioridade sobre o upload; grava reduzida fora da linha.
+        try:
+            foto = ler_foto_enviada(
+                dados.get("foto_webcam_base64"), request.files.get("foto_associado")
+            )
+        except FotoInvalida:
+            return "Foto inválida.", 400
 
         conn = conectar_banco()
         cur = conn.cursor()
+        foto_id = gravar_foto(cur, foto) if foto else None
         
         # Gera próximo número
         cur.execute("SELECT MAX(CAST(numero AS INTEGER)) FROM associados")
@@ -1181,14 +1780,14 @@ def cadastrar_associado():
         cur.execute("""
             INSERT INTO associados (numero, uvr, associacao, nome, cpf, rg, data_nascimento,
                                     data_admissao, status, cep, logradouro, endereco_numero,
-                                    bairro, cidade, uf, telefone, data_hora_cadastro, foto_base64)
+                                    bairro, cidade, uf, telefone, data_hora_cadastro, foto_id)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """, (
             numero_gerado_str, dados["uvr"], dados.get("associacao",""), dados["nome"],
             cpf_num, dados["rg"], data_nascimento, data_admissao, dados["status"],
             cep_num, dados.get("logradouro", ""), dados.get("endereco_numero", ""), 
             dados.get("bairro", ""), dados.get("cidade", ""), dados.get("uf", ""), 
-            dados["telefone"], data_hora, foto_final
+            dados["telefone"], data_hora, foto_id
         ))
         
         conn.commit()
@@ -1200,10 +1799,141 @@ def cadastrar_associado():
     finally:
         if conn: conn.close()
 
+# --- FOTOS DE ASSOCIADOS E PATRIMÔNIO ---
+# As fotos ficam na tabela `fotos`; os registros guardam só `foto_id`. A URL
+# leva o id da foto, que muda a cada troca, então o navegador pode guardá-la.
+CACHE_FOTO_SEGUNDOS = 365 * 24 * 60 * 60
+
+
+def _url_foto(tabela, id_registro, id_foto, *, miniatura=False):
+    if not id_foto:
+        return None
+    parametros = {"tamanho": "miniatura"} if miniatura else {}
+    return url_for(
+        "servir_foto", tabela=tabela, id_registro=id_registro, id_foto=id_foto, **parametros
+    )
+
+
+def _foto_da_solicitacao(cur, dados, chave_legada):
+    """foto_id proposto; solicitações antigas ainda trazem a foto em base64."""
+    if dados.get("foto_id"):
+        return int(dados["foto_id"])
+    try:
+        conteudo = decodificar_data_url(dados.get(chave_legada))
+        return gravar_foto(cur, processar_foto(conteudo)) if conteudo else None
+    except FotoInvalida:
+        return None
+
+
+@app.route("/fotos/<tabela>/<int:id_registro>/<int:id_foto>", methods=["GET"])
+@login_required
+def servir_foto(tabela, id_registro, id_foto):
+    if tabela == "solicitacoes" and getattr(current_user, "role", None) != "admin":
+        abort(404)
+    uvr, negado = _escopo_uvr_objeto(resposta_json=False)
+    if negado:
+        return negado
+    miniatura = request.args.get("tamanho") == "miniatura"
+    conn = None
+    try:
+        conn = conectar_banco()
+        linha = consultar_foto(
+            conn.cursor(), tabela, id_registro, id_foto, uvr, miniatura=miniatura
+        )
+    finally:
+        if conn: conn.close()
+    if not linha:
+        abort(404)
+
+    conteudo, sha256 = linha
+    resposta = Response(bytes(conteudo), mimetype=TIPO_MIME_FOTO)
+    resposta.set_etag(f"{sha256.strip()}-{'m' if miniatura else 'f'}")
+    # Dados pessoais: somente o cache do próprio navegador pode guardar.
+    resposta.cache_control.private = True
+    resposta.cache_control.max_age = CACHE_FOTO_SEGUNDOS
+    resposta.cache_control.immutable = True
+    return resposta.make_conditional(request)
+
+
+def migrar_fotos_legadas(lote=100):
+    """Move as fotos base64 antigas para `fotos` e remove fotos órfãs.
+
+    A tabela e as colunas `foto_id` vêm de `atualizar_esquema.py`. Cada lote
+    tem commit próprio, então o comando pode ser interrompido e executado de
+    novo. Retorna as contagens de migradas, inválidas e removidas.
+    """
+    conn = None
+    totais = {"migradas": 0, "invalidas": 0, "removidas": 0}
+    try:
+        conn = conectar_banco()
+        cur = conn.cursor()
+        for tabela in TABELAS_COM_FOTO:
+            apos_id = 0
+            while apos_id is not None:
+                apos_id, migradas, invalidas = migrar_lote_fotos(cur, tabela, apos_id, lote)
+                conn.commit()
+                totais["migradas"] += migradas
+                totais["invalidas"] += invalidas
+        cur.execute(SQL_REMOVER_FOTOS_ORFAS)
+        totais["removidas"] = cur.rowcount
+        conn.commit()
+        registrar_evento(
+            "maintenance_completed",
+            mensagem="Fotos movidas para o armazenamento próprio.",
+            affected_count=totais["migradas"],
+        )
+        return totais
+    except Exception:
+        if conn: conn.rollback()
+        registrar_evento(
+            "internal_error",
+            nivel="ERROR",
+            mensagem="Falha em atualização interna.",
+            error_type="MaintenanceError",
+        )
+        raise
+    finally:
+        if conn: conn.close()
+
+# --- PAGINAÇÃO DAS BUSCAS DE GESTÃO ---
+# Cada busca ordena por uma coluna visível e desempata pelo id; a página
+# seguinte começa depois da última linha entregue, sem OFFSET.
+ORDEM_ASSOCIADOS = OrdemKeyset("associados", (("nome", "texto", 1), ("id", "inteiro", 0)))
+ORDEM_CADASTROS = OrdemKeyset("cadastros", (("razao_social", "texto", 1), ("id", "inteiro", 0)))
+ORDEM_TRANSACOES_GESTAO = OrdemKeyset(
+    "transacoes_gestao",
+    (("data_documento", "data", 1), ("id", "inteiro", 0)),
+    descendente=True,
+)
+ORDEM_PATRIMONIO = OrdemKeyset(
+    "patrimonio", (("COALESCE(descricao, '')", "texto", 1), ("id", "inteiro", 0))
+)
+LIMITE_MAXIMO_PAGINA = 200
+
+
+def _parametros_pagina(limite_padrao):
+    """Retorna (limite, cursor, com_total, resposta_de_erro)."""
+    try:
+        limite, cursor, com_total = ler_parametros_pagina(
+            request.args,
+            limite_padrao=limite_padrao,
+            limite_maximo=LIMITE_MAXIMO_PAGINA,
+        )
+    except ValueError:
+        return None, None, False, (jsonify({"error": "Parâmetros de paginação inválidos."}), 400)
+    return limite, cursor, com_total, None
+
+
+def _resposta_cursor_invalido():
+    return jsonify({"error": "A paginação expirou; refaça a busca."}), 400
+
 @app.route("/buscar_associados", methods=["GET"])
 @login_json_required
 @login_required
 def buscar_associados():
+    limite, cursor_pagina, com_total, erro_pagina = _parametros_pagina(50)
+    if erro_pagina:
+        return erro_pagina
     # Coleta os parâmetros da URL
     termo = request.args.get("q", "").lower()
     status_filtro = request.args.get("status", "")
@@ -1240,10 +1970,10 @@ def buscar_associados():
         # -------------------------------------------
 
         # 1. Filtro de Texto (Nome ou CPF)
-        if termo:
-            sql += " AND (LOWER(nome) LIKE %s OR cpf LIKE %s)"
-            params.append(f"%{termo}%")
-            params.append(f"%{termo}%")
+        filtro_busca, params_busca = condicao_busca(termo, ("nome",), ("cpf",))
+        if filtro_busca:
+            sql += f" AND {filtro_busca}"
+            params.extend(params_busca)
             
         # 2. Filtro de Status
         if status_filtro and status_filtro != "Todos":
@@ -1260,14 +1990,14 @@ def buscar_associados():
             sql += " AND data_admissao <= %s"
             params.append(data_fim)
 
-        # Ordenação
-        sql += " ORDER BY nome ASC LIMIT 50"
-        
-        cur.execute(sql, tuple(params))
-        resultados = cur.fetchall()
+        pagina = consultar_pagina(
+            cur, sql, params, ORDEM_ASSOCIADOS,
+            limite=limite, cursor=cursor_pagina, com_total=com_total,
+            filtros={"sql": sql, "params": params},
+        )
         
         lista_associados = []
-        for row in resultados:
+        for row in pagina.linhas:
             data_adm_str = ""
             if row[6]: data_adm_str = row[6].strftime('%Y-%m-%d')
 
@@ -1281,7 +2011,10 @@ def buscar_associados():
                 "data_admissao": data_adm_str
             })
             
-        return jsonify(lista_associados)
+        return jsonify(pagina.resposta(lista_associados))
+
+    except CursorInvalido:
+        return _resposta_cursor_invalido()
 
     except Exception as e:
         app.logger.error(
@@ -1308,7 +2041,7 @@ def get_associado(id):
         sql = """
             SELECT id, nome, cpf, rg, data_nascimento, data_admissao, status, 
                    uvr, associacao, logradouro, endereco_numero, bairro, cidade, 
-                   uf, cep, telefone, foto_base64
+                   uf, cep, telefone, foto_id
             FROM associados WHERE id = %s
         """
         row = _consulta_objeto_por_uvr(cur, sql, id, uvr)
@@ -1328,7 +2061,8 @@ def get_associado(id):
             "logradouro": row[9], "numero": row[10], "bairro": row[11],
             "cidade": row[12], "uf": row[13], "cep": row[14],
             "telefone": row[15],
-            "foto_base64": row[16] # A foto vem aqui!
+            "foto_url": _url_foto("associados", row[0], row[16]),
+            "foto_miniatura_url": _url_foto("associados", row[0], row[16], miniatura=True),
         }
         
         return jsonify(associado)
@@ -1369,30 +2103,17 @@ def editar_associado():
         data_nasc = processar_data(dados.get("data_nascimento"))
         data_adm = processar_data(dados.get("data_admissao"))
 
-        # --- LÓGICA DE FOTO NA EDIÇÃO ---
-        foto_final = ""
-        
-        # 1. Prioridade: Nova foto de Webcam
-        foto_webcam = dados.get("foto_webcam_base64", "")
-        if foto_webcam and len(foto_webcam) > 100:
-            foto_final = foto_webcam
-        
-        # 2. Prioridade: Novo Arquivo de Upload
-        elif 'foto_associado' in request.files:
-            arquivo = request.files['foto_associado']
-            if arquivo and arquivo.filename:
-                conteudo = arquivo.read()
-                encoded = base64.b64encode(conteudo).decode('utf-8')
-                mime = arquivo.content_type or "image/jpeg"
-                foto_final = f"data:{mime};base64,{encoded}"
-        
-        # 3. Se não enviou nada novo, mantém a existente (que vem num campo hidden)
-        if not foto_final:
-            foto_final = dados.get("foto_existente_base64", "")
-        # --------------------------------
+        # Foto nova (webcam ou upload); sem foto nova, a atual é mantida.
+        try:
+            foto = ler_foto_enviada(
+                dados.get("foto_webcam_base64"), request.files.get("foto_associado")
+            )
+        except FotoInvalida:
+            return "Foto inválida.", 400
 
         conn = conectar_banco()
         cur = conn.cursor()
+        foto_id = gravar_foto(cur, foto) if foto else None
 
         if current_user.role == 'admin':
             cur.execute("""
@@ -1400,14 +2121,15 @@ def editar_associado():
                     nome=%s, cpf=%s, rg=%s, data_nascimento=%s, data_admissao=%s,
                     status=%s, uvr=%s, associacao=%s, cep=%s, logradouro=%s,
                     endereco_numero=%s, bairro=%s, cidade=%s, uf=%s, telefone=%s,
-                    foto_base64=%s
+                    foto_id=COALESCE(%s, foto_id),
+                    foto_base64=CASE WHEN %s IS NULL THEN foto_base64 END
                 WHERE id=%s
             """, (
                 dados["nome"], cpf_num, dados["rg"], data_nasc, data_adm,
                 dados["status"], dados["uvr"], dados.get("associacao", ""), cep_num,
                 dados.get("logradouro", ""), dados.get("endereco_numero", ""),
                 dados.get("bairro", ""), dados.get("cidade", ""), dados.get("uf"),
-                dados["telefone"], foto_final, int(id_associado)
+                dados["telefone"], foto_id, foto_id, int(id_associado)
             ))
             if cur.rowcount == 0:
                 conn.rollback()
@@ -1423,7 +2145,8 @@ def editar_associado():
                 "endereco_numero", "bairro", "cidade", "uf", "telefone",
             }
             dados_json = {campo: dados.get(campo, "") for campo in campos_permitidos}
-            dados_json['foto_base64'] = foto_final # Garante que a foto vai no JSON
+            if foto_id:
+                dados_json["foto_id"] = foto_id
             # Converte datas para string para não quebrar o JSON
             if data_nasc: dados_json['data_nascimento'] = str(data_nasc)
             if data_adm: dados_json['data_admissao'] = str(data_adm)
@@ -1484,7 +2207,7 @@ def cadastrar_produto_servico():
             dados["item_produto_servico"].strip(),
             data_hora_cadastro
         ))
-        conn.commit()
+        _confirmar_alteracao_catalogo(conn, cur)
         app.logger.info(
             "Produto/servico cadastrado. usuario_id=%s", current_user.id
         )
@@ -1556,6 +2279,7 @@ def cadastrar_conta_corrente():
             banco_codigo.strip(), banco_nome.strip(), agencia, conta_corrente,
             dados.get("descricao_apelido_conta", "").strip(), data_hora
         ))
+        registrar_referencias(cur, uvr=dados["uvr_conta"])
         conn.commit()
         app.logger.info("Conta corrente cadastrada. usuario_id=%s", current_user.id)
         return redirect(url_for("sucesso_conta_corrente"))
@@ -1580,15 +2304,12 @@ def cadastrar_conta_corrente():
 @app.route("/get_produtos_servicos", methods=["GET"])
 @login_json_required
 @login_required
+@json_condicional
 def get_produtos_servicos():
-    conn = None
     try:
-        conn = conectar_banco()
-        cur = conn.cursor()
-        cur.execute("SELECT id, item, tipo, tipo_atividade, grupo, subgrupo FROM produtos_servicos ORDER BY item")
         produtos_servicos = [
             {"id": row[0], "item": row[1], "tipo": row[2], "tipo_atividade": row[3], "grupo": row[4], "subgrupo": row[5]} 
-            for row in cur.fetchall()
+            for row in _dados_referencia("catalogo")
         ]
         return jsonify(produtos_servicos)
     except Exception as e:
@@ -1596,13 +2317,11 @@ def get_produtos_servicos():
             "Falha ao consultar produtos e serviços. erro_tipo=%s", type(e).__name__
         )
         return jsonify({"error": "Não foi possível realizar a consulta."}), 500
-    finally:
-        if conn and not conn.closed:
-            conn.close()
 
 @app.route("/get_cadastros_ativos", methods=["GET"])
 @login_json_required
 @login_required
+@json_condicional
 def get_cadastros_ativos():
     conn = None
     try:
@@ -1701,6 +2420,7 @@ def get_resumo_fluxo_caixa():
 @app.route("/get_contas_correntes") 
 @login_json_required
 @login_required
+@json_condicional
 def get_contas_correntes_fluxo_caixa():
     uvr, negado = _escopo_uvr_consulta(request.args.get("uvr"))
     if negado:
@@ -1740,6 +2460,7 @@ def get_contas_correntes_fluxo_caixa():
 @app.route("/get_associados_ativos", methods=["GET"])
 @login_json_required
 @login_required
+@json_condicional
 def get_associados_ativos():
     conn = None
     try:
@@ -1768,6 +2489,7 @@ def get_associados_ativos():
 @app.route("/get_distinct_grupos")
 @login_json_required
 @login_required
+@json_condicional
 def get_distinct_grupos():
     """Retorna os Grupos (Atividades) baseados no Tipo (Receita/Despesa)."""
     tipo = request.args.get('tipo')
@@ -1799,62 +2521,48 @@ def get_distinct_grupos():
 @app.route("/get_distinct_subgrupos")
 @login_json_required
 @login_required
+@json_condicional
 def get_distinct_subgrupos():
     """Retorna os Subgrupos vinculados a um Grupo Pai (tabela 'subgrupos')."""
     grupo = request.args.get('grupo')
     if not grupo:
         return jsonify([])
         
-    conn = conectar_banco()
-    cur = conn.cursor()
     try:
         # Busca na tabela NOVA de subgrupos
-        cur.execute("SELECT nome FROM subgrupos WHERE atividade_pai = %s ORDER BY nome", (grupo,))
-        res = [r[0] for r in cur.fetchall()]
+        res = [
+            nome for nome, atividade_pai in _dados_referencia("subgrupos")
+            if atividade_pai == grupo
+        ]
         return jsonify(res)
     except Exception as e:
         app.logger.error(
             "Falha ao consultar subgrupos. erro_tipo=%s", type(e).__name__
         )
         return jsonify({"error": "Não foi possível realizar a consulta."}), 500
-    finally:
-        conn.close()
 
 @app.route("/get_items_for_filters")
 @login_json_required
 @login_required
+@json_condicional
 def get_items_for_filters():
     """Retorna itens filtrados por Grupo e Subgrupo."""
     grupo = request.args.get('grupo')
     subgrupo = request.args.get('subgrupo')
     
-    sql = "SELECT DISTINCT item FROM produtos_servicos WHERE 1=1"
-    params = []
-    
-    if grupo:
-        sql += " AND (grupo = %s OR tipo_atividade = %s)"
-        params.append(grupo)
-        params.append(grupo)
-    
-    if subgrupo:
-        sql += " AND subgrupo = %s"
-        params.append(subgrupo)
-        
-    sql += " ORDER BY item"
-    
-    conn = conectar_banco()
-    cur = conn.cursor()
     try:
-        cur.execute(sql, tuple(params))
-        res = [r[0] for r in cur.fetchall()]
+        # O catálogo já vem ordenado por item e o item é único.
+        res = [
+            produto[1] for produto in _dados_referencia("catalogo")
+            if (not grupo or grupo in (produto[4], produto[3]))
+            and (not subgrupo or produto[5] == subgrupo)
+        ]
         return jsonify(res)
     except Exception as e:
         app.logger.error(
             "Falha ao consultar itens. erro_tipo=%s", type(e).__name__
         )
         return jsonify({"error": "Não foi possível realizar a consulta."}), 500
-    finally:
-        conn.close()
 
 @app.route("/registrar_transacao_financeira", methods=["POST"])
 @login_required
@@ -2008,15 +2716,14 @@ def registrar_transacao_financeira():
             return _resposta_acesso_negado_html()
         id_transacao_criada = transacao_criada[0]
 
-        for item_data in itens_para_db:
-            cur.execute("""
-                INSERT INTO itens_transacao
-                (id_transacao, descricao, unidade, quantidade, valor_unitario, valor_total_item)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                id_transacao_criada, item_data['descricao'], item_data['unidade'],
-                item_data['quantidade'], item_data['valor_unitario'], item_data['valor_total_item']
-            ))
+        _inserir_itens_transacao(cur, id_transacao_criada, itens_para_db)
+        incrementar_versao_dados(cur, uvrs=[dados["uvr_transacao"]])
+        registrar_referencias(
+            cur,
+            uvr=dados["uvr_transacao"],
+            tipo_transacao=dados["tipo_transacao"],
+            tipo_atividade=dados["tipo_atividade_transacao"],
+        )
         conn.commit()
         app.logger.info(
             "Transacao financeira registrada. usuario_id=%s", current_user.id
@@ -2062,6 +2769,8 @@ def editar_transacao():
         unidades = request.form.getlist("produto_servico_unidade[]")
         quantidades = request.form.getlist("produto_servico_quantidade[]")
         valores = request.form.getlist("produto_servico_valor_unitario[]")
+        # Id do item já gravado que a linha mostra; vazio nas linhas novas.
+        ids_itens = request.form.getlist("produto_servico_id[]")
         
         itens_processados = []
         valor_total_novo = Decimal('0.00')
@@ -2073,6 +2782,7 @@ def editar_transacao():
             total_item = qtd * vu
             
             itens_processados.append({
+                "id": ids_itens[i] if i < len(ids_itens) else "",
                 "descricao": descricoes[i], "unidade": unidades[i],
                 "quantidade": float(qtd), "valor_unitario": float(vu), # float para salvar no JSON
                 "valor_total_item": float(total_item)
@@ -2142,6 +2852,9 @@ def editar_transacao():
             if cabecalho['id_origem'] and cabecalho['id_origem'].isdigit():
                 id_origem_sql = int(cabecalho['id_origem'])
 
+            incrementar_versao_dados(
+                cur, uvrs=[cabecalho['uvr']], ids_transacao=[id_transacao]
+            )
             cur.execute("""
                 UPDATE transacoes_financeiras SET
                     uvr=%s, associacao=%s, data_documento=%s, tipo_transacao=%s,
@@ -2159,13 +2872,15 @@ def editar_transacao():
                 conn.rollback()
                 return "Recurso não encontrado.", 404
 
-            # Atualiza Itens (Estratégia: Apaga todos antigos e recria os novos)
-            cur.execute("DELETE FROM itens_transacao WHERE id_transacao = %s", (id_transacao,))
-            for item in itens_processados:
-                cur.execute("""
-                    INSERT INTO itens_transacao (id_transacao, descricao, unidade, quantidade, valor_unitario, valor_total_item)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (id_transacao, item['descricao'], item['unidade'], item['quantidade'], item['valor_unitario'], item['valor_total_item']))
+            # Atualiza Itens (somente as linhas que mudaram)
+            _sincronizar_itens_transacao(cur, id_transacao, itens_processados)
+            _atualizar_alocacao_pagamentos(cur, [id_transacao])
+            registrar_referencias(
+                cur,
+                uvr=cabecalho['uvr'],
+                tipo_transacao=cabecalho['tipo_transacao'],
+                tipo_atividade=cabecalho['tipo_atividade'],
+            )
             
             conn.commit()
             return redirect(url_for("sucesso_transacao")) # Reutiliza página de sucesso
@@ -2455,17 +3170,25 @@ def registrar_fluxo_caixa():
         if not notas_ids_selecionadas:
              return jsonify({"error": "Nenhuma nota fiscal (transação) foi selecionada para este lançamento."}), 400
 
-        for id_nf_str in notas_ids_selecionadas:
-            cur.execute("""
-                SELECT (valor_total_documento - valor_pago_recebido) AS valor_pendente
-                FROM transacoes_financeiras
-                WHERE id = %s AND uvr = %s
-            """, (int(id_nf_str), uvr))
-            nf_pendente_row = cur.fetchone()
-            if not nf_pendente_row or nf_pendente_row[0] is None:
-                conn.rollback()
-                return _resposta_acesso_negado_json()
-            total_nfs_selecionadas_valor += Decimal(nf_pendente_row[0])
+        # Trava as NFs em ordem de ID, evitando deadlock entre pagamentos
+        # simultâneos; um segundo pagamento espera e enxerga o saldo já baixado.
+        ids_nfs = list(dict.fromkeys(int(id_nf_str) for id_nf_str in notas_ids_selecionadas))
+        cur.execute("""
+            SELECT id, valor_pago_recebido, valor_total_documento
+            FROM transacoes_financeiras
+            WHERE id = ANY(%s) AND uvr = %s
+            ORDER BY id
+            FOR UPDATE
+        """, (ids_nfs, uvr))
+        nfs_travadas = {row[0]: row for row in cur.fetchall()}
+        if len(nfs_travadas) != len(ids_nfs) or any(
+            row[1] is None or row[2] is None for row in nfs_travadas.values()
+        ):
+            conn.rollback()
+            return _resposta_acesso_negado_json()
+        for id_transacao in ids_nfs:
+            _, pago_na_nf, total_da_nf = nfs_travadas[id_transacao]
+            total_nfs_selecionadas_valor += Decimal(total_da_nf) - Decimal(pago_na_nf)
         
         saldo_operacao_calculado = total_nfs_selecionadas_valor - valor_efetivo
         observacoes = dados.get("observacoes")
@@ -2500,61 +3223,72 @@ def registrar_fluxo_caixa():
             return _resposta_acesso_negado_json()
         id_fluxo = fluxo_criado[0]
 
+        # A distribuição segue a ordem em que as NFs foram selecionadas.
+        aplicacoes = []
         valor_efetivo_restante_para_aplicar = valor_efetivo
-        for id_nf_str in notas_ids_selecionadas:
-            id_transacao = int(id_nf_str)
+        for id_transacao in ids_nfs:
             if valor_efetivo_restante_para_aplicar <= Decimal('0'):
                 break 
 
-            cur.execute("""
-                SELECT valor_pago_recebido, valor_total_documento,
-                       (valor_total_documento - valor_pago_recebido) AS valor_pendente
-                FROM transacoes_financeiras
-                WHERE id = %s AND uvr = %s
-            """, (id_transacao, uvr))
-            nf_data = cur.fetchone()
-            if not nf_data:
-                conn.rollback()
-                return _resposta_acesso_negado_json()
-
-            atual_pago_na_nf, total_doc_da_nf, pendente_na_nf = Decimal(nf_data[0]), Decimal(nf_data[1]), Decimal(nf_data[2])
+            _, pago_na_nf, total_da_nf = nfs_travadas[id_transacao]
+            atual_pago_na_nf, total_doc_da_nf = Decimal(pago_na_nf), Decimal(total_da_nf)
+            pendente_na_nf = total_doc_da_nf - atual_pago_na_nf
             valor_a_aplicar_nesta_nf = min(valor_efetivo_restante_para_aplicar, pendente_na_nf)
             
             if valor_a_aplicar_nesta_nf > Decimal('0'):
-                cur.execute("""
-                    INSERT INTO fluxo_caixa_transacoes_link
-                    (id_fluxo_caixa, id_transacao_financeira, valor_aplicado_nesta_nf)
-                    SELECT %s, tf.id, %s
-                    FROM transacoes_financeiras tf
-                    WHERE tf.id = %s AND tf.uvr = %s
-                """, (id_fluxo, valor_a_aplicar_nesta_nf, id_transacao, uvr))
-                if cur.rowcount == 0:
-                    conn.rollback()
-                    return _resposta_acesso_negado_json()
-
                 novo_valor_pago_total_na_nf = atual_pago_na_nf + valor_a_aplicar_nesta_nf
                 
                 if novo_valor_pago_total_na_nf.quantize(Decimal('0.01')) >= total_doc_da_nf.quantize(Decimal('0.01')):
                     status_final_nf = 'Liquidado'
                 else:
                     status_final_nf = 'Parcialmente Pago/Recebido'
-                
-                cur.execute("""
-                    UPDATE transacoes_financeiras
-                    SET valor_pago_recebido = %s, status_pagamento = %s
-                    WHERE id = %s AND uvr = %s
-                """, (
+                aplicacoes.append((
+                    id_transacao,
+                    valor_a_aplicar_nesta_nf,
                     novo_valor_pago_total_na_nf,
                     status_final_nf,
-                    id_transacao,
-                    uvr,
                 ))
-                if cur.rowcount == 0:
-                    conn.rollback()
-                    return _resposta_acesso_negado_json()
-                
                 valor_efetivo_restante_para_aplicar -= valor_a_aplicar_nesta_nf
 
+        if aplicacoes:
+            ids_aplicados = [aplicacao[0] for aplicacao in aplicacoes]
+            cur.execute("""
+                INSERT INTO fluxo_caixa_transacoes_link
+                (id_fluxo_caixa, id_transacao_financeira, valor_aplicado_nesta_nf)
+                SELECT %s, tf.id, aplicacao.valor
+                FROM UNNEST(%s::integer[], %s::numeric[]) AS aplicacao(id, valor)
+                JOIN transacoes_financeiras tf ON tf.id = aplicacao.id
+                WHERE tf.uvr = %s
+            """, (
+                id_fluxo,
+                ids_aplicados,
+                [aplicacao[1] for aplicacao in aplicacoes],
+                uvr,
+            ))
+            if cur.rowcount != len(aplicacoes):
+                conn.rollback()
+                return _resposta_acesso_negado_json()
+
+            cur.execute("""
+                UPDATE transacoes_financeiras tf
+                SET valor_pago_recebido = aplicacao.valor_pago,
+                    status_pagamento = aplicacao.status
+                FROM UNNEST(%s::integer[], %s::numeric[], %s::varchar[])
+                    AS aplicacao(id, valor_pago, status)
+                WHERE tf.id = aplicacao.id AND tf.uvr = %s
+            """, (
+                ids_aplicados,
+                [aplicacao[2] for aplicacao in aplicacoes],
+                [aplicacao[3] for aplicacao in aplicacoes],
+                uvr,
+            ))
+            if cur.rowcount != len(aplicacoes):
+                conn.rollback()
+                return _resposta_acesso_negado_json()
+
+            _atualizar_alocacao_pagamentos(cur, ids_aplicados, uvr=uvr)
+            incrementar_versao_dados(cur, uvrs=[uvr])
+        _atualizar_saldos_conta(cur, id_conta, data_efetiva, uvr=uvr)
         conn.commit()
         app.logger.info("Fluxo de caixa registrado. usuario_id=%s", current_user.id)
         return jsonify({"status": "sucesso", "message": "Fluxo de caixa registrado e transações atualizadas."})
@@ -2639,6 +3373,7 @@ def registrar_denuncia():
             dados["uvr_denuncia"],
             dados.get("associacao_denuncia", "")
         ))
+        registrar_referencias(cur, uvr=dados["uvr_denuncia"])
         conn.commit()
         app.logger.info("Denuncia registrada. usuario_id=%s", current_user.id)
         return redirect(url_for("sucesso_denuncia"))
@@ -2660,122 +3395,82 @@ def registrar_denuncia():
 @app.route("/get_relatorio_uvrs", methods=["GET"])
 @login_json_required
 @login_required
+@json_condicional
 def get_relatorio_uvrs():
-    conn = None
     try:
         if getattr(current_user, "role", None) != "admin":
             uvr, negado = _escopo_uvr_consulta()
             if negado:
                 return negado
             return jsonify([uvr])
-        conn = conectar_banco()
-        cur = conn.cursor()
-        cur.execute("SELECT DISTINCT uvr FROM transacoes_financeiras")
-        uvrs_transacoes = {row[0] for row in cur.fetchall()}
-        cur.execute("SELECT DISTINCT uvr FROM contas_correntes")
-        uvrs_contas = {row[0] for row in cur.fetchall()}
-        cur.execute("SELECT DISTINCT uvr FROM fluxo_caixa")
-        uvrs_fluxo = {row[0] for row in cur.fetchall()}
-        cur.execute("SELECT DISTINCT uvr FROM denuncias") # Adicionado para denúncias
-        uvrs_denuncias = {row[0] for row in cur.fetchall()}
-        
-        all_uvrs = sorted(list(uvrs_transacoes.union(uvrs_contas).union(uvrs_fluxo).union(uvrs_denuncias)))
-        return jsonify(all_uvrs)
+        # Registro mantido por transações, contas, fluxo de caixa e denúncias.
+        return jsonify(list(_dados_referencia("uvrs")))
     except Exception as e:
         app.logger.error(
             "Falha ao consultar UVRs do relatório. erro_tipo=%s", type(e).__name__
         )
         return jsonify({"error": "Não foi possível realizar a consulta."}), 500
-    finally:
-        if conn and not conn.closed: conn.close()
 
 @app.route("/get_relatorio_tipos_atividade_transacao", methods=["GET"])
 @login_json_required
 @login_required
+@json_condicional
 def get_relatorio_tipos_atividade_transacao():
     tipo_transacao = request.args.get("tipo_transacao") 
-    conn = None
     try:
-        conn = conectar_banco()
-        cur = conn.cursor()
-        query = "SELECT DISTINCT tipo_atividade FROM transacoes_financeiras"
-        params = []
-        if tipo_transacao:
-            query += " WHERE tipo_transacao = %s"
-            params.append(tipo_transacao)
-        query += " ORDER BY tipo_atividade"
-        cur.execute(query, tuple(params))
-        tipos_atividade = [row[0] for row in cur.fetchall()]
+        # O registro vem ordenado por atividade; dict.fromkeys remove as
+        # repetidas entre Receita e Despesa sem perder a ordem.
+        tipos_atividade = list(dict.fromkeys(
+            tipo_atividade
+            for tipo, tipo_atividade in _dados_referencia("atividades")
+            if not tipo_transacao or tipo == tipo_transacao
+        ))
         return jsonify(tipos_atividade)
     except Exception as e:
         app.logger.error(
             "Falha ao consultar atividades do relatório. erro_tipo=%s", type(e).__name__
         )
         return jsonify({"error": "Não foi possível realizar a consulta."}), 500
-    finally:
-        if conn and not conn.closed: conn.close()
 
 @app.route("/get_relatorio_catalog_options", methods=["GET"])
 @login_json_required
 @login_required
+@json_condicional
 def get_relatorio_catalog_options():
     option_type = request.args.get("option_type") 
     tipo_transacao = request.args.get("tipo_transacao") 
     tipo_atividade_catalogo = request.args.get("tipo_atividade_catalogo")
     grupo = request.args.get("grupo")
     subgrupo = request.args.get("subgrupo")
-    conn = None
+    # (posição do valor, posição da ordem) na linha do catálogo em memória;
+    # o item é único e o catálogo já vem ordenado por ele.
+    colunas = {"grupo": (4, 6), "subgrupo": (5, 7), "item": (1, None)}
+    if option_type not in colunas:
+        return jsonify({"error": "Tipo de opção inválido"}), 400
     try:
-        conn = conectar_banco()
-        cur = conn.cursor()
-        
-        query_select = ""
-        if option_type == "grupo":
-            query_select = "SELECT DISTINCT grupo FROM produtos_servicos WHERE grupo IS NOT NULL AND grupo <> ''"
-        elif option_type == "subgrupo":
-            query_select = "SELECT DISTINCT subgrupo FROM produtos_servicos WHERE subgrupo IS NOT NULL AND subgrupo <> ''"
-        elif option_type == "item":
-            query_select = "SELECT DISTINCT item FROM produtos_servicos WHERE item IS NOT NULL AND item <> ''"
-        else:
-            return jsonify({"error": "Tipo de opção inválido"}), 400
-
-        filters = []
-        params = []
-
-        if tipo_transacao: 
-            filters.append("tipo = %s")
-            params.append(tipo_transacao) 
-        if tipo_atividade_catalogo: 
-            filters.append("tipo_atividade = %s") 
-            params.append(tipo_atividade_catalogo)
-        if grupo and option_type != "grupo": 
-            filters.append("grupo = %s")
-            params.append(grupo)
-        if subgrupo and option_type == "item": 
-            if subgrupo == "(Nenhum)" or subgrupo == "":
-                 filters.append("(ps.subgrupo IS NULL OR ps.subgrupo = '')") # Corrigido para ps.subgrupo se ps for o alias da tabela produtos_servicos
-            else:
-                filters.append("subgrupo = %s")
-                params.append(subgrupo)
-        
-        if filters:
-            query_select += " AND " + " AND ".join(filters)
-        
-        valid_order_by_columns = ["grupo", "subgrupo", "item"]
-        if option_type not in valid_order_by_columns:
-            return jsonify({"error": "Tipo de ordenação inválido"}), 400
-        query_select += f" ORDER BY {option_type}"
-        
-        cur.execute(query_select, tuple(params))
-        options = [row[0] for row in cur.fetchall()]
+        sem_subgrupo = subgrupo == "(Nenhum)"
+        produtos = [
+            produto for produto in _dados_referencia("catalogo")
+            if (not tipo_transacao or produto[2] == tipo_transacao)
+            and (not tipo_atividade_catalogo or produto[3] == tipo_atividade_catalogo)
+            and (not grupo or option_type == "grupo" or produto[4] == grupo)
+            and (
+                not subgrupo or option_type != "item"
+                or (not produto[5] if sem_subgrupo else produto[5] == subgrupo)
+            )
+        ]
+        indice_valor, indice_ordem = colunas[option_type]
+        if indice_ordem is not None:
+            produtos.sort(key=lambda produto: produto[indice_ordem])
+        options = list(dict.fromkeys(
+            produto[indice_valor] for produto in produtos if produto[indice_valor]
+        ))
         return jsonify(options)
     except Exception as e:
         app.logger.error(
             "Falha ao consultar catálogo do relatório. erro_tipo=%s", type(e).__name__
         )
         return jsonify({"error": "Não foi possível realizar a consulta."}), 500
-    finally:
-        if conn and not conn.closed: conn.close()
 
 @app.route("/get_relatorio_entidades_para_filtro", methods=["GET"])
 @login_json_required
@@ -2880,167 +3575,176 @@ def get_relatorio_entidades_para_filtro():
 
 
 # --- ROTAS PARA GERAR E BAIXAR RELATÓRIO FINANCEIRO ---
-def fetch_report_data(filters):
-    conn = None
-    try:
-        conn = conectar_banco()
-        cur = conn.cursor()
+def _montar_consulta_relatorio(conn, filters):
+    """Retorna o SQL parametrizado do relatório financeiro e seus parâmetros."""
+    # Valor pago por item e último pagamento da NF vêm da alocação mantida
+    # pelas rotas de fluxo de caixa (ver _atualizar_alocacao_pagamentos).
+    base_query = """
+        SELECT
+            tf.uvr, 
+            tf.associacao, 
+            tf.nome_cadastro_origem, 
+            tf.numero_documento,
+            tf.data_documento, 
+            COALESCE(tf.data_ultimo_pagamento, tf.data_documento) as data_efetiva_pag_rec, 
+            tf.tipo_transacao, 
+            tf.tipo_atividade AS tipo_atividade_transacao,
+            it.descricao AS item_descricao,
+            ps.tipo AS item_tipo_catalogo, 
+            ps.tipo_atividade AS item_tipo_atividade_catalogo, 
+            ps.grupo AS item_grupo_catalogo, 
+            ps.subgrupo AS item_subgrupo_catalogo,
+            it.unidade, 
+            it.quantidade, 
+            it.valor_unitario, 
+            it.valor_total_item,
+            tf.status_pagamento, 
+            it.valor_pago_item as valor_pago_neste_item,
+            tf.data_hora_registro 
+        FROM
+            transacoes_financeiras tf
+        JOIN
+            itens_transacao it ON tf.id = it.id_transacao
+        LEFT JOIN 
+            produtos_servicos ps ON TRIM(it.descricao) = TRIM(ps.item)
+    """
+    where_clauses = []
+    params = []
 
-        # CTE para calcular o valor pago por item e obter a data do último pagamento da NF.
-        cte_query = """
-        WITH ItemPagamentosDistribuidos AS (
-            SELECT
-                it.id as item_id,
-                tf.id as transacao_id,
-                it.valor_total_item,
-                tf.valor_pago_recebido as total_pago_na_nf,
-                COALESCE(SUM(it.valor_total_item) OVER (
-                    PARTITION BY tf.id 
-                    ORDER BY it.valor_total_item ASC, it.id ASC 
-                    ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
-                ), 0) as previous_items_cumulative_value
-            FROM
-                transacoes_financeiras tf
-            JOIN
-                itens_transacao it ON tf.id = it.id_transacao
-        ),
-        UltimoPagamentoData AS (
-            SELECT
-                fctl.id_transacao_financeira,
-                MAX(fc.data_efetiva) as data_ultimo_pagamento_nf
-            FROM fluxo_caixa_transacoes_link fctl
-            JOIN fluxo_caixa fc ON fctl.id_fluxo_caixa = fc.id
-            GROUP BY fctl.id_transacao_financeira
-        )
-        """
-        
-        base_query = cte_query + """
-            SELECT
-                tf.uvr, 
-                tf.associacao, 
-                tf.nome_cadastro_origem, 
-                tf.numero_documento,
-                tf.data_documento, 
-                COALESCE(upd.data_ultimo_pagamento_nf, tf.data_documento) as data_efetiva_pag_rec, 
-                tf.tipo_transacao, 
-                tf.tipo_atividade AS tipo_atividade_transacao,
-                it.descricao AS item_descricao,
-                ps.tipo AS item_tipo_catalogo, 
-                ps.tipo_atividade AS item_tipo_atividade_catalogo, 
-                ps.grupo AS item_grupo_catalogo, 
-                ps.subgrupo AS item_subgrupo_catalogo,
-                it.unidade, 
-                it.quantidade, 
-                it.valor_unitario, 
-                it.valor_total_item,
-                tf.status_pagamento, 
-                LEAST(
-                    ipd.valor_total_item, 
-                    GREATEST(0, ipd.total_pago_na_nf - ipd.previous_items_cumulative_value)
-                ) as valor_pago_neste_item,
-                tf.data_hora_registro 
-            FROM
-                transacoes_financeiras tf
-            JOIN
-                itens_transacao it ON tf.id = it.id_transacao
-            JOIN
-                ItemPagamentosDistribuidos ipd ON it.id = ipd.item_id
-            LEFT JOIN 
-                produtos_servicos ps ON TRIM(it.descricao) = TRIM(ps.item)
-            LEFT JOIN
-                UltimoPagamentoData upd ON tf.id = upd.id_transacao_financeira
-        """
-        where_clauses = []
-        params = []
+    if filters.get("data_inicial"):
+        where_clauses.append("(tf.data_documento >= %s OR tf.data_ultimo_pagamento >= %s)")
+        params.extend([filters["data_inicial"], filters["data_inicial"]])
+    if filters.get("data_final"):
+        where_clauses.append("(tf.data_documento <= %s OR tf.data_ultimo_pagamento <= %s)")
+        params.extend([filters["data_final"], filters["data_final"]])
+    
+    if filters.get("uvr"):
+        where_clauses.append("tf.uvr = %s")
+        params.append(filters["uvr"])
 
-        if filters.get("data_inicial"):
-            where_clauses.append("(tf.data_documento >= %s OR upd.data_ultimo_pagamento_nf >= %s)")
-            params.extend([filters["data_inicial"], filters["data_inicial"]])
-        if filters.get("data_final"):
-            where_clauses.append("(tf.data_documento <= %s OR upd.data_ultimo_pagamento_nf <= %s)")
-            params.extend([filters["data_final"], filters["data_final"]])
-        
-        if filters.get("uvr"):
-            where_clauses.append("tf.uvr = %s")
-            params.append(filters["uvr"])
+    # Novos filtros de Entidade
+    tipo_entidade = filters.get("tipo_entidade")
+    id_entidade_str = filters.get("id_entidade") # Este é o ID da tabela cadastros ou associados
+
+    if tipo_entidade and id_entidade_str:
+        try:
+            id_entidade_int = int(id_entidade_str)
+            if tipo_entidade == "Cliente":
+                where_clauses.append("tf.id_cadastro_origem = %s AND tf.tipo_transacao = 'Receita'") # Clientes associados a Receitas
+                params.append(id_entidade_int)
+            elif tipo_entidade == "Fornecedor/Prestador":
+                where_clauses.append("tf.id_cadastro_origem = %s AND tf.tipo_transacao = 'Despesa'") # Fornecedores a Despesas
+                params.append(id_entidade_int)
+            elif tipo_entidade == "Associado":
+                # Para associado, o filtro é pelo nome em nome_cadastro_origem e tipo_atividade de rateio
+                # Buscamos o nome do associado pelo ID fornecido
+                cur_nome_assoc = conn.cursor()
+                cur_nome_assoc.execute("SELECT nome FROM associados WHERE id = %s", (id_entidade_int,))
+                nome_assoc_row = cur_nome_assoc.fetchone()
+                if nome_assoc_row:
+                    nome_associado_para_filtro = nome_assoc_row[0]
+                    where_clauses.append("tf.nome_cadastro_origem = %s AND tf.tipo_atividade = 'Rateio dos Associados' AND tf.id_cadastro_origem IS NULL AND tf.tipo_transacao = 'Despesa'")
+                    params.append(nome_associado_para_filtro)
+                cur_nome_assoc.close()
+                
+        except ValueError:
+            app.logger.warning("Identificador de entidade inválido no relatório.")
+
+
+    if filters.get("tipo_transacao_rel"): 
+        # Este filtro já é parcialmente coberto pela lógica de tipo_entidade, mas pode refinar mais
+        # Por exemplo, se tipo_entidade for vazio, este filtro se aplica diretamente.
+        # Se tipo_entidade for Cliente, e tipo_transacao_rel for Despesa, o resultado será vazio (correto).
+        if not (tipo_entidade and id_entidade_str): # Só aplica se não houver filtro de entidade específico que já restrinja o tipo_transacao
+            where_clauses.append("tf.tipo_transacao = %s")
+            params.append(filters["tipo_transacao_rel"])
+        elif tipo_entidade == "Cliente" and filters.get("tipo_transacao_rel") == "Receita":
+            pass # Já coberto ou compatível
+        elif tipo_entidade == "Fornecedor/Prestador" and filters.get("tipo_transacao_rel") == "Despesa":
+            pass # Já coberto ou compatível
+        elif tipo_entidade == "Associado" and filters.get("tipo_transacao_rel") == "Despesa":
+            pass # Já coberto ou compatível
+        # else: # Conflito, mas a lógica de entidade já deve ter retornado vazio. Para segurança:
+        #    if (tipo_entidade == "Cliente" and filters.get("tipo_transacao_rel") == "Despesa") or \
+        #       (tipo_entidade == "Fornecedor/Prestador" and filters.get("tipo_transacao_rel") == "Receita") or \
+        #       (tipo_entidade == "Associado" and filters.get("tipo_transacao_rel") == "Receita"):
+        #        where_clauses.append("1=0") # Força resultado vazio devido a conflito
+
+
+    if filters.get("tipo_atividade_transacao_rel"):
+        where_clauses.append("tf.tipo_atividade = %s") 
+        params.append(filters["tipo_atividade_transacao_rel"])
+    if filters.get("grupo_rel"):
+        where_clauses.append("ps.grupo = %s")
+        params.append(filters["grupo_rel"])
+    if filters.get("subgrupo_rel"):
+        if filters["subgrupo_rel"] == "(Nenhum)" or filters["subgrupo_rel"] == "":
+             where_clauses.append("(ps.subgrupo IS NULL OR ps.subgrupo = '')")
+        else:
+            where_clauses.append("ps.subgrupo = %s")
+            params.append(filters["subgrupo_rel"])
+    if filters.get("item_rel"):
+        where_clauses.append("ps.item = %s")
+        params.append(filters["item_rel"])
+    if filters.get("status_pagamento_rel"): 
+        where_clauses.append("tf.status_pagamento = %s")
+        params.append(filters["status_pagamento_rel"])
+
+
+    if where_clauses:
+        base_query += " WHERE " + " AND ".join(where_clauses)
+    
+    base_query += " ORDER BY data_efetiva_pag_rec, tf.data_documento, tf.id, it.valor_total_item, it.id"
+    
+    app.logger.debug("Consulta parametrizada do relatório financeiro preparada.")
+    return base_query, tuple(params)
 
-        # Novos filtros de Entidade
-        tipo_entidade = filters.get("tipo_entidade")
-        id_entidade_str = filters.get("id_entidade") # Este é o ID da tabela cadastros ou associados
 
-        if tipo_entidade and id_entidade_str:
-            try:
-                id_entidade_int = int(id_entidade_str)
-                if tipo_entidade == "Cliente":
-                    where_clauses.append("tf.id_cadastro_origem = %s AND tf.tipo_transacao = 'Receita'") # Clientes associados a Receitas
-                    params.append(id_entidade_int)
-                elif tipo_entidade == "Fornecedor/Prestador":
-                    where_clauses.append("tf.id_cadastro_origem = %s AND tf.tipo_transacao = 'Despesa'") # Fornecedores a Despesas
-                    params.append(id_entidade_int)
-                elif tipo_entidade == "Associado":
-                    # Para associado, o filtro é pelo nome em nome_cadastro_origem e tipo_atividade de rateio
-                    # Buscamos o nome do associado pelo ID fornecido
-                    cur_nome_assoc = conn.cursor()
-                    cur_nome_assoc.execute("SELECT nome FROM associados WHERE id = %s", (id_entidade_int,))
-                    nome_assoc_row = cur_nome_assoc.fetchone()
-                    if nome_assoc_row:
-                        nome_associado_para_filtro = nome_assoc_row[0]
-                        where_clauses.append("tf.nome_cadastro_origem = %s AND tf.tipo_atividade = 'Rateio dos Associados' AND tf.id_cadastro_origem IS NULL AND tf.tipo_transacao = 'Despesa'")
-                        params.append(nome_associado_para_filtro)
-                    cur_nome_assoc.close()
-                    
-            except ValueError:
-                app.logger.warning("Identificador de entidade inválido no relatório.")
-
-
-        if filters.get("tipo_transacao_rel"): 
-            # Este filtro já é parcialmente coberto pela lógica de tipo_entidade, mas pode refinar mais
-            # Por exemplo, se tipo_entidade for vazio, este filtro se aplica diretamente.
-            # Se tipo_entidade for Cliente, e tipo_transacao_rel for Despesa, o resultado será vazio (correto).
-            if not (tipo_entidade and id_entidade_str): # Só aplica se não houver filtro de entidade específico que já restrinja o tipo_transacao
-                where_clauses.append("tf.tipo_transacao = %s")
-                params.append(filters["tipo_transacao_rel"])
-            elif tipo_entidade == "Cliente" and filters.get("tipo_transacao_rel") == "Receita":
-                pass # Já coberto ou compatível
-            elif tipo_entidade == "Fornecedor/Prestador" and filters.get("tipo_transacao_rel") == "Despesa":
-                pass # Já coberto ou compatível
-            elif tipo_entidade == "Associado" and filters.get("tipo_transacao_rel") == "Despesa":
-                pass # Já coberto ou compatível
-            # else: # Conflito, mas a lógica de entidade já deve ter retornado vazio. Para segurança:
-            #    if (tipo_entidade == "Cliente" and filters.get("tipo_transacao_rel") == "Despesa") or \
-            #       (tipo_entidade == "Fornecedor/Prestador" and filters.get("tipo_transacao_rel") == "Receita") or \
-            #       (tipo_entidade == "Associado" and filters.get("tipo_transacao_rel") == "Receita"):
-            #        where_clauses.append("1=0") # Força resultado vazio devido a conflito
-
-
-        if filters.get("tipo_atividade_transacao_rel"):
-            where_clauses.append("tf.tipo_atividade = %s") 
-            params.append(filters["tipo_atividade_transacao_rel"])
-        if filters.get("grupo_rel"):
-            where_clauses.append("ps.grupo = %s")
-            params.append(filters["grupo_rel"])
-        if filters.get("subgrupo_rel"):
-            if filters["subgrupo_rel"] == "(Nenhum)" or filters["subgrupo_rel"] == "":
-                 where_clauses.append("(ps.subgrupo IS NULL OR ps.subgrupo = '')")
-            else:
-                where_clauses.append("ps.subgrupo = %s")
-                params.append(filters["subgrupo_rel"])
-        if filters.get("item_rel"):
-            where_clauses.append("ps.item = %s")
-            params.append(filters["item_rel"])
-        if filters.get("status_pagamento_rel"): 
-            where_clauses.append("tf.status_pagamento = %s")
-            params.append(filters["status_pagamento_rel"])
+def _cache_relatorios():
+    return app.extensions["recic3_cache_relatorios"]
 
 
-        if where_clauses:
-            base_query += " WHERE " + " AND ".join(where_clauses)
-        
-        base_query += " ORDER BY data_efetiva_pag_rec, tf.data_documento, tf.id, it.valor_total_item, it.id"
-        
-        app.logger.debug("Consulta parametrizada do relatório financeiro preparada.")
+# Campos que mudam o resultado de _montar_consulta_relatorio; os demais só
+# aparecem no título do PDF e não separam entradas do cache.
+CAMPOS_CONSULTA_RELATORIO = JSON_CAMPOS_RELATORIO - {"nome_entidade_display", "listar_por"}
+
+
+def _chave_cache_relatorio(cur, filters):
+    """Lê a versão dos dados antes da consulta, para nunca guardar dado velho como novo."""
+    return chave_relatorio(
+        "relatorio_financeiro",
+        {campo: filters.get(campo) for campo in CAMPOS_CONSULTA_RELATORIO},
+        uvr_autorizada=filters.get("_uvr_autorizada"),
+        versao=ler_versao_dados(cur, filters.get("uvr")),
+    )
+
 
-        cur.execute(base_query, tuple(params))
+def relatorio_em_cache(filters):
+    """Linhas do relatório já em cache para os filtros, sem consultar o relatório."""
+    cache = _cache_relatorios()
+    if not cache.ativo:
+        return None
+    conn = None
+    try:
+        conn = conectar_banco()
+        return cache.obter(_chave_cache_relatorio(conn.cursor(), filters))
+    finally:
+        if conn: conn.close()
+
+
+def fetch_report_data(filters):
+    cache = _cache_relatorios()
+    conn = None
+    try:
+        conn = conectar_banco()
+        cur = conn.cursor()
+        chave = _chave_cache_relatorio(cur, filters) if cache.ativo else None
+        report_data = cache.obter(chave)
+        if report_data is not None:
+            return report_data
+
+        base_query, params = _montar_consulta_relatorio(conn, filters)
+        cur.execute(base_query, params)
         columns = [desc[0] for desc in cur.description]
         report_data = [dict(zip(columns, row)) for row in cur.fetchall()]
         
@@ -3052,6 +3756,7 @@ def fetch_report_data(filters):
                     row_dict[key] = value.strftime('%Y-%m-%d')
                 elif isinstance(value, datetime): 
                      row_dict[key] = value.strftime('%Y-%m-%dT%H:%M:%S')
+        cache.guardar(chave, report_data)
         return report_data
     except Exception as e:
         app.logger.error(
@@ -3061,6 +3766,56 @@ def fetch_report_data(filters):
     finally:
         if conn: conn.close()
 
+def stream_report_rows(filters):
+    """Gera as linhas do relatório em lotes de um cursor nomeado no servidor.
+
+    A conexão fica aberta enquanto o gerador é consumido e é liberada ao final
+    ou quando o download é interrompido.
+    """
+    conn = conectar_banco_streaming()
+    cur = None
+    try:
+        base_query, params = _montar_consulta_relatorio(conn, filters)
+        cur = conn.cursor(name=f"exportacao_relatorio_{secrets.token_hex(4)}")
+        cur.itersize = TAMANHO_LOTE_EXPORTACAO
+        cur.execute(base_query, params)
+        while True:
+            lote = cur.fetchmany(TAMANHO_LOTE_EXPORTACAO)
+            if not lote:
+                break
+            yield from lote
+    except Exception as e:
+        app.logger.error(
+            "Falha na exportacao do relatorio. erro_tipo=%s", type(e).__name__
+        )
+        raise
+    finally:
+        if cur is not None:
+            try:
+                cur.close()
+            except psycopg2.Error:
+                pass
+        conn.close()
+
+# Colunas que fetch_report_data entrega como texto e o CSV formata pelo tipo.
+CAMPOS_DATA_RELATORIO = ("data_documento", "data_efetiva_pag_rec")
+CAMPOS_DECIMAL_RELATORIO = (
+    "quantidade", "valor_unitario", "valor_total_item", "valor_pago_neste_item",
+)
+
+
+def _linha_relatorio_do_cache(row):
+    """Converte uma linha em cache na tupla que stream_report_rows produziria."""
+    valores = dict(row)
+    for campo in CAMPOS_DATA_RELATORIO:
+        if valores.get(campo):
+            valores[campo] = date.fromisoformat(valores[campo])
+    for campo in CAMPOS_DECIMAL_RELATORIO:
+        if valores.get(campo) not in (None, ""):
+            valores[campo] = Decimal(valores[campo])
+    return tuple(valores.values())
+
+
 @app.route("/gerar_relatorio", methods=["POST"])
 @login_json_required
 @login_required
@@ -3074,6 +3829,7 @@ def gerar_relatorio():
             return negado
         app.logger.info("Solicitacao autorizada de relatorio financeiro.")
         data = fetch_report_data(filters)
+        registrar_linhas_relatorio("financeiro", "json", len(data))
         return jsonify(data)
     except Exception as e:
         app.logger.error(
@@ -3093,14 +3849,18 @@ def baixar_csv_relatorio():
         if negado:
             return negado
         app.logger.info("Solicitacao autorizada de CSV do relatorio financeiro.")
-        data = fetch_report_data(filters)
+        # Depois de /gerar_relatorio com os mesmos filtros o resultado já está
+        # em cache; sem ele, o CSV continua em streaming e não entra no cache.
+        em_cache = relatorio_em_cache(filters)
+        if em_cache is None:
+            linhas = stream_report_rows(filters)
+        else:
+            linhas = map(_linha_relatorio_do_cache, em_cache)
+        primeira = next(linhas, None)
 
-        if not data:
+        if primeira is None:
             return jsonify({"message": "Nenhum dado encontrado para os filtros fornecidos."}), 404
 
-        output = io.StringIO()
-        writer = csv.writer(output, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        
         header = [
             "UVR", "Associação", "Fornecedor/Cliente/Associado (Transação)", "Nº Documento", 
             "Data Documento", "Data Efetiva Pag./Rec.", 
@@ -3109,46 +3869,20 @@ def baixar_csv_relatorio():
             "Unidade", "Quantidade", "Valor Unitário (R$)", "Valor Total Item (R$)", 
             "Status Pagamento NF", "Valor Pago/Recebido Item (R$)" 
         ]
-        writer.writerow(header)
-        
-        for row_data_dict in data:
-            data_doc_str = ""
-            if row_data_dict.get("data_documento"):
-                try: data_doc_str = datetime.strptime(row_data_dict["data_documento"], '%Y-%m-%d').strftime('%d/%m/%Y')
-                except ValueError: data_doc_str = row_data_dict["data_documento"]
-            
-            data_efetiva_str = ""
-            if row_data_dict.get("data_efetiva_pag_rec"):
-                try: data_efetiva_str = datetime.strptime(row_data_dict["data_efetiva_pag_rec"], '%Y-%m-%d').strftime('%d/%m/%Y')
-                except ValueError: data_efetiva_str = row_data_dict["data_efetiva_pag_rec"]
-
-
-            csv_row = [
-                _texto_csv_seguro(row_data_dict.get("uvr", "")),
-                _texto_csv_seguro(row_data_dict.get("associacao", "")),
-                _texto_csv_seguro(row_data_dict.get("nome_cadastro_origem", "")),
-                _texto_csv_seguro(row_data_dict.get("numero_documento", "")),
-                _texto_csv_seguro(data_doc_str),
-                _texto_csv_seguro(data_efetiva_str),
-                _texto_csv_seguro(row_data_dict.get("tipo_transacao", "")),
-                _texto_csv_seguro(row_data_dict.get("tipo_atividade_transacao", "")),
-                _texto_csv_seguro(row_data_dict.get("item_descricao", "")),
-                _texto_csv_seguro(row_data_dict.get("item_tipo_catalogo", "")),
-                _texto_csv_seguro(row_data_dict.get("item_tipo_atividade_catalogo", "")),
-                _texto_csv_seguro(row_data_dict.get("item_grupo_catalogo", "")),
-                _texto_csv_seguro(row_data_dict.get("item_subgrupo_catalogo", "")),
-                _texto_csv_seguro(row_data_dict.get("unidade", "")),
-                str(row_data_dict.get("quantidade", "")).replace('.', ','),
-                str(row_data_dict.get("valor_unitario", "")).replace('.', ','), 
-                str(row_data_dict.get("valor_total_item", "")).replace('.', ','),
-                _texto_csv_seguro(row_data_dict.get("status_pagamento", "")),
-                str(row_data_dict.get("valor_pago_neste_item", "")).replace('.', ',') 
-            ]
-            writer.writerow(csv_row)
-        
-        output.seek(0)
+
+        def gerar_linhas():
+            yield header
+            # As colunas do SELECT seguem a ordem do cabeçalho; a última
+            # (data_hora_registro) não é exportada.
+            exportadas = contar_linhas_relatorio(
+                itertools.chain((primeira,), linhas), "financeiro", "csv"
+            )
+            for row in exportadas:
+                yield [_celula_csv(valor) for valor in row[:len(header)]]
+
         return Response(
-            output, mimetype="text/csv; charset=utf-8",
+            stream_with_context(_blocos_csv(gerar_linhas())),
+            mimetype="text/csv; charset=utf-8",
             headers={"Content-Disposition": "attachment;filename=relatorio_financeiro.csv"}
         )
     except Exception as e:
@@ -3194,6 +3928,124 @@ def _create_pdf_header_footer(canvas, doc, title, subtitle=""):
     canvas.restoreState()
 
 # --- ROTAS PARA PDF ---
+def _data_curta_relatorio(valor):
+    return datetime.strptime(valor, '%Y-%m-%d').strftime('%d/%m/%y') if valor else ""
+
+
+# (título, largura relativa, alinhamento, formatação) das colunas do PDF
+# financeiro; as larguras são esticadas até ocupar a página.
+COLUNAS_PDF_RELATORIO_FINANCEIRO = (
+    ("Data Doc.", 1.3, "CENTER", _data_curta_relatorio),
+    ("Data Efet.", 1.3, "CENTER", _data_curta_relatorio),
+    ("UVR", 1.0, "CENTER", str),
+    ("Cliente/Forn.", 2.5, "LEFT", str),
+    ("Nº Doc.", 1.2, "CENTER", str),
+    ("Tipo", 0.8, "CENTER", str),
+    ("Ativ. Trans.", 2.0, "LEFT", str),
+    ("Item Descrição", 2.8, "LEFT", str),
+    ("Grupo", 1.8, "LEFT", str),
+    ("Subgrupo", 1.8, "LEFT", str),
+    ("Qtd.", 1.0, "RIGHT", _format_decimal_quantidade),
+    ("Vl. Unit.", 1.5, "RIGHT", _format_decimal),
+    ("Vl. Total", 1.5, "RIGHT", _format_decimal),
+    ("Status NF", 1.5, "CENTER", str),
+    ("Vl. Pago Item", 1.5, "RIGHT", _format_decimal),
+)
+
+
+def _gerar_pdf_relatorio_financeiro(filters):
+    """Monta o PDF do relatório financeiro; executado pelo worker da fila."""
+    data = fetch_report_data(filters)
+    if not data:
+        raise RelatorioSemDados()
+    registrar_linhas_relatorio("financeiro", "pdf", len(data))
+
+    title_pdf = "Relatório Financeiro Detalhado"
+    subtitle_parts = []
+    if filters.get("uvr"): subtitle_parts.append(f"UVR: {filters['uvr']}")
+
+    if filters.get("tipo_entidade") and filters.get("id_entidade"):
+        nome_entidade_display = filters.get("nome_entidade_display") 
+        if nome_entidade_display: # Se o nome foi passado pelo JS
+             subtitle_parts.append(f"{filters['tipo_entidade']}: {nome_entidade_display}")
+        else: # Senão, busca no banco (requer cursor e conexão aqui, ou simplificar)
+            # Para simplificar, podemos apenas mostrar o ID se o nome não vier
+            subtitle_parts.append(f"{filters['tipo_entidade']} ID: {filters['id_entidade']}")
+
+
+    data_inicial_str = filters.get("data_inicial")
+    data_final_str = filters.get("data_final")
+
+    periodo_str = "Período não especificado"
+    if data_inicial_str and data_final_str:
+        try:
+            di = datetime.strptime(data_inicial_str, '%Y-%m-%d').strftime('%d/%m/%Y')
+            df = datetime.strptime(data_final_str, '%Y-%m-%d').strftime('%d/%m/%Y')
+            periodo_str = f"Período: {di} a {df}"
+        except ValueError:
+            periodo_str = f"Período (datas inválidas): {data_inicial_str} a {data_final_str}"
+    elif data_inicial_str:
+        try:
+            di = datetime.strptime(data_inicial_str, '%Y-%m-%d').strftime('%d/%m/%Y')
+            periodo_str = f"A partir de: {di}"
+        except ValueError:
+             periodo_str = f"A partir de (data inválida): {data_inicial_str}"
+    elif data_final_str:
+        try:
+            df = datetime.strptime(data_final_str, '%Y-%m-%d').strftime('%d/%m/%Y')
+            periodo_str = f"Até: {df}"
+        except ValueError:
+            periodo_str = f"Até (data inválida): {data_final_str}"
+    subtitle_parts.append(periodo_str)
+
+    subtitle_pdf = " | ".join(subtitle_parts)
+
+    margens = (1.5*inch, 1*inch, 0.3*inch, 0.3*inch)
+    largura_util = landscape(A4)[0] - margens[2] - margens[3]
+    proporcao = largura_util / sum(largura for _, largura, _, _ in COLUNAS_PDF_RELATORIO_FINANCEIRO)
+    colunas = [
+        ColunaPdf(
+            titulo, largura * proporcao, alinhamento,
+            formatar=formatar, somar=titulo in {"Vl. Total", "Vl. Pago Item"},
+        )
+        for titulo, largura, alinhamento, formatar in COLUNAS_PDF_RELATORIO_FINANCEIRO
+    ]
+
+    def linhas():
+        for row in data:
+            yield (
+                row.get("data_documento"),
+                row.get("data_efetiva_pag_rec"),
+                row.get("uvr") or "",
+                (row.get("nome_cadastro_origem") or "")[:20],
+                (row.get("numero_documento") or "")[:10],
+                (row.get("tipo_transacao") or "")[:3],
+                (row.get("tipo_atividade_transacao") or "")[:15],
+                (row.get("item_descricao") or "")[:25],
+                (row.get("item_grupo_catalogo") or "")[:12],
+                (row.get("item_subgrupo_catalogo") or "")[:12],
+                row.get("quantidade", ""),
+                row.get("valor_unitario", ""),
+                row.get("valor_total_item", ""),
+                (row.get("status_pagamento") or "")[:10],
+                row.get("valor_pago_neste_item", ""),
+            )
+
+    conteudo = renderizar_tabela_paginada(
+        linhas(), colunas, pagesize=landscape(A4), margens=margens,
+        ao_desenhar_pagina=lambda c, d: _create_pdf_header_footer(c, d, title_pdf, subtitle_pdf),
+    )
+
+    uvr_arquivo = _nome_arquivo_seguro(filters.get("uvr"), "todos")
+    inicio_arquivo = _nome_arquivo_seguro(filters.get("data_inicial"), "inicio")
+    fim_arquivo = _nome_arquivo_seguro(filters.get("data_final"), "fim")
+    filename = (
+        f"relatorio_financeiro_{uvr_arquivo}_"
+        f"{inicio_arquivo}_a_{fim_arquivo}.pdf"
+    )
+    return filename, "application/pdf", conteudo
+
+
 @app.route("/baixar_pdf_relatorio_financeiro", methods=["POST"])
 @login_json_required
 @login_required
@@ -3206,154 +4058,7 @@ def baixar_pdf_relatorio_financeiro():
         if negado:
             return negado
         app.logger.info("Solicitacao autorizada de PDF do relatorio financeiro.")
-        data = fetch_report_data(filters)
-
-        if not data:
-            return jsonify({"message": "Nenhum dado encontrado para os filtros fornecidos."}), 404
-
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), topMargin=1.5*inch, bottomMargin=1*inch, leftMargin=0.3*inch, rightMargin=0.3*inch) 
-        
-        story = []
-        styles = getSampleStyleSheet()
-        style_normal = styles['Normal']
-        style_normal.fontSize = 7 
-        style_body = ParagraphStyle('BodyText', parent=style_normal, alignment=TA_LEFT, leading=9)
-        style_right = ParagraphStyle('BodyTextRight', parent=style_body, alignment=TA_RIGHT)
-        style_center = ParagraphStyle('BodyTextCenter', parent=style_body, alignment=TA_CENTER)
-        style_header_table = ParagraphStyle('TableHeader', parent=style_body, fontName='Helvetica-Bold', alignment=TA_CENTER, fontSize=7.5)
-
-        title_pdf = "Relatório Financeiro Detalhado"
-        subtitle_parts = []
-        if filters.get("uvr"): subtitle_parts.append(f"UVR: {filters['uvr']}")
-        
-        if filters.get("tipo_entidade") and filters.get("id_entidade"):
-            nome_entidade_display = filters.get("nome_entidade_display") 
-            if nome_entidade_display: # Se o nome foi passado pelo JS
-                 subtitle_parts.append(f"{filters['tipo_entidade']}: {nome_entidade_display}")
-            else: # Senão, busca no banco (requer cursor e conexão aqui, ou simplificar)
-                # Para simplificar, podemos apenas mostrar o ID se o nome não vier
-                subtitle_parts.append(f"{filters['tipo_entidade']} ID: {filters['id_entidade']}")
-
-
-        data_inicial_str = filters.get("data_inicial")
-        data_final_str = filters.get("data_final")
-        
-        periodo_str = "Período não especificado"
-        if data_inicial_str and data_final_str:
-            try:
-                di = datetime.strptime(data_inicial_str, '%Y-%m-%d').strftime('%d/%m/%Y')
-                df = datetime.strptime(data_final_str, '%Y-%m-%d').strftime('%d/%m/%Y')
-                periodo_str = f"Período: {di} a {df}"
-            except ValueError:
-                periodo_str = f"Período (datas inválidas): {data_inicial_str} a {data_final_str}"
-        elif data_inicial_str:
-            try:
-                di = datetime.strptime(data_inicial_str, '%Y-%m-%d').strftime('%d/%m/%Y')
-                periodo_str = f"A partir de: {di}"
-            except ValueError:
-                 periodo_str = f"A partir de (data inválida): {data_inicial_str}"
-        elif data_final_str:
-            try:
-                df = datetime.strptime(data_final_str, '%Y-%m-%d').strftime('%d/%m/%Y')
-                periodo_str = f"Até: {df}"
-            except ValueError:
-                periodo_str = f"Até (data inválida): {data_final_str}"
-        subtitle_parts.append(periodo_str)
-
-        subtitle_pdf = " | ".join(subtitle_parts)
-        
-        header_data = [
-            Paragraph("Data Doc.", style_header_table), Paragraph("Data Efet.", style_header_table), Paragraph("UVR", style_header_table), 
-            Paragraph("Cliente/Forn.", style_header_table), Paragraph("Nº Doc.", style_header_table), 
-            Paragraph("Tipo", style_header_table), Paragraph("Ativ. Trans.", style_header_table),
-            Paragraph("Item Descrição", style_header_table), Paragraph("Grupo", style_header_table), 
-            Paragraph("Subgrupo", style_header_table), Paragraph("Qtd.", style_header_table), 
-            Paragraph("Vl. Unit.", style_header_table), Paragraph("Vl. Total", style_header_table),
-            Paragraph("Status NF", style_header_table), Paragraph("Vl. Pago Item", style_header_table)
-        ]
-        
-        table_data = [header_data]
-        col_widths = [
-            1.3*cm, 1.3*cm, 0.8*cm, 
-            2.5*cm, 1.2*cm, 
-            0.8*cm, 2.0*cm, 
-            3.0*cm, 1.8*cm, 1.8*cm, 
-            1.0*cm, 1.5*cm, 1.5*cm, 
-            1.5*cm, 1.5*cm  
-        ]
-        page_width_useful = landscape(A4)[0] - (doc.leftMargin + doc.rightMargin)
-        total_col_width = sum(col_widths)
-        if total_col_width > page_width_useful:
-            app.logger.warning(f"Largura total das colunas ({total_col_width} cm) excede a largura útil da página ({page_width_useful} cm). Ajustando proporcionalmente.")
-            ratio = page_width_useful / total_col_width
-            col_widths = [w * ratio for w in col_widths]
-
-
-        for row in data:
-            data_doc_val = row.get("data_documento")
-            data_doc_fmt = datetime.strptime(data_doc_val, '%Y-%m-%d').strftime('%d/%m/%y') if data_doc_val else ""
-            
-            data_efet_val = row.get("data_efetiva_pag_rec")
-            data_efet_fmt = datetime.strptime(data_efet_val, '%Y-%m-%d').strftime('%d/%m/%y') if data_efet_val else ""
-
-            table_data.append([
-                Paragraph(_texto_pdf_seguro(data_doc_fmt), style_center),
-                Paragraph(_texto_pdf_seguro(data_efet_fmt), style_center),
-                Paragraph(_texto_pdf_seguro(row.get("uvr", "")), style_center),
-                Paragraph(_texto_pdf_seguro(row.get("nome_cadastro_origem", "")[:20]), style_body),
-                Paragraph(_texto_pdf_seguro(row.get("numero_documento", "")[:10]), style_center),
-                Paragraph(_texto_pdf_seguro(row.get("tipo_transacao", "")[:3]), style_center),
-                Paragraph(_texto_pdf_seguro(row.get("tipo_atividade_transacao", "")[:15]), style_body),
-                Paragraph(_texto_pdf_seguro(row.get("item_descricao", "")[:25]), style_body),
-                Paragraph(_texto_pdf_seguro(row.get("item_grupo_catalogo", "")[:12]), style_body),
-                Paragraph(_texto_pdf_seguro(row.get("item_subgrupo_catalogo", "")[:12]), style_body),
-                Paragraph(_format_decimal_quantidade(row.get("quantidade","")), style_right),
-                Paragraph(_format_decimal(row.get("valor_unitario","")), style_right),
-                Paragraph(_format_decimal(row.get("valor_total_item","")), style_right),
-                Paragraph(_texto_pdf_seguro(row.get("status_pagamento","")[:10]), style_center),
-                Paragraph(_format_decimal(row.get("valor_pago_neste_item","")), style_right) 
-            ])
-
-        report_table = Table(table_data, colWidths=col_widths)
-        report_table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#4F81BD")), 
-            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 7.5), 
-            ('BOTTOMPADDING', (0,0), (-1,0), 5),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('LEFTPADDING', (0,0), (-1,-1), 2),
-            ('RIGHTPADDING', (0,0), (-1,-1), 2),
-            ('ALIGN', (3,1), (3,-1), 'LEFT'), 
-            ('ALIGN', (6,1), (6,-1), 'LEFT'), 
-            ('ALIGN', (7,1), (7,-1), 'LEFT'), 
-            ('ALIGN', (8,1), (8,-1), 'LEFT'), 
-            ('ALIGN', (9,1), (9,-1), 'LEFT'), 
-            ('ALIGN', (10,1), (10,-1), 'RIGHT'), 
-            ('ALIGN', (11,1), (11,-1), 'RIGHT'), 
-            ('ALIGN', (12,1), (12,-1), 'RIGHT'), 
-            ('ALIGN', (14,1), (14,-1), 'RIGHT'), 
-        ]))
-        story.append(report_table)
-        
-        doc.build(story, onFirstPage=lambda c, d: _create_pdf_header_footer(c, d, title_pdf, subtitle_pdf), 
-                         onLaterPages=lambda c, d: _create_pdf_header_footer(c, d, title_pdf, subtitle_pdf))
-        
-        buffer.seek(0)
-        uvr_arquivo = _nome_arquivo_seguro(filters.get("uvr"), "todos")
-        inicio_arquivo = _nome_arquivo_seguro(filters.get("data_inicial"), "inicio")
-        fim_arquivo = _nome_arquivo_seguro(filters.get("data_final"), "fim")
-        filename = (
-            f"relatorio_financeiro_{uvr_arquivo}_"
-            f"{inicio_arquivo}_a_{fim_arquivo}.pdf"
-        )
-        return Response(
-            buffer, mimetype='application/pdf',
-            headers={'Content-Disposition': f'attachment;filename={filename}'}
-        )
+        return _resposta_relatorio_enfileirado("pdf_relatorio_financeiro", filters)
     except Exception as e:
         app.logger.error(
             "Falha ao gerar PDF do relatorio. erro_tipo=%s", type(e).__name__
@@ -3361,6 +4066,81 @@ def baixar_pdf_relatorio_financeiro():
         return jsonify({"error": "Não foi possível gerar o relatório."}), 500
 
 
+def _gerar_pdf_extrato(filters):
+    """Monta o PDF do extrato bancário; executado pelo worker da fila."""
+    data = fetch_extrato_data(filters)
+    if not data or "movimentacoes" not in data:
+        raise RelatorioSemDados()
+    registrar_linhas_relatorio("extrato", "pdf", len(data["movimentacoes"]))
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1.5*inch, bottomMargin=1*inch, leftMargin=0.75*inch, rightMargin=0.75*inch)
+    story = []
+
+    styles = getSampleStyleSheet()
+    style_normal = styles['Normal']
+    style_normal.fontSize = 9
+    style_bold = ParagraphStyle('BoldText', parent=style_normal, fontName='Helvetica-Bold')
+    style_body = ParagraphStyle('BodyText', parent=style_normal, leading=12)
+    style_right = ParagraphStyle('BodyTextRight', parent=style_body, alignment=TA_RIGHT)
+    style_header_table = ParagraphStyle('TableHeader', parent=style_body, fontName='Helvetica-Bold', alignment=TA_CENTER)
+
+    conta_info = data.get("conta_info", {})
+    title_pdf = "Extrato de Conta Corrente"
+    subtitle_pdf = f"{conta_info.get('associacao','')} - {conta_info.get('uvr','')} | Conta: {conta_info.get('display_name','N/A')} | Período: {conta_info.get('periodo','N/A')}"
+
+    story.append(Paragraph(f"<b>Saldo Inicial em {datetime.strptime(filters['data_inicial_extrato'], '%Y-%m-%d').strftime('%d/%m/%Y')}: R$ {_format_decimal(data.get('saldo_inicial','0.00'))}</b>", style_body))
+    story.append(Spacer(1, 0.2*inch))
+
+    header_mov_pdf = [
+        Paragraph("Data", style_header_table), Paragraph("Histórico", style_header_table),
+        Paragraph("Entrada (R$)", style_header_table), Paragraph("Saída (R$)", style_header_table),
+        Paragraph("Saldo (R$)", style_header_table)
+    ]
+
+    col_widths_extrato = [1.5*cm, 9*cm, 2.5*cm, 2.5*cm, 2.5*cm] 
+
+    table_data_extrato = [header_mov_pdf]
+    for mov in data["movimentacoes"]:
+        table_data_extrato.append([
+            Paragraph(_texto_pdf_seguro(mov.get("data", "")), style_body),
+            Paragraph(_texto_pdf_seguro(mov.get("historico", "")), style_body),
+            Paragraph(_format_decimal(mov.get("entrada", "")), style_right),
+            Paragraph(_format_decimal(mov.get("saida", "")), style_right),
+            Paragraph(_format_decimal(mov.get("saldo_parcial", "")), style_right)
+        ])
+
+    extrato_table = Table(table_data_extrato, colWidths=col_widths_extrato)
+    extrato_table.setStyle(TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.lightblue), 
+        ('TEXTCOLOR', (0,0), (-1,0), colors.black),
+        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+        ('ALIGN', (2,0), (-1,-1), 'RIGHT'), 
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0,0), (-1,0), 9),
+        ('BOTTOMPADDING', (0,0), (-1,0), 6),
+        ('BACKGROUND', (0,1), (-1,-1), colors.whitesmoke),
+        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+        ('LEFTPADDING', (0,0), (-1,-1), 3),
+        ('RIGHTPADDING', (0,0), (-1,-1), 3),
+    ]))
+    story.append(extrato_table)
+    story.append(Spacer(1, 0.2*inch))
+    story.append(Paragraph(f"<b>Saldo Final em {datetime.strptime(filters['data_final_extrato'], '%Y-%m-%d').strftime('%d/%m/%Y')}: R$ {_format_decimal(data.get('saldo_final','0.00'))}</b>", style_body))
+
+    doc.build(story, onFirstPage=lambda c, d: _create_pdf_header_footer(c, d, title_pdf, subtitle_pdf), 
+                     onLaterPages=lambda c, d: _create_pdf_header_footer(c, d, title_pdf, subtitle_pdf))
+
+    uvr_arquivo = _nome_arquivo_seguro(conta_info.get("uvr"), "UVR")
+    conta_arquivo = _nome_arquivo_seguro(conta_info.get("conta"), "CONTA")
+    filename = (
+        f"extrato_pdf_{uvr_arquivo}_{conta_arquivo}_"
+        f"{filters.get('data_inicial_extrato')}_a_{filters.get('data_final_extrato')}.pdf"
+    )
+    return filename, "application/pdf", buffer.getvalue()
+
+
 @app.route("/baixar_pdf_extrato", methods=["POST"])
 @login_json_required
 @login_required
@@ -3372,82 +4152,10 @@ def baixar_pdf_extrato():
         negado = _autorizar_extrato_financeiro(filters)
         if negado:
             return negado
+        for campo in ("data_inicial_extrato", "data_final_extrato"):
+            datetime.strptime(filters.get(campo) or "", '%Y-%m-%d')
         app.logger.info("Solicitacao autorizada de PDF do extrato bancario.")
-        data = fetch_extrato_data(filters)
-
-        if not data or "movimentacoes" not in data:
-            return jsonify({"message": "Nenhum dado encontrado para os filtros fornecidos."}), 404
-
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1.5*inch, bottomMargin=1*inch, leftMargin=0.75*inch, rightMargin=0.75*inch)
-        story = []
-        
-        styles = getSampleStyleSheet()
-        style_normal = styles['Normal']
-        style_normal.fontSize = 9
-        style_bold = ParagraphStyle('BoldText', parent=style_normal, fontName='Helvetica-Bold')
-        style_body = ParagraphStyle('BodyText', parent=style_normal, leading=12)
-        style_right = ParagraphStyle('BodyTextRight', parent=style_body, alignment=TA_RIGHT)
-        style_header_table = ParagraphStyle('TableHeader', parent=style_body, fontName='Helvetica-Bold', alignment=TA_CENTER)
-        
-        conta_info = data.get("conta_info", {})
-        title_pdf = "Extrato de Conta Corrente"
-        subtitle_pdf = f"{conta_info.get('associacao','')} - {conta_info.get('uvr','')} | Conta: {conta_info.get('display_name','N/A')} | Período: {conta_info.get('periodo','N/A')}"
-
-        story.append(Paragraph(f"<b>Saldo Inicial em {datetime.strptime(filters['data_inicial_extrato'], '%Y-%m-%d').strftime('%d/%m/%Y')}: R$ {_format_decimal(data.get('saldo_inicial','0.00'))}</b>", style_body))
-        story.append(Spacer(1, 0.2*inch))
-
-        header_mov_pdf = [
-            Paragraph("Data", style_header_table), Paragraph("Histórico", style_header_table),
-            Paragraph("Entrada (R$)", style_header_table), Paragraph("Saída (R$)", style_header_table),
-            Paragraph("Saldo (R$)", style_header_table)
-        ]
-        
-        col_widths_extrato = [1.5*cm, 9*cm, 2.5*cm, 2.5*cm, 2.5*cm] 
-        
-        table_data_extrato = [header_mov_pdf]
-        for mov in data["movimentacoes"]:
-            table_data_extrato.append([
-                Paragraph(_texto_pdf_seguro(mov.get("data", "")), style_body),
-                Paragraph(_texto_pdf_seguro(mov.get("historico", "")), style_body),
-                Paragraph(_format_decimal(mov.get("entrada", "")), style_right),
-                Paragraph(_format_decimal(mov.get("saida", "")), style_right),
-                Paragraph(_format_decimal(mov.get("saldo_parcial", "")), style_right)
-            ])
-        
-        extrato_table = Table(table_data_extrato, colWidths=col_widths_extrato)
-        extrato_table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.lightblue), 
-            ('TEXTCOLOR', (0,0), (-1,0), colors.black),
-            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-            ('ALIGN', (2,0), (-1,-1), 'RIGHT'), 
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 9),
-            ('BOTTOMPADDING', (0,0), (-1,0), 6),
-            ('BACKGROUND', (0,1), (-1,-1), colors.whitesmoke),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-            ('LEFTPADDING', (0,0), (-1,-1), 3),
-            ('RIGHTPADDING', (0,0), (-1,-1), 3),
-        ]))
-        story.append(extrato_table)
-        story.append(Spacer(1, 0.2*inch))
-        story.append(Paragraph(f"<b>Saldo Final em {datetime.strptime(filters['data_final_extrato'], '%Y-%m-%d').strftime('%d/%m/%Y')}: R$ {_format_decimal(data.get('saldo_final','0.00'))}</b>", style_body))
-
-        doc.build(story, onFirstPage=lambda c, d: _create_pdf_header_footer(c, d, title_pdf, subtitle_pdf), 
-                         onLaterPages=lambda c, d: _create_pdf_header_footer(c, d, title_pdf, subtitle_pdf))
-        
-        buffer.seek(0)
-        uvr_arquivo = _nome_arquivo_seguro(conta_info.get("uvr"), "UVR")
-        conta_arquivo = _nome_arquivo_seguro(conta_info.get("conta"), "CONTA")
-        filename = (
-            f"extrato_pdf_{uvr_arquivo}_{conta_arquivo}_"
-            f"{filters.get('data_inicial_extrato')}_a_{filters.get('data_final_extrato')}.pdf"
-        )
-        return Response(
-            buffer, mimetype='application/pdf',
-            headers={'Content-Disposition': f'attachment;filename={filename}'}
-        )
+        return _resposta_relatorio_enfileirado("pdf_extrato", filters)
     except ValueError:
         return jsonify({"error": "Filtros inválidos para o extrato."}), 400
     except Exception as e:
@@ -3457,126 +4165,281 @@ def baixar_pdf_extrato():
         return jsonify({"error": "Não foi possível gerar o extrato."}), 500
 
 
-# --- ROTAS E FUNÇÕES PARA EXTRATO BANCÁRIO (Função fetch_extrato_data ATUALIZADA) ---
-def fetch_extrato_data(filters): 
+
+# --- FILA DE RELATÓRIOS ---
+# Os PDFs por período são gerados por `worker_relatorios.py`. A rota autoriza,
+# grava os filtros já escopados e responde 202 com a URL de acompanhamento.
+GERADORES_RELATORIO = {
+    "pdf_relatorio_financeiro": _gerar_pdf_relatorio_financeiro,
+    "pdf_extrato": _gerar_pdf_extrato,
+}
+
+
+def _resposta_relatorio_enfileirado(tipo, filters):
+    conn = conectar_banco()
+    cur = conn.cursor()
+    id_tarefa = enfileirar_relatorio(cur, tipo, filters, int(current_user.id))
+    conn.commit()
+    url_status = url_for("status_tarefa_relatorio", id_tarefa=id_tarefa)
+    resposta = jsonify({
+        "tarefa_id": id_tarefa,
+        "status": STATUS_PENDENTE,
+        "status_url": url_status,
+    })
+    resposta.status_code = 202
+    resposta.headers["Location"] = url_status
+    return resposta
+
+
+@app.route("/relatorios/tarefas/<int:id_tarefa>", methods=["GET"])
+@login_json_required
+@login_required
+def status_tarefa_relatorio(id_tarefa):
+    conn = None
+    try:
+        conn = conectar_banco()
+        linha = consultar_tarefa(conn.cursor(), id_tarefa, int(current_user.id))
+        if not linha:
+            return jsonify({"error": "Recurso não encontrado."}), 404
+        status, mensagem, _nome_arquivo = linha
+        return jsonify({
+            "tarefa_id": id_tarefa,
+            "status": status,
+            "concluida": status in STATUS_FINAIS,
+            "mensagem": mensagem,
+            "arquivo_url": (
+                url_for("arquivo_tarefa_relatorio", id_tarefa=id_tarefa)
+                if status == STATUS_CONCLUIDA
+                else None
+            ),
+        })
+    except Exception as e:
+        app.logger.error(
+            "Falha ao consultar tarefa de relatorio. erro_tipo=%s", type(e).__name__
+        )
+        return jsonify({"error": "Não foi possível consultar o recurso."}), 500
+    finally:
+        if conn: conn.close()
+
+
+@app.route("/relatorios/tarefas/<int:id_tarefa>/arquivo", methods=["GET"])
+@login_required
+def arquivo_tarefa_relatorio(id_tarefa):
     conn = None
     try:
         conn = conectar_banco()
+        linha = ler_arquivo_tarefa(conn.cursor(), id_tarefa, int(current_user.id))
+    finally:
+        if conn: conn.close()
+    if not linha:
+        abort(404)
+    nome_arquivo, tipo_mime, conteudo = linha
+    resposta = Response(
+        bytes(conteudo), mimetype=tipo_mime,
+        headers={'Content-Disposition': f'attachment;filename={nome_arquivo}'},
+    )
+    resposta.headers["Cache-Control"] = "no-store, private, max-age=0"
+    return resposta
+
+
+def executar_proxima_tarefa_relatorio(configuracao):
+    """Reserva e executa uma tarefa da fila; retorna False quando não há nenhuma.
+
+    A reserva tem commit próprio, então a geração do PDF não segura bloqueio
+    nem transação aberta. Falha inesperada devolve a tarefa à fila até
+    MAXIMO_TENTATIVAS; filtros inválidos e períodos vazios encerram de vez.
+    """
+    conn = conectar_banco()
+    try:
         cur = conn.cursor()
+        tarefa = reservar_proxima_tarefa(
+            cur, execucao_maxima_s=configuracao["execucao_maxima_s"]
+        )
+        conn.commit()
+        if not tarefa:
+            return False
+        id_tarefa, tipo, parametros, tentativa = tarefa
+        try:
+            nome_arquivo, tipo_mime, conteudo = GERADORES_RELATORIO[tipo](parametros)
+        except RelatorioSemDados:
+            finalizar_sem_arquivo(
+                cur, id_tarefa, STATUS_SEM_DADOS,
+                "Nenhum dado encontrado para os filtros fornecidos.",
+            )
+        except (KeyError, ValueError) as e:
+            app.logger.warning(
+                "Tarefa de relatorio recusada. tarefa=%s erro_tipo=%s",
+                id_tarefa, type(e).__name__,
+            )
+            finalizar_sem_arquivo(
+                cur, id_tarefa, STATUS_FALHOU, "Filtros inválidos para o relatório."
+            )
+        except Exception as e:
+            conn.rollback()
+            status = registrar_falha(cur, id_tarefa, tentativa)
+            app.logger.error(
+                "Falha ao gerar relatorio da fila. tarefa=%s tentativa=%s status=%s erro_tipo=%s",
+                id_tarefa, tentativa, status, type(e).__name__,
+            )
+        else:
+            concluir_tarefa(cur, id_tarefa, nome_arquivo, tipo_mime, conteudo)
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
-        id_conta_corrente = filters.get("id_conta_corrente_extrato")
-        data_inicial_str = filters.get("data_inicial_extrato")
-        data_final_str = filters.get("data_final_extrato")
 
-        if not all([id_conta_corrente, data_inicial_str, data_final_str]):
-            raise ValueError("Filtros incompletos para extrato.")
+def limpar_tarefas_relatorio(configuracao):
+    """Remove as tarefas e os arquivos que passaram da retenção."""
+    conn = conectar_banco()
+    try:
+        removidas = limpar_tarefas(
+            conn.cursor(),
+            retencao_horas=configuracao["retencao_horas"],
+            execucao_maxima_s=configuracao["execucao_maxima_s"],
+        )
+        conn.commit()
+        return removidas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
-        data_inicial = datetime.strptime(data_inicial_str, '%Y-%m-%d').date()
-        data_final = datetime.strptime(data_final_str, '%Y-%m-%d').date()
-        uvr_autorizada = filters.get("_uvr_autorizada")
+# --- ROTAS E FUNÇÕES PARA EXTRATO BANCÁRIO (Função fetch_extrato_data ATUALIZADA) ---
+SQL_MOVIMENTACOES_EXTRATO = """
+    SELECT 
+        fc.id, 
+        fc.data_efetiva,
+        fc.tipo_movimentacao,
+        fc.valor_efetivo,
+        fc.nome_cadastro_cf,
+        fc.numero_documento_bancario,
+        fc.observacoes,
+        STRING_AGG(tf.numero_documento, ', ') AS nfs_vinculadas
+    FROM fluxo_caixa fc
+    JOIN contas_correntes cc ON cc.id = fc.id_conta_corrente
+    LEFT JOIN fluxo_caixa_transacoes_link fctl ON fc.id = fctl.id_fluxo_caixa
+    LEFT JOIN transacoes_financeiras tf ON fctl.id_transacao_financeira = tf.id
+    WHERE fc.id_conta_corrente = %s
+      AND fc.data_efetiva BETWEEN %s AND %s
+      AND (%s IS NULL OR cc.uvr = %s)
+    GROUP BY fc.id, fc.data_efetiva, fc.tipo_movimentacao, fc.valor_efetivo, fc.nome_cadastro_cf, fc.numero_documento_bancario, fc.observacoes
+    ORDER BY fc.data_efetiva, fc.id
+"""
+
+
+def _consultar_cabecalho_extrato(cur, filters):
+    """Valida os filtros e retorna a conta, o saldo inicial e os parâmetros das movimentações."""
+    id_conta_corrente = filters.get("id_conta_corrente_extrato")
+    data_inicial_str = filters.get("data_inicial_extrato")
+    data_final_str = filters.get("data_final_extrato")
+
+    if not all([id_conta_corrente, data_inicial_str, data_final_str]):
+        raise ValueError("Filtros incompletos para extrato.")
+
+    data_inicial = datetime.strptime(data_inicial_str, '%Y-%m-%d').date()
+    data_final = datetime.strptime(data_final_str, '%Y-%m-%d').date()
+    uvr_autorizada = filters.get("_uvr_autorizada")
 
-        cur.execute("""
-            SELECT uvr, associacao, banco_nome, agencia, conta_corrente, descricao_conta
-            FROM contas_correntes
-            WHERE id = %s AND (%s IS NULL OR uvr = %s)
-        """, (id_conta_corrente, uvr_autorizada, uvr_autorizada))
-        conta_info_row = cur.fetchone()
-        if not conta_info_row:
-            raise ValueError("Conta indisponivel para o escopo autorizado.")
+    cur.execute("""
+        SELECT uvr, associacao, banco_nome, agencia, conta_corrente, descricao_conta
+        FROM contas_correntes
+        WHERE id = %s AND (%s IS NULL OR uvr = %s)
+    """, (id_conta_corrente, uvr_autorizada, uvr_autorizada))
+    conta_info_row = cur.fetchone()
+    if not conta_info_row:
+        raise ValueError("Conta indisponivel para o escopo autorizado.")
+
+    saldo_inicial = Decimal('0.00')
+    cur.execute(SQL_SALDO_CONTA_EM, (
+        id_conta_corrente, data_inicial, uvr_autorizada, uvr_autorizada,
+        id_conta_corrente, data_inicial, uvr_autorizada, uvr_autorizada,
+    ))
+    saldo_inicial_result = cur.fetchone()
+    if saldo_inicial_result:
+        saldo_inicial = saldo_inicial_result[0]
+
+    conta_info = {
+        "uvr": conta_info_row[0], "associacao": conta_info_row[1],
+        "banco": conta_info_row[2], "agencia": conta_info_row[3],
+        "conta": conta_info_row[4], "descricao_conta": conta_info_row[5] or ""
+    }
+    conta_display = f"{conta_info.get('descricao_conta') or conta_info.get('banco','')} Ag: {conta_info.get('agencia','')} C/C: {conta_info.get('conta','')}"
+    conta_info["display_name"] = conta_display
+    conta_info["periodo"] = f"{data_inicial.strftime('%d/%m/%Y')} a {data_final.strftime('%d/%m/%Y')}"
+
+    parametros_movimentacoes = (
+        id_conta_corrente,
+        data_inicial,
+        data_final,
+        uvr_autorizada,
+        uvr_autorizada,
+    )
+    return conta_info, saldo_inicial, parametros_movimentacoes
+
+
+def _movimentacao_extrato(row, saldo_anterior):
+    """Converte uma linha de SQL_MOVIMENTACOES_EXTRATO, mantendo valores em Decimal."""
+    id_mov = row[0]
+    data_mov = row[1]
+    tipo_mov = row[2]
+    valor_mov = Decimal(row[3])
+    nome_cf = row[4] or ""
+    doc_bancario = row[5] or ""
+    obs = row[6] or ""
+    nfs = row[7] or ""
+
+    entrada = Decimal('0.00')
+    saida = Decimal('0.00')
+
+    if tipo_mov == 'Recebimento':
+        entrada = valor_mov
+        saldo = saldo_anterior + valor_mov
+    else: 
+        saida = valor_mov
+        saldo = saldo_anterior - valor_mov
+    
+    historico = f"{tipo_mov} de/para {nome_cf}"
+    if doc_bancario: historico += f" (Doc: {doc_bancario})"
+    if nfs: historico += f" (NFs: {nfs})"
+    if obs: historico += f" - Obs: {obs}"
+
+    return {
+        "id": id_mov,
+        "data": data_mov,
+        "historico": historico.strip(),
+        "entrada": entrada,
+        "saida": saida,
+        "saldo_parcial": saldo,
+        "descricao_simples": f"{tipo_mov} - {nome_cf}"
+    }
 
-        saldo_inicial = Decimal('0.00')
-        cur.execute("""
-            SELECT COALESCE(SUM(
-                CASE fc.tipo_movimentacao
-                    WHEN 'Recebimento' THEN fc.valor_efetivo
-                    ELSE -fc.valor_efetivo
-                END
-            ), 0)
-            FROM fluxo_caixa fc
-            JOIN contas_correntes cc ON cc.id = fc.id_conta_corrente
-            WHERE fc.id_conta_corrente = %s
-              AND fc.data_efetiva < %s
-              AND (%s IS NULL OR cc.uvr = %s)
-        """, (id_conta_corrente, data_inicial, uvr_autorizada, uvr_autorizada))
-        saldo_inicial_result = cur.fetchone()
-        if saldo_inicial_result:
-            saldo_inicial = saldo_inicial_result[0]
-        
-        # --- QUERY ATUALIZADA COM ID ---
-        cur.execute("""
-            SELECT 
-                fc.id, 
-                fc.data_efetiva,
-                fc.tipo_movimentacao,
-                fc.valor_efetivo,
-                fc.nome_cadastro_cf,
-                fc.numero_documento_bancario,
-                fc.observacoes,
-                STRING_AGG(tf.numero_documento, ', ') AS nfs_vinculadas
-            FROM fluxo_caixa fc
-            JOIN contas_correntes cc ON cc.id = fc.id_conta_corrente
-            LEFT JOIN fluxo_caixa_transacoes_link fctl ON fc.id = fctl.id_fluxo_caixa
-            LEFT JOIN transacoes_financeiras tf ON fctl.id_transacao_financeira = tf.id
-            WHERE fc.id_conta_corrente = %s
-              AND fc.data_efetiva BETWEEN %s AND %s
-              AND (%s IS NULL OR cc.uvr = %s)
-            GROUP BY fc.id, fc.data_efetiva, fc.tipo_movimentacao, fc.valor_efetivo, fc.nome_cadastro_cf, fc.numero_documento_bancario, fc.observacoes
-            ORDER BY fc.data_efetiva, fc.id
-        """, (
-            id_conta_corrente,
-            data_inicial,
-            data_final,
-            uvr_autorizada,
-            uvr_autorizada,
-        ))
+
+def fetch_extrato_data(filters): 
+    conn = None
+    try:
+        conn = conectar_banco()
+        cur = conn.cursor()
+
+        conta_info, saldo_inicial, parametros = _consultar_cabecalho_extrato(cur, filters)
+        cur.execute(SQL_MOVIMENTACOES_EXTRATO, parametros)
         
         movimentacoes = []
         saldo_acumulado_periodo = saldo_inicial
         for row in cur.fetchall():
-            id_mov = row[0] # NOVO CAMPO ID
-            data_mov = row[1]
-            tipo_mov = row[2]
-            valor_mov = Decimal(row[3])
-            nome_cf = row[4] or ""
-            doc_bancario = row[5] or ""
-            obs = row[6] or ""
-            nfs = row[7] or ""
-
-            entrada = Decimal('0.00')
-            saida = Decimal('0.00')
-
-            if tipo_mov == 'Recebimento':
-                entrada = valor_mov
-                saldo_acumulado_periodo += valor_mov
-            else: 
-                saida = valor_mov
-                saldo_acumulado_periodo -= valor_mov
-            
-            historico = f"{tipo_mov} de/para {nome_cf}"
-            if doc_bancario: historico += f" (Doc: {doc_bancario})"
-            if nfs: historico += f" (NFs: {nfs})"
-            if obs: historico += f" - Obs: {obs}"
-
+            mov = _movimentacao_extrato(row, saldo_acumulado_periodo)
+            saldo_acumulado_periodo = mov["saldo_parcial"]
             movimentacoes.append({
-                "id": id_mov, # Importante para o CRUD
-                "data": data_mov.strftime('%d/%m/%Y'),
-                "historico": historico.strip(),
-                "entrada": str(entrada), 
-                "saida": str(saida),     
+                **mov,
+                "data": mov["data"].strftime('%d/%m/%Y'),
+                "entrada": str(mov["entrada"]), 
+                "saida": str(mov["saida"]),     
                 "saldo_parcial": str(saldo_acumulado_periodo),
-                "descricao_simples": f"{tipo_mov} - {nome_cf}"
             })
-        
-        conta_info = {}
-        if conta_info_row:
-            conta_info = {
-                "uvr": conta_info_row[0], "associacao": conta_info_row[1],
-                "banco": conta_info_row[2], "agencia": conta_info_row[3],
-                "conta": conta_info_row[4], "descricao_conta": conta_info_row[5] or ""
-            }
-            conta_display = f"{conta_info.get('descricao_conta') or conta_info.get('banco','')} Ag: {conta_info.get('agencia','')} C/C: {conta_info.get('conta','')}"
-            conta_info["display_name"] = conta_display
-            conta_info["periodo"] = f"{data_inicial.strftime('%d/%m/%Y')} a {data_final.strftime('%d/%m/%Y')}"
 
         return {
             "conta_info": conta_info,
@@ -3595,6 +4458,50 @@ def fetch_extrato_data(filters):
     finally:
         if conn: conn.close()
 
+
+def stream_extrato_data(filters):
+    """Gerador do extrato para exportação.
+
+    O primeiro item é o cabeçalho ({"conta_info", "saldo_inicial"}); os demais
+    são as movimentações, lidas em lotes de um cursor nomeado no servidor.
+    """
+    conn = conectar_banco_streaming()
+    cur = None
+    try:
+        cur_cabecalho = conn.cursor()
+        conta_info, saldo_inicial, parametros = _consultar_cabecalho_extrato(
+            cur_cabecalho, filters
+        )
+        cur_cabecalho.close()
+        yield {"conta_info": conta_info, "saldo_inicial": saldo_inicial}
+
+        cur = conn.cursor(name=f"exportacao_extrato_{secrets.token_hex(4)}")
+        cur.itersize = TAMANHO_LOTE_EXPORTACAO
+        cur.execute(SQL_MOVIMENTACOES_EXTRATO, parametros)
+        saldo = saldo_inicial
+        while True:
+            lote = cur.fetchmany(TAMANHO_LOTE_EXPORTACAO)
+            if not lote:
+                break
+            for row in lote:
+                mov = _movimentacao_extrato(row, saldo)
+                saldo = mov["saldo_parcial"]
+                yield mov
+    except ValueError:
+        raise
+    except Exception as e:
+        app.logger.error(
+            "Falha na exportacao do extrato. erro_tipo=%s", type(e).__name__
+        )
+        raise
+    finally:
+        if cur is not None:
+            try:
+                cur.close()
+            except psycopg2.Error:
+                pass
+        conn.close()
+
 @app.route("/gerar_extrato_bancario", methods=["POST"])
 @login_json_required
 @login_required
@@ -3608,6 +4515,8 @@ def gerar_extrato_bancario_json():
             return negado
         app.logger.info("Solicitacao autorizada de extrato bancario.")
         data = fetch_extrato_data(filters) 
+        if data:
+            registrar_linhas_relatorio("extrato", "json", len(data.get("movimentacoes") or ()))
         return jsonify(data)
     except ValueError:
         return jsonify({"error": "Filtros inválidos para o extrato."}), 400
@@ -3629,42 +4538,36 @@ def baixar_csv_extrato():
         if negado:
             return negado
         app.logger.info("Solicitacao autorizada de CSV do extrato bancario.")
-        data = fetch_extrato_data(filters) 
+        dados = stream_extrato_data(filters)
+        cabecalho = next(dados, None)
 
-        if not data or "movimentacoes" not in data:
+        if not cabecalho:
              return jsonify({"message": "Nenhum dado encontrado para os filtros fornecidos."}), 404
 
-        output = io.StringIO()
-        writer = csv.writer(output, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        
-        writer.writerow([_texto_csv_seguro(
-            f"Extrato Bancário - {data.get('conta_info',{}).get('display_name','N/A')}"
-        )])
-        writer.writerow([_texto_csv_seguro(
-            f"Período: {data.get('conta_info',{}).get('periodo','N/A')}"
-        )])
-        writer.writerow([]) 
-        writer.writerow(["Saldo Inicial:", str(data.get("saldo_inicial","0.00")).replace('.',',')])
-        writer.writerow([]) 
-        
-        header_mov = ["Data", "Histórico", "Entrada (R$)", "Saída (R$)", "Saldo (R$)"]
-        writer.writerow(header_mov)
-        
-        for mov in data["movimentacoes"]:
-            csv_row = [
-                _texto_csv_seguro(mov.get("data", "")),
-                _texto_csv_seguro(mov.get("historico", "")),
-                str(mov.get("entrada", "")).replace('.', ','),
-                str(mov.get("saida", "")).replace('.', ','),
-                str(mov.get("saldo_parcial", "")).replace('.', ',')
-            ]
-            writer.writerow(csv_row)
-        
-        writer.writerow([]) 
-        writer.writerow(["Saldo Final:", str(data.get("saldo_final","0.00")).replace('.',',')])
-        
-        output.seek(0)
-        conta_info = data.get("conta_info", {})
+        conta_info = cabecalho.get("conta_info", {})
+
+        def gerar_linhas():
+            yield [_texto_csv_seguro(
+                f"Extrato Bancário - {conta_info.get('display_name','N/A')}"
+            )]
+            yield [_texto_csv_seguro(f"Período: {conta_info.get('periodo','N/A')}")]
+            yield []
+            yield ["Saldo Inicial:", _celula_csv(cabecalho["saldo_inicial"])]
+            yield []
+            yield ["Data", "Histórico", "Entrada (R$)", "Saída (R$)", "Saldo (R$)"]
+            saldo_final = cabecalho["saldo_inicial"]
+            for mov in contar_linhas_relatorio(dados, "extrato", "csv"):
+                saldo_final = mov["saldo_parcial"]
+                yield [
+                    _celula_csv(mov["data"]),
+                    _celula_csv(mov["historico"]),
+                    _celula_csv(mov["entrada"]),
+                    _celula_csv(mov["saida"]),
+                    _celula_csv(mov["saldo_parcial"]),
+                ]
+            yield []
+            yield ["Saldo Final:", _celula_csv(saldo_final)]
+
         uvr_arquivo = _nome_arquivo_seguro(conta_info.get("uvr"), "UVR")
         conta_arquivo = _nome_arquivo_seguro(conta_info.get("conta"), "CONTA")
         filename = (
@@ -3672,7 +4575,7 @@ def baixar_csv_extrato():
             f"{filters.get('data_inicial_extrato')}_a_{filters.get('data_final_extrato')}.csv"
         )
         return Response(
-            output,
+            stream_with_context(_blocos_csv(gerar_linhas())),
             mimetype="text/csv; charset=utf-8",
             headers={"Content-Disposition": f"attachment;filename={filename}"}
         )
@@ -3689,67 +4592,19 @@ def baixar_csv_extrato():
 @login_json_required
 @login_required
 def buscar_cnpj(cnpj):
-    try:
-        cnpj_limpo = re.sub(r'[^0-9]', '', cnpj)
-        if len(cnpj_limpo) != 14:
-            return jsonify({"erro": "CNPJ deve conter 14 dígitos numéricos"}), 400
+    cnpj_limpo = re.sub(r'[^0-9]', '', cnpj)
+    if len(cnpj_limpo) != 14:
+        return jsonify({"erro": "CNPJ deve conter 14 dígitos numéricos"}), 400
 
-        try:
-            response_brasilapi = requests.get(f"https://brasilapi.com.br/api/cnpj/v1/{cnpj_limpo}", timeout=5)
-            response_brasilapi.raise_for_status()
-            dados_brasilapi = response_brasilapi.json()
-            
-            telefone_principal = ""
-            if dados_brasilapi.get("ddd_telefone_1"):
-                telefone_principal = f"({dados_brasilapi.get('ddd_telefone_1')}) {dados_brasilapi.get('telefone_1')}"
-            elif dados_brasilapi.get("ddd_telefone_2"):
-                 telefone_principal = f"({dados_brasilapi.get('ddd_telefone_2')}) {dados_brasilapi.get('telefone_2')}"
-
-            resultado = {
-                "razao_social": dados_brasilapi.get("razao_social", ""),
-                "cep": dados_brasilapi.get("cep", "").replace(".","").replace("-","")[:8],
-                "logradouro": dados_brasilapi.get("logradouro", ""),
-                "numero": dados_brasilapi.get("numero", ""),
-                "bairro": dados_brasilapi.get("bairro", ""),
-                "cidade": dados_brasilapi.get("municipio", ""),
-                "uf": dados_brasilapi.get("uf", ""),
-                "telefone": telefone_principal,
-            }
-            app.logger.info("Consulta de CNPJ concluída pela primeira opção.")
-            return jsonify(resultado)
-        
-        except requests.exceptions.RequestException as e_brasilapi:
-            app.logger.warning(
-                "Primeira consulta de CNPJ falhou; alternativa acionada. erro_tipo=%s",
-                type(e_brasilapi).__name__,
-            )
-            response_opencnpja = requests.get(f"https://open.cnpja.com/office/{cnpj_limpo}", timeout=5)
-            response_opencnpja.raise_for_status()
-            dados_opencnpja = response_opencnpja.json()
-
-            resultado = {
-                "razao_social": dados_opencnpja.get("company", {}).get("name", ""),
-                "cep": dados_opencnpja.get("address", {}).get("zip", "")[:8],
-                "logradouro": dados_opencnpja.get("address", {}).get("street", ""),
-                "numero": dados_opencnpja.get("address", {}).get("number", ""),
-                "bairro": dados_opencnpja.get("address", {}).get("district", ""),
-                "cidade": dados_opencnpja.get("address", {}).get("city", ""),
-                "uf": dados_opencnpja.get("address", {}).get("state", ""),
-                "telefone": f"({dados_opencnpja.get('phones', [{}])[0].get('area','')}) {dados_opencnpja.get('phones', [{}])[0].get('number','')}" if dados_opencnpja.get("phones") else "",
-            }
-            app.logger.info("Consulta de CNPJ concluída pela opção alternativa.")
-            return jsonify(resultado)
-
-    except requests.exceptions.HTTPError as e_http:
-        status_code = e_http.response.status_code if e_http.response else 500
-        if status_code == 404:
-            return jsonify({"erro": "CNPJ não encontrado ou inválido."}), 404
-        return jsonify({"erro": "Não foi possível consultar o CNPJ agora."}), 502
-    except requests.exceptions.RequestException as e_req:
-        app.logger.warning(
-            "Consulta de CNPJ falhou. erro_tipo=%s", type(e_req).__name__
-        )
-        return jsonify({"erro": "Erro de rede ao consultar CNPJ. Verifique sua conexão."}), 503
+    try:
+        return jsonify(consultar_cnpj(cnpj_limpo))
+    except ValueError:
+        return jsonify({"erro": "CNPJ não encontrado ou inválido."}), 400
+    except ConsultaNaoEncontradaError:
+        return jsonify({"erro": "CNPJ não encontrado ou inválido."}), 404
+    except ConsultaExternaError:
+        app.logger.warning("Consulta de CNPJ falhou em todos os serviços.")
+        return jsonify({"erro": "Não foi possível consultar o CNPJ agora."}), 503
     except Exception as e_geral:
         app.logger.error(
             "Falha interna na consulta de CNPJ. erro_tipo=%s",
@@ -3851,6 +4706,7 @@ def editar_conta_corrente():
             if cur.rowcount == 0:
                 conn.rollback()
                 return "Recurso não encontrado.", 404
+            registrar_referencias(cur, uvr=dados["uvr_conta"])
             conn.commit()
             msg = "Conta alterada com sucesso!"
         else:
@@ -3928,6 +4784,8 @@ def responder_solicitacao():
                 if not sql_del:
                     conn.rollback()
                     return jsonify({"error": "Solicitação inválida."}), 400
+                if tabela == "transacoes_financeiras":
+                    incrementar_versao_dados(cur, ids_transacao=[id_reg])
                 cur.execute(sql_del, (id_reg,))
                 if cur.rowcount == 0:
                     conn.rollback()
@@ -3948,10 +4806,11 @@ def responder_solicitacao():
                             novo_uvr = atual[0]
                             if not nova_assoc: nova_assoc = atual[1]
 
-                    cur.execute("""UPDATE associados SET nome=%s, cpf=%s, rg=%s, data_nascimento=%s, data_admissao=%s, status=%s, uvr=%s, associacao=%s, cep=%s, logradouro=%s, endereco_numero=%s, bairro=%s, cidade=%s, uf=%s, telefone=%s, foto_base64=%s WHERE id=%s""",
+                    foto_id = _foto_da_solicitacao(cur, d, "foto_base64")
+                    cur.execute("""UPDATE associados SET nome=%s, cpf=%s, rg=%s, data_nascimento=%s, data_admissao=%s, status=%s, uvr=%s, associacao=%s, cep=%s, logradouro=%s, endereco_numero=%s, bairro=%s, cidade=%s, uf=%s, telefone=%s, foto_id=COALESCE(%s, foto_id), foto_base64=CASE WHEN %s IS NULL THEN foto_base64 END WHERE id=%s""",
                         (d.get("nome"), re.sub(r'[^0-9]', '', d.get("cpf","")), d.get("rg"), d.get("data_nascimento"), d.get("data_admissao"), d.get("status"), 
                          novo_uvr, nova_assoc,
-                         re.sub(r'[^0-9]', '', d.get("cep","")), d.get("logradouro"), d.get("endereco_numero"), d.get("bairro"), d.get("cidade"), d.get("uf"), d.get("telefone"), d.get("foto_base64",""), id_reg))
+                         re.sub(r'[^0-9]', '', d.get("cep","")), d.get("logradouro"), d.get("endereco_numero"), d.get("bairro"), d.get("cidade"), d.get("uf"), d.get("telefone"), foto_id, foto_id, id_reg))
 
                 elif tabela == 'cadastros':
                     novo_uvr = d.get("uvr")
@@ -3974,6 +4833,7 @@ def responder_solicitacao():
                         WHERE id=%s""",
                         (d.get("uvr"), d.get("associacao",""), d.get("banco_codigo"), d.get("banco_nome"),
                          d.get("agencia"), d.get("conta_corrente"), d.get("descricao_conta"), id_reg))
+                    registrar_referencias(cur, uvr=d.get("uvr"))
                 
                 elif tabela == 'transacoes_financeiras':
                     # 1. Atualiza Cabeçalho
@@ -3981,6 +4841,7 @@ def responder_solicitacao():
                     if id_origem and str(id_origem).isdigit(): id_origem = int(id_origem)
                     else: id_origem = None
 
+                    incrementar_versao_dados(cur, uvrs=[d["uvr"]], ids_transacao=[id_reg])
                     cur.execute("""
                         UPDATE transacoes_financeiras SET
                             uvr=%s, associacao=%s, data_documento=%s, tipo_transacao=%s,
@@ -3994,18 +4855,26 @@ def responder_solicitacao():
                         id_origem, d.get("nome_origem"), d["valor_total"], id_reg
                     ))
 
-                    # 2. Atualiza Itens (Apaga antigos e insere os do JSON)
-                    cur.execute("DELETE FROM itens_transacao WHERE id_transacao = %s", (id_reg,))
-                    for item in d["itens"]:
-                        cur.execute("""
-                            INSERT INTO itens_transacao (id_transacao, descricao, unidade, quantidade, valor_unitario, valor_total_item)
-                            VALUES (%s, %s, %s, %s, %s, %s)
-                        """, (id_reg, item['descricao'], item['unidade'], item['quantidade'], item['valor_unitario'], item['valor_total_item']))
+                    # 2. Atualiza Itens (somente as linhas que mudaram no JSON)
+                    _sincronizar_itens_transacao(cur, id_reg, d["itens"])
+                    _atualizar_alocacao_pagamentos(cur, [id_reg])
+                    registrar_referencias(
+                        cur,
+                        uvr=d["uvr"],
+                        tipo_transacao=d["tipo_transacao"],
+                        tipo_atividade=d["tipo_atividade"],
+                    )
 
                 # --- LÓGICA PARA PATRIMÔNIO ---
                 elif tabela == 'patrimonio':
                     # Remove campos auxiliares de visualização que não existem no banco
                     d.pop('nome_visual', None)
+                    foto_id = _foto_da_solicitacao(cur, d, "foto_bem_base64")
+                    d.pop("foto_id", None)
+                    d.pop("foto_bem_base64", None)
+                    if foto_id:
+                        d["foto_id"] = foto_id
+                        d["foto_bem_base64"] = None
                     
                     # Constrói a query de UPDATE dinamicamente baseada nas chaves do JSON
                     campos_permitidos = {
@@ -4021,7 +4890,7 @@ def responder_solicitacao():
                         "nome_operador_principal", "status_bem",
                         "estado_conservacao", "permite_abastecimento",
                         "permite_manutencao", "alerta_preventiva",
-                        "observacoes_gerais", "foto_bem_base64",
+                        "observacoes_gerais", "foto_id", "foto_bem_base64",
                         "eh_bem_publico", "uso_compartilhado",
                     }
                     campos = [campo for campo in d if campo in campos_permitidos]
@@ -4084,7 +4953,8 @@ def imprimir_ficha_associado(id):
         sql = f"""
             SELECT nome, cpf, rg, data_nascimento, data_admissao, status, 
                    uvr, associacao, logradouro, endereco_numero, bairro, cidade, 
-                   uf, cep, telefone, foto_base64, numero
+                   uf, cep, telefone,
+                   (SELECT imagem FROM fotos WHERE fotos.id = associados.foto_id), numero
             FROM associados {escopo_sql}
         """
         cur.execute(sql, parametros)
@@ -4128,13 +4998,10 @@ def imprimir_ficha_associado(id):
 
         # --- PROCESSAMENTO DA FOTO (CORRIGIDO PROPORÇÃO) ---
         img_obj = None
-        if dados['foto'] and len(dados['foto']) > 100:
+        if dados['foto']:
             try:
-                img_str = dados['foto'].split(",")[1] if "," in dados['foto'] else dados['foto']
-                img_data = base64.b64decode(img_str)
-                
                 # Cria um objeto de arquivo na memória
-                imagem_io = io.BytesIO(img_data)
+                imagem_io = io.BytesIO(bytes(dados['foto']))
                 
                 # Lê as dimensões originais da imagem para calcular a proporção
                 utils_img = ImageReader(imagem_io)
@@ -4277,6 +5144,9 @@ def imprimir_ficha_associado(id):
 @login_json_required
 @login_required
 def buscar_cadastros():
+    limite, cursor_pagina, com_total, erro_pagina = _parametros_pagina(50)
+    if erro_pagina:
+        return erro_pagina
     termo = request.args.get("q", "").lower()
     tipo = request.args.get("tipo", "") # Cliente ou Fornecedor
     uvr_tela = request.args.get("uvr", "")
@@ -4303,25 +5173,30 @@ def buscar_cadastros():
             params.append(current_user.uvr_acesso)
         
         # Filtros de Busca
-        if termo: 
-            sql += " AND (LOWER(razao_social) LIKE %s OR cnpj LIKE %s)"
-            params.extend([f"%{termo}%", f"%{termo}%"])
+        filtro_busca, params_busca = condicao_busca(termo, ("razao_social",), ("cnpj",))
+        if filtro_busca:
+            sql += f" AND {filtro_busca}"
+            params.extend(params_busca)
         
         if tipo and tipo != "Todos": 
             sql += " AND tipo_cadastro = %s"
             params.append(tipo)
             
-        sql += " ORDER BY razao_social ASC LIMIT 50"
-        
-        cur.execute(sql, tuple(params))
+        pagina = consultar_pagina(
+            cur, sql, params, ORDEM_CADASTROS,
+            limite=limite, cursor=cursor_pagina, com_total=com_total,
+            filtros={"sql": sql, "params": params},
+        )
         
         res = []
-        for r in cur.fetchall():
+        for r in pagina.linhas:
             res.append({
                 "id": r[0], "razao": r[1], "cnpj": r[2], 
                 "tipo": r[3], "uvr": r[4], "cidade": r[5], "tel": r[6]
             })
-        return jsonify(res)
+        return jsonify(pagina.resposta(res))
+    except CursorInvalido:
+        return _resposta_cursor_invalido()
     except Exception as e:
         app.logger.error(
             "Falha ao buscar cadastros. erro_tipo=%s", type(e).__name__
@@ -4912,15 +5787,18 @@ def get_detalhes_solicitacao(id):
             })
         # ------------------------------------------------------------------
 
-        # Verifica se tem foto nova (Patrimônio ou Associado)
-        foto_nova = d_novos.get("foto_bem_base64") or d_novos.get("foto_base64") or ""
+        # Foto nova (Patrimônio ou Associado); solicitações antigas trazem base64.
+        if d_novos.get("foto_id"):
+            foto_nova = _url_foto("solicitacoes", id, d_novos["foto_id"])
+        else:
+            foto_nova = d_novos.get("foto_bem_base64") or d_novos.get("foto_base64") or None
 
         return jsonify({
             "id_solicitacao": id, "usuario": usuario, 
             "data": data_solic.strftime('%d/%m %H:%M') if data_solic else "Data desc.",
             "tipo": "EDICAO", 
             "comparacao": comp, 
-            "foto_nova_base64": foto_nova
+            "foto_nova_url": foto_nova
         })
 
     except Exception as e:
@@ -4937,6 +5815,9 @@ def get_detalhes_solicitacao(id):
 @login_json_required
 @login_required
 def buscar_transacoes_gestao():
+    limite, cursor_pagina, com_total, erro_pagina = _parametros_pagina(100)
+    if erro_pagina:
+        return erro_pagina
     # Pega os filtros que vieram do Javascript
     data_ini = request.args.get("data_inicial")
     data_fim = request.args.get("data_final")
@@ -4984,15 +5865,20 @@ def buscar_transacoes_gestao():
             sql += " AND tipo_transacao = %s"
             params.append(tipo)
 
-        if termo:
-            sql += " AND (LOWER(nome_cadastro_origem) LIKE %s OR numero_documento LIKE %s)"
-            params.extend([f"%{termo}%", f"%{termo}%"])
+        filtro_busca, params_busca = condicao_busca(
+            termo, ("nome_cadastro_origem", "numero_documento")
+        )
+        if filtro_busca:
+            sql += f" AND {filtro_busca}"
+            params.extend(params_busca)
 
         # Ordenar: Mais recentes primeiro
-        sql += " ORDER BY data_documento DESC, id DESC LIMIT 100"
-
-        cur.execute(sql, tuple(params))
-        rows = cur.fetchall()
+        pagina = consultar_pagina(
+            cur, sql, params, ORDEM_TRANSACOES_GESTAO,
+            limite=limite, cursor=cursor_pagina, com_total=com_total,
+            filtros={"sql": sql, "params": params},
+        )
+        rows = pagina.linhas
 
         resultados = []
         for r in rows:
@@ -5012,7 +5898,10 @@ def buscar_transacoes_gestao():
                 "uvr": r[7]
             })
 
-        return jsonify(resultados)
+        return jsonify(pagina.resposta(resultados))
+
+    except CursorInvalido:
+        return _resposta_cursor_invalido()
 
     except Exception as e:
         app.logger.error(
@@ -5054,7 +5943,7 @@ def get_transacao_detalhes(id):
         parametros_itens = (id,) if uvr is None else (id, uvr)
         cur.execute("""
             SELECT it.descricao, it.unidade, it.quantidade, it.valor_unitario, it.valor_total_item,
-                   ps.grupo, ps.subgrupo
+                   ps.grupo, ps.subgrupo, it.id
             FROM itens_transacao it
             INNER JOIN transacoes_financeiras tf ON tf.id = it.id_transacao
             LEFT JOIN produtos_servicos ps ON it.descricao = ps.item
@@ -5068,6 +5957,7 @@ def get_transacao_detalhes(id):
         itens = []
         for item in itens_db:
             itens.append({
+                "id": item[7],
                 "descricao": item[0],
                 "unidade": item[1],
                 "quantidade": float(item[2]),
@@ -5108,6 +5998,7 @@ def get_transacao_detalhes(id):
 
 @app.route("/api/subgrupos", methods=["GET", "POST"])
 @admin_json_required
+@json_condicional
 def api_subgrupos():
     conn = None
     cur = None
@@ -5142,8 +6033,9 @@ def api_subgrupos():
             if acao == 'novo':
                 try:
                     cur.execute("INSERT INTO subgrupos (nome, atividade_pai) VALUES (%s, %s) RETURNING id", (nome, atividade))
-                    conn.commit()
-                    return jsonify({"sucesso": True, "id": cur.fetchone()[0]})
+                    id_novo = cur.fetchone()[0]
+                    _confirmar_alteracao_catalogo(conn, cur)
+                    return jsonify({"sucesso": True, "id": id_novo})
                 except psycopg2.IntegrityError:
                     conn.rollback()
                     return jsonify({"erro": "Já existe um subgrupo com este nome para esta atividade."}), 400
@@ -5155,7 +6047,7 @@ def api_subgrupos():
                     return jsonify({"erro": "Recurso não encontrado."}), 404
                 # Também atualiza o texto na tabela antiga para manter consistência por enquanto
                 cur.execute("UPDATE produtos_servicos SET subgrupo = %s WHERE id_subgrupo = %s", (nome, id_sub))
-                conn.commit()
+                _confirmar_alteracao_catalogo(conn, cur)
                 return jsonify({"sucesso": True})
             
             elif acao == 'excluir':
@@ -5168,7 +6060,7 @@ def api_subgrupos():
                 if cur.rowcount == 0:
                     conn.rollback()
                     return jsonify({"erro": "Recurso não encontrado."}), 404
-                conn.commit()
+                _confirmar_alteracao_catalogo(conn, cur)
                 return jsonify({"sucesso": True})
 
         # GET: Listar Subgrupos
@@ -5196,6 +6088,7 @@ def api_subgrupos():
 
 @app.route("/api/produtos_crud", methods=["GET", "POST", "DELETE"])
 @admin_json_required
+@json_condicional
 def api_produtos_crud():
     conn = None
     cur = None
@@ -5242,7 +6135,7 @@ def api_produtos_crud():
                         INSERT INTO produtos_servicos (tipo, tipo_atividade, grupo, subgrupo, id_subgrupo, item, data_hora_cadastro)
                         VALUES (%s, %s, %s, %s, %s, %s, NOW())
                     """, (tipo, grupo, grupo, nome_subgrupo, id_subgrupo, item))
-                    conn.commit()
+                    _confirmar_alteracao_catalogo(conn, cur)
                 except psycopg2.IntegrityError:
                     conn.rollback()
                     return jsonify({"erro": "Já existe um item com este nome."}), 400
@@ -5255,7 +6148,7 @@ def api_produtos_crud():
                 if cur.rowcount == 0:
                     conn.rollback()
                     return jsonify({"erro": "Recurso não encontrado."}), 404
-                conn.commit()
+                _confirmar_alteracao_catalogo(conn, cur)
             
             return jsonify({"sucesso": True})
 
@@ -5272,7 +6165,7 @@ def api_produtos_crud():
             if cur.rowcount == 0:
                 conn.rollback()
                 return jsonify({"erro": "Recurso não encontrado."}), 404
-            conn.commit()
+            _confirmar_alteracao_catalogo(conn, cur)
             return jsonify({"sucesso": True})
 
         # GET: Listar Produtos (COM NOVOS FILTROS)
@@ -5361,6 +6254,7 @@ def excluir_transacao(id):
         desc = f"NF {row[1]} - {row[2]}"
 
         if current_user.role == 'admin':
+            incrementar_versao_dados(cur, ids_transacao=[id])
             cur.execute("DELETE FROM transacoes_financeiras WHERE id = %s", (id,))
             if cur.rowcount == 0:
                 conn.rollback()
@@ -5457,8 +6351,12 @@ def excluir_movimentacao(id):
     try:
         conn = conectar_banco()
         cur = conn.cursor()
-        cur.execute("SELECT id FROM fluxo_caixa WHERE id = %s FOR UPDATE", (id,))
-        if not cur.fetchone():
+        cur.execute(
+            "SELECT id, id_conta_corrente, data_efetiva FROM fluxo_caixa WHERE id = %s FOR UPDATE",
+            (id,),
+        )
+        movimentacao = cur.fetchone()
+        if not movimentacao:
             conn.rollback()
             return jsonify({"error": "Recurso não encontrado."}), 404
         # 1. Busca se há vínculos com Transações (NFs) para estornar
@@ -5498,6 +6396,11 @@ def excluir_movimentacao(id):
         if cur.rowcount == 0:
             conn.rollback()
             return jsonify({"error": "Recurso não encontrado."}), 404
+        _atualizar_alocacao_pagamentos(cur, [id_transacao for id_transacao, _ in links])
+        incrementar_versao_dados(
+            cur, ids_transacao=[id_transacao for id_transacao, _ in links]
+        )
+        _atualizar_saldos_conta(cur, movimentacao[1], movimentacao[2])
         conn.commit()
         
         return jsonify({"status": "sucesso", "message": "Movimentação excluída e saldos estornados!"})
@@ -5528,22 +6431,18 @@ def cadastrar_patrimonio():
         uso_compartilhado = True if dados.get("uso_compartilhado") else False
         
         # Foto
-        foto_final = ""
-        foto_webcam = dados.get("foto_bem_base64_webcam")
-        if foto_webcam and "data:image" in foto_webcam:
-            foto_final = foto_webcam
-        elif 'foto_bem_upload' in request.files:
-            arquivo = request.files['foto_bem_upload']
-            if arquivo and arquivo.filename:
-                conteudo = arquivo.read()
-                encoded = base64.b64encode(conteudo).decode('utf-8')
-                mime = arquivo.content_type or "image/jpeg"
-                foto_final = f"data:{mime};base64,{encoded}"
+        try:
+            foto = ler_foto_enviada(
+                dados.get("foto_bem_base64_webcam"), request.files.get("foto_bem_upload")
+            )
+        except FotoInvalida:
+            return "Foto inválida.", 400
 
         def data_or_none(d): return d if d else None
         
         conn = conectar_banco()
         cur = conn.cursor()
+        foto_id = gravar_foto(cur, foto) if foto else None
         
         cur.execute("""
             INSERT INTO patrimonio (
@@ -5553,7 +6452,7 @@ def cadastrar_patrimonio():
                 placa, renavam, combustivel, capacidade_carga, controle_por, medidor_inicial, medidor_atual,
                 local_instalacao, setor_uso, nome_responsavel, nome_operador_principal,
                 status_bem, estado_conservacao, permite_abastecimento, permite_manutencao,
-                alerta_preventiva, observacoes_gerais, foto_bem_base64, eh_bem_publico, uso_compartilhado
+                alerta_preventiva, observacoes_gerais, foto_id, eh_bem_publico, uso_compartilhado
             ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
         """, (
             dados["uvr_patrimonio"], dados.get("associacao_patrimonio",""), dados["tipo_bem"], dados["categoria_bem"],
@@ -5564,7 +6463,7 @@ def cadastrar_patrimonio():
             dados["medidor_inicial"] or 0, dados["medidor_inicial"] or 0,
             dados["local_instalacao"], dados["setor_uso"], dados["nome_responsavel"], dados["nome_operador"],
             dados["status_bem"], dados["estado_conservacao"], permite_abast, permite_manut,
-            dados["alerta_preventiva"] or 0, dados["observacoes_gerais"], foto_final, bem_publico, uso_compartilhado
+            dados["alerta_preventiva"] or 0, dados["observacoes_gerais"], foto_id, bem_publico, uso_compartilhado
         ))
         conn.commit()
         return pagina_sucesso_base("Sucesso", "Bem/Patrimônio cadastrado com sucesso!")
@@ -5579,6 +6478,9 @@ def cadastrar_patrimonio():
 @login_json_required
 @login_required
 def buscar_patrimonio():
+    limite, cursor_pagina, com_total, erro_pagina = _parametros_pagina(50)
+    if erro_pagina:
+        return erro_pagina
     conn = None
     try:
         termo = request.args.get("q", "").lower()
@@ -5604,17 +6506,22 @@ def buscar_patrimonio():
             sql += " AND categoria = %s"
             params.append(categoria)
             
-        if termo:
-            sql += " AND (LOWER(descricao) LIKE %s OR placa LIKE %s OR codigo_patrimonio LIKE %s)"
-            params.extend([f"%{termo}%", f"%{termo}%", f"%{termo}%"])
+        filtro_busca, params_busca = condicao_busca(
+            termo, ("descricao", "placa", "codigo_patrimonio")
+        )
+        if filtro_busca:
+            sql += f" AND {filtro_busca}"
+            params.extend(params_busca)
             
-        sql += " ORDER BY descricao ASC"
-        
         conn = conectar_banco()
         cur = conn.cursor()
-        cur.execute(sql, tuple(params))
+        pagina = consultar_pagina(
+            cur, sql, params, ORDEM_PATRIMONIO,
+            limite=limite, cursor=cursor_pagina, com_total=com_total,
+            filtros={"sql": sql, "params": params},
+        )
         res = []
-        for r in cur.fetchall():
+        for r in pagina.linhas:
             medida = f"{float(r[6]):.0f} {r[7]}" if r[6] is not None else "-"
             # r[3] é placa, r[9] é código
             identificacao = r[3] if r[3] else (r[9] or "-")
@@ -5623,7 +6530,9 @@ def buscar_patrimonio():
                 "id": r[0], "descricao": r[1], "tipo": r[2], "placa": identificacao,
                 "status": r[4], "responsavel": r[5] or "-", "medidor": medida, "categoria": r[8]
             })
-        return jsonify(res)
+        return jsonify(pagina.resposta(res))
+    except CursorInvalido:
+        return _resposta_cursor_invalido()
     except Exception as e:
         app.logger.error(
             "Falha ao buscar patrimônio. erro_tipo=%s", type(e).__name__
@@ -5651,6 +6560,10 @@ def get_patrimonio_detalhes(id):
         # Mapeia colunas dinamicamente
         columns = [desc[0] for desc in cur.description]
         data = dict(zip(columns, row))
+        data.pop("foto_bem_base64", None)
+        foto_id = data.pop("foto_id", None)
+        data["foto_url"] = _url_foto("patrimonio", id, foto_id)
+        data["foto_miniatura_url"] = _url_foto("patrimonio", id, foto_id, miniatura=True)
         
         # Formata datas e decimais para JSON
         for k, v in data.items():
@@ -5691,17 +6604,12 @@ def editar_patrimonio():
         def data_or_none(d): return d if d else None
 
         # Foto (Lógica: Webcam > Upload > Manter Antiga)
-        foto_final = None
-        foto_webcam = dados.get("foto_bem_base64_webcam")
-        if foto_webcam and "data:image" in foto_webcam:
-            foto_final = foto_webcam
-        elif 'foto_bem_upload' in request.files:
-            arquivo = request.files['foto_bem_upload']
-            if arquivo and arquivo.filename:
-                conteudo = arquivo.read()
-                encoded = base64.b64encode(conteudo).decode('utf-8')
-                mime = arquivo.content_type or "image/jpeg"
-                foto_final = f"data:{mime};base64,{encoded}"
+        try:
+            foto = ler_foto_enviada(
+                dados.get("foto_bem_base64_webcam"), request.files.get("foto_bem_upload")
+            )
+        except FotoInvalida:
+            return "Foto inválida.", 400
         
         # Monta dicionário de dados limpos
         dados_tratados = {
@@ -5730,11 +6638,11 @@ def editar_patrimonio():
             "eh_bem_publico": bem_publico, "uso_compartilhado": uso_comp
         }
         
-        if foto_final:
-            dados_tratados["foto_bem_base64"] = foto_final
-
         conn = conectar_banco()
         cur = conn.cursor()
+        if foto:
+            dados_tratados["foto_id"] = gravar_foto(cur, foto)
+            dados_tratados["foto_bem_base64"] = None
 
         # --- FLUXO DE DECISÃO ---
         if current_user.role == 'admin':
@@ -0,0 +1,30 @@
+"""Cria manualmente, no banco já implantado, as estruturas novas da aplicação."""
+
+import argparse
+
+
+CONFIRMACAO_EXIGIDA = "ATUALIZAR_ESQUEMA"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Cria as funções, tabelas e índices que a aplicação exige além do "
+            "esquema legado, no banco configurado. Pode ser executado de novo."
+        )
+    )
+    parser.add_argument(
+        "--confirmar",
+        help=f"Informe exatamente {CONFIRMACAO_EXIGIDA} para prosseguir.",
+    )
+    argumentos = parser.parse_args()
+    if argumentos.confirmar != CONFIRMACAO_EXIGIDA:
+        parser.error("Confirmação inválida; nenhuma alteração foi executada.")
+
+    from app import atualizar_esquema_aplicacao
+
+    atualizar_esquema_aplicacao()
+
+
+if __name__ == "__main__":
+    main()
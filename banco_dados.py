@@ -0,0 +1,535 @@
+"""Pool de conexões PostgreSQL por processo, emprestadas por requisição."""
+
+import os
+import threading
+import time
+import weakref
+
+import psycopg2
+from psycopg2 import extensions
+from flask import current_app, g, has_request_context, request
+
+from instrumentacao_banco import instrumentar_cursor
+from leitura_ambiente import ler_inteiro
+from logging_operacional import registrar_evento
+
+
+POOL_MAX_LIMITE = 64
+THREADS_PADRAO = 4
+ESPERA_PADRAO_S = 10
+VERIFICACAO_PADRAO_S = 30
+VIDA_MAXIMA_PADRAO_S = 1800
+
+METODOS_SOMENTE_LEITURA = {"GET", "HEAD", "OPTIONS"}
+
+_PROVEDORES = weakref.WeakSet()
+
+
+class PoolEsgotadoError(RuntimeError):
+    """Nenhuma conexão foi liberada dentro do tempo de espera configurado."""
+
+
+def ler_configuracao_pool():
+    """Dimensiona o pool pelo número de threads de cada worker do Gunicorn."""
+    threads = ler_inteiro(
+        "GUNICORN_THREADS",
+        padrao=THREADS_PADRAO,
+        minimo=1,
+        maximo=POOL_MAX_LIMITE,
+    )
+    return {
+        "maximo": ler_inteiro(
+            "DB_POOL_MAX",
+            padrao=threads,
+            minimo=1,
+            maximo=POOL_MAX_LIMITE,
+        ),
+        "espera_s": ler_inteiro(
+            "DB_POOL_TIMEOUT",
+            padrao=ESPERA_PADRAO_S,
+            minimo=1,
+            maximo=120,
+        ),
+        "verificar_apos_s": ler_inteiro(
+            "DB_POOL_HEALTHCHECK_SECONDS",
+            padrao=VERIFICACAO_PADRAO_S,
+            minimo=0,
+            maximo=3600,
+        ),
+        "vida_maxima_s": ler_inteiro(
+            "DB_POOL_MAX_LIFETIME",
+            padrao=VIDA_MAXIMA_PADRAO_S,
+            minimo=60,
+            maximo=86400,
+        ),
+    }
+
+
+class ConexaoEmprestada:
+    """Encaminha tudo à conexão real; close() a devolve ao pool em vez de encerrar."""
+
+    __slots__ = ("_pool", "_conexao", "_criada_em", "__weakref__")
+
+    def __init__(self, pool, conexao, criada_em):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_conexao", conexao)
+        object.__setattr__(self, "_criada_em", criada_em)
+
+    def _real(self):
+        conexao = object.__getattribute__(self, "_conexao")
+        if conexao is None:
+            raise psycopg2.InterfaceError("connection already closed")
+        return conexao
+
+    def __getattr__(self, nome):
+        return getattr(self._real(), nome)
+
+    def __setattr__(self, nome, valor):
+        setattr(self._real(), nome, valor)
+
+    @property
+    def closed(self):
+        conexao = object.__getattribute__(self, "_conexao")
+        return 1 if conexao is None else conexao.closed
+
+    @property
+    def devolvida(self):
+        return object.__getattribute__(self, "_conexao") is None
+
+    def close(self):
+        conexao = object.__getattribute__(self, "_conexao")
+        if conexao is None:
+            return
+        object.__setattr__(self, "_conexao", None)
+        self._pool.devolver(conexao, self._criada_em)
+
+    def __enter__(self):
+        # Mantém a semântica transacional do psycopg2: o bloco confirma ou
+        # desfaz a transação, mas não devolve a conexão.
+        self._real().__enter__()
+        return self
+
+    def __exit__(self, tipo, valor, rastreio):
+        return self._real().__exit__(tipo, valor, rastreio)
+
+
+class PoolConexoes:
+    """Pool limitado e sensível a fork, com verificação na retirada."""
+
+    def __init__(self, dsn, *, maximo, espera_s, verificar_apos_s, vida_maxima_s):
+        self._dsn = dsn
+        self._maximo = maximo
+        self._espera_s = espera_s
+        self._verificar_apos_s = verificar_apos_s
+        self._vida_maxima_s = vida_maxima_s
+        self._condicao = threading.Condition()
+        self._pid = os.getpid()
+        self._ociosas = []
+        self._total = 0
+        self._em_uso = 0
+        self._metricas = {
+            "emprestimos": 0,
+            "devolucoes": 0,
+            "conexoes_criadas": 0,
+            "conexoes_descartadas": 0,
+            "falhas_verificacao": 0,
+            "esperas": 0,
+            "espera_total_ms": 0.0,
+            "esgotamentos": 0,
+            "recuperadas_no_teardown": 0,
+        }
+
+    def _verificar_processo(self):
+        # Após um fork, os sockets herdados pertencem ao processo pai. Eles são
+        # esquecidos sem close() para não encerrar a sessão que o pai ainda usa.
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._ociosas = []
+            self._total = 0
+            self._em_uso = 0
+
+    def _abrir(self):
+        conexao = psycopg2.connect(self._dsn)
+        with self._condicao:
+            self._metricas["conexoes_criadas"] += 1
+        return conexao, time.monotonic()
+
+    @staticmethod
+    def _fechar_silenciosamente(conexao):
+        try:
+            conexao.close()
+        except Exception:
+            pass
+
+    def _conexao_valida(self, conexao, criada_em, devolvida_em):
+        agora = time.monotonic()
+        if conexao.closed:
+            return False
+        if agora - criada_em > self._vida_maxima_s:
+            return False
+        if agora - devolvida_em < self._verificar_apos_s:
+            return True
+        try:
+            with conexao.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            conexao.rollback()
+            return True
+        except Exception:
+            with self._condicao:
+                self._metricas["falhas_verificacao"] += 1
+            return False
+
+    def emprestar(self):
+        inicio = time.monotonic()
+        prazo = inicio + self._espera_s
+        esperou = False
+        with self._condicao:
+            self._verificar_processo()
+            while True:
+                if self._ociosas:
+                    item = self._ociosas.pop()
+                    break
+                if self._total < self._maximo:
+                    self._total += 1
+                    item = None
+                    break
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    self._metricas["esgotamentos"] += 1
+                    raise PoolEsgotadoError(
+                        "Nenhuma conexão com o banco ficou disponível a tempo."
+                    )
+                esperou = True
+                self._condicao.wait(restante)
+            self._em_uso += 1
+            self._metricas["emprestimos"] += 1
+            if esperou:
+                self._metricas["esperas"] += 1
+                self._metricas["espera_total_ms"] += (time.monotonic() - inicio) * 1000
+
+        try:
+            if item is not None:
+                conexao, criada_em, devolvida_em = item
+                if self._conexao_valida(conexao, criada_em, devolvida_em):
+                    return ConexaoEmprestada(self, conexao, criada_em)
+                self._fechar_silenciosamente(conexao)
+                with self._condicao:
+                    self._metricas["conexoes_descartadas"] += 1
+            conexao, criada_em = self._abrir()
+            return ConexaoEmprestada(self, conexao, criada_em)
+        except BaseException:
+            with self._condicao:
+                self._total -= 1
+                self._em_uso -= 1
+                self._condicao.notify()
+            raise
+
+    def devolver(self, conexao, criada_em):
+        reutilizar = not conexao.closed and os.getpid() == self._pid
+        if reutilizar:
+            try:
+                if conexao.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conexao.rollback()
+                # Restaura somente o estado do cliente; não gera ida ao servidor.
+                conexao.set_session(
+                    isolation_level="DEFAULT",
+                    readonly="DEFAULT",
+                    deferrable="DEFAULT",
+                    autocommit=False,
+                )
+            except Exception:
+                reutilizar = False
+        if not reutilizar:
+            self._fechar_silenciosamente(conexao)
+
+        with self._condicao:
+            if os.getpid() != self._pid:
+                return
+            self._em_uso -= 1
+            self._metricas["devolucoes"] += 1
+            if reutilizar:
+                self._ociosas.append((conexao, criada_em, time.monotonic()))
+            else:
+                self._total -= 1
+                self._metricas["conexoes_descartadas"] += 1
+            self._condicao.notify()
+
+    def registrar_recuperacao(self):
+        with self._condicao:
+            self._metricas["recuperadas_no_teardown"] += 1
+
+    def fechar(self):
+        with self._condicao:
+            ociosas = self._ociosas
+            self._ociosas = []
+            self._total -= len(ociosas)
+        for conexao, _criada_em, _devolvida_em in ociosas:
+            self._fechar_silenciosamente(conexao)
+
+    def metricas(self):
+        with self._condicao:
+            return {
+                **self._metricas,
+                "espera_total_ms": round(self._metricas["espera_total_ms"], 3),
+                "maximo": self._maximo,
+                "abertas": self._total,
+                "em_uso": self._em_uso,
+                "ociosas": len(self._ociosas),
+            }
+
+
+class ConexaoRequisicao:
+    """Visão de uma rota sobre a conexão única da requisição.
+
+    close() encerra somente esta visão. Em requisições de escrita, fechar a
+    última visão ainda aberta desfaz o que não foi confirmado, como ocorria
+    quando cada chamada tinha conexão própria.
+    """
+
+    __slots__ = ("_unidade", "_aberta")
+
+    def __init__(self, unidade):
+        object.__setattr__(self, "_unidade", unidade)
+        object.__setattr__(self, "_aberta", True)
+
+    def _real(self):
+        if not object.__getattribute__(self, "_aberta"):
+            raise psycopg2.InterfaceError("connection already closed")
+        return object.__getattribute__(self, "_unidade").emprestada
+
+    def __getattr__(self, nome):
+        return getattr(self._real(), nome)
+
+    def __setattr__(self, nome, valor):
+        setattr(self._real(), nome, valor)
+
+    @property
+    def closed(self):
+        if not object.__getattribute__(self, "_aberta"):
+            return 1
+        return self._real().closed
+
+    def cursor(self, *args, **kwargs):
+        return instrumentar_cursor(self._real().cursor(*args, **kwargs))
+
+    def close(self):
+        if not object.__getattribute__(self, "_aberta"):
+            return
+        object.__setattr__(self, "_aberta", False)
+        object.__getattribute__(self, "_unidade").liberar_visao()
+
+    def __enter__(self):
+        self._real().__enter__()
+        return self
+
+    def __exit__(self, tipo, valor, rastreio):
+        return self._real().__exit__(tipo, valor, rastreio)
+
+
+class UnidadeTrabalho:
+    """Uma conexão por requisição, compartilhada por loader, decorators e rotas.
+
+    Requisições somente de leitura usam uma única transação REPEATABLE READ
+    READ ONLY; todas as consultas enxergam o mesmo instante do banco.
+    """
+
+    def __init__(self, pool, *, somente_leitura):
+        self._pool = pool
+        self.somente_leitura = somente_leitura
+        self.emprestada = None
+        self.visoes_abertas = 0
+        self.visoes_criadas = 0
+
+    def conexao(self):
+        if self.emprestada is None or self.emprestada.devolvida:
+            self.emprestada = self._pool.emprestar()
+            if self.somente_leitura:
+                self.emprestada.set_session(
+                    isolation_level=extensions.ISOLATION_LEVEL_REPEATABLE_READ,
+                    readonly=True,
+                )
+        self.visoes_abertas += 1
+        self.visoes_criadas += 1
+        return ConexaoRequisicao(self)
+
+    def liberar_visao(self):
+        self.visoes_abertas -= 1
+        emprestada = self.emprestada
+        if emprestada is None or emprestada.closed:
+            return
+        try:
+            status = emprestada.info.transaction_status
+            # Uma falha tratada pela rota não pode contaminar as próximas
+            # consultas; em escrita, a última visão fechada descarta o que
+            # ficou sem commit.
+            if status == extensions.TRANSACTION_STATUS_INERROR or (
+                not self.somente_leitura
+                and self.visoes_abertas <= 0
+                and status != extensions.TRANSACTION_STATUS_IDLE
+            ):
+                emprestada.rollback()
+        except psycopg2.Error:
+            emprestada.close()
+
+    def transferir(self):
+        """Entrega a conexão a uma resposta em streaming, que a devolve com close().
+
+        O Flask executa o teardown antes de consumir o gerador da resposta; sem
+        a transferência, a conexão voltaria ao pool ainda em uso. O gerador
+        fica com uma conexão só dele, somente leitura quando a requisição é de
+        leitura; não conte com o snapshot das consultas feitas antes na rota.
+        """
+        emprestada = self.emprestada
+        if emprestada is None or emprestada.devolvida:
+            emprestada = self._pool.emprestar()
+            if self.somente_leitura:
+                emprestada.set_session(
+                    isolation_level=extensions.ISOLATION_LEVEL_REPEATABLE_READ,
+                    readonly=True,
+                )
+        self.emprestada = None
+        return emprestada
+
+    def encerrar(self):
+        """Devolve a conexão ao pool e informa quantas visões ficaram abertas."""
+        esquecidas = max(self.visoes_abertas, 0)
+        self.visoes_abertas = 0
+        if self.emprestada is not None and not self.emprestada.devolvida:
+            self.emprestada.close()
+            if esquecidas:
+                self._pool.registrar_recuperacao()
+        self.emprestada = None
+        return esquecidas
+
+
+def _requisicao_somente_leitura():
+    if request.method in METODOS_SOMENTE_LEITURA:
+        return True
+    endpoints = current_app.config.get("DB_READ_ONLY_ENDPOINTS") or ()
+    return request.endpoint in endpoints
+
+
+class ProvedorConexoes:
+    """Cria o pool somente no primeiro uso de cada processo."""
+
+    def __init__(self, dsn, configuracao):
+        self._dsn = dsn
+        self._configuracao = dict(configuracao)
+        self._pool = None
+        self._trava = threading.Lock()
+        _PROVEDORES.add(self)
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._trava:
+                if self._pool is None:
+                    self._pool = PoolConexoes(self._dsn, **self._configuracao)
+        return self._pool
+
+    def conectar(self):
+        if not self._dsn:
+            raise RuntimeError("DATABASE_URL não está configurada.")
+        if not has_request_context():
+            return self.pool.emprestar()
+        return self._unidade_da_requisicao().conexao()
+
+    def conectar_para_streaming(self):
+        """Conexão que sobrevive ao teardown, para geradores de resposta."""
+        if not self._dsn:
+            raise RuntimeError("DATABASE_URL não está configurada.")
+        if not has_request_context():
+            return self.pool.emprestar()
+        return self._unidade_da_requisicao().transferir()
+
+    def conectar_apos_liberar_requisicao(self):
+        """Conexão de escrita para uma gravação acessória de requisição de leitura.
+
+        Devolve antes a conexão da requisição, de modo que a thread nunca segura
+        duas conexões do pool. Consultas seguintes na rota recebem outra
+        unidade; não use com alterações da rota ainda sem commit.
+        """
+        if not self._dsn:
+            raise RuntimeError("DATABASE_URL não está configurada.")
+        if has_request_context():
+            devolver_conexoes_da_requisicao()
+        return self.pool.emprestar()
+
+    def _unidade_da_requisicao(self):
+        unidade = g.get("_recic3_unidade_trabalho")
+        if unidade is None:
+            unidade = UnidadeTrabalho(
+                self.pool,
+                somente_leitura=_requisicao_somente_leitura(),
+            )
+            g._recic3_unidade_trabalho = unidade
+        return unidade
+
+    def metricas(self):
+        if self._pool is None:
+            return {
+                "maximo": self._configuracao["maximo"],
+                "abertas": 0,
+                "em_uso": 0,
+                "ociosas": 0,
+            }
+        return self._pool.metricas()
+
+    def fechar(self):
+        if self._pool is not None:
+            self._pool.fechar()
+
+
+def obter_unidade_trabalho():
+    """Retorna a unidade de trabalho da requisição atual, se já existir."""
+    if not has_request_context():
+        return None
+    return g.get("_recic3_unidade_trabalho")
+
+
+def devolver_conexoes_da_requisicao():
+    """Devolve ao pool a conexão da requisição, inclusive após exceções."""
+    unidade = g.pop("_recic3_unidade_trabalho", None)
+    if unidade is None:
+        return
+    esquecidas = unidade.encerrar()
+    if esquecidas:
+        registrar_evento(
+            "database_connection_reclaimed",
+            nivel="WARNING",
+            mensagem="Conexão devolvida ao pool no encerramento da requisição.",
+            connections=esquecidas,
+        )
+
+
+def configurar_banco_dados(app):
+    """Registra o provedor do pool sem abrir conexão durante a inicialização."""
+    configuracao = ler_configuracao_pool()
+    provedor = ProvedorConexoes(app.config.get("DATABASE_URL"), configuracao)
+    app.config.update(
+        DB_POOL_MAX=configuracao["maximo"],
+        DB_POOL_TIMEOUT=configuracao["espera_s"],
+        DB_POOL_HEALTHCHECK_SECONDS=configuracao["verificar_apos_s"],
+        DB_POOL_MAX_LIFETIME=configuracao["vida_maxima_s"],
+    )
+    app.extensions["recic3_banco_dados"] = provedor
+
+    @app.teardown_request
+    def devolver_conexoes_emprestadas(_erro=None):
+        devolver_conexoes_da_requisicao()
+
+    return provedor
+
+
+def encerrar_pools():
+    """Fecha as conexões ociosas de todos os pools deste processo."""
+    for provedor in list(_PROVEDORES):
+        metricas = provedor.metricas()
+        provedor.fechar()
+        registrar_evento(
+            "database_pool_closed",
+            mensagem="Pool de conexões encerrado.",
+            pool=metricas,
+        )
@@ -0,0 +1,323 @@
+"""Mede os endpoints mais usados contra um PostgreSQL local e descartável.
+
+O cluster é criado por `postgres_efemero.PostgresEfemero` e populado por
+`gerar_dados_sinteticos.py` com escala e semente fixas. A aplicação real é
+exercitada pelo test client do Flask. Para cada cenário o script grava a
+latência (p50, p95 e máximo), o número de consultas lido do cabeçalho
+`Server-Timing` e, em uma execução extra sob `tracemalloc`, o pico de memória
+alocada pelo Python.
+
+Com --gravar o resultado vira a baseline em JSON. Com --baseline o resultado é
+comparado a ela; o código de saída é 1 quando o p95 ou o pico de memória passam
+da tolerância, quando um cenário faz mais consultas ou quando não responde 200.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import secrets
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from benchmark_pagamentos_concorrentes import _cliente_autenticado, _percentil
+
+
+PADRAO_CONSULTAS = re.compile(r'db;[^,]*desc="(\d+) consultas"')
+VERSAO_FORMATO = 1
+
+
+def contar_consultas(cabecalho):
+    """Consultas informadas em Server-Timing; None quando o cabeçalho falta."""
+    encontrado = PADRAO_CONSULTAS.search(cabecalho or "")
+    return int(encontrado.group(1)) if encontrado else None
+
+
+def comparar(base, atual, tolerancia, folga_ms):
+    """Lista as regressões de `atual` em relação à baseline `base`.
+
+    Latência e memória aceitam `tolerancia` (fração) sobre a baseline; a
+    latência ainda ignora diferenças menores que `folga_ms`, que em cenários de
+    poucos milissegundos são ruído. O número de consultas não tem tolerância.
+    """
+    regressoes = []
+    for nome, anterior in sorted(base["cenarios"].items()):
+        medido = atual["cenarios"].get(nome)
+        if medido is None:
+            regressoes.append(f"{nome}: cenário ausente na medição atual")
+            continue
+        if medido["status"] != [200]:
+            regressoes.append(f"{nome}: status {medido['status']}")
+        limite_ms = max(anterior["p95_ms"] * (1 + tolerancia), anterior["p95_ms"] + folga_ms)
+        if medido["p95_ms"] > limite_ms:
+            regressoes.append(
+                f"{nome}: p95 {medido['p95_ms']:.1f} ms > {limite_ms:.1f} ms "
+                f"(baseline {anterior['p95_ms']:.1f} ms)"
+            )
+        if (medido["consultas"] or 0) > (anterior["consultas"] or 0):
+            regressoes.append(
+                f"{nome}: {medido['consultas']} consultas (baseline {anterior['consultas']})"
+            )
+        limite_kib = anterior["pico_memoria_kib"] * (1 + tolerancia)
+        if medido["pico_memoria_kib"] > limite_kib:
+            regressoes.append(
+                f"{nome}: pico de memória {medido['pico_memoria_kib']} KiB > {limite_kib:.0f} KiB"
+            )
+    return regressoes
+
+
+def _criar_admin(app_module, usuario, senha):
+    from werkzeug.security import generate_password_hash
+
+    conn = app_module.conectar_banco()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO usuarios (username, password_hash, role) VALUES (%s, %s, 'admin')",
+        (usuario, generate_password_hash(senha)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _localizar_alvos(app_module, pagamentos):
+    """Escolhe os registros mais carregados do banco semeado para cada cenário."""
+    conn = app_module.conectar_banco()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT cc.id, cc.uvr, MAX(fc.data_efetiva)
+        FROM contas_correntes cc
+        JOIN fluxo_caixa fc ON fc.id_conta_corrente = cc.id
+        GROUP BY cc.id, cc.uvr
+        ORDER BY COUNT(*) DESC, cc.id
+        LIMIT 1
+    """)
+    id_conta, uvr, data_final = cur.fetchone()
+    cur.execute("""
+        SELECT id, associacao, id_cadastro_origem, nome_cadastro_origem,
+               valor_total_documento
+        FROM transacoes_financeiras
+        WHERE uvr = %s AND tipo_transacao = 'Despesa'
+          AND id_cadastro_origem IS NOT NULL AND valor_pago_recebido = 0
+        ORDER BY id DESC
+        LIMIT %s
+    """, (uvr, pagamentos))
+    nfs = cur.fetchall()
+    cur.execute("""
+        SELECT m.contrato_id, MAX(m.id)
+        FROM fc_medicoes m
+        GROUP BY m.contrato_id
+        ORDER BY COUNT(*) DESC, m.contrato_id
+        LIMIT 1
+    """)
+    contrato = cur.fetchone()
+    conn.close()
+    if len(nfs) < pagamentos or contrato is None:
+        raise RuntimeError("O banco semeado não tem NFs em aberto ou medições suficientes.")
+    return {
+        "id_conta": id_conta,
+        "uvr": uvr,
+        "data_inicial": (data_final - timedelta(days=365)).isoformat(),
+        "data_final": data_final.isoformat(),
+        "nfs_abertas": nfs,
+        "contrato_id": contrato[0],
+        "medicao_id": contrato[1],
+    }
+
+
+def montar_cenarios(alvos, token):
+    """Cada cenário recebe o cliente autenticado e devolve a resposta."""
+    periodo = {"data_inicial": alvos["data_inicial"], "data_final": alvos["data_final"]}
+    nfs_abertas = iter(alvos["nfs_abertas"])
+
+    def pagar_nf(cliente):
+        id_nf, associacao, id_cadastro, nome, valor = next(nfs_abertas)
+        return cliente.post(
+            "/registrar_fluxo_caixa",
+            json={
+                "uvr": alvos["uvr"],
+                "associacao": associacao,
+                "tipo_movimentacao": "Pagamento",
+                "id_cadastro_cf_str": id_cadastro,
+                "is_associado_rateio": False,
+                "nome_cadastro_cf_display": nome,
+                "id_conta_corrente": alvos["id_conta"],
+                "data_efetiva": alvos["data_final"],
+                "valor_efetivo": str(valor),
+                "data_hora_registro_fluxo": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+                "ids_nfs_selecionadas": [id_nf],
+            },
+            headers={"X-CSRFToken": token},
+        )
+
+    return {
+        "relatorio_financeiro": lambda cliente: cliente.post(
+            "/gerar_relatorio",
+            json={**periodo, "uvr": alvos["uvr"]},
+            headers={"X-CSRFToken": token},
+        ),
+        "extrato_bancario": lambda cliente: cliente.post(
+            "/gerar_extrato_bancario",
+            json={
+                "id_conta_corrente_extrato": alvos["id_conta"],
+                "data_inicial_extrato": alvos["data_inicial"],
+                "data_final_extrato": alvos["data_final"],
+            },
+            headers={"X-CSRFToken": token},
+        ),
+        "registrar_fluxo_caixa": pagar_nf,
+        "buscar_associados": lambda cliente: cliente.get(
+            "/buscar_associados", query_string={"q": "silva", "uvr": alvos["uvr"]}
+        ),
+        "buscar_cadastros": lambda cliente: cliente.get(
+            "/buscar_cadastros", query_string={"q": "ltda", "uvr": alvos["uvr"]}
+        ),
+        "buscar_transacoes_gestao": lambda cliente: cliente.get(
+            "/buscar_transacoes_gestao", query_string={**periodo, "uvr": alvos["uvr"]}
+        ),
+        "medicoes_listar": lambda cliente: cliente.get("/fiscalizacao-contratos/medicoes"),
+        "medicoes_obter": lambda cliente: cliente.get(
+            f"/fiscalizacao-contratos/medicoes/{alvos['medicao_id']}"
+        ),
+        "contratos_detalhe": lambda cliente: cliente.get(
+            f"/fiscalizacao-contratos/contratos/{alvos['contrato_id']}"
+        ),
+    }
+
+
+def medir(cliente, cenario, aquecimento, repeticoes):
+    for _ in range(aquecimento):
+        cenario(cliente)
+    latencias, consultas, status = [], [], set()
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resposta = cenario(cliente)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(contar_consultas(resposta.headers.get("Server-Timing")))
+        status.add(resposta.status_code)
+
+    gc.collect()
+    tracemalloc.start()
+    cenario(cliente)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "p50_ms": round(statistics.median(latencias), 2),
+        "p95_ms": round(_percentil(latencias, 0.95), 2),
+        "max_ms": round(max(latencias), 2),
+        "consultas": max(consultas, key=lambda valor: valor or 0),
+        "pico_memoria_kib": pico // 1024,
+        "status": sorted(status),
+    }
+
+
+def executar(argumentos):
+    from postgres_efemero import PostgresEfemero
+
+    with PostgresEfemero(argumentos.pg_bin, argumentos.porta) as postgres:
+        dsn = postgres.semear("benchmark", argumentos.escala, argumentos.semente)
+        usuario, senha = "benchmark", secrets.token_urlsafe(16)
+        os.environ.update({
+            "APP_ENV": "testing",
+            "SECRET_KEY": secrets.token_urlsafe(32),
+            "DATABASE_URL": dsn,
+            "RATELIMIT_ENABLED": "false",
+        })
+        import app as app_module
+
+        try:
+            _criar_admin(app_module, usuario, senha)
+            alvos = _localizar_alvos(
+                app_module, argumentos.aquecimento + argumentos.repeticoes + 1
+            )
+            cliente, token = _cliente_autenticado(app_module, usuario, senha)
+            conn = app_module.conectar_banco()
+            cur = conn.cursor()
+            cur.execute("SHOW server_version")
+            versao_postgres = cur.fetchone()[0]
+            conn.close()
+
+            resultado = {
+                "versao": VERSAO_FORMATO,
+                "metadados": {
+                    "escala": argumentos.escala,
+                    "semente": argumentos.semente,
+                    "repeticoes": argumentos.repeticoes,
+                    "python": platform.python_version(),
+                    "postgresql": versao_postgres,
+                    "gerado_em": date.today().isoformat(),
+                },
+                "cenarios": {},
+            }
+            print(f"{'cenário':<26} {'p50 ms':>9} {'p95 ms':>9} {'máx ms':>9} {'consultas':>10} {'pico KiB':>10}")
+            for nome, cenario in montar_cenarios(alvos, token).items():
+                medido = medir(cliente, cenario, argumentos.aquecimento, argumentos.repeticoes)
+                resultado["cenarios"][nome] = medido
+                print(
+                    f"{nome:<26} {medido['p50_ms']:>9.1f} {medido['p95_ms']:>9.1f} "
+                    f"{medido['max_ms']:>9.1f} {medido['consultas'] or '-':>10} "
+                    f"{medido['pico_memoria_kib']:>10}"
+                )
+        finally:
+            app_module.app.extensions["recic3_banco_dados"].fechar()
+
+    falhou = any(medido["status"] != [200] for medido in resultado["cenarios"].values())
+    if argumentos.gravar:
+        Path(argumentos.gravar).write_text(
+            json.dumps(resultado, indent=2, ensure_ascii=False) + "\n", encoding="utf-8"
+        )
+    if argumentos.baseline:
+        base = json.loads(Path(argumentos.baseline).read_text(encoding="utf-8"))
+        chave = ("escala", "semente")
+        if [base["metadados"][c] for c in chave] != [resultado["metadados"][c] for c in chave]:
+            print("A baseline foi gravada com outra escala ou semente; nada foi comparado.")
+            return 2
+        regressoes = comparar(base, resultado, argumentos.tolerancia, argumentos.folga_ms)
+        for regressao in regressoes:
+            print(f"REGRESSÃO {regressao}")
+        falhou = falhou or bool(regressoes)
+    return 1 if falhou else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Mede latência, consultas e memória dos endpoints mais usados em um "
+            "PostgreSQL local criado, populado e removido pelo script."
+        )
+    )
+    parser.add_argument("--pg-bin", default=os.getenv("PG_BIN"))
+    parser.add_argument("--porta", type=int, default=54329)
+    parser.add_argument("--escala", default="pequena")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--aquecimento", type=int, default=2)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--gravar", help="Arquivo JSON onde a medição vira baseline.")
+    parser.add_argument("--baseline", help="Arquivo JSON gravado antes com --gravar.")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    parser.add_argument("--folga-ms", type=float, default=5.0)
+    argumentos = parser.parse_args()
+
+    from gerar_dados_sinteticos import ESCALAS
+
+    if argumentos.escala not in ESCALAS:
+        parser.error(f"--escala deve ser uma de: {', '.join(sorted(ESCALAS))}.")
+    if argumentos.repeticoes < 1 or argumentos.aquecimento < 0:
+        parser.error("Use ao menos uma repetição e aquecimento não negativo.")
+    if argumentos.tolerancia < 0 or argumentos.folga_ms < 0:
+        parser.error("--tolerancia e --folga-ms não podem ser negativas.")
+    if argumentos.baseline and not Path(argumentos.baseline).is_file():
+        parser.error("Arquivo de --baseline não encontrado.")
+    try:
+        sys.exit(executar(argumentos))
+    except RuntimeError as erro:
+        parser.error(str(erro))
+
+
+if __name__ == "__main__":
+    main()
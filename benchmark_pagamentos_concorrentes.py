@@ -0,0 +1,256 @@
+"""Dispara pagamentos simultâneos sobre as mesmas NFs em um PostgreSQL descartável.
+
+O script nunca usa DATABASE_URL. A conexão administrativa é informada por
+BENCHMARK_ADMIN_DSN (ou --admin-dsn); um banco com nome aleatório é criado,
+recebe o schema legado, é exercitado pela aplicação real e removido ao final.
+"""
+
+import argparse
+import os
+import re
+import secrets
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+
+
+CONFIRMACAO_EXIGIDA = "BANCO_DESCARTAVEL"
+UVR = "UVR 01"
+VALOR_NF = Decimal("100.00")
+PADRAO_TOKEN = re.compile(
+    rb'name=["\']csrf_token["\'][^>]*value=["\']([^"\']+)', re.IGNORECASE
+)
+
+
+def _percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(fracao * (len(ordenados) - 1))))]
+
+
+def _token(cliente):
+    encontrado = PADRAO_TOKEN.search(cliente.get("/login").data)
+    if not encontrado:
+        raise RuntimeError("Token CSRF não encontrado no formulário de login.")
+    return encontrado.group(1).decode()
+
+
+def _cliente_autenticado(app_module, usuario, senha):
+    cliente = app_module.app.test_client()
+    resposta = cliente.post(
+        "/login",
+        data={"username": usuario, "password": senha, "csrf_token": _token(cliente)},
+    )
+    if resposta.status_code != 302:
+        raise RuntimeError("Falha ao autenticar o usuário do benchmark.")
+    return cliente, _token(cliente)
+
+
+def _semear(app_module, usuario, senha):
+    from werkzeug.security import generate_password_hash
+
+    conn = app_module.conectar_banco()
+    cur = conn.cursor()
+    agora = datetime.now()
+    cur.execute(
+        "INSERT INTO usuarios (username, password_hash, role) VALUES (%s, %s, 'admin')",
+        (usuario, generate_password_hash(senha)),
+    )
+    cur.execute("""
+        INSERT INTO cadastros
+        (uvr, associacao, data_hora_cadastro, razao_social, cnpj, cep,
+         tipo_atividade, tipo_cadastro)
+        VALUES (%s, 'Associação', %s, 'Fornecedor Benchmark', '00000000000191',
+                '01001000', 'Recicláveis', 'Fornecedor')
+        RETURNING id
+    """, (UVR, agora))
+    id_cadastro = cur.fetchone()[0]
+    cur.execute("""
+        INSERT INTO contas_correntes
+        (uvr, associacao, banco_codigo, banco_nome, agencia, conta_corrente,
+         data_hora_cadastro)
+        VALUES (%s, 'Associação', '001', 'Banco', '0001', '12345', %s)
+        RETURNING id
+    """, (UVR, agora))
+    id_conta = cur.fetchone()[0]
+    conn.commit()
+    conn.close()
+    return id_cadastro, id_conta
+
+
+def _criar_nfs(app_module, id_cadastro, quantidade):
+    conn = app_module.conectar_banco()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO transacoes_financeiras
+        (uvr, associacao, id_cadastro_origem, nome_cadastro_origem,
+         numero_documento, data_documento, tipo_transacao, tipo_atividade,
+         valor_total_documento, data_hora_registro)
+        SELECT %s, 'Associação', %s, 'Fornecedor Benchmark', 'NF-' || n,
+               CURRENT_DATE, 'Despesa', 'Recicláveis', %s, NOW()
+        FROM generate_series(1, %s) AS n
+        RETURNING id
+    """, (UVR, id_cadastro, VALOR_NF, quantidade))
+    ids = sorted(row[0] for row in cur.fetchall())
+    conn.commit()
+    conn.close()
+    return ids
+
+
+def _divergencias(app_module, ids):
+    """NFs pagas acima do total ou com vínculos que não somam o valor baixado."""
+    conn = app_module.conectar_banco()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT tf.id
+        FROM transacoes_financeiras tf
+        LEFT JOIN fluxo_caixa_transacoes_link l ON l.id_transacao_financeira = tf.id
+        WHERE tf.id = ANY(%s)
+        GROUP BY tf.id, tf.valor_pago_recebido, tf.valor_total_documento
+        HAVING tf.valor_pago_recebido > tf.valor_total_documento
+            OR tf.valor_pago_recebido <> COALESCE(SUM(l.valor_aplicado_nesta_nf), 0)
+    """, (ids,))
+    divergentes = [row[0] for row in cur.fetchall()]
+    conn.close()
+    return divergentes
+
+
+def _rodada(app_module, clientes, ids, id_cadastro, id_conta):
+    barreira = threading.Barrier(len(clientes))
+    resultados = [None] * len(clientes)
+    # Cada pagador tenta quitar todas as NFs, em ordens diferentes, ao mesmo tempo.
+    dados_base = {
+        "uvr": UVR,
+        "associacao": "Associação",
+        "tipo_movimentacao": "Pagamento",
+        "id_cadastro_cf_str": id_cadastro,
+        "is_associado_rateio": False,
+        "nome_cadastro_cf_display": "Fornecedor Benchmark",
+        "id_conta_corrente": id_conta,
+        "data_efetiva": datetime.now().strftime("%Y-%m-%d"),
+        "valor_efetivo": str(VALOR_NF * len(ids)),
+        "data_hora_registro_fluxo": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+    }
+
+    def pagar(indice, cliente, token):
+        selecionadas = ids if indice % 2 == 0 else list(reversed(ids))
+        barreira.wait()
+        inicio = time.perf_counter()
+        resposta = cliente.post(
+            "/registrar_fluxo_caixa",
+            json={**dados_base, "ids_nfs_selecionadas": selecionadas},
+            headers={"X-CSRFToken": token},
+        )
+        resultados[indice] = (time.perf_counter() - inicio, resposta.status_code)
+
+    threads = [
+        threading.Thread(target=pagar, args=(indice, cliente, token))
+        for indice, (cliente, token) in enumerate(clientes)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultados
+
+
+def executar(admin_dsn, quantidades, pagadores, repeticoes):
+    import psycopg2
+    from psycopg2 import sql
+    from psycopg2.extensions import make_dsn
+
+    nome_banco = f"bench_pagamentos_{secrets.token_hex(6)}"
+    admin = psycopg2.connect(admin_dsn)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(nome_banco)))
+    app_module = None
+    try:
+        usuario, senha = "benchmark", secrets.token_urlsafe(16)
+        os.environ.update({
+            "APP_ENV": "testing",
+            "SECRET_KEY": secrets.token_urlsafe(32),
+            "DATABASE_URL": make_dsn(admin_dsn, dbname=nome_banco),
+            "DB_POOL_MAX": str(pagadores + 2),
+            "RATELIMIT_ENABLED": "false",
+        })
+        import app as app_module
+
+        app_module.criar_tabelas_se_nao_existir()
+        id_cadastro, id_conta = _semear(app_module, usuario, senha)
+        clientes = [
+            _cliente_autenticado(app_module, usuario, senha) for _ in range(pagadores)
+        ]
+
+        print(f"{'NFs':>5} {'p50 ms':>9} {'p95 ms':>9} {'máx ms':>9} {'status':>12}  divergências")
+        falhou = False
+        for quantidade in quantidades:
+            latencias, status, divergentes = [], set(), []
+            for _ in range(repeticoes):
+                ids = _criar_nfs(app_module, id_cadastro, quantidade)
+                for duracao, codigo in _rodada(app_module, clientes, ids, id_cadastro, id_conta):
+                    latencias.append(duracao * 1000)
+                    status.add(codigo)
+                divergentes.extend(_divergencias(app_module, ids))
+            falhou = falhou or bool(divergentes) or status != {200}
+            print(
+                f"{quantidade:>5} {statistics.median(latencias):>9.1f} "
+                f"{_percentil(latencias, 0.95):>9.1f} {max(latencias):>9.1f} "
+                f"{','.join(map(str, sorted(status))):>12}  {len(divergentes)}"
+            )
+        return 1 if falhou else 0
+    finally:
+        if app_module is not None:
+            app_module.app.extensions["recic3_banco_dados"].fechar()
+        with admin.cursor() as cur:
+            cur.execute(
+                sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(
+                    sql.Identifier(nome_banco)
+                )
+            )
+        admin.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Mede registrar_fluxo_caixa com pagamentos simultâneos sobre as "
+            "mesmas NFs, em um banco temporário criado e removido pelo script."
+        )
+    )
+    parser.add_argument("--admin-dsn", default=os.getenv("BENCHMARK_ADMIN_DSN"))
+    parser.add_argument("--notas", default="1,10,50,200")
+    parser.add_argument("--pagadores", type=int, default=8)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument(
+        "--confirmar",
+        help=f"Informe exatamente {CONFIRMACAO_EXIGIDA} para prosseguir.",
+    )
+    argumentos = parser.parse_args()
+    if argumentos.confirmar != CONFIRMACAO_EXIGIDA:
+        parser.error("Confirmação inválida; nenhum banco foi criado.")
+    if not argumentos.admin_dsn:
+        parser.error("Informe BENCHMARK_ADMIN_DSN ou --admin-dsn.")
+    if argumentos.admin_dsn == os.getenv("DATABASE_URL"):
+        parser.error("O benchmark não pode usar o mesmo DSN de DATABASE_URL.")
+    try:
+        quantidades = [int(valor) for valor in argumentos.notas.split(",")]
+    except ValueError:
+        parser.error("--notas deve ser uma lista de inteiros separados por vírgula.")
+    if argumentos.pagadores < 2 or any(quantidade < 1 for quantidade in quantidades):
+        parser.error("Use ao menos dois pagadores e uma NF por rodada.")
+
+    sys.exit(
+        executar(
+            argumentos.admin_dsn,
+            quantidades,
+            argumentos.pagadores,
+            argumentos.repeticoes,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
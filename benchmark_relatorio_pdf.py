@@ -0,0 +1,190 @@
+"""Compara a renderização do PDF do relatório financeiro com a implementação anterior.
+
+Não usa banco: as linhas são sintéticas, no mesmo formato que
+`fetch_report_data` devolve. Para cada quantidade de linhas o script mede o
+tempo (linhas por segundo) e, em uma segunda execução sob `tracemalloc`, o
+pico de memória alocada pelo Python.
+"""
+
+import argparse
+import gc
+import io
+import os
+import random
+import re
+import secrets
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+
+PADRAO_PAGINA = re.compile(rb"/Type /Page\b")
+FILTROS = {"uvr": "UVR 01", "data_inicial": "2026-01-01", "data_final": "2026-12-31"}
+
+
+def linhas_sinteticas(quantidade, semente=7):
+    gerador = random.Random(semente)
+    itens = ("Papelão ondulado", "PET cristal", "Alumínio latinha", "Vidro âmbar", "PEAD colorido")
+    inicio = date(2026, 1, 1)
+    linhas = []
+    for indice in range(quantidade):
+        quantidade_item = Decimal(gerador.randint(1, 5000)) / 10
+        unitario = Decimal(gerador.randint(10, 900)) / 100
+        total = (quantidade_item * unitario).quantize(Decimal("0.01"))
+        dia = (inicio + timedelta(days=indice % 365)).isoformat()
+        linhas.append({
+            "data_documento": dia,
+            "data_efetiva_pag_rec": dia if indice % 3 else None,
+            "uvr": "UVR 01",
+            "nome_cadastro_origem": f"Cooperativa de Reciclagem {indice % 40:02d} Ltda",
+            "numero_documento": f"NF-{indice:07d}",
+            "tipo_transacao": "Receita" if indice % 2 else "Despesa",
+            "tipo_atividade_transacao": "Venda de recicláveis",
+            "item_descricao": gerador.choice(itens),
+            "item_grupo_catalogo": "Recicláveis",
+            "item_subgrupo_catalogo": "Triagem",
+            "quantidade": str(quantidade_item),
+            "valor_unitario": str(unitario),
+            "valor_total_item": str(total),
+            "status_pagamento": "Pago" if indice % 4 else "Em aberto",
+            "valor_pago_neste_item": str(total if indice % 4 else Decimal("0")),
+        })
+    return linhas
+
+
+def renderizar_referencia(app_module, data, filters):
+    """A implementação anterior: um Paragraph por célula em uma única Table."""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import cm, inch
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+
+    seguro = app_module._texto_pdf_seguro
+    decimal_fmt = app_module._format_decimal
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=landscape(A4), topMargin=1.5*inch, bottomMargin=1*inch,
+        leftMargin=0.3*inch, rightMargin=0.3*inch,
+    )
+    style_body = ParagraphStyle(
+        "BodyText", parent=getSampleStyleSheet()["Normal"], alignment=TA_LEFT,
+        fontSize=7, leading=9,
+    )
+    style_right = ParagraphStyle("BodyTextRight", parent=style_body, alignment=TA_RIGHT)
+    style_center = ParagraphStyle("BodyTextCenter", parent=style_body, alignment=TA_CENTER)
+    style_header = ParagraphStyle(
+        "TableHeader", parent=style_body, fontName="Helvetica-Bold",
+        alignment=TA_CENTER, fontSize=7.5,
+    )
+    titulos = [titulo for titulo, _, _, _ in app_module.COLUNAS_PDF_RELATORIO_FINANCEIRO]
+    table_data = [[Paragraph(titulo, style_header) for titulo in titulos]]
+    for row in data:
+        data_doc = app_module._data_curta_relatorio(row.get("data_documento"))
+        data_efet = app_module._data_curta_relatorio(row.get("data_efetiva_pag_rec"))
+        table_data.append([
+            Paragraph(seguro(data_doc), style_center),
+            Paragraph(seguro(data_efet), style_center),
+            Paragraph(seguro(row.get("uvr", "")), style_center),
+            Paragraph(seguro(row.get("nome_cadastro_origem", "")[:20]), style_body),
+            Paragraph(seguro(row.get("numero_documento", "")[:10]), style_center),
+            Paragraph(seguro(row.get("tipo_transacao", "")[:3]), style_center),
+            Paragraph(seguro(row.get("tipo_atividade_transacao", "")[:15]), style_body),
+            Paragraph(seguro(row.get("item_descricao", "")[:25]), style_body),
+            Paragraph(seguro(row.get("item_grupo_catalogo", "")[:12]), style_body),
+            Paragraph(seguro(row.get("item_subgrupo_catalogo", "")[:12]), style_body),
+            Paragraph(app_module._format_decimal_quantidade(row.get("quantidade", "")), style_right),
+            Paragraph(decimal_fmt(row.get("valor_unitario", "")), style_right),
+            Paragraph(decimal_fmt(row.get("valor_total_item", "")), style_right),
+            Paragraph(seguro(row.get("status_pagamento", "")[:10]), style_center),
+            Paragraph(decimal_fmt(row.get("valor_pago_neste_item", "")), style_right),
+        ])
+    larguras = [largura * cm for _, largura, _, _ in app_module.COLUNAS_PDF_RELATORIO_FINANCEIRO]
+    tabela = Table(table_data, colWidths=larguras)
+    tabela.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#4F81BD")),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("LEFTPADDING", (0, 0), (-1, -1), 2),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 2),
+    ]))
+    cabecalho = lambda c, d: app_module._create_pdf_header_footer(  # noqa: E731
+        c, d, "Relatório Financeiro Detalhado", "Referência"
+    )
+    doc.build([tabela], onFirstPage=cabecalho, onLaterPages=cabecalho)
+    return buffer.getvalue()
+
+
+def renderizar_atual(app_module, data, filters):
+    app_module.fetch_report_data = lambda _filtros: data
+    return app_module._gerar_pdf_relatorio_financeiro(filters)[2]
+
+
+def medir(renderizar, app_module, data):
+    gc.collect()
+    inicio = time.perf_counter()
+    conteudo = renderizar(app_module, data, FILTROS)
+    segundos = time.perf_counter() - inicio
+
+    gc.collect()
+    tracemalloc.start()
+    renderizar(app_module, data, FILTROS)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return segundos, pico, len(PADRAO_PAGINA.findall(conteudo))
+
+
+def executar(quantidades, com_referencia):
+    os.environ.update({
+        "APP_ENV": "testing",
+        "SECRET_KEY": secrets.token_urlsafe(32),
+        "DATABASE_URL": "",
+        "RATELIMIT_ENABLED": "false",
+    })
+    import app as app_module
+
+    renderizadores = [("atual", renderizar_atual)]
+    if com_referencia:
+        renderizadores.append(("anterior", renderizar_referencia))
+
+    print(f"{'linhas':>7} {'renderizador':>12} {'segundos':>9} {'linhas/s':>9} {'pico MiB':>9} {'páginas':>8}")
+    for quantidade in quantidades:
+        data = linhas_sinteticas(quantidade)
+        for nome, renderizar in renderizadores:
+            segundos, pico, paginas = medir(renderizar, app_module, data)
+            print(
+                f"{quantidade:>7} {nome:>12} {segundos:>9.2f} "
+                f"{quantidade / segundos:>9.0f} {pico / 2**20:>9.1f} {paginas:>8}"
+            )
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Mede linhas por segundo e pico de memória do PDF do relatório "
+            "financeiro, contra a implementação anterior, sem acessar banco."
+        )
+    )
+    parser.add_argument("--linhas", default="1000,5000")
+    parser.add_argument(
+        "--sem-referencia",
+        action="store_true",
+        help="Mede só o renderizador atual (a referência é lenta em volumes altos).",
+    )
+    argumentos = parser.parse_args()
+    try:
+        quantidades = [int(valor) for valor in argumentos.linhas.split(",")]
+    except ValueError:
+        parser.error("--linhas deve ser uma lista de inteiros separados por vírgula.")
+    if any(quantidade < 1 for quantidade in quantidades):
+        parser.error("Use ao menos uma linha por medição.")
+
+    sys.exit(executar(quantidades, not argumentos.sem_referencia))
+
+
+if __name__ == "__main__":
+    main()
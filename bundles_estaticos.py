@@ -0,0 +1,180 @@
+"""Bundles estáticos com o hash do conteúdo no nome, servidos como imutáveis.
+
+O JavaScript e o CSS da tela de cadastro ficam em `static/js` e `static/css`.
+`python bundles_estaticos.py` junta as fontes de cada bundle em
+`static/dist/<nome>.<hash>.<ext>` e grava `static/dist/manifest.json`; as
+templates resolvem o nome com `asset_url("cadastro.js")`. Como o nome muda
+junto com o conteúdo, o navegador guarda o arquivo por um ano sem revalidar, e
+uma visita repetida baixa só o HTML da página.
+
+Os arquivos de `static/dist` são versionados: o deploy não precisa de etapa de
+build. Depois de editar uma fonte, rode o script e inclua o resultado no commit.
+"""
+
+import argparse
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+
+from flask import request, url_for
+
+from compressao_respostas import comprimir, escolher_codificacao
+from logging_operacional import registrar_evento
+
+
+RAIZ_STATIC = Path(__file__).resolve().parent / "static"
+PASTA_DIST = "dist"
+MANIFESTO = "manifest.json"
+TAMANHO_HASH = 12
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+# Os arquivos são comprimidos uma vez por processo, então vale o nível máximo.
+NIVEL_COMPRESSAO_BUNDLE = 9
+QUALIDADE_BROTLI_BUNDLE = 11
+# As fontes de cada bundle entram na ordem listada.
+BUNDLES = {
+    "cadastro.css": ("css/cadastro.css",),
+    "cadastro.js": ("js/cadastro_seguranca.js", "js/cadastro.js"),
+}
+
+
+def montar_bundle(nome, raiz=RAIZ_STATIC):
+    # O ";" isola cada arquivo JS caso o anterior termine sem ponto e vírgula.
+    separador = b"\n;\n" if nome.endswith(".js") else b"\n"
+    partes = [(raiz / fonte).read_bytes().rstrip(b"\n") for fonte in BUNDLES[nome]]
+    return separador.join(partes) + b"\n"
+
+
+def caminho_com_hash(nome, conteudo):
+    base, extensao = nome.rsplit(".", 1)
+    resumo = hashlib.sha256(conteudo).hexdigest()[:TAMANHO_HASH]
+    return f"{PASTA_DIST}/{base}.{resumo}.{extensao}"
+
+
+def ler_manifesto(raiz=RAIZ_STATIC):
+    try:
+        return json.loads((raiz / PASTA_DIST / MANIFESTO).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def gerar_bundles(raiz=RAIZ_STATIC):
+    """Grava os bundles e o manifesto e remove as versões que saíram dele."""
+    destino = raiz / PASTA_DIST
+    destino.mkdir(exist_ok=True)
+    manifesto = {}
+    for nome in BUNDLES:
+        conteudo = montar_bundle(nome, raiz)
+        caminho = caminho_com_hash(nome, conteudo)
+        (raiz / caminho).write_bytes(conteudo)
+        manifesto[nome] = caminho
+    mantidos = {Path(caminho).name for caminho in manifesto.values()} | {MANIFESTO}
+    for arquivo in destino.iterdir():
+        if arquivo.is_file() and arquivo.name not in mantidos:
+            arquivo.unlink()
+    (destino / MANIFESTO).write_text(
+        json.dumps(manifesto, indent=2, sort_keys=True) + "\n", encoding="utf-8"
+    )
+    return manifesto
+
+
+def bundles_desatualizados(raiz=RAIZ_STATIC):
+    """Bundles cujo arquivo no manifesto não corresponde mais às fontes."""
+    manifesto = ler_manifesto(raiz)
+    return sorted(
+        nome
+        for nome in BUNDLES
+        if manifesto.get(nome) != caminho_com_hash(nome, montar_bundle(nome, raiz))
+        or not (raiz / manifesto[nome]).is_file()
+    )
+
+
+@lru_cache(maxsize=32)
+def _bundle_comprimido(caminho, codificacao):
+    return comprimir(
+        Path(caminho).read_bytes(),
+        codificacao,
+        NIVEL_COMPRESSAO_BUNDLE,
+        qualidade_brotli=QUALIDADE_BROTLI_BUNDLE,
+    )
+
+
+def configurar_bundles_estaticos(app):
+    """Registra `asset_url` nas templates e o cache imutável de `static/dist`.
+
+    Apps sem `static/dist` (os apps mínimos dos testes) seguem sem bundles;
+    `asset_url` só falha se uma template pedir um bundle inexistente.
+    """
+    raiz = Path(app.static_folder) if app.static_folder else RAIZ_STATIC
+    manifesto = ler_manifesto(raiz)
+    if manifesto:
+        desatualizados = bundles_desatualizados(raiz)
+        if desatualizados:
+            registrar_evento(
+                "static_bundle_outdated",
+                nivel="WARNING",
+                mensagem="Bundles estáticos desatualizados; rode python bundles_estaticos.py.",
+                bundles=",".join(desatualizados),
+            )
+    app.extensions["recic3_bundles_estaticos"] = manifesto
+    servidos = set(manifesto.values())
+
+    @app.template_global()
+    def asset_url(nome):
+        return url_for("static", filename=manifesto[nome])
+
+    @app.after_request
+    def servir_bundle_imutavel(resposta):
+        caminho = (request.view_args or {}).get("filename")
+        if (
+            request.endpoint != "static"
+            or caminho not in servidos
+            or resposta.status_code != 200
+        ):
+            return resposta
+        resposta.headers["Cache-Control"] = CACHE_IMUTAVEL
+        resposta.vary.add("Accept-Encoding")
+        codificacao = escolher_codificacao(request.accept_encodings)
+        if (
+            request.method == "HEAD"
+            or codificacao is None
+            or not app.config.get("COMPRESSION_LEVEL")
+        ):
+            return resposta
+
+        # O send_file entrega o arquivo aberto; ele é fechado antes de trocar o corpo.
+        fechar = getattr(resposta.response, "close", None)
+        if fechar is not None:
+            fechar()
+        resposta.direct_passthrough = False
+        resposta.set_data(_bundle_comprimido(str(raiz / caminho), codificacao))
+        resposta.headers["Content-Encoding"] = codificacao
+        # O ETag do send_file descreve o arquivo sem compressão.
+        resposta.headers.pop("ETag", None)
+        return resposta
+
+    return manifesto
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Gera os bundles de static/dist e o manifesto usado por asset_url."
+    )
+    parser.add_argument(
+        "--verificar",
+        action="store_true",
+        help="Só confere se static/dist corresponde às fontes; sai com erro se não.",
+    )
+    argumentos = parser.parse_args()
+    if argumentos.verificar:
+        desatualizados = bundles_desatualizados()
+        if desatualizados:
+            parser.exit(1, "Bundles desatualizados: " + ", ".join(desatualizados) + "\n")
+        print("Bundles em dia.")
+        return
+    for nome, caminho in gerar_bundles().items():
+        print(f"{nome} -> static/{caminho}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Busca textual sem acento e sem caixa, apoiada em índices trigram (pg_trgm).
+
+As buscas comparam `busca_normalizada(coluna) LIKE %s` com o termo normalizado
+do mesmo jeito em Python. Como a função é IMMUTABLE, cada coluna pesquisada
+ganha um índice GIN de trigramas sobre a expressão, e `LIKE '%termo%'` deixa
+de varrer a tabela inteira.
+"""
+
+import re
+import unicodedata
+
+import psycopg2
+
+
+FUNCAO_NORMALIZAR = "busca_normalizada"
+
+# unaccent() é STABLE porque depende do dicionário; fixando o dicionário a
+# função pode ser declarada IMMUTABLE e usada em índices de expressão.
+DDL_FUNCAO_UNACCENT = """
+    CREATE FUNCTION busca_normalizada(texto TEXT) RETURNS TEXT
+    LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+    AS $$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, texto)) $$
+"""
+
+# Sem a extensão unaccent, troca os acentos usados em português.
+DDL_FUNCAO_TRANSLATE = """
+    CREATE FUNCTION busca_normalizada(texto TEXT) RETURNS TEXT
+    LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+    AS $$ SELECT translate(lower(texto), 'áàâãäéèêëíìîïóòôõöúùûüçñ', 'aaaaaeeeeiiiiooooouuuucn') $$
+"""
+
+# (tabela, coluna, expressão normalizada?). Documentos (CPF, CNPJ) são
+# gravados só com dígitos e indexados sem normalização.
+INDICES_BUSCA = (
+    ("associados", "nome", True),
+    ("associados", "cpf", False),
+    ("cadastros", "razao_social", True),
+    ("cadastros", "cnpj", False),
+    ("transacoes_financeiras", "nome_cadastro_origem", True),
+    ("transacoes_financeiras", "numero_documento", True),
+    ("patrimonio", "descricao", True),
+    ("patrimonio", "placa", True),
+    ("patrimonio", "codigo_patrimonio", True),
+    ("fc_empresas", "razao_social", True),
+    ("fc_servidores", "nome", True),
+    ("fc_contratos", "numero_contrato", True),
+    ("fc_contratos", "processo_administrativo", True),
+    ("fc_contratos", "objeto", True),
+    ("fc_documentos", "titulo", True),
+    ("fc_documentos", "nome_original", True),
+)
+
+
+def normalizar_texto(texto):
+    """Mesma normalização de `busca_normalizada`: minúsculas e sem acentos."""
+    decomposto = unicodedata.normalize("NFKD", str(texto or "").strip().lower())
+    return "".join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+
+
+def _escapar_like(texto):
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def padrao_busca(termo):
+    """Padrão `%termo%` normalizado; curingas digitados viram texto literal."""
+    return f"%{_escapar_like(normalizar_texto(termo))}%"
+
+
+def expressao_busca(coluna):
+    return f"{FUNCAO_NORMALIZAR}({coluna})"
+
+
+def condicao_busca(termo, colunas, colunas_documento=()):
+    """Retorna (sql, params) da condição de busca, ou ("", []) sem termo.
+
+    `colunas_documento` só entram quando o termo tem dígitos e são comparadas
+    apenas com os dígitos, então "123.456" encontra o CPF "12345678900".
+    """
+    if not normalizar_texto(termo):
+        return "", []
+    condicoes = [f"{expressao_busca(coluna)} LIKE %s" for coluna in colunas]
+    params = [padrao_busca(termo)] * len(colunas)
+    digitos = re.sub(r"\D", "", str(termo))
+    if digitos:
+        condicoes.extend(f"{coluna} LIKE %s" for coluna in colunas_documento)
+        params.extend([f"%{digitos}%"] * len(colunas_documento))
+    return "(" + " OR ".join(condicoes) + ")", params
+
+
+def _criar_extensao(cur, extensao):
+    cur.execute("SAVEPOINT busca_textual_extensao")
+    try:
+        cur.execute(f"CREATE EXTENSION IF NOT EXISTS {extensao} WITH SCHEMA public")
+    except psycopg2.Error:
+        cur.execute("ROLLBACK TO SAVEPOINT busca_textual_extensao")
+        return False
+    cur.execute("RELEASE SAVEPOINT busca_textual_extensao")
+    return True
+
+
+def preparar_busca_textual(cur):
+    """Cria a função de normalização e os índices trigram que ainda faltam.
+
+    Sem permissão para as extensões, a busca continua correta: a função cai
+    para translate() e os índices são omitidos. A função existente nunca é
+    substituída, porque isso invalidaria os índices já construídos sobre ela;
+    para trocá-la, remova-a com CASCADE e rode `atualizar_esquema.py`.
+    Retorna True quando os índices trigram puderam ser criados.
+    """
+    trigram = _criar_extensao(cur, "pg_trgm")
+    cur.execute("SELECT to_regprocedure('busca_normalizada(text)') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        if _criar_extensao(cur, "unaccent"):
+            cur.execute(DDL_FUNCAO_UNACCENT)
+        else:
+            cur.execute(DDL_FUNCAO_TRANSLATE)
+    if not trigram:
+        return False
+
+    # As tabelas de Fiscalização vêm das migrations; só indexa as que existem.
+    tabelas = sorted({tabela for tabela, _, _ in INDICES_BUSCA})
+    cur.execute(
+        "SELECT tabela FROM unnest(%s::text[]) AS tabela WHERE to_regclass(tabela) IS NOT NULL",
+        (tabelas,),
+    )
+    existentes = {linha[0] for linha in cur.fetchall()}
+    for tabela, coluna, normalizada in INDICES_BUSCA:
+        if tabela not in existentes:
+            continue
+        expressao = f"({expressao_busca(coluna)})" if normalizada else coluna
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{tabela}_busca_{coluna} "
+            f"ON {tabela} USING gin ({expressao} gin_trgm_ops)"
+        )
+    return True
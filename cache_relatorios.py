@@ -0,0 +1,252 @@
+"""Cache do resultado do relatório financeiro, invalidado pela versão dos dados da UVR.
+
+Cada UVR tem um contador em `versoes_dados_uvr`, incrementado na mesma
+transação de toda alteração financeira. A chave do cache reúne os filtros
+normalizados, a UVR autorizada de quem pede e a versão lida antes da consulta,
+junto com a versão do catálogo; depois de uma alteração confirmada, a chave
+muda e a entrada antiga nunca mais é lida. Com Redis as entradas valem para todos os workers; sem Redis cada
+processo guarda as suas.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+from cache_usuarios import _criar_cliente_redis, _uri_redis
+from logging_operacional import registrar_evento
+
+
+TTL_PADRAO_S = 300
+TTL_MAXIMO_S = 3600
+MAX_ITENS_LOCAL = 32
+# Resultados maiores são consultados de novo em vez de ocupar memória do Redis.
+MAX_LINHAS_CACHE = 20000
+INTERVALO_AVISO_S = 60
+PREFIXO_CHAVE = "sistema-recic3:relatorio:"
+
+DDL_VERSOES_DADOS = """
+    CREATE TABLE IF NOT EXISTS versoes_dados_uvr (
+        uvr VARCHAR(100) PRIMARY KEY,
+        versao BIGINT NOT NULL DEFAULT 1,
+        atualizado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# As UVRs vêm informadas ou das NFs afetadas; a ordenação evita deadlock
+# entre duas alterações que marcam as mesmas UVRs.
+SQL_INCREMENTAR_VERSOES = """
+    INSERT INTO versoes_dados_uvr (uvr, versao)
+    SELECT alteradas.uvr, 1
+    FROM (
+        SELECT LOWER(TRIM(informada)) AS uvr FROM UNNEST(%s::text[]) AS informada
+        UNION
+        SELECT LOWER(TRIM(tf.uvr)) FROM transacoes_financeiras tf
+        WHERE tf.id = ANY(%s::integer[])
+    ) alteradas
+    WHERE alteradas.uvr <> ''
+    ORDER BY alteradas.uvr
+    ON CONFLICT (uvr) DO UPDATE
+    SET versao = versoes_dados_uvr.versao + 1,
+        atualizado_em = CURRENT_TIMESTAMP
+"""
+
+# O relatório agrupa pelo catálogo de produtos; renomear ou reagrupar um item
+# incrementa a versão `catalogo` de versoes_referencia, que entra na chave.
+SQL_VERSAO_CATALOGO = (
+    "(SELECT COALESCE(MAX(versao), 0) FROM versoes_referencia WHERE nome = 'catalogo')"
+)
+
+SQL_VERSAO_UVR = f"""
+    SELECT
+        (SELECT COALESCE(MAX(versao), 0) FROM versoes_dados_uvr
+         WHERE uvr = LOWER(TRIM(%s))),
+        {SQL_VERSAO_CATALOGO}
+"""
+
+# Os contadores só crescem, então a soma muda sempre que qualquer UVR muda.
+SQL_VERSAO_GERAL = f"""
+    SELECT (SELECT COALESCE(SUM(versao), 0) FROM versoes_dados_uvr), {SQL_VERSAO_CATALOGO}
+"""
+
+
+def ler_ttl_cache_relatorios(ambiente):
+    """O ambiente de testes desativa o cache, salvo configuração explícita."""
+    valor = os.getenv("REPORT_CACHE_TTL_SECONDS")
+    if valor is None or not valor.strip():
+        return 0 if ambiente == "testing" else TTL_PADRAO_S
+    try:
+        ttl = int(valor.strip())
+    except ValueError as erro:
+        raise RuntimeError("REPORT_CACHE_TTL_SECONDS deve ser um número inteiro.") from erro
+    if not 0 <= ttl <= TTL_MAXIMO_S:
+        raise RuntimeError("REPORT_CACHE_TTL_SECONDS está fora do intervalo permitido.")
+    return ttl
+
+
+def preparar_versoes_dados(cur):
+    cur.execute(DDL_VERSOES_DADOS)
+
+
+def incrementar_versao_dados(cur, *, uvrs=(), ids_transacao=()):
+    """Marca como alterados os dados das UVRs e das NFs informadas.
+
+    Deve rodar na transação da alteração e, para NFs que mudam de UVR ou
+    são excluídas, antes do UPDATE/DELETE, para alcançar a UVR antiga.
+    """
+    uvrs = sorted({str(uvr) for uvr in uvrs if uvr})
+    ids = sorted({int(id_transacao) for id_transacao in ids_transacao})
+    if not uvrs and not ids:
+        return
+    cur.execute(SQL_INCREMENTAR_VERSOES, (uvrs, ids))
+
+
+def ler_versao_dados(cur, uvr=None):
+    """(versão dos dados da UVR, versão do catálogo).
+
+    Sem UVR, a primeira é uma versão que muda com qualquer UVR.
+    """
+    if uvr:
+        cur.execute(SQL_VERSAO_UVR, (str(uvr),))
+    else:
+        cur.execute(SQL_VERSAO_GERAL)
+    versao_dados, versao_catalogo = cur.fetchone()
+    return int(versao_dados), int(versao_catalogo)
+
+
+def chave_relatorio(tipo, filtros, *, uvr_autorizada, versao):
+    """Chave estável para os mesmos filtros, escopo e versão dos dados.
+
+    Filtros vazios são descartados e os valores viram texto, então "5" e 5
+    dão a mesma chave; espaços não são removidos porque a consulta compara o
+    valor exato.
+    """
+    normalizados = {
+        campo: str(valor)
+        for campo, valor in filtros.items()
+        if valor is not None and valor != ""
+    }
+    conteudo = json.dumps(
+        [tipo, uvr_autorizada or "*", versao, normalizados],
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return PREFIXO_CHAVE + hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+def _serializar(dados):
+    return zlib.compress(
+        json.dumps(dados, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 1
+    )
+
+
+def _desserializar(bruto):
+    return json.loads(zlib.decompress(bruto).decode("utf-8"))
+
+
+class CacheRelatorios:
+    """Guarda linhas já convertidas para JSON, comprimidas.
+
+    A invalidação é pela chave: nenhuma entrada é apagada quando os dados
+    mudam, ela só deixa de ser encontrada e expira pelo TTL.
+    """
+
+    def __init__(self, ttl_s, *, redis_uri=None, max_itens=MAX_ITENS_LOCAL):
+        self.ttl_s = ttl_s
+        self._redis_uri = redis_uri
+        self._redis = None
+        self._max_itens = max_itens
+        self._locais = {}
+        self._trava = threading.Lock()
+        self._ultimo_aviso = 0.0
+
+    @property
+    def ativo(self):
+        return self.ttl_s > 0
+
+    @property
+    def compartilhado(self):
+        return bool(self._redis_uri)
+
+    def _cliente(self):
+        if self._redis is None:
+            self._redis = _criar_cliente_redis(self._redis_uri)
+        return self._redis
+
+    def _avisar_falha(self, erro):
+        agora = time.monotonic()
+        if agora - self._ultimo_aviso < INTERVALO_AVISO_S:
+            return
+        self._ultimo_aviso = agora
+        registrar_evento(
+            "report_cache_unavailable",
+            nivel="WARNING",
+            mensagem="Cache compartilhado de relatórios indisponível; usando o banco.",
+            error_type=type(erro).__name__,
+        )
+
+    def obter(self, chave):
+        if not self.ativo or not chave:
+            return None
+        if self.compartilhado:
+            try:
+                bruto = self._cliente().get(chave)
+            except Exception as erro:
+                self._avisar_falha(erro)
+                return None
+        else:
+            with self._trava:
+                item = self._locais.get(chave)
+                if item is None:
+                    return None
+                expira_em, bruto = item
+                if expira_em <= time.monotonic():
+                    self._locais.pop(chave, None)
+                    return None
+        if not bruto:
+            return None
+        try:
+            return _desserializar(bruto)
+        except (zlib.error, UnicodeDecodeError, ValueError):
+            return None
+
+    def guardar(self, chave, dados):
+        if not self.ativo or not chave or len(dados) > MAX_LINHAS_CACHE:
+            return
+        bruto = _serializar(dados)
+        if self.compartilhado:
+            try:
+                self._cliente().set(chave, bruto, ex=self.ttl_s)
+            except Exception as erro:
+                self._avisar_falha(erro)
+            return
+
+        with self._trava:
+            if len(self._locais) >= self._max_itens:
+                agora = time.monotonic()
+                for vencida in [
+                    item for item, (expira_em, _) in self._locais.items()
+                    if expira_em <= agora
+                ]:
+                    del self._locais[vencida]
+                while len(self._locais) >= self._max_itens:
+                    del self._locais[next(iter(self._locais))]
+            self._locais[chave] = (time.monotonic() + self.ttl_s, bruto)
+
+    def limpar(self):
+        with self._trava:
+            self._locais.clear()
+
+
+def configurar_cache_relatorios(app, ambiente):
+    """Reaproveita o Redis do rate limit, sem conectar durante a inicialização."""
+    cache = CacheRelatorios(
+        ler_ttl_cache_relatorios(ambiente),
+        redis_uri=_uri_redis(app.config.get("RATELIMIT_STORAGE_URI")),
+    )
+    app.config["REPORT_CACHE_TTL_SECONDS"] = cache.ttl_s
+    app.extensions["recic3_cache_relatorios"] = cache
+    return cache
@@ -0,0 +1,199 @@
+"""Cache curto do usuário autenticado, compartilhado pelo Redis quando houver."""
+
+import json
+import os
+import threading
+import time
+
+from logging_operacional import registrar_evento
+
+
+TTL_PADRAO_S = 30
+TTL_MAXIMO_S = 300
+MAX_ITENS_LOCAL = 1024
+INTERVALO_AVISO_S = 60
+PREFIXO_CHAVE = "sistema-recic3:usuario:"
+CAMPOS_USUARIO = ("id", "username", "role", "uvr_acesso")
+
+
+def ler_ttl_cache_usuarios(ambiente):
+    """O ambiente de testes desativa o cache, salvo configuração explícita."""
+    valor = os.getenv("USER_CACHE_TTL_SECONDS")
+    if valor is None or not valor.strip():
+        return 0 if ambiente == "testing" else TTL_PADRAO_S
+    try:
+        ttl = int(valor.strip())
+    except ValueError as erro:
+        raise RuntimeError("USER_CACHE_TTL_SECONDS deve ser um número inteiro.") from erro
+    if not 0 <= ttl <= TTL_MAXIMO_S:
+        raise RuntimeError("USER_CACHE_TTL_SECONDS está fora do intervalo permitido.")
+    return ttl
+
+
+def _uri_redis(storage_uri):
+    uri = str(storage_uri or "")
+    return uri if uri.startswith(("redis://", "rediss://")) else None
+
+
+def _criar_cliente_redis(uri):
+    import redis
+
+    return redis.Redis.from_url(
+        uri,
+        socket_connect_timeout=0.2,
+        socket_timeout=0.2,
+    )
+
+
+class CacheUsuarios:
+    """Guarda somente id, nome, perfil e UVR; nunca o hash da senha.
+
+    Com Redis, todos os workers leem as mesmas entradas e a invalidação vale
+    imediatamente para todos. Sem Redis, cada worker mantém seu próprio cache e
+    os demais percebem a mudança em no máximo o TTL configurado.
+    """
+
+    def __init__(self, ttl_s, *, redis_uri=None, max_itens=MAX_ITENS_LOCAL):
+        self.ttl_s = ttl_s
+        self._redis_uri = redis_uri
+        self._redis = None
+        self._max_itens = max_itens
+        self._locais = {}
+        self._trava = threading.Lock()
+        self._ultimo_aviso = 0.0
+
+    @property
+    def ativo(self):
+        return self.ttl_s > 0
+
+    @property
+    def compartilhado(self):
+        return bool(self._redis_uri)
+
+    @staticmethod
+    def _chave(user_id):
+        return f"{PREFIXO_CHAVE}{user_id}"
+
+    def _cliente(self):
+        if self._redis is None:
+            self._redis = _criar_cliente_redis(self._redis_uri)
+        return self._redis
+
+    def _avisar_falha(self, erro):
+        agora = time.monotonic()
+        if agora - self._ultimo_aviso < INTERVALO_AVISO_S:
+            return
+        self._ultimo_aviso = agora
+        registrar_evento(
+            "user_cache_unavailable",
+            nivel="WARNING",
+            mensagem="Cache compartilhado de usuários indisponível; usando o banco.",
+            error_type=type(erro).__name__,
+        )
+
+    def obter(self, user_id):
+        if not self.ativo:
+            return None
+        if self.compartilhado:
+            try:
+                bruto = self._cliente().get(self._chave(user_id))
+            except Exception as erro:
+                self._avisar_falha(erro)
+                return None
+            if not bruto:
+                return None
+            try:
+                dados = json.loads(bruto)
+            except (TypeError, ValueError):
+                return None
+            return dados if set(dados) == set(CAMPOS_USUARIO) else None
+
+        with self._trava:
+            item = self._locais.get(str(user_id))
+            if item is None:
+                return None
+            expira_em, dados = item
+            if expira_em <= time.monotonic():
+                self._locais.pop(str(user_id), None)
+                return None
+            return dict(dados)
+
+    def guardar(self, user_id, dados):
+        if not self.ativo:
+            return
+        dados = {campo: dados.get(campo) for campo in CAMPOS_USUARIO}
+        if self.compartilhado:
+            try:
+                self._cliente().set(
+                    self._chave(user_id),
+                    json.dumps(dados, ensure_ascii=False),
+                    ex=self.ttl_s,
+                )
+            except Exception as erro:
+                self._avisar_falha(erro)
+            return
+
+        with self._trava:
+            if len(self._locais) >= self._max_itens:
+                agora = time.monotonic()
+                for chave in [
+                    chave for chave, (expira_em, _) in self._locais.items()
+                    if expira_em <= agora
+                ]:
+                    del self._locais[chave]
+                while len(self._locais) >= self._max_itens:
+                    del self._locais[next(iter(self._locais))]
+            self._locais[str(user_id)] = (time.monotonic() + self.ttl_s, dados)
+
+    def invalidar(self, user_id):
+        """Remove a entrada do usuário; a próxima requisição consulta o banco."""
+        with self._trava:
+            self._locais.pop(str(user_id), None)
+        if self.compartilhado:
+            try:
+                self._cliente().delete(self._chave(user_id))
+            except Exception as erro:
+                self._avisar_falha(erro)
+
+    def limpar(self):
+        with self._trava:
+            self._locais.clear()
+
+
+def configurar_cache_usuarios(app, ambiente):
+    """Reaproveita o Redis do rate limit, sem conectar durante a inicialização."""
+    cache = CacheUsuarios(
+        ler_ttl_cache_usuarios(ambiente),
+        redis_uri=_uri_redis(app.config.get("RATELIMIT_STORAGE_URI")),
+    )
+    app.config["USER_CACHE_TTL_SECONDS"] = cache.ttl_s
+    app.extensions["recic3_cache_usuarios"] = cache
+    return cache
+
+
+def invalidar_usuario_fora_da_aplicacao(user_id):
+    """Usado por scripts administrativos que alteram perfil, UVR ou status.
+
+    Sem Redis não há cache compartilhado a limpar; os workers descartam a
+    entrada antiga em no máximo USER_CACHE_TTL_SECONDS.
+    """
+    uri = _uri_redis(os.getenv("RATELIMIT_STORAGE_URI"))
+    if not uri:
+        return False
+    try:
+        _criar_cliente_redis(uri).delete(f"{PREFIXO_CHAVE}{user_id}")
+    except Exception:
+        return False
+    return True
+
+
+def invalidar_usuario_atualizado(existente):
+    """Para os scripts que criam ou atualizam um usuário, depois do commit.
+
+    `existente` é a linha de `SELECT id FROM usuarios` lida antes da escrita;
+    usuário recém-criado (None) ainda não tem entrada no cache.
+    """
+    if not existente:
+        return False
+    # Perfil e UVR mudaram: a sessão aberta não pode seguir com o cache antigo.
+    return invalidar_usuario_fora_da_aplicacao(existente[0])
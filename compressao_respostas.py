@@ -0,0 +1,176 @@
+"""Compressão gzip/brotli das respostas de texto, negociada por Accept-Encoding.
+
+A página de cadastro, o JSON do relatório e os CSVs são texto muito repetitivo.
+A compressão roda no último `after_request` da configuração, depois dos
+cabeçalhos de segurança e do nonce da CSP, então o corpo já está completo.
+Respostas em streaming são comprimidas bloco a bloco, sem juntar o arquivo.
+Brotli é usado quando o pacote opcional `Brotli` ou, no PyPy, `brotlicffi`
+está instalado; os dois têm a mesma API.
+"""
+
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+from leitura_ambiente import ler_inteiro
+
+
+MINIMO_PADRAO_BYTES = 1024
+MINIMO_MAXIMO_BYTES = 1024 * 1024
+NIVEL_GZIP_PADRAO = 6
+# Qualidade 4 fica perto do gzip 6 em tempo e comprime mais; as qualidades
+# altas são para arquivos estáticos, não para respostas geradas a cada pedido.
+QUALIDADE_BROTLI = 4
+TIPOS_COMPRIMIVEIS = frozenset({
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+})
+# BREACH depende de o atacante disparar a requisição a partir de outro site.
+# Sem compressão nesses casos, o tamanho da resposta não revela o token CSRF.
+ORIGENS_SEM_COMPRESSAO = frozenset({"cross-site", "same-site"})
+
+
+def ler_configuracao_compressao():
+    """Nível 0 desativa a compressão."""
+    return {
+        "nivel": ler_inteiro("COMPRESSION_LEVEL", padrao=NIVEL_GZIP_PADRAO, minimo=0, maximo=9),
+        "minimo_bytes": ler_inteiro(
+            "COMPRESSION_MIN_BYTES",
+            padrao=MINIMO_PADRAO_BYTES,
+            minimo=0,
+            maximo=MINIMO_MAXIMO_BYTES,
+        ),
+    }
+
+
+def escolher_codificacao(aceitas, *, brotli_disponivel=None):
+    """`br` ou `gzip` conforme as qualidades de Accept-Encoding; None sem acordo."""
+    if brotli_disponivel is None:
+        brotli_disponivel = brotli is not None
+    candidatas = (["br"] if brotli_disponivel else []) + ["gzip"]
+    qualidades = {codificacao: aceitas.quality(codificacao) for codificacao in candidatas}
+    melhor = max(candidatas, key=lambda codificacao: qualidades[codificacao])
+    return melhor if qualidades[melhor] > 0 else None
+
+
+def _compressor(codificacao, nivel):
+    """Funções (comprimir bloco, finalizar) para respostas em streaming."""
+    if codificacao == "br":
+        compressor = brotli.Compressor(quality=QUALIDADE_BROTLI)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def comprimir(dados, codificacao, nivel, *, qualidade_brotli=QUALIDADE_BROTLI):
+    if codificacao == "br":
+        return brotli.compress(dados, quality=qualidade_brotli)
+    return gzip.compress(dados, compresslevel=nivel, mtime=0)
+
+
+class FluxoComprimido:
+    """Iterável de uma resposta em streaming comprimida, que repassa o close().
+
+    Os geradores de CSV devolvem a conexão do banco no close(). Um gerador
+    comum não executaria o `finally` se o cliente desconectasse antes do
+    primeiro bloco, e a conexão ficaria presa até o coletor de lixo.
+    """
+
+    def __init__(self, blocos, codificacao, nivel):
+        self._blocos = blocos
+        self._compressor = _compressor(codificacao, nivel)
+        self._gerador = self._comprimir()
+
+    def _comprimir(self):
+        comprimir_bloco, finalizar = self._compressor
+        for bloco in self._blocos:
+            if isinstance(bloco, str):
+                bloco = bloco.encode("utf-8")
+            saida = comprimir_bloco(bloco)
+            if saida:
+                yield saida
+        saida = finalizar()
+        if saida:
+            yield saida
+
+    def __iter__(self):
+        return self._gerador
+
+    def close(self):
+        try:
+            self._gerador.close()
+        finally:
+            fechar = getattr(self._blocos, "close", None)
+            if fechar is not None:
+                fechar()
+
+
+def comprimir_fluxo(blocos, codificacao, nivel):
+    """Comprime um iterável de respostas em streaming e repassa o close()."""
+    return FluxoComprimido(blocos, codificacao, nivel)
+
+
+def _comprimivel(resposta):
+    return (
+        200 <= resposta.status_code < 300
+        and resposta.status_code not in {204, 206}
+        and not resposta.direct_passthrough
+        and "Content-Encoding" not in resposta.headers
+        and "no-transform" not in resposta.headers.get("Cache-Control", "")
+        and resposta.mimetype in TIPOS_COMPRIMIVEIS
+    )
+
+
+def configurar_compressao(app):
+    """Registra a compressão antes do `after_request` dos cabeçalhos de segurança.
+
+    O Flask executa os `after_request` na ordem inversa do registro; assim a
+    compressão roda depois da troca de erros por JSON e dos cabeçalhos de
+    segurança, e também depois dos hooks registrados em app.py.
+    """
+    configuracao = ler_configuracao_compressao()
+    app.config.update(
+        COMPRESSION_LEVEL=configuracao["nivel"],
+        COMPRESSION_MIN_BYTES=configuracao["minimo_bytes"],
+    )
+    app.extensions["recic3_compressao"] = configuracao
+
+    @app.after_request
+    def comprimir_resposta(resposta):
+        nivel = configuracao["nivel"]
+        if not nivel or request.method == "HEAD" or not _comprimivel(resposta):
+            return resposta
+        resposta.vary.add("Accept-Encoding")
+        if request.headers.get("Sec-Fetch-Site") in ORIGENS_SEM_COMPRESSAO:
+            return resposta
+        codificacao = escolher_codificacao(request.accept_encodings)
+        if codificacao is None:
+            return resposta
+
+        if resposta.is_streamed:
+            resposta.response = comprimir_fluxo(resposta.response, codificacao, nivel)
+            resposta.headers.pop("Content-Length", None)
+        else:
+            dados = resposta.get_data()
+            if len(dados) < configuracao["minimo_bytes"]:
+                return resposta
+            resposta.set_data(comprimir(dados, codificacao, nivel))
+        resposta.headers["Content-Encoding"] = codificacao
+        return resposta
+
+    return configuracao
@@ -10,12 +10,21 @@ from flask import Response, abort, g, jsonify, request
 from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.middleware.proxy_fix import ProxyFix
 
+from banco_dados import configurar_banco_dados
+from bundles_estaticos import configurar_bundles_estaticos
+from cache_relatorios import configurar_cache_relatorios
+from cache_usuarios import configurar_cache_usuarios
+from compressao_respostas import configurar_compressao
+from consultas_cadastrais import configurar_consultas_cadastrais
+from dados_referencia import configurar_dados_referencia
+from instrumentacao_banco import configurar_instrumentacao_banco
 from logging_operacional import (
     configurar_logging_operacional,
     emitir_erro_configuracao_minimo,
     registrar_evento,
     registrar_inicio_aplicacao,
 )
+from metricas import configurar_metricas
 from seguranca_rate_limit import configurar_rate_limit
 
 
@@ -271,6 +280,15 @@ def _configurar_aplicacao_validada(app, ambiente):
             abort(404)
 
     configurar_rate_limit(app, ambiente)
+    configurar_banco_dados(app)
+    configurar_metricas(app)
+    configurar_instrumentacao_banco(app, ambiente)
+    configurar_cache_usuarios(app, ambiente)
+    configurar_cache_relatorios(app, ambiente)
+    configurar_consultas_cadastrais(app, ambiente)
+    configurar_dados_referencia(app, ambiente)
+    configurar_compressao(app)
+    configurar_bundles_estaticos(app)
 
     @app.before_request
     def preparar_nonce_csp():
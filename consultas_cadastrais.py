@@ -0,0 +1,291 @@
+"""Consultas de CNPJ e CEP com cache no banco, corrida entre provedores e deduplicação.
+
+Os provedores são tentados em ordem, mas o seguinte não espera o anterior
+esgotar o timeout: se a primeira opção não responde em `CONSULTAS_HEDGE_MS`, a
+segunda entra na corrida e vale a primeira resposta útil; uma falha aciona a
+próxima opção na hora. Pedidos simultâneos do mesmo documento no mesmo
+processo esperam a consulta que já está em andamento.
+
+Respostas encontradas ficam em `consultas_cadastrais_cache` por
+`CONSULTAS_CACHE_TTL_HORAS`; documento que todos os provedores dizem não
+existir (404) fica por `CONSULTAS_CACHE_NEGATIVO_HORAS`. Falhas de rede não
+são guardadas. Sem banco disponível, a consulta segue sem cache.
+"""
+
+import contextvars
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from flask import current_app, has_app_context
+
+from leitura_ambiente import ler_inteiro
+from logging_operacional import registrar_evento
+
+
+TTL_PADRAO_HORAS = 720
+TTL_MAXIMO_HORAS = 8760
+TTL_NEGATIVO_PADRAO_HORAS = 24
+HEDGE_PADRAO_MS = 800
+HEDGE_MAXIMO_MS = 10000
+MAXIMO_CONSULTAS_PARALELAS = 16
+INTERVALO_AVISO_S = 60
+
+DDL_CONSULTAS_CADASTRAIS_CACHE = """
+    CREATE TABLE IF NOT EXISTS consultas_cadastrais_cache (
+        tipo VARCHAR(10) NOT NULL,
+        chave VARCHAR(14) NOT NULL,
+        encontrado BOOLEAN NOT NULL,
+        dados JSONB,
+        provedor VARCHAR(30),
+        consultado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        expira_em TIMESTAMP NOT NULL,
+        PRIMARY KEY (tipo, chave)
+    )
+"""
+
+SQL_LER_CACHE = """
+    SELECT encontrado, dados FROM consultas_cadastrais_cache
+    WHERE tipo = %s AND chave = %s AND expira_em > CURRENT_TIMESTAMP
+"""
+
+SQL_GRAVAR_CACHE = """
+    INSERT INTO consultas_cadastrais_cache
+        (tipo, chave, encontrado, dados, provedor, expira_em)
+    VALUES (%s, %s, %s, %s::jsonb, %s, CURRENT_TIMESTAMP + make_interval(hours => %s))
+    ON CONFLICT (tipo, chave) DO UPDATE
+    SET encontrado = EXCLUDED.encontrado,
+        dados = EXCLUDED.dados,
+        provedor = EXCLUDED.provedor,
+        consultado_em = CURRENT_TIMESTAMP,
+        expira_em = EXCLUDED.expira_em
+"""
+
+
+class RegistroNaoEncontrado(Exception):
+    """Nenhum provedor conhece o documento consultado."""
+
+
+class ConsultaIndisponivel(Exception):
+    """Todos os provedores falharam sem confirmar que o documento não existe."""
+
+
+def ler_configuracao_consultas(ambiente):
+    """O ambiente de testes desativa o cache, salvo configuração explícita."""
+    return {
+        "ttl_horas": ler_inteiro(
+            "CONSULTAS_CACHE_TTL_HORAS",
+            padrao=0 if ambiente == "testing" else TTL_PADRAO_HORAS,
+            minimo=0,
+            maximo=TTL_MAXIMO_HORAS,
+        ),
+        "ttl_negativo_horas": ler_inteiro(
+            "CONSULTAS_CACHE_NEGATIVO_HORAS",
+            padrao=0 if ambiente == "testing" else TTL_NEGATIVO_PADRAO_HORAS,
+            minimo=0,
+            maximo=TTL_MAXIMO_HORAS,
+        ),
+        "hedge_ms": ler_inteiro(
+            "CONSULTAS_HEDGE_MS", padrao=HEDGE_PADRAO_MS, minimo=0, maximo=HEDGE_MAXIMO_MS
+        ),
+    }
+
+
+def preparar_consultas_cadastrais(cur):
+    cur.execute(DDL_CONSULTAS_CADASTRAIS_CACHE)
+
+
+def _nao_encontrado(erro):
+    if isinstance(erro, RegistroNaoEncontrado):
+        return True
+    resposta = getattr(erro, "response", None)
+    return getattr(resposta, "status_code", None) == 404
+
+
+class ConsultasCadastrais:
+    """Executa consultas por provedores `(nome, funcao)`; `funcao()` devolve um dict."""
+
+    def __init__(
+        self,
+        conectar_banco=None,
+        *,
+        conectar_gravacao=None,
+        ttl_horas=0,
+        ttl_negativo_horas=0,
+        hedge_ms=HEDGE_PADRAO_MS,
+    ):
+        self._conectar_banco = conectar_banco
+        self._conectar_gravacao = conectar_gravacao or conectar_banco
+        self.ttl_horas = ttl_horas
+        self.ttl_negativo_horas = ttl_negativo_horas
+        self.atraso_hedge_s = hedge_ms / 1000
+        self._em_andamento = {}
+        self._trava = threading.Lock()
+        self._executor_criado = None
+        self._ultimo_aviso = 0.0
+
+    @property
+    def cache_ativo(self):
+        return self._conectar_banco is not None and (self.ttl_horas > 0 or self.ttl_negativo_horas > 0)
+
+    def _executor(self):
+        # Criado no primeiro uso, já dentro do worker, e não antes do fork.
+        with self._trava:
+            if self._executor_criado is None:
+                self._executor_criado = ThreadPoolExecutor(
+                    MAXIMO_CONSULTAS_PARALELAS, thread_name_prefix="consulta_cadastral"
+                )
+            return self._executor_criado
+
+    def _avisar_falha(self, erro):
+        agora = time.monotonic()
+        if agora - self._ultimo_aviso < INTERVALO_AVISO_S:
+            return
+        self._ultimo_aviso = agora
+        registrar_evento(
+            "lookup_cache_unavailable",
+            nivel="WARNING",
+            mensagem="Cache de consultas cadastrais indisponível; consultando os provedores.",
+            error_type=type(erro).__name__,
+        )
+
+    def _executar_cache(self, conectar, comando, parametros, *, confirmar):
+        conexao = conectar()
+        try:
+            cur = conexao.cursor()
+            cur.execute(comando, parametros)
+            linha = cur.fetchone() if cur.description else None
+            if confirmar:
+                conexao.commit()
+            return linha
+        finally:
+            conexao.close()
+
+    def _ler_cache(self, tipo, chave):
+        if not self.cache_ativo:
+            return None
+        try:
+            return self._executar_cache(
+                self._conectar_banco, SQL_LER_CACHE, (tipo, chave), confirmar=False
+            )
+        except Exception as erro:
+            self._avisar_falha(erro)
+            return None
+
+    def _gravar_cache(self, tipo, chave, dados, provedor):
+        horas = self.ttl_horas if dados is not None else self.ttl_negativo_horas
+        if not self.cache_ativo or not horas:
+            return
+        conteudo = None if dados is None else json.dumps(dados, ensure_ascii=False)
+        try:
+            self._executar_cache(
+                self._conectar_gravacao,
+                SQL_GRAVAR_CACHE,
+                (tipo, chave, dados is not None, conteudo, provedor, horas),
+                confirmar=True,
+            )
+        except Exception as erro:
+            self._avisar_falha(erro)
+
+    def _correr(self, provedores):
+        """Primeira resposta útil entre os provedores, acionados em cascata."""
+        executor = self._executor()
+        fila = list(provedores)
+        pendentes = {}
+        erros = []
+
+        def acionar_proximo():
+            nome, funcao = fila.pop(0)
+            # O contexto copiado leva a aplicação atual ao log da thread.
+            pendentes[executor.submit(contextvars.copy_context().run, funcao)] = nome
+
+        acionar_proximo()
+        while pendentes:
+            prontos, _ = wait(
+                pendentes,
+                timeout=self.atraso_hedge_s if fila else None,
+                return_when=FIRST_COMPLETED,
+            )
+            if not prontos:
+                acionar_proximo()
+                continue
+            for futuro in prontos:
+                nome = pendentes.pop(futuro)
+                try:
+                    return nome, futuro.result()
+                except Exception as erro:
+                    erros.append(erro)
+            if fila:
+                acionar_proximo()
+
+        if all(_nao_encontrado(erro) for erro in erros):
+            raise RegistroNaoEncontrado() from erros[-1]
+        raise ConsultaIndisponivel() from erros[-1]
+
+    def _consultar_provedores(self, tipo, chave, provedores):
+        try:
+            provedor, dados = self._correr(provedores)
+        except RegistroNaoEncontrado:
+            self._gravar_cache(tipo, chave, None, None)
+            raise
+        self._gravar_cache(tipo, chave, dados, provedor)
+        return dados
+
+    def consultar(self, tipo, chave, provedores):
+        """Dados do documento, do cache ou dos provedores.
+
+        Levanta RegistroNaoEncontrado ou ConsultaIndisponivel.
+        """
+        linha = self._ler_cache(tipo, chave)
+        if linha is not None:
+            encontrado, dados = linha
+            if not encontrado:
+                raise RegistroNaoEncontrado()
+            return json.loads(dados) if isinstance(dados, str) else dados
+
+        with self._trava:
+            futuro = self._em_andamento.get((tipo, chave))
+            lider = futuro is None
+            if lider:
+                futuro = self._em_andamento[(tipo, chave)] = Future()
+        if not lider:
+            return futuro.result()
+
+        try:
+            dados = self._consultar_provedores(tipo, chave, provedores)
+        except BaseException as erro:
+            futuro.set_exception(erro)
+            raise
+        else:
+            futuro.set_result(dados)
+            return dados
+        finally:
+            with self._trava:
+                self._em_andamento.pop((tipo, chave), None)
+
+
+SERVICO_SEM_CACHE = ConsultasCadastrais()
+
+
+def servico_consultas():
+    """Serviço da aplicação atual; fora dela, um serviço do processo sem cache."""
+    if has_app_context():
+        servico = current_app.extensions.get("recic3_consultas_cadastrais")
+        if servico is not None:
+            return servico
+    return SERVICO_SEM_CACHE
+
+
+def configurar_consultas_cadastrais(app, ambiente):
+    configuracao = ler_configuracao_consultas(ambiente)
+    provedor_banco = app.extensions["recic3_banco_dados"]
+    # A leitura usa a conexão da requisição. A gravação não cabe na transação
+    # somente leitura das rotas GET e só empresta outra depois de devolvê-la.
+    servico = ConsultasCadastrais(
+        provedor_banco.conectar,
+        conectar_gravacao=provedor_banco.conectar_apos_liberar_requisicao,
+        **configuracao,
+    )
+    app.extensions["recic3_consultas_cadastrais"] = servico
+    return servico
@@ -2,6 +2,7 @@ from werkzeug.security import generate_password_hash
 import psycopg2
 import os
 from dotenv import load_dotenv
+from cache_usuarios import invalidar_usuario_atualizado
 
 # Carrega as configurações do arquivo .env
 load_dotenv()
@@ -59,6 +60,7 @@ try:
         print(f"Usuário '{user}' criado com sucesso! Senha: {senha_plana}")
 
     conn.commit()
+    invalidar_usuario_atualizado(existente)
 
 except Exception as e:
     print(f"ERRO CRÍTICO: {e}")
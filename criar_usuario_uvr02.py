@@ -2,6 +2,7 @@ from werkzeug.security import generate_password_hash
 import psycopg2
 import os
 from dotenv import load_dotenv
+from cache_usuarios import invalidar_usuario_atualizado
 
 # Carrega as configurações do arquivo .env
 load_dotenv()
@@ -26,7 +27,8 @@ try:
 
     # Verifica se já existe
     cur.execute("SELECT id FROM usuarios WHERE username = %s", (novo_user,))
-    if cur.fetchone():
+    existente = cur.fetchone()
+    if existente:
         print(f"Usuário '{novo_user}' já existe. Atualizando permissões...")
         cur.execute("""
             UPDATE usuarios 
@@ -41,6 +43,7 @@ try:
         """, (novo_user, senha_hash, 'Responsável UVR 02', 'user', uvr_vinculada))
 
     conn.commit()
+    invalidar_usuario_atualizado(existente)
     print("-" * 30)
     print(f"SUCESSO! Usuário criado/atualizado.")
     print(f"Login: {novo_user}")
@@ -0,0 +1,222 @@
+"""Listas pequenas dos filtros de relatório, guardadas em memória por worker.
+
+Catálogo de produtos e subgrupos, UVRs e atividades de transação mudam pouco e
+eram relidos do banco a cada troca de filtro na tela. Cada worker guarda a
+última cópia e, passado `REFERENCE_CACHE_CHECK_SECONDS`, confere os
+contadores de `versoes_referencia` com uma consulta só, recarregando apenas o
+conjunto que mudou. Quem altera o catálogo incrementa o contador na mesma
+transação e descarta a cópia local na hora.
+
+UVRs e atividades saem de registros mantidos na escrita, em vez de
+`SELECT DISTINCT` sobre transações, contas, fluxo de caixa e denúncias.
+"""
+
+import os
+import threading
+import time
+
+
+INTERVALO_PADRAO_S = 30
+INTERVALO_MAXIMO_S = 600
+CONJUNTOS = ("catalogo", "subgrupos", "uvrs", "atividades")
+
+DDL_DADOS_REFERENCIA = (
+    """
+    CREATE TABLE IF NOT EXISTS versoes_referencia (
+        nome VARCHAR(30) PRIMARY KEY,
+        versao BIGINT NOT NULL DEFAULT 1
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS uvrs_registradas (
+        uvr VARCHAR(100) PRIMARY KEY,
+        registrada_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS atividades_transacao_registradas (
+        tipo_transacao VARCHAR(50) NOT NULL,
+        tipo_atividade VARCHAR(255) NOT NULL,
+        PRIMARY KEY (tipo_transacao, tipo_atividade)
+    )
+    """,
+    """
+    INSERT INTO versoes_referencia (nome)
+    VALUES ('catalogo'), ('subgrupos'), ('uvrs'), ('atividades')
+    ON CONFLICT (nome) DO NOTHING
+    """,
+)
+
+# Carga inicial dos registros; depois eles crescem pelas rotas de escrita.
+SQL_POPULAR_REGISTROS = (
+    """
+    INSERT INTO uvrs_registradas (uvr)
+    SELECT uvr FROM transacoes_financeiras WHERE uvr <> ''
+    UNION SELECT uvr FROM contas_correntes WHERE uvr <> ''
+    UNION SELECT uvr FROM fluxo_caixa WHERE uvr <> ''
+    UNION SELECT uvr FROM denuncias WHERE uvr <> ''
+    ON CONFLICT (uvr) DO NOTHING
+    """,
+    """
+    INSERT INTO atividades_transacao_registradas (tipo_transacao, tipo_atividade)
+    SELECT DISTINCT COALESCE(tipo_transacao, ''), tipo_atividade
+    FROM transacoes_financeiras
+    WHERE tipo_atividade IS NOT NULL
+    ON CONFLICT DO NOTHING
+    """,
+    "UPDATE versoes_referencia SET versao = versao + 1 WHERE nome IN ('uvrs', 'atividades')",
+)
+
+# Só incrementa a versão quando algum valor é realmente novo.
+SQL_REGISTRAR_REFERENCIAS = """
+    WITH nova_uvr AS (
+        INSERT INTO uvrs_registradas (uvr)
+        SELECT %s WHERE %s <> ''
+        ON CONFLICT (uvr) DO NOTHING
+        RETURNING 'uvrs'::text AS nome
+    ), nova_atividade AS (
+        INSERT INTO atividades_transacao_registradas (tipo_transacao, tipo_atividade)
+        SELECT COALESCE(%s, ''), %s WHERE %s <> ''
+        ON CONFLICT DO NOTHING
+        RETURNING 'atividades'::text AS nome
+    )
+    UPDATE versoes_referencia SET versao = versao + 1
+    WHERE nome IN (SELECT nome FROM nova_uvr UNION SELECT nome FROM nova_atividade)
+"""
+
+# As posições de grupo e subgrupo vêm do banco para manter a ordenação
+# (collation) que os ORDER BY das rotas produziam.
+SQL_CATALOGO = """
+    SELECT id, item, tipo, tipo_atividade, grupo, subgrupo,
+           DENSE_RANK() OVER (ORDER BY grupo),
+           DENSE_RANK() OVER (ORDER BY subgrupo)
+    FROM produtos_servicos
+    ORDER BY item
+"""
+
+CARREGADORES = {
+    "catalogo": lambda cur: _carregar(cur, SQL_CATALOGO),
+    "subgrupos": lambda cur: _carregar(
+        cur, "SELECT nome, atividade_pai FROM subgrupos ORDER BY nome"
+    ),
+    "uvrs": lambda cur: tuple(
+        sorted(linha[0] for linha in _carregar(cur, "SELECT uvr FROM uvrs_registradas"))
+    ),
+    "atividades": lambda cur: _carregar(
+        cur,
+        "SELECT tipo_transacao, tipo_atividade FROM atividades_transacao_registradas "
+        "ORDER BY tipo_atividade, tipo_transacao",
+    ),
+}
+
+
+def _carregar(cur, sql):
+    cur.execute(sql)
+    return tuple(tuple(linha) for linha in cur.fetchall())
+
+
+def ler_intervalo_dados_referencia(ambiente):
+    """O ambiente de testes desativa a cópia em memória, salvo configuração explícita."""
+    valor = os.getenv("REFERENCE_CACHE_CHECK_SECONDS")
+    if valor is None or not valor.strip():
+        return 0 if ambiente == "testing" else INTERVALO_PADRAO_S
+    try:
+        intervalo = int(valor.strip())
+    except ValueError as erro:
+        raise RuntimeError("REFERENCE_CACHE_CHECK_SECONDS deve ser um número inteiro.") from erro
+    if not 0 <= intervalo <= INTERVALO_MAXIMO_S:
+        raise RuntimeError("REFERENCE_CACHE_CHECK_SECONDS está fora do intervalo permitido.")
+    return intervalo
+
+
+def preparar_dados_referencia(cur):
+    """Cria as tabelas e completa os registros com o que já existe no banco."""
+    for comando in DDL_DADOS_REFERENCIA + SQL_POPULAR_REGISTROS:
+        cur.execute(comando)
+
+
+def registrar_referencias(cur, *, uvr=None, tipo_transacao=None, tipo_atividade=None):
+    """Registra UVR e atividade gravadas agora; roda na transação da escrita."""
+    if not uvr and not tipo_atividade:
+        return
+    cur.execute(
+        SQL_REGISTRAR_REFERENCIAS,
+        (uvr, uvr, tipo_transacao, tipo_atividade, tipo_atividade),
+    )
+
+
+def incrementar_versao_referencia(cur, *nomes):
+    cur.execute(
+        "UPDATE versoes_referencia SET versao = versao + 1 WHERE nome = ANY(%s)",
+        (list(nomes),),
+    )
+
+
+class DadosReferencia:
+    """Cópia por worker dos conjuntos de `CONJUNTOS`, conferida por versão.
+
+    Com intervalo 0 não há cópia: cada chamada lê o conjunto do banco.
+    """
+
+    def __init__(self, intervalo_s):
+        self.intervalo_s = intervalo_s
+        self._conjuntos = {}
+        self._conferido_em = None
+        self._trava = threading.Lock()
+
+    @property
+    def ativo(self):
+        return self.intervalo_s > 0
+
+    def _copia_recente(self, nome):
+        with self._trava:
+            item = self._conjuntos.get(nome)
+            if item is None or self._conferido_em is None:
+                return None
+            if time.monotonic() - self._conferido_em >= self.intervalo_s:
+                return None
+            return item[1]
+
+    def obter(self, nome, conectar):
+        """Conjunto `nome`; `conectar` só é chamado quando é preciso ir ao banco."""
+        dados = self._copia_recente(nome) if self.ativo else None
+        if dados is not None:
+            return dados
+
+        conn = conectar()
+        try:
+            cur = conn.cursor()
+            if not self.ativo:
+                return CARREGADORES[nome](cur)
+            # A versão é lida antes dos dados: uma escrita no meio do caminho
+            # só provoca uma recarga a mais na próxima conferência.
+            cur.execute("SELECT nome, versao FROM versoes_referencia")
+            versoes = dict(cur.fetchall())
+            with self._trava:
+                item = self._conjuntos.get(nome)
+            if item is None or item[0] != versoes.get(nome):
+                item = (versoes.get(nome), CARREGADORES[nome](cur))
+            with self._trava:
+                self._conjuntos = {
+                    outro: copia
+                    for outro, copia in self._conjuntos.items()
+                    if copia[0] == versoes.get(outro)
+                }
+                self._conjuntos[nome] = item
+                self._conferido_em = time.monotonic()
+            return item[1]
+        finally:
+            conn.close()
+
+    def invalidar(self, *nomes):
+        """Descarta a cópia local; os outros workers percebem pela versão."""
+        with self._trava:
+            for nome in nomes:
+                self._conjuntos.pop(nome, None)
+
+
+def configurar_dados_referencia(app, ambiente):
+    dados = DadosReferencia(ler_intervalo_dados_referencia(ambiente))
+    app.config["REFERENCE_CACHE_CHECK_SECONDS"] = dados.intervalo_s
+    app.extensions["recic3_dados_referencia"] = dados
+    return dados
@@ -0,0 +1,220 @@
+"""Fila de geração de relatórios no PostgreSQL, consumida por um processo à parte.
+
+A rota só valida, autoriza e grava a tarefa; o worker (`worker_relatorios.py`)
+reserva a próxima com `FOR UPDATE SKIP LOCKED`, gera o arquivo e o guarda na
+própria linha até o fim da retenção. Vários workers podem rodar ao mesmo tempo
+sem pegar a mesma tarefa.
+"""
+
+import json
+
+from leitura_ambiente import ler_inteiro
+
+
+STATUS_PENDENTE = "PENDENTE"
+STATUS_EXECUTANDO = "EXECUTANDO"
+STATUS_CONCLUIDA = "CONCLUIDA"
+STATUS_SEM_DADOS = "SEM_DADOS"
+STATUS_FALHOU = "FALHOU"
+STATUS_FINAIS = {STATUS_CONCLUIDA, STATUS_SEM_DADOS, STATUS_FALHOU}
+
+MAXIMO_TENTATIVAS = 3
+RETENCAO_PADRAO_HORAS = 24
+INTERVALO_PADRAO_S = 2
+# Tarefa em execução há mais tempo que isso pertence a um worker que morreu.
+EXECUCAO_MAXIMA_PADRAO_S = 900
+
+DDL_TAREFAS_RELATORIO = """
+    CREATE TABLE IF NOT EXISTS tarefas_relatorio (
+        id BIGSERIAL PRIMARY KEY,
+        tipo VARCHAR(50) NOT NULL,
+        parametros JSONB NOT NULL,
+        id_usuario INTEGER NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'PENDENTE',
+        tentativas INTEGER NOT NULL DEFAULT 0,
+        mensagem TEXT,
+        nome_arquivo VARCHAR(255),
+        tipo_mime VARCHAR(100),
+        conteudo BYTEA,
+        criado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        iniciado_em TIMESTAMP,
+        concluido_em TIMESTAMP
+    )
+"""
+
+DDL_INDICE_TAREFAS_ABERTAS = """
+    CREATE INDEX IF NOT EXISTS idx_tarefas_relatorio_abertas
+    ON tarefas_relatorio (id)
+    WHERE status IN ('PENDENTE', 'EXECUTANDO')
+"""
+
+DDL_INDICE_TAREFAS_CRIACAO = """
+    CREATE INDEX IF NOT EXISTS idx_tarefas_relatorio_criado_em
+    ON tarefas_relatorio (criado_em)
+"""
+
+SQL_ENFILEIRAR = """
+    INSERT INTO tarefas_relatorio (tipo, parametros, id_usuario)
+    VALUES (%s, %s::jsonb, %s)
+    RETURNING id
+"""
+
+# Uma única instrução reserva e marca a tarefa; a de outro worker é pulada
+# em vez de esperar o bloqueio.
+SQL_RESERVAR = """
+    UPDATE tarefas_relatorio t
+    SET status = 'EXECUTANDO',
+        tentativas = t.tentativas + 1,
+        iniciado_em = CURRENT_TIMESTAMP
+    WHERE t.id = (
+        SELECT id FROM tarefas_relatorio
+        WHERE (
+            status = 'PENDENTE'
+            OR (
+                status = 'EXECUTANDO'
+                AND iniciado_em < CURRENT_TIMESTAMP - make_interval(secs => %s)
+            )
+        )
+          AND tentativas < %s
+        ORDER BY id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING t.id, t.tipo, t.parametros, t.tentativas
+"""
+
+SQL_CONCLUIR = """
+    UPDATE tarefas_relatorio
+    SET status = 'CONCLUIDA', nome_arquivo = %s, tipo_mime = %s, conteudo = %s,
+        mensagem = NULL, concluido_em = CURRENT_TIMESTAMP
+    WHERE id = %s
+"""
+
+SQL_FINALIZAR_SEM_ARQUIVO = """
+    UPDATE tarefas_relatorio
+    SET status = %s, mensagem = %s, concluido_em = CURRENT_TIMESTAMP
+    WHERE id = %s
+"""
+
+SQL_DEVOLVER = """
+    UPDATE tarefas_relatorio
+    SET status = 'PENDENTE', iniciado_em = NULL
+    WHERE id = %s
+"""
+
+# Tarefas abandonadas que esgotaram as tentativas também são encerradas.
+SQL_ENCERRAR_ESGOTADAS = """
+    UPDATE tarefas_relatorio
+    SET status = 'FALHOU', mensagem = %s, concluido_em = CURRENT_TIMESTAMP
+    WHERE status IN ('PENDENTE', 'EXECUTANDO')
+      AND tentativas >= %s
+      AND (status = 'PENDENTE'
+           OR iniciado_em < CURRENT_TIMESTAMP - make_interval(secs => %s))
+"""
+
+SQL_REMOVER_EXPIRADAS = """
+    DELETE FROM tarefas_relatorio
+    WHERE criado_em < CURRENT_TIMESTAMP - make_interval(hours => %s)
+"""
+
+MENSAGEM_FALHA = "Não foi possível gerar o relatório."
+
+
+class RelatorioSemDados(Exception):
+    """Os filtros da tarefa não retornaram nenhum registro."""
+
+
+def ler_configuracao_fila():
+    return {
+        "retencao_horas": ler_inteiro(
+            "RELATORIOS_RETENCAO_HORAS",
+            padrao=RETENCAO_PADRAO_HORAS,
+            minimo=1,
+            maximo=720,
+        ),
+        "intervalo_s": ler_inteiro(
+            "RELATORIOS_INTERVALO_SEGUNDOS",
+            padrao=INTERVALO_PADRAO_S,
+            minimo=1,
+            maximo=60,
+        ),
+        "execucao_maxima_s": ler_inteiro(
+            "RELATORIOS_EXECUCAO_MAXIMA_SEGUNDOS",
+            padrao=EXECUCAO_MAXIMA_PADRAO_S,
+            minimo=60,
+            maximo=7200,
+        ),
+    }
+
+
+def preparar_fila_relatorios(cur):
+    cur.execute(DDL_TAREFAS_RELATORIO)
+    cur.execute(DDL_INDICE_TAREFAS_ABERTAS)
+    cur.execute(DDL_INDICE_TAREFAS_CRIACAO)
+
+
+def enfileirar_relatorio(cur, tipo, parametros, id_usuario):
+    """Grava a tarefa e devolve o id; o commit fica com quem chama."""
+    cur.execute(
+        SQL_ENFILEIRAR,
+        (tipo, json.dumps(parametros, ensure_ascii=False), id_usuario),
+    )
+    return cur.fetchone()[0]
+
+
+def reservar_proxima_tarefa(cur, *, execucao_maxima_s):
+    """(id, tipo, parâmetros, tentativa) da próxima tarefa, ou None."""
+    cur.execute(SQL_RESERVAR, (execucao_maxima_s, MAXIMO_TENTATIVAS))
+    linha = cur.fetchone()
+    if not linha:
+        return None
+    id_tarefa, tipo, parametros, tentativa = linha
+    if isinstance(parametros, str):
+        parametros = json.loads(parametros)
+    return id_tarefa, tipo, parametros, tentativa
+
+
+def concluir_tarefa(cur, id_tarefa, nome_arquivo, tipo_mime, conteudo):
+    cur.execute(SQL_CONCLUIR, (nome_arquivo, tipo_mime, conteudo, id_tarefa))
+
+
+def finalizar_sem_arquivo(cur, id_tarefa, status, mensagem):
+    cur.execute(SQL_FINALIZAR_SEM_ARQUIVO, (status, mensagem, id_tarefa))
+
+
+def registrar_falha(cur, id_tarefa, tentativa):
+    """Devolve a tarefa à fila ou a encerra ao esgotar as tentativas."""
+    if tentativa < MAXIMO_TENTATIVAS:
+        cur.execute(SQL_DEVOLVER, (id_tarefa,))
+        return STATUS_PENDENTE
+    finalizar_sem_arquivo(cur, id_tarefa, STATUS_FALHOU, MENSAGEM_FALHA)
+    return STATUS_FALHOU
+
+
+def consultar_tarefa(cur, id_tarefa, id_usuario):
+    """(status, mensagem, nome_arquivo) da tarefa do próprio usuário, ou None."""
+    cur.execute(
+        "SELECT status, mensagem, nome_arquivo FROM tarefas_relatorio "
+        "WHERE id = %s AND id_usuario = %s",
+        (id_tarefa, id_usuario),
+    )
+    return cur.fetchone()
+
+
+def ler_arquivo_tarefa(cur, id_tarefa, id_usuario):
+    """(nome, tipo MIME, bytes) de uma tarefa concluída do usuário, ou None."""
+    cur.execute(
+        "SELECT nome_arquivo, tipo_mime, conteudo FROM tarefas_relatorio "
+        "WHERE id = %s AND id_usuario = %s AND status = 'CONCLUIDA'",
+        (id_tarefa, id_usuario),
+    )
+    return cur.fetchone()
+
+
+def limpar_tarefas(cur, *, retencao_horas, execucao_maxima_s):
+    """Encerra as tarefas abandonadas e remove as vencidas; retorna as removidas."""
+    cur.execute(
+        SQL_ENCERRAR_ESGOTADAS, (MENSAGEM_FALHA, MAXIMO_TENTATIVAS, execucao_maxima_s)
+    )
+    cur.execute(SQL_REMOVER_EXPIRADAS, (retencao_horas,))
+    return cur.rowcount
@@ -0,0 +1,210 @@
+"""Armazenamento das fotos de associados e patrimônio fora da linha do registro.
+
+A imagem é decodificada uma única vez no envio, reduzida para no máximo
+LADO_MAXIMO_FOTO pixels e acompanhada de uma miniatura. As duas versões ficam
+na tabela `fotos`; associados e patrimônio guardam apenas `foto_id`.
+"""
+
+import base64
+import binascii
+import hashlib
+import io
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+LADO_MAXIMO_FOTO = 1024
+LADO_MINIATURA = 160
+QUALIDADE_JPEG = 85
+PIXELS_MAXIMOS = 40_000_000
+TIPO_MIME_FOTO = "image/jpeg"
+
+# Tabelas cujas linhas apontam para uma foto; os nomes entram no SQL.
+TABELAS_COM_FOTO = {"associados": "foto_base64", "patrimonio": "foto_bem_base64"}
+
+DDL_FOTOS = """
+    CREATE TABLE IF NOT EXISTS fotos (
+        id SERIAL PRIMARY KEY,
+        largura INTEGER NOT NULL,
+        altura INTEGER NOT NULL,
+        sha256 CHAR(64) NOT NULL,
+        imagem BYTEA NOT NULL,
+        miniatura BYTEA NOT NULL,
+        criado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+SQL_INSERIR_FOTO = """
+    INSERT INTO fotos (largura, altura, sha256, imagem, miniatura)
+    VALUES (%s, %s, %s, %s, %s)
+    RETURNING id
+"""
+
+# Fotos sem registro nem solicitação pendente que as referencie: substituídas,
+# de solicitações rejeitadas ou de registros excluídos.
+SQL_REMOVER_FOTOS_ORFAS = """
+    DELETE FROM fotos f
+    WHERE NOT EXISTS (SELECT 1 FROM associados a WHERE a.foto_id = f.id)
+      AND NOT EXISTS (SELECT 1 FROM patrimonio p WHERE p.foto_id = f.id)
+      AND NOT EXISTS (
+          SELECT 1 FROM solicitacoes_alteracao s
+          WHERE s.status = 'PENDENTE'
+            AND s.dados_novos->>'foto_id' = f.id::text
+      )
+"""
+
+
+class FotoInvalida(ValueError):
+    """O conteúdo enviado não é uma imagem aceita."""
+
+
+@dataclass(frozen=True)
+class FotoProcessada:
+    imagem: bytes
+    miniatura: bytes
+    largura: int
+    altura: int
+    sha256: str
+
+
+def _jpeg(imagem):
+    saida = io.BytesIO()
+    imagem.save(saida, format="JPEG", quality=QUALIDADE_JPEG, optimize=True)
+    return saida.getvalue()
+
+
+def processar_foto(conteudo):
+    """Decodifica, corrige a orientação e gera a foto reduzida e a miniatura."""
+    if not conteudo:
+        raise FotoInvalida("Foto vazia.")
+    try:
+        with Image.open(io.BytesIO(conteudo)) as original:
+            largura, altura = original.size
+            if largura * altura > PIXELS_MAXIMOS:
+                raise FotoInvalida("Foto com resolução acima do permitido.")
+            imagem = ImageOps.exif_transpose(original).convert("RGB")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as erro:
+        raise FotoInvalida("Arquivo de imagem inválido.") from erro
+
+    imagem.thumbnail((LADO_MAXIMO_FOTO, LADO_MAXIMO_FOTO), Image.LANCZOS)
+    miniatura = imagem.copy()
+    miniatura.thumbnail((LADO_MINIATURA, LADO_MINIATURA), Image.LANCZOS)
+    reduzida = _jpeg(imagem)
+    return FotoProcessada(
+        imagem=reduzida,
+        miniatura=_jpeg(miniatura),
+        largura=imagem.width,
+        altura=imagem.height,
+        sha256=hashlib.sha256(reduzida).hexdigest(),
+    )
+
+
+def decodificar_data_url(texto):
+    """Bytes de um `data:image/...;base64,...` (ou base64 puro); None se vazio."""
+    texto = (texto or "").strip()
+    if not texto:
+        return None
+    if texto.startswith("data:"):
+        cabecalho, _, texto = texto.partition(",")
+        if ";base64" not in cabecalho:
+            raise FotoInvalida("Foto em formato não suportado.")
+    try:
+        return base64.b64decode(texto, validate=True)
+    except (binascii.Error, ValueError) as erro:
+        raise FotoInvalida("Foto em base64 inválida.") from erro
+
+
+def ler_foto_enviada(data_url, arquivo):
+    """Foto nova já processada: captura da webcam primeiro, depois o upload.
+
+    Retorna None quando nada foi enviado. O processamento acontece antes de a
+    rota abrir a conexão, para não segurar o banco durante o redimensionamento.
+    """
+    conteudo = decodificar_data_url(data_url)
+    if not conteudo and arquivo and arquivo.filename:
+        conteudo = arquivo.read()
+    return processar_foto(conteudo) if conteudo else None
+
+
+def preparar_fotos(cur):
+    """Cria a tabela de fotos e a coluna foto_id nas tabelas que já existem."""
+    cur.execute(DDL_FOTOS)
+    for tabela in TABELAS_COM_FOTO:
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (tabela,))
+        if cur.fetchone()[0]:
+            cur.execute(
+                f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS foto_id INTEGER "
+                "REFERENCES fotos(id) ON DELETE SET NULL"
+            )
+            cur.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{tabela}_foto_id ON {tabela} (foto_id)"
+            )
+
+
+def gravar_foto(cur, foto):
+    """Grava uma FotoProcessada e devolve o id da nova linha em `fotos`."""
+    cur.execute(
+        SQL_INSERIR_FOTO,
+        (foto.largura, foto.altura, foto.sha256, foto.imagem, foto.miniatura),
+    )
+    return cur.fetchone()[0]
+
+
+def migrar_lote_fotos(cur, tabela, apos_id, lote):
+    """Move um lote de fotos base64 de `tabela` para `fotos`.
+
+    Retorna (último id lido ou None no fim, migradas, inválidas). Fotos que não
+    decodificam continuam na coluna antiga para conferência manual.
+    """
+    coluna = TABELAS_COM_FOTO[tabela]
+    cur.execute(
+        f"SELECT id, {coluna} FROM {tabela} "
+        f"WHERE id > %s AND foto_id IS NULL AND COALESCE({coluna}, '') <> '' "
+        "ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED",
+        (apos_id, lote),
+    )
+    linhas = cur.fetchall()
+    migradas = invalidas = 0
+    for id_registro, legado in linhas:
+        try:
+            foto = processar_foto(decodificar_data_url(legado))
+        except FotoInvalida:
+            invalidas += 1
+            continue
+        cur.execute(
+            f"UPDATE {tabela} SET foto_id = %s, {coluna} = NULL WHERE id = %s",
+            (gravar_foto(cur, foto), id_registro),
+        )
+        migradas += 1
+    return (linhas[-1][0] if linhas else None), migradas, invalidas
+
+
+def consultar_foto(cur, tabela, id_registro, id_foto, uvr=None, *, miniatura=False):
+    """(bytes, sha256) da foto atual do registro, ou None.
+
+    Para usuário comum o registro também precisa ser da UVR informada. Em
+    `solicitacoes`, a foto é a proposta pela solicitação pendente `id_registro`.
+    """
+    coluna = "miniatura" if miniatura else "imagem"
+    if tabela == "solicitacoes":
+        sql = (
+            f"SELECT f.{coluna}, f.sha256 FROM solicitacoes_alteracao s "
+            "JOIN fotos f ON f.id::text = s.dados_novos->>'foto_id' "
+            "WHERE s.id = %s AND f.id = %s"
+        )
+    elif tabela in TABELAS_COM_FOTO:
+        sql = (
+            f"SELECT f.{coluna}, f.sha256 FROM {tabela} r JOIN fotos f ON f.id = r.foto_id "
+            "WHERE r.id = %s AND f.id = %s"
+        )
+    else:
+        return None
+    params = [id_registro, id_foto]
+    if uvr is not None:
+        if tabela == "solicitacoes":
+            return None
+        sql += " AND LOWER(TRIM(r.uvr)) = LOWER(TRIM(%s))"
+        params.append(uvr)
+    cur.execute(sql, tuple(params))
+    return cur.fetchone()
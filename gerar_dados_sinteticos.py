@@ -0,0 +1,1002 @@
+"""Popula um PostgreSQL descartável com um conjunto de dados sintético e reprodutível.
+
+O mesmo par (escala, semente) gera sempre as mesmas linhas, com os mesmos IDs,
+no schema legado (`criar_tabelas_se_nao_existir`) ou na baseline controlada
+(M0001–H011), para que benchmarks e conferências de plano de consulta rodem
+sobre dados comparáveis. A distribuição imita a produção: poucas UVRs
+concentram a maior parte do movimento (pesos de Zipf) e algumas contas
+bancárias acompanham todo o período, enquanto as demais abrem depois.
+
+O script nunca usa DATABASE_URL. O banco de destino é informado por
+SINTETICOS_DSN (ou --dsn), precisa estar vazio e deve ser descartável.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import sys
+import uuid
+from dataclasses import dataclass, replace
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+
+CONFIRMACAO_EXIGIDA = "BANCO_DESCARTAVEL"
+ESQUEMAS = ("legado", "baseline")
+DATA_FINAL_PADRAO = date(2026, 6, 30)
+LOTE_PADRAO = 20000
+RAIZ = Path(__file__).resolve().parent
+MIGRACOES_CONTRATOS = RAIZ / "modulos" / "fiscalizacao_contratos" / "migrations"
+CENTAVO = Decimal("0.01")
+
+
+@dataclass(frozen=True)
+class Escala:
+    """Volume e assimetria do conjunto gerado."""
+
+    uvrs: int
+    associados: int
+    cadastros: int
+    transacoes: int
+    contratos: int
+    itens_por_transacao: int = 3
+    contas_por_uvr: int = 3
+    itens_planilha: int = 40
+    anos: int = 6
+    expoente_uvr: float = 1.1
+    fracao_contas_longas: float = 0.34
+
+
+ESCALAS = {
+    "pequena": Escala(uvrs=4, associados=120, cadastros=60, transacoes=2000, contratos=6),
+    "media": Escala(uvrs=12, associados=1000, cadastros=400, transacoes=40000, contratos=40),
+    "producao": Escala(uvrs=40, associados=5000, cadastros=2000, transacoes=300000, contratos=200),
+}
+
+# (tipo, grupo, peso na mistura de NFs, [(subgrupo, item, unidade, preço base)]).
+CATALOGO = (
+    ("Receita", "Papel", 12, [
+        ("Papel", "Papelão ondulado", "kg", "0.45"),
+        ("Papel", "Papel branco", "kg", "0.80"),
+        ("Papel", "Papel misto", "kg", "0.30"),
+    ]),
+    ("Receita", "Plástico", 10, [
+        ("Plástico rígido", "PET cristal", "kg", "2.10"),
+        ("Plástico rígido", "PEAD colorido", "kg", "1.60"),
+        ("Plástico flexível", "Filme plástico", "kg", "0.90"),
+    ]),
+    ("Receita", "Metal", 8, [
+        ("Não ferrosos", "Alumínio latinha", "kg", "5.50"),
+        ("Não ferrosos", "Cobre", "kg", "28.00"),
+        ("Ferrosos", "Sucata ferrosa", "kg", "0.60"),
+    ]),
+    ("Receita", "Vidro", 3, [
+        ("Vidro", "Vidro incolor", "kg", "0.15"),
+        ("Vidro", "Vidro colorido", "kg", "0.10"),
+    ]),
+    ("Receita", "Elétrico ou Eletrônico", 2, [
+        ("Eletrônicos", "Placas eletrônicas", "kg", "9.00"),
+        ("Eletrônicos", "Cabos e fios", "kg", "4.00"),
+    ]),
+    ("Receita", "Não convencionais", 2, [
+        ("Não convencionais", "Embalagem longa vida", "kg", "0.35"),
+        ("Não convencionais", "Isopor", "kg", "0.50"),
+    ]),
+    ("Receita", "Repasses Governamentais", 2, [
+        ("Repasses", "Pagamento por serviço ambiental", "un", "3500.00"),
+    ]),
+    ("Despesa", "Despesas de operação", 30, [
+        ("Operação", "Combustível", "l", "6.20"),
+        ("Operação", "Equipamento de proteção individual", "un", "45.00"),
+        ("Operação", "Bag de ráfia", "un", "18.00"),
+        ("Operação", "Energia elétrica", "un", "900.00"),
+    ]),
+    ("Despesa", "Despesas de manutenção", 11, [
+        ("Manutenção", "Manutenção de prensa", "un", "650.00"),
+        ("Manutenção", "Manutenção de veículo", "un", "1200.00"),
+    ]),
+    ("Despesa", "Rateio dos Associados", 20, [
+        ("Rateio", "Rateio mensal", "un", "1400.00"),
+    ]),
+)
+GRUPO_RATEIO = "Rateio dos Associados"
+BANCOS = (("001", "Banco do Brasil"), ("104", "Caixa Econômica Federal"), ("756", "Sicoob"))
+NOMES = (
+    "Ana", "Antônio", "Beatriz", "Carlos", "Cláudia", "Daniel", "Elaine", "Fábio",
+    "Fernanda", "Francisco", "Gabriela", "José", "Juliana", "Luiz", "Márcia", "Maria",
+    "Paulo", "Raimunda", "Sandra", "Sebastião", "Tereza", "Vanessa",
+)
+SOBRENOMES = (
+    "Almeida", "Barbosa", "Cardoso", "Costa", "Ferreira", "Gomes", "Lima", "Martins",
+    "Oliveira", "Pereira", "Ribeiro", "Rodrigues", "Santos", "Silva", "Souza",
+)
+CIDADES = (("Belo Horizonte", "MG", "30"), ("Contagem", "MG", "32"), ("Betim", "MG", "32"))
+
+TABELAS_CONTRATOS = {
+    "fc_empresas": (
+        "id", "cnpj", "razao_social", "cep", "cidade", "uf", "criado_por_usuario_id",
+    ),
+    "fc_servidores": ("id", "nome", "matricula", "cargo", "criado_por_usuario_id"),
+    "fc_contratos": (
+        "id", "numero_contrato", "objeto", "empresa_id", "valor_original",
+        "data_assinatura", "vigencia_inicio", "vigencia_fim", "situacao",
+        "criado_por_usuario_id",
+    ),
+    "fc_contrato_responsaveis": (
+        "id", "contrato_id", "servidor_id", "tipo_responsabilidade", "titular",
+        "data_inicio", "criado_por_usuario_id",
+    ),
+    "fc_planilhas_orcamentarias": (
+        "id", "contrato_id", "nome", "versao", "tipo_planilha", "data_referencia",
+        "status", "vigente", "criado_por_usuario_id",
+    ),
+    "fc_planilha_itens": (
+        "id", "planilha_id", "ordem", "grupo", "codigo_item", "descricao", "unidade",
+        "quantidade", "valor_unitario", "criado_por_usuario_id",
+    ),
+    "fc_medicoes": (
+        "id", "contrato_id", "numero_medicao", "competencia", "periodo_inicio",
+        "periodo_fim", "servidor_fiscal_id", "data_apresentacao", "status",
+        "valor_bruto", "valor_liquido", "aprovado_em", "servidor_aprovador_id",
+        "aprovado_por_usuario_id", "criado_por_usuario_id",
+    ),
+    "fc_medicao_itens": (
+        "id", "medicao_id", "planilha_item_id", "ordem", "codigo_item", "descricao",
+        "unidade", "quantidade_prevista", "quantidade_medida", "preco_unitario",
+        "valor_medido", "criado_por_usuario_id",
+    ),
+}
+
+# Ordem de gravação: toda tabela vem depois das que ela referencia.
+TABELAS = {
+    "legado": {
+        "cadastros": (
+            "id", "uvr", "associacao", "data_hora_cadastro", "razao_social", "cnpj", "cep",
+            "cidade", "uf", "telefone", "tipo_atividade", "tipo_cadastro",
+        ),
+        "associados": (
+            "id", "numero", "uvr", "associacao", "nome", "cpf", "rg", "data_nascimento",
+            "data_admissao", "status", "cep", "cidade", "uf", "telefone", "data_hora_cadastro",
+        ),
+        "subgrupos": ("id", "nome", "atividade_pai"),
+        "produtos_servicos": (
+            "id", "tipo", "tipo_atividade", "grupo", "subgrupo", "item",
+            "data_hora_cadastro", "id_subgrupo",
+        ),
+        "contas_correntes": (
+            "id", "uvr", "associacao", "banco_codigo", "banco_nome", "agencia",
+            "conta_corrente", "descricao_conta", "data_hora_cadastro",
+        ),
+        "transacoes_financeiras": (
+            "id", "uvr", "associacao", "id_cadastro_origem", "nome_cadastro_origem",
+            "numero_documento", "data_documento", "tipo_transacao", "tipo_atividade",
+            "valor_total_documento", "data_hora_registro", "valor_pago_recebido",
+            "status_pagamento",
+        ),
+        "itens_transacao": (
+            "id", "id_transacao", "descricao", "unidade", "quantidade", "valor_unitario",
+            "valor_total_item",
+        ),
+        "fluxo_caixa": (
+            "id", "uvr", "associacao", "tipo_movimentacao", "id_cadastro_cf",
+            "nome_cadastro_cf", "id_conta_corrente", "numero_documento_bancario",
+            "data_efetiva", "valor_efetivo", "saldo_operacao_calculado",
+            "data_hora_registro_fluxo",
+        ),
+        "fluxo_caixa_transacoes_link": (
+            "id_fluxo_caixa", "id_transacao_financeira", "valor_aplicado_nesta_nf",
+        ),
+        **TABELAS_CONTRATOS,
+    },
+    "baseline": {
+        "associacoes": (
+            "id", "codigo", "nome", "nome_normalizado", "estado", "inicio_data",
+            "criado_por_usuario_id", "atualizado_por_usuario_id",
+        ),
+        "uvrs": (
+            "id", "associacao_id", "codigo", "nome", "nome_normalizado", "estado",
+            "inicio_data", "criado_por_usuario_id", "atualizado_por_usuario_id",
+        ),
+        "naturezas_financeiras": ("id", "codigo", "nome", "nome_normalizado"),
+        "associados": (
+            "id", "numero", "nome", "nome_normalizado", "cpf", "data_nascimento", "telefone",
+            "cep", "cidade", "uf", "estado", "data_admissao", "criado_por_usuario_id",
+            "atualizado_por_usuario_id",
+        ),
+        "associado_associacao_vinculos": (
+            "id", "associado_id", "associacao_id", "tipo_vinculo", "principal",
+            "inicio_data", "estado", "solicitado_por_usuario_id", "aprovado_por_usuario_id",
+            "request_id",
+        ),
+        "associado_uvr_vinculos": (
+            "id", "associado_id", "uvr_id", "tipo_vinculo", "principal", "inicio_data",
+            "estado", "solicitado_por_usuario_id", "aprovado_por_usuario_id", "request_id",
+        ),
+        "contas_financeiras": (
+            "id", "associacao_id", "codigo", "nome", "tipo", "instituicao", "agencia",
+            "conta", "abertura_data", "encerramento_data", "observacoes",
+            "criado_por_usuario_id", "atualizado_por_usuario_id",
+        ),
+        "transacoes_financeiras": (
+            "id", "identificador_publico", "associacao_id", "natureza_id",
+            "conta_financeira_id", "associado_id", "data_documento", "competencia_data",
+            "numero_documento", "contraparte_nome", "valor_total", "estado", "fotografia",
+            "concluida_em", "criado_por_usuario_id", "atualizado_por_usuario_id",
+        ),
+        "transacao_itens": (
+            "id", "transacao_id", "ordem", "descricao_fotografia", "unidade_fotografia",
+            "quantidade", "valor_unitario", "valor_total", "fotografia",
+            "criado_por_usuario_id", "atualizado_por_usuario_id",
+        ),
+        "transacao_rateios_uvr": (
+            "id", "transacao_id", "uvr_id", "modo", "percentual", "criado_por_usuario_id",
+            "atualizado_por_usuario_id", "request_id",
+        ),
+        **TABELAS_CONTRATOS,
+    },
+}
+
+
+def pesos_zipf(quantidade, expoente):
+    """Peso de cada posição; a primeira UVR é a mais movimentada."""
+    return [1 / (posicao + 1) ** expoente for posicao in range(quantidade)]
+
+
+def repartir(total, pesos, minimo=1):
+    """Divide `total` proporcionalmente aos pesos, com ao menos `minimo` por parte."""
+    livre = total - minimo * len(pesos)
+    if livre < 0:
+        raise ValueError("Total insuficiente para o mínimo de cada parte.")
+    soma = sum(pesos)
+    cotas = [livre * peso / soma for peso in pesos]
+    partes = [int(cota) for cota in cotas]
+    restos = sorted(range(len(pesos)), key=lambda i: (partes[i] - cotas[i], i))
+    for indice in restos[:livre - sum(partes)]:
+        partes[indice] += 1
+    return [minimo + parte for parte in partes]
+
+
+def _digito_verificador(digitos, pesos):
+    resto = sum(int(digito) * peso for digito, peso in zip(digitos, pesos)) % 11
+    return "0" if resto < 2 else str(11 - resto)
+
+
+def gerar_cpf(indice):
+    """CPF válido e único por índice; o passo primo com 10^9 evita sequências óbvias."""
+    base = f"{(indice * 7919 + 104729) % 10 ** 9:09d}"
+    base += _digito_verificador(base, range(10, 1, -1))
+    return base + _digito_verificador(base, range(11, 1, -1))
+
+
+def gerar_cnpj(indice):
+    """CNPJ válido e único por índice, sempre da matriz (0001)."""
+    base = f"{(indice * 7907 + 15485863) % 10 ** 8:08d}0001"
+    base += _digito_verificador(base, (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2))
+    return base + _digito_verificador(base, (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2))
+
+
+def _uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _dinheiro(rng, minimo, maximo):
+    """Valor uniforme em centavos; Decimal exato, sem arredondamento de float."""
+    return Decimal(rng.randrange(int(minimo * 100), int(maximo * 100) + 1)) / 100
+
+
+def _primeiro_dia(dia):
+    return dia.replace(day=1)
+
+
+def _meses_depois(dia, meses):
+    ano, mes = divmod(dia.month - 1 + meses, 12)
+    return date(dia.year + ano, mes + 1, 1)
+
+
+def _json_ordenado(valor):
+    return json.dumps(valor, ensure_ascii=False, sort_keys=True)
+
+
+def _normalizar(texto):
+    return " ".join(texto.lower().split())
+
+
+class GeradorSintetico:
+    """Monta as entidades do conjunto independentemente do schema de destino.
+
+    Cada família de dados tem o próprio gerador pseudoaleatório, derivado da
+    semente e do nome da família, para que aumentar o volume de uma delas não
+    altere as demais.
+    """
+
+    def __init__(self, escala, semente, data_final=DATA_FINAL_PADRAO):
+        if escala.uvrs < 1 or escala.transacoes < 1 or escala.contas_por_uvr < 1:
+            raise ValueError("A escala precisa de ao menos uma UVR, uma conta e uma NF.")
+        if escala.associados < escala.uvrs or escala.cadastros < 2 * escala.uvrs:
+            raise ValueError("Cada UVR precisa de um associado, um cliente e um fornecedor.")
+        self.escala = escala
+        self.semente = semente
+        self.data_final = data_final
+        self.data_inicial = date(data_final.year - escala.anos, data_final.month, 1)
+        self.pesos_uvr = pesos_zipf(escala.uvrs, escala.expoente_uvr)
+        self.uvrs = [
+            {"id": i + 1, "codigo": f"UVR {i + 1:02d}", "associacao": f"Associação {i + 1:02d}"}
+            for i in range(escala.uvrs)
+        ]
+        self.catalogo = self._montar_catalogo()
+        self.associados = self._gerar_associados()
+        self.cadastros = self._gerar_cadastros()
+        self.contas = self._gerar_contas()
+        self.contas_uvr = {}
+        for conta in self.contas:
+            self.contas_uvr.setdefault(conta["uvr"]["id"], []).append(conta)
+
+    def rng(self, familia):
+        return random.Random(f"{self.semente}:{familia}")
+
+    def _data(self, rng, inicio=None):
+        inicio = inicio or self.data_inicial
+        return inicio + timedelta(days=rng.randrange((self.data_final - inicio).days + 1))
+
+    def _nome_pessoa(self, rng):
+        return f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+
+    def _montar_catalogo(self):
+        grupos, subgrupos, itens = [], {}, []
+        for tipo, grupo, peso, produtos in CATALOGO:
+            grupos.append({"tipo": tipo, "grupo": grupo, "peso": peso, "itens": []})
+            for subgrupo, item, unidade, preco in produtos:
+                id_subgrupo = subgrupos.setdefault((subgrupo, grupo), len(subgrupos) + 1)
+                produto = {
+                    "id": len(itens) + 1, "tipo": tipo, "grupo": grupo, "subgrupo": subgrupo,
+                    "id_subgrupo": id_subgrupo, "item": item, "unidade": unidade,
+                    "preco": Decimal(preco),
+                }
+                itens.append(produto)
+                grupos[-1]["itens"].append(produto)
+        return {"grupos": grupos, "subgrupos": subgrupos, "itens": itens}
+
+    def _gerar_associados(self):
+        rng = self.rng("associados")
+        associados, indice = [], 0
+        por_uvr = repartir(self.escala.associados, self.pesos_uvr)
+        for uvr, quantidade in zip(self.uvrs, por_uvr):
+            for numero in range(1, quantidade + 1):
+                indice += 1
+                cidade, uf, prefixo_cep = rng.choice(CIDADES)
+                associados.append({
+                    "id": indice,
+                    "uvr": uvr,
+                    "numero": f"{uvr['id']:02d}-{numero:05d}",
+                    "nome": self._nome_pessoa(rng),
+                    "cpf": gerar_cpf(indice),
+                    "rg": f"MG{rng.randrange(10 ** 7, 10 ** 8)}",
+                    "nascimento": date(rng.randrange(1955, 2004), rng.randrange(1, 13), rng.randrange(1, 29)),
+                    "admissao": self._data(rng),
+                    "ativo": rng.random() < 0.9,
+                    "cep": f"{prefixo_cep}{rng.randrange(10 ** 5, 10 ** 6):06d}",
+                    "cidade": cidade,
+                    "uf": uf,
+                    "telefone": f"31{rng.randrange(900000000, 1000000000)}",
+                })
+        return associados
+
+    def _gerar_cadastros(self):
+        rng = self.rng("cadastros")
+        cadastros, indice = [], 0
+        por_uvr = repartir(self.escala.cadastros, self.pesos_uvr, minimo=2)
+        receitas = [g for g in self.catalogo["grupos"] if g["tipo"] == "Receita"]
+        despesas = [
+            g for g in self.catalogo["grupos"] if g["tipo"] == "Despesa" and g["grupo"] != GRUPO_RATEIO
+        ]
+        for uvr, quantidade in zip(self.uvrs, por_uvr):
+            for posicao in range(quantidade):
+                indice += 1
+                # As duas primeiras garantem um cliente e um fornecedor por UVR.
+                cliente = posicao == 0 or (posicao > 1 and rng.random() < 0.4)
+                grupo = rng.choice(receitas if cliente else despesas)
+                cidade, uf, prefixo_cep = rng.choice(CIDADES)
+                cadastros.append({
+                    "id": indice,
+                    "uvr": uvr,
+                    "tipo": "Cliente" if cliente else "Fornecedor/Prestador",
+                    "grupo": grupo["grupo"],
+                    "razao_social": f"{rng.choice(SOBRENOMES)} {grupo['grupo']} Ltda {indice:05d}",
+                    "cnpj": gerar_cnpj(indice),
+                    "cep": f"{prefixo_cep}{rng.randrange(10 ** 5, 10 ** 6):06d}",
+                    "cidade": cidade,
+                    "uf": uf,
+                    "telefone": f"31{rng.randrange(30000000, 40000000)}",
+                    "desde": self._data(rng),
+                })
+        return cadastros
+
+    def _gerar_contas(self):
+        """Contas longas existem desde o início e recebem quatro vezes mais movimento."""
+        rng = self.rng("contas")
+        contas, indice = [], 0
+        longas = max(1, round(self.escala.contas_por_uvr * self.escala.fracao_contas_longas))
+        for uvr in self.uvrs:
+            for posicao in range(self.escala.contas_por_uvr):
+                indice += 1
+                codigo, nome = BANCOS[posicao % len(BANCOS)]
+                longa = posicao < longas
+                contas.append({
+                    "id": indice,
+                    "uvr": uvr,
+                    "banco_codigo": codigo,
+                    "banco_nome": nome,
+                    "agencia": f"{rng.randrange(1000, 10000)}",
+                    "conta": f"{indice:06d}-{rng.randrange(10)}",
+                    "abertura": self.data_inicial if longa else self._data(rng),
+                    "longa": longa,
+                    "peso": 4 if longa else 1,
+                })
+        return contas
+
+    def transacoes(self):
+        """NFs em ordem cronológica, cada uma com itens e, se paga, a movimentação."""
+        rng = self.rng("transacoes")
+        escala = self.escala
+        dias = (self.data_final - self.data_inicial).days + 1
+        datas = sorted(rng.randrange(dias) for _ in range(escala.transacoes))
+        acumulado_uvr = [sum(self.pesos_uvr[:i + 1]) for i in range(escala.uvrs)]
+        grupos = self.catalogo["grupos"]
+        acumulado_grupo = [sum(g["peso"] for g in grupos[:i + 1]) for i in range(len(grupos))]
+        associados_uvr, cadastros_uvr = {}, {}
+        for associado in self.associados:
+            associados_uvr.setdefault(associado["uvr"]["id"], []).append(associado)
+        for cadastro in self.cadastros:
+            chave = (cadastro["uvr"]["id"], cadastro["tipo"])
+            cadastros_uvr.setdefault(chave, []).append(cadastro)
+        id_item = id_fluxo = 0
+
+        for id_transacao, deslocamento in enumerate(datas, start=1):
+            uvr = rng.choices(self.uvrs, cum_weights=acumulado_uvr)[0]
+            grupo = rng.choices(grupos, cum_weights=acumulado_grupo)[0]
+            data_documento = self.data_inicial + timedelta(days=deslocamento)
+            cadastro = associado = None
+            if grupo["grupo"] == GRUPO_RATEIO:
+                associado = rng.choice(associados_uvr[uvr["id"]])
+                contraparte = associado["nome"]
+            else:
+                tipo_cadastro = "Cliente" if grupo["tipo"] == "Receita" else "Fornecedor/Prestador"
+                cadastro = rng.choice(cadastros_uvr[(uvr["id"], tipo_cadastro)])
+                contraparte = cadastro["razao_social"]
+
+            itens = []
+            quantidade_itens = 1 if grupo["grupo"] == GRUPO_RATEIO else rng.randint(
+                1, 2 * escala.itens_por_transacao - 1
+            )
+            for _ in range(quantidade_itens):
+                produto = rng.choice(grupo["itens"])
+                if produto["unidade"] == "kg":
+                    quantidade = Decimal(rng.randrange(20000, 3000000)) / 1000
+                else:
+                    quantidade = Decimal(rng.randrange(1, 40))
+                if produto["unidade"] == "un" and produto["preco"] >= 500:
+                    quantidade = Decimal(1)
+                preco = produto["preco"]
+                unitario = _dinheiro(rng, preco * Decimal("0.7"), preco * Decimal("1.3"))
+                id_item += 1
+                itens.append({
+                    "id": id_item,
+                    "produto": produto,
+                    "quantidade": quantidade,
+                    "valor_unitario": unitario,
+                    "valor_total": (quantidade * unitario).quantize(CENTAVO),
+                })
+            total = sum(item["valor_total"] for item in itens)
+
+            pagamento = None
+            sorteio = rng.random()
+            data_pagamento = data_documento + timedelta(days=rng.randrange(0, 46))
+            if sorteio < 0.85 and data_pagamento <= self.data_final:
+                abertas = [c for c in self.contas_uvr[uvr["id"]] if c["abertura"] <= data_pagamento]
+                if abertas:
+                    conta = rng.choices(abertas, weights=[c["peso"] for c in abertas])[0]
+                    valor = total if sorteio < 0.75 else (
+                        total * Decimal(rng.randrange(30, 91)) / 100
+                    ).quantize(CENTAVO)
+                    id_fluxo += 1
+                    pagamento = {
+                        "id": id_fluxo, "conta": conta, "data": data_pagamento, "valor": valor,
+                    }
+
+            yield {
+                "id": id_transacao,
+                "uvr": uvr,
+                "tipo": grupo["tipo"],
+                "grupo": grupo["grupo"],
+                "cadastro": cadastro,
+                "associado": associado,
+                "contraparte": contraparte,
+                "numero_documento": f"NF-{uvr['id']:02d}-{id_transacao:07d}",
+                "data": data_documento,
+                "registro": datetime.combine(data_documento, time(8 + rng.randrange(10), rng.randrange(60))),
+                "itens": itens,
+                "total": total,
+                "pagamento": pagamento,
+                "uuid": _uuid(rng),
+            }
+
+    def contratos(self, usuario_id):
+        """Linhas das tabelas de fiscalização, idênticas nos dois schemas."""
+        rng = self.rng("contratos")
+        escala = self.escala
+        empresas = max(1, escala.contratos // 4)
+        servidores = max(2, escala.contratos // 10)
+        for indice in range(1, empresas + 1):
+            cidade, uf, prefixo_cep = rng.choice(CIDADES)
+            yield "fc_empresas", (
+                indice, gerar_cnpj(10 ** 6 + indice), f"Construtora {rng.choice(SOBRENOMES)} {indice:04d}",
+                f"{prefixo_cep}{rng.randrange(10 ** 5, 10 ** 6):06d}", cidade, uf, usuario_id,
+            )
+        for indice in range(1, servidores + 1):
+            yield "fc_servidores", (
+                indice, self._nome_pessoa(rng), f"M{indice:06d}", "Analista", usuario_id,
+            )
+
+        id_responsavel = id_item_planilha = id_medicao = id_item_medicao = 0
+        for id_contrato in range(1, escala.contratos + 1):
+            inicio = _primeiro_dia(self._data(rng))
+            fim = _meses_depois(inicio, rng.randrange(12, 61)) - timedelta(days=1)
+            meses = 0
+            while _meses_depois(inicio, meses) <= min(fim, self.data_final):
+                meses += 1
+            fiscal, gestor = rng.sample(range(1, servidores + 1), 2)
+
+            itens = []
+            for ordem in range(1, rng.randint(max(1, escala.itens_planilha // 2), escala.itens_planilha) + 1):
+                id_item_planilha += 1
+                itens.append({
+                    "id": id_item_planilha,
+                    "ordem": ordem,
+                    "codigo": f"{ordem // 10 + 1}.{ordem % 10 + 1}",
+                    "descricao": f"Serviço {ordem:03d} do contrato {id_contrato}",
+                    "unidade": rng.choice(("m2", "m3", "h", "un", "t")),
+                    "quantidade": Decimal(rng.randrange(50, 5000)),
+                    "valor_unitario": _dinheiro(rng, 10, 900),
+                })
+            valor = sum((item["quantidade"] * item["valor_unitario"]).quantize(CENTAVO) for item in itens)
+
+            yield "fc_contratos", (
+                id_contrato, f"{id_contrato:04d}/{inicio.year}",
+                f"Serviços de coleta e triagem — lote {id_contrato}", rng.randint(1, empresas),
+                valor, inicio - timedelta(days=rng.randrange(5, 30)), inicio, fim,
+                "Vigente" if fim >= self.data_final else "Encerrado", usuario_id,
+            )
+            for servidor, tipo in ((gestor, "Gestor"), (fiscal, "Fiscal titular")):
+                id_responsavel += 1
+                yield "fc_contrato_responsaveis", (
+                    id_responsavel, id_contrato, servidor, tipo, True, inicio, usuario_id,
+                )
+            yield "fc_planilhas_orcamentarias", (
+                id_contrato, id_contrato, "Planilha original", 1, "Original", inicio,
+                "Consolidada", True, usuario_id,
+            )
+            for item in itens:
+                yield "fc_planilha_itens", (
+                    item["id"], id_contrato, item["ordem"], f"Grupo {item['ordem'] // 10 + 1}",
+                    item["codigo"], item["descricao"], item["unidade"], item["quantidade"],
+                    item["valor_unitario"], usuario_id,
+                )
+
+            for numero in range(1, meses + 1):
+                competencia = _meses_depois(inicio, numero - 1)
+                periodo_fim = min(_meses_depois(competencia, 1) - timedelta(days=1), fim)
+                aprovada = numero < meses or competencia < _primeiro_dia(self.data_final)
+                id_medicao += 1
+                medidos, bruto = [], Decimal(0)
+                amostra = rng.sample(itens, min(len(itens), rng.randint(3, 15)))
+                for ordem, item in enumerate(sorted(amostra, key=lambda i: i["ordem"]), start=1):
+                    # Até 10% do previsto por mês, sem exigir justificativa de excedente.
+                    fracao = Decimal(rng.randrange(1, 1001)) / 10000
+                    medida = (item["quantidade"] * fracao).quantize(Decimal("0.001"))
+                    valor_medido = (medida * item["valor_unitario"]).quantize(CENTAVO)
+                    bruto += valor_medido
+                    id_item_medicao += 1
+                    medidos.append((
+                        id_item_medicao, id_medicao, item["id"], ordem, item["codigo"],
+                        item["descricao"], item["unidade"], item["quantidade"], medida,
+                        item["valor_unitario"], valor_medido, usuario_id,
+                    ))
+                aprovacao = datetime.combine(periodo_fim + timedelta(days=10), time(14)) if aprovada else None
+                yield "fc_medicoes", (
+                    id_medicao, id_contrato, numero, competencia, competencia, periodo_fim,
+                    fiscal, periodo_fim + timedelta(days=5),
+                    "Aprovada" if aprovada else "Em análise", bruto, bruto, aprovacao,
+                    gestor if aprovada else None, usuario_id if aprovada else None, usuario_id,
+                )
+                for linha in medidos:
+                    yield "fc_medicao_itens", linha
+
+
+def linhas_legado(gerador, usuario_id):
+    """Gera (tabela, linha) do schema legado na ordem de TABELAS['legado']."""
+    cadastro_em = datetime.combine(gerador.data_inicial, time(9))
+    for cadastro in gerador.cadastros:
+        yield "cadastros", (
+            cadastro["id"], cadastro["uvr"]["codigo"], cadastro["uvr"]["associacao"],
+            datetime.combine(cadastro["desde"], time(9)), cadastro["razao_social"],
+            cadastro["cnpj"], cadastro["cep"], cadastro["cidade"], cadastro["uf"],
+            cadastro["telefone"], cadastro["grupo"], cadastro["tipo"],
+        )
+    for associado in gerador.associados:
+        yield "associados", (
+            associado["id"], associado["numero"], associado["uvr"]["codigo"],
+            associado["uvr"]["associacao"], associado["nome"], associado["cpf"], associado["rg"],
+            associado["nascimento"], associado["admissao"],
+            "Ativo" if associado["ativo"] else "Inativo", associado["cep"], associado["cidade"],
+            associado["uf"], associado["telefone"], datetime.combine(associado["admissao"], time(9)),
+        )
+    for (subgrupo, grupo), id_subgrupo in gerador.catalogo["subgrupos"].items():
+        yield "subgrupos", (id_subgrupo, subgrupo, grupo)
+    for produto in gerador.catalogo["itens"]:
+        yield "produtos_servicos", (
+            produto["id"], produto["tipo"], produto["grupo"], produto["grupo"],
+            produto["subgrupo"], produto["item"], cadastro_em, produto["id_subgrupo"],
+        )
+    for conta in gerador.contas:
+        yield "contas_correntes", (
+            conta["id"], conta["uvr"]["codigo"], conta["uvr"]["associacao"], conta["banco_codigo"],
+            conta["banco_nome"], conta["agencia"], conta["conta"],
+            "Conta principal" if conta["longa"] else "Conta secundária",
+            datetime.combine(conta["abertura"], time(9)),
+        )
+
+    for nf in gerador.transacoes():
+        pagamento = nf["pagamento"]
+        pago = pagamento["valor"] if pagamento else Decimal("0.00")
+        if not pagamento:
+            status = "Aberto"
+        elif pago == nf["total"]:
+            status = "Liquidado"
+        else:
+            status = "Parcialmente Pago/Recebido"
+        yield "transacoes_financeiras", (
+            nf["id"], nf["uvr"]["codigo"], nf["uvr"]["associacao"],
+            nf["cadastro"]["id"] if nf["cadastro"] else None, nf["contraparte"],
+            nf["numero_documento"], nf["data"], nf["tipo"], nf["grupo"], nf["total"],
+            nf["registro"], pago, status,
+        )
+        for item in nf["itens"]:
+            yield "itens_transacao", (
+                item["id"], nf["id"], item["produto"]["item"], item["produto"]["unidade"],
+                item["quantidade"], item["valor_unitario"], item["valor_total"],
+            )
+        if pagamento:
+            # O saldo acumulado é calculado depois da carga, em ordem de data.
+            yield "fluxo_caixa", (
+                pagamento["id"], nf["uvr"]["codigo"], nf["uvr"]["associacao"],
+                "Recebimento" if nf["tipo"] == "Receita" else "Pagamento",
+                nf["cadastro"]["id"] if nf["cadastro"] else None, nf["contraparte"],
+                pagamento["conta"]["id"], f"DOC-{pagamento['id']:07d}", pagamento["data"],
+                pagamento["valor"], Decimal("0.00"), datetime.combine(pagamento["data"], time(16)),
+            )
+            yield "fluxo_caixa_transacoes_link", (pagamento["id"], nf["id"], pagamento["valor"])
+
+    yield from gerador.contratos(usuario_id)
+
+
+def linhas_baseline(gerador, usuario_id):
+    """Gera (tabela, linha) da baseline controlada na ordem de TABELAS['baseline'].
+
+    A baseline não tem fluxo de caixa: a conta fica na própria NF e a UVR
+    entra pelo rateio de 100%.
+    """
+    rng = gerador.rng("baseline")
+    for uvr in gerador.uvrs:
+        yield "associacoes", (
+            uvr["id"], f"ASSOC-{uvr['id']:03d}", uvr["associacao"], _normalizar(uvr["associacao"]),
+            "ATIVA", gerador.data_inicial, usuario_id, usuario_id,
+        )
+    for uvr in gerador.uvrs:
+        yield "uvrs", (
+            uvr["id"], uvr["id"], uvr["codigo"], uvr["codigo"], _normalizar(uvr["codigo"]),
+            "ATIVA", gerador.data_inicial, usuario_id, usuario_id,
+        )
+    naturezas = {}
+    for grupo in gerador.catalogo["grupos"]:
+        naturezas[grupo["grupo"]] = len(naturezas) + 1
+        yield "naturezas_financeiras", (
+            naturezas[grupo["grupo"]], f"{grupo['tipo'].upper()}-{len(naturezas):02d}",
+            grupo["grupo"], _normalizar(grupo["grupo"]),
+        )
+    for associado in gerador.associados:
+        yield "associados", (
+            associado["id"], associado["numero"], associado["nome"], _normalizar(associado["nome"]),
+            associado["cpf"], associado["nascimento"], associado["telefone"], associado["cep"],
+            associado["cidade"], associado["uf"], "ATIVO" if associado["ativo"] else "INATIVO",
+            associado["admissao"], usuario_id, usuario_id,
+        )
+    for tabela in ("associado_associacao_vinculos", "associado_uvr_vinculos"):
+        for associado in gerador.associados:
+            yield tabela, (
+                associado["id"], associado["id"], associado["uvr"]["id"], "ASSOCIADO", True,
+                associado["admissao"], "ATIVO" if associado["ativo"] else "ENCERRADO",
+                usuario_id, usuario_id, _uuid(rng),
+            )
+    for conta in gerador.contas:
+        yield "contas_financeiras", (
+            conta["id"], conta["uvr"]["id"], f"CC-{conta['id']:05d}",
+            f"{conta['banco_nome']} {conta['conta']}", "CONTA_CORRENTE", conta["banco_nome"],
+            conta["agencia"], conta["conta"], conta["abertura"], date(9999, 12, 31),
+            "Conta longa" if conta["longa"] else "Conta aberta durante o período",
+            usuario_id, usuario_id,
+        )
+
+    for nf in gerador.transacoes():
+        pagamento = nf["pagamento"]
+        # NF em aberto fica na conta mais antiga da UVR.
+        conta = (pagamento["conta"] if pagamento else gerador.contas_uvr[nf["uvr"]["id"]][0])["id"]
+        concluida = datetime.combine(pagamento["data"], time(16)) if pagamento else None
+        yield "transacoes_financeiras", (
+            nf["id"], nf["uuid"], nf["uvr"]["id"], naturezas[nf["grupo"]], conta,
+            nf["associado"]["id"] if nf["associado"] else None, nf["data"],
+            _primeiro_dia(nf["data"]), nf["numero_documento"], nf["contraparte"], nf["total"],
+            "CONCLUIDA" if pagamento else "RASCUNHO",
+            _json_ordenado({"origem": "sintetico", "tipo": nf["tipo"], "grupo": nf["grupo"]}),
+            concluida, usuario_id, usuario_id,
+        )
+        for ordem, item in enumerate(nf["itens"], start=1):
+            yield "transacao_itens", (
+                item["id"], nf["id"], ordem, item["produto"]["item"], item["produto"]["unidade"],
+                item["quantidade"], item["valor_unitario"], item["valor_total"],
+                _json_ordenado({"produto_id": item["produto"]["id"]}), usuario_id, usuario_id,
+            )
+        yield "transacao_rateios_uvr", (
+            nf["id"], nf["id"], nf["uvr"]["id"], "PERCENTUAL", Decimal("100"),
+            usuario_id, usuario_id, _uuid(rng),
+        )
+
+    yield from gerador.contratos(usuario_id)
+
+
+def _celula(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, bool):
+        return "t" if valor else "f"
+    return str(valor)
+
+
+class CargaCopy:
+    """Acumula linhas por tabela e grava em lotes com COPY ... FROM STDIN.
+
+    Um lote descarrega todas as tabelas na ordem declarada, de modo que as
+    referências de cada linha já existam quando ela chega ao banco.
+    """
+
+    def __init__(self, cursor, tabelas, lote=LOTE_PADRAO):
+        self.cursor = cursor
+        self.tabelas = tabelas
+        self.lote = lote
+        self.buffers = {tabela: [] for tabela in tabelas}
+        self.contagem = dict.fromkeys(tabelas, 0)
+        self.pendentes = 0
+
+    def adicionar(self, tabela, linha):
+        self.buffers[tabela].append(linha)
+        self.pendentes += 1
+        if self.pendentes >= self.lote:
+            self.descarregar()
+
+    def descarregar(self):
+        from psycopg2 import sql
+
+        for tabela, linhas in self.buffers.items():
+            if not linhas:
+                continue
+            texto = io.StringIO()
+            escritor = csv.writer(texto, lineterminator="\n")
+            for linha in linhas:
+                escritor.writerow([_celula(valor) for valor in linha])
+            texto.seek(0)
+            comando = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+                sql.Identifier(tabela),
+                sql.SQL(", ").join(map(sql.Identifier, self.tabelas[tabela])),
+            )
+            self.cursor.copy_expert(comando, texto)
+            self.contagem[tabela] += len(linhas)
+            linhas.clear()
+        self.pendentes = 0
+
+
+def preparar_esquema(conexao, esquema):
+    """Cria o schema pedido no banco vazio; o legado exige DATABASE_URL apontando para ele."""
+    if esquema == "legado":
+        from migrations_control.historical_sql import adaptar_wrapper_historico
+        import app as app_module
+
+        app_module.criar_tabelas_se_nao_existir()
+        with conexao.cursor() as cur:
+            for arquivo in sorted(MIGRACOES_CONTRATOS.glob("*.sql")):
+                cur.execute(adaptar_wrapper_historico(arquivo.read_text(encoding="utf-8")))
+        conexao.commit()
+        return
+
+    from migrations_control.runner import MigrationRunner
+
+    with conexao.cursor() as cur:
+        cur.execute("SELECT to_regclass('public.schema_migrations') IS NOT NULL")
+        existente = cur.fetchone()[0]
+    conexao.rollback()
+    if existente:
+        return
+    runner = MigrationRunner(conexao, event_logger=lambda *args, **kwargs: None)
+    for etapa in (runner.executar, runner.executar_cadeia_controlada):
+        resultado = etapa()
+        if not resultado.sucesso:
+            raise RuntimeError(f"Falha ao aplicar a baseline: {resultado.mensagem}")
+
+
+def _criar_usuario(cur, esquema):
+    if esquema == "legado":
+        cur.execute(
+            """
+            INSERT INTO usuarios (username, password_hash, nome_completo, role, ativo)
+            VALUES ('carga.sintetica', '!', 'Carga sintética', 'admin', FALSE)
+            RETURNING id
+            """
+        )
+    else:
+        cur.execute(
+            """
+            INSERT INTO usuarios
+            (username, username_normalizado, password_hash, nome_completo, estado, exige_troca_senha)
+            VALUES ('carga.sintetica', 'carga.sintetica', '!', 'Carga sintética', 'INATIVO', FALSE)
+            RETURNING id
+            """
+        )
+    return cur.fetchone()[0]
+
+
+def _pos_carga_legado(cur):
+    """Saldos por operação, alocação por item e fechamentos mensais, como após uma carga externa."""
+    import app as app_module
+
+    cur.execute(
+        f"""
+        UPDATE fluxo_caixa f
+        SET saldo_operacao_calculado = calculo.saldo
+        FROM (
+            SELECT fc.id, SUM({app_module.VALOR_COM_SINAL_FLUXO}) OVER (
+                PARTITION BY fc.id_conta_corrente ORDER BY fc.data_efetiva, fc.id
+            ) AS saldo
+            FROM fluxo_caixa fc
+        ) calculo
+        WHERE calculo.id = f.id
+        """
+    )
+    app_module._atualizar_alocacao_pagamentos(cur)
+    cur.execute("DELETE FROM saldos_conta_mensais")
+    cur.execute(app_module.SQL_RECONSTRUIR_SALDOS_CONTA)
+
+
+def semear(conexao, esquema, escala, semente, *, data_final=DATA_FINAL_PADRAO, lote=LOTE_PADRAO):
+    """Grava o conjunto em uma única transação e devolve as linhas por tabela."""
+    from psycopg2 import sql
+
+    tabelas = TABELAS[esquema]
+    gerador = GeradorSintetico(escala, semente, data_final)
+    with conexao.cursor() as cur:
+        for tabela in ("transacoes_financeiras", "associados", "fc_contratos"):
+            cur.execute(sql.SQL("SELECT EXISTS (SELECT 1 FROM {})").format(sql.Identifier(tabela)))
+            if cur.fetchone()[0]:
+                raise RuntimeError(f"O banco de destino já tem dados em {tabela}.")
+        usuario_id = _criar_usuario(cur, esquema)
+        carga = CargaCopy(cur, tabelas, lote)
+        linhas = linhas_legado if esquema == "legado" else linhas_baseline
+        for tabela, linha in linhas(gerador, usuario_id):
+            carga.adicionar(tabela, linha)
+        carga.descarregar()
+        for tabela, colunas in tabelas.items():
+            if colunas[0] != "id":
+                continue
+            cur.execute(
+                sql.SQL(
+                    "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    "GREATEST((SELECT MAX(id) FROM {}), 1))"
+                ).format(sql.Identifier(tabela)),
+                (tabela,),
+            )
+        if esquema == "legado":
+            _pos_carga_legado(cur)
+    conexao.commit()
+    conexao.autocommit = True
+    try:
+        with conexao.cursor() as cur:
+            cur.execute("ANALYZE")
+    finally:
+        conexao.autocommit = False
+    return carga.contagem
+
+
+def executar(dsn, esquema, escala, semente, data_final=DATA_FINAL_PADRAO):
+    import secrets
+
+    import psycopg2
+
+    os.environ.update({
+        "APP_ENV": "testing",
+        "SECRET_KEY": secrets.token_urlsafe(32),
+        "DATABASE_URL": dsn,
+        "RATELIMIT_ENABLED": "false",
+    })
+    conexao = psycopg2.connect(dsn)
+    try:
+        preparar_esquema(conexao, esquema)
+        contagem = semear(conexao, esquema, escala, semente, data_final=data_final)
+    finally:
+        conexao.close()
+    for tabela, quantidade in contagem.items():
+        print(f"{tabela:<32} {quantidade:>10}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Popula um banco vazio e descartável com dados sintéticos reprodutíveis "
+            "no schema legado ou na baseline controlada."
+        )
+    )
+    parser.add_argument("--dsn", default=os.getenv("SINTETICOS_DSN"))
+    parser.add_argument("--esquema", choices=ESQUEMAS, default="legado")
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="pequena")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--uvrs", type=int)
+    parser.add_argument("--associados", type=int)
+    parser.add_argument("--cadastros", type=int)
+    parser.add_argument("--transacoes", type=int)
+    parser.add_argument("--contratos", type=int)
+    parser.add_argument("--anos", type=int)
+    parser.add_argument(
+        "--expoente-uvr", type=float,
+        help="Assimetria entre UVRs (0 = uniforme; maior concentra nas primeiras).",
+    )
+    parser.add_argument(
+        "--fracao-contas-longas", type=float,
+        help="Fração das contas de cada UVR abertas desde o início do período.",
+    )
+    parser.add_argument("--data-final", type=date.fromisoformat, default=DATA_FINAL_PADRAO)
+    parser.add_argument(
+        "--confirmar",
+        help=f"Informe exatamente {CONFIRMACAO_EXIGIDA} para prosseguir.",
+    )
+    argumentos = parser.parse_args()
+    if argumentos.confirmar != CONFIRMACAO_EXIGIDA:
+        parser.error("Confirmação inválida; nenhum dado foi gravado.")
+    if not argumentos.dsn:
+        parser.error("Informe SINTETICOS_DSN ou --dsn.")
+    if argumentos.dsn == os.getenv("DATABASE_URL"):
+        parser.error("A carga sintética não pode usar o mesmo DSN de DATABASE_URL.")
+
+    ajustes = {
+        campo: valor
+        for campo in (
+            "uvrs", "associados", "cadastros", "transacoes", "contratos", "anos",
+            "expoente_uvr", "fracao_contas_longas",
+        )
+        if (valor := getattr(argumentos, campo)) is not None
+    }
+    escala = replace(ESCALAS[argumentos.escala], **ajustes)
+    if escala.expoente_uvr < 0 or not 0 <= escala.fracao_contas_longas <= 1 or escala.anos < 1:
+        parser.error("Use --expoente-uvr >= 0, --fracao-contas-longas entre 0 e 1 e --anos >= 1.")
+    try:
+        GeradorSintetico(escala, argumentos.semente, argumentos.data_final)
+    except ValueError as erro:
+        parser.error(str(erro))
+
+    sys.exit(executar(argumentos.dsn, argumentos.esquema, escala, argumentos.semente, argumentos.data_final))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 """Configuração explícita e validada para o Gunicorn no ambiente online."""
 
 import os
+import tempfile
 
 
 AMBIENTES_GUNICORN = {"homologation", "production"}
@@ -57,6 +58,40 @@ graceful_timeout = _inteiro_ambiente(
 )
 keepalive = 5
 
+# Cada worker mantém um pool próprio; o teto padrão acompanha as threads, pois
+# cada thread usa no máximo uma conexão por vez.
+db_pool_max = _inteiro_ambiente(
+    "DB_POOL_MAX",
+    padrao=threads,
+    minimo=1,
+    maximo=64,
+)
+db_max_connections = _inteiro_ambiente(
+    "DB_MAX_CONNECTIONS",
+    padrao=workers * db_pool_max,
+    minimo=1,
+    maximo=10000,
+)
+if workers * db_pool_max > db_max_connections:
+    raise RuntimeError(
+        "WEB_CONCURRENCY x DB_POOL_MAX excede DB_MAX_CONNECTIONS."
+    )
+# Os workers herdam o ambiente do processo principal e dimensionam o pool igual.
+os.environ["GUNICORN_THREADS"] = str(threads)
+os.environ["DB_POOL_MAX"] = str(db_pool_max)
+
+# /metrics numa porta própria, servida pelo processo principal; veja metricas.py.
+metrics_port = None
+if (os.getenv("METRICS_PORT") or "").strip():
+    metrics_port = _inteiro_ambiente("METRICS_PORT", minimo=1, maximo=65535)
+    if metrics_port == porta:
+        raise RuntimeError("METRICS_PORT deve ser diferente de PORT.")
+    metrics_token = (os.getenv("METRICS_TOKEN") or "").strip()
+    if len(metrics_token) < 32:
+        raise RuntimeError("METRICS_TOKEN deve ter ao menos 32 caracteres.")
+    if not (os.getenv("METRICS_DIR") or "").strip():
+        os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="recic3-metricas-")
+
 preload_app = False
 reload = False
 daemon = False
@@ -73,3 +108,33 @@ loglevel = "info"
 capture_output = True
 access_log_format = '%(t)s %(p)s %(h)s "%(m)s %(U)s" %(s)s %(L)s'
 proc_name = "sistema-recic3"
+
+
+def when_ready(server):
+    """Inicia o exportador de métricas depois que o servidor abriu a porta."""
+    if metrics_port is None:
+        return
+    from metricas import iniciar_exportador, preparar_pasta
+
+    pasta = preparar_pasta(os.environ["METRICS_DIR"])
+    iniciar_exportador(pasta, metrics_port, metrics_token)
+
+
+def post_fork(server, worker):
+    """O worker não atende /metrics; fecha a cópia herdada do socket."""
+    if metrics_port is None:
+        return
+    from metricas import fechar_exportador_herdado
+
+    fechar_exportador_herdado()
+
+
+def worker_exit(server, worker):
+    """Fecha as conexões ociosas do pool e guarda as métricas do worker."""
+    from banco_dados import encerrar_pools
+
+    encerrar_pools()
+    if metrics_port is not None:
+        from metricas import REGISTRO
+
+        REGISTRO.consolidar()
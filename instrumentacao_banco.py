@@ -0,0 +1,355 @@
+"""Tempo de banco e número de consultas de cada requisição.
+
+Os cursores entregues por `conectar_banco()`, inclusive aos serviços da
+fiscalização, que recebem a mesma função, passam por `CursorInstrumentado`, que
+mede cada execute. No fim da requisição, `request_completed` recebe
+`db_queries` e `db_time_ms`; fora de produção a resposta leva também o
+cabeçalho `Server-Timing`, que o navegador mostra na aba de rede.
+
+Um mesmo comando executado mais de `DB_REPEATED_QUERY_THRESHOLD` vezes na
+requisição costuma ser um laço com uma consulta por item (N+1) e gera
+`database_repeated_query` uma vez por comando. Respostas em streaming leem o
+cursor depois do log da requisição e ficam fora da contagem.
+
+Um comando que passa de `DB_SLOW_QUERY_MS` gera `database_slow_query` com a
+impressão digital do SQL normalizado, o que permite somar e ordenar os piores
+comandos pelos logs. Numa fração `DB_SLOW_QUERY_EXPLAIN_RATE` desses casos, o
+plano de `EXPLAIN (FORMAT JSON)` vai junto, com os mesmos parâmetros.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from collections import Counter
+
+import psycopg2
+from flask import current_app, g, has_request_context
+from psycopg2 import extensions
+
+from leitura_ambiente import ler_inteiro
+from logging_operacional import redigir_dados, registrar_evento
+
+
+LIMITE_REPETICOES_PADRAO = 10
+LIMITE_REPETICOES_MAXIMO = 1000
+CONSULTA_LENTA_PADRAO_MS = 500
+CONSULTA_LENTA_MAXIMO_MS = 600000
+TAMANHO_MAXIMO_COMANDO_LOG = 200
+TAMANHO_IMPRESSAO_DIGITAL = 16
+# Só leituras recebem EXPLAIN; sem ANALYZE o comando não é executado de novo.
+PADRAO_LEITURA = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+PADRAO_COMENTARIO = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+PADRAO_LITERAL_TEXTO = re.compile(r"'(?:[^']|'')*'")
+PADRAO_MARCADOR = re.compile(r"%\([^)]*\)s|%s")
+PADRAO_NUMERO = re.compile(r"(?<![\w.$])-?\d+(?:\.\d+)?(?![\w.])")
+PADRAO_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def _ler_fracao(nome):
+    valor = os.getenv(nome)
+    if valor is None or not valor.strip():
+        return 0.0
+    try:
+        fracao = float(valor.strip())
+    except ValueError as erro:
+        raise RuntimeError(f"{nome} deve ser um número entre 0 e 1.") from erro
+    if not 0 <= fracao <= 1:
+        raise RuntimeError(f"{nome} está fora do intervalo permitido.")
+    return fracao
+
+
+def ler_configuracao_instrumentacao(ambiente):
+    """Limites 0 desativam os avisos de repetição e de lentidão; a contagem continua."""
+    return {
+        "limite_repeticoes": ler_inteiro(
+            "DB_REPEATED_QUERY_THRESHOLD",
+            padrao=LIMITE_REPETICOES_PADRAO,
+            minimo=0,
+            maximo=LIMITE_REPETICOES_MAXIMO,
+        ),
+        "lenta_ms": ler_inteiro(
+            "DB_SLOW_QUERY_MS",
+            padrao=CONSULTA_LENTA_PADRAO_MS,
+            minimo=0,
+            maximo=CONSULTA_LENTA_MAXIMO_MS,
+        ),
+        "amostra_explain": _ler_fracao("DB_SLOW_QUERY_EXPLAIN_RATE"),
+        "server_timing": ambiente != "production",
+    }
+
+
+def _sql_original(comando):
+    if isinstance(comando, bytes):
+        return comando.decode("utf-8", "replace")
+    if not isinstance(comando, str):
+        return repr(comando)
+    return comando
+
+
+def _texto_comando(comando):
+    return " ".join(_sql_original(comando).split())
+
+
+def normalizar_comando(comando):
+    """SQL sem comentários e com literais, marcadores e listas trocados por `?`."""
+    texto = PADRAO_COMENTARIO.sub(" ", _sql_original(comando))
+    texto = PADRAO_LITERAL_TEXTO.sub("?", texto)
+    texto = PADRAO_MARCADOR.sub("?", texto)
+    texto = PADRAO_NUMERO.sub("?", texto)
+    texto = PADRAO_LISTA.sub("(?)", texto)
+    return " ".join(texto.split())
+
+
+def impressao_digital(comando_normalizado):
+    resumo = hashlib.sha256(comando_normalizado.encode("utf-8")).hexdigest()
+    return resumo[:TAMANHO_IMPRESSAO_DIGITAL]
+
+
+def _forma_parametro(valor):
+    # Textos podem ser nome, documento ou observação digitada; ficam só o tipo e
+    # o tamanho. Datas, números e ids bastam para reconhecer o filtro usado.
+    if isinstance(valor, (str, bytes)):
+        return f"<{type(valor).__name__}:{len(valor)}>"
+    if isinstance(valor, dict):
+        return {chave: _forma_parametro(item) for chave, item in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_forma_parametro(item) for item in valor]
+    return valor
+
+
+def _resumir_plano(no, nos):
+    resumo = {"node": no.get("Node Type"), "rows": no.get("Plan Rows")}
+    for chave, nome in (("Relation Name", "relation"), ("Index Name", "index")):
+        if no.get(chave):
+            resumo[nome] = no[chave]
+    nos.append(resumo)
+    for filho in no.get("Plans", ()):
+        _resumir_plano(filho, nos)
+    return nos
+
+
+def capturar_plano(cursor, comando, parametros):
+    """Plano estimado da leitura, sem afetar a transação da requisição.
+
+    O EXPLAIN roda num cursor novo, dentro de um savepoint: uma falha volta ao
+    savepoint e a rota segue como se nada tivesse acontecido.
+    """
+    conexao = cursor.connection
+    if (
+        not PADRAO_LEITURA.match(_texto_comando(comando))
+        or conexao.info.transaction_status != extensions.TRANSACTION_STATUS_INTRANS
+    ):
+        return None
+    with conexao.cursor() as auxiliar:
+        auxiliar.execute("SAVEPOINT recic3_explain")
+        try:
+            auxiliar.execute("EXPLAIN (FORMAT JSON) " + _sql_original(comando), parametros)
+            resultado = auxiliar.fetchone()[0]
+        except psycopg2.Error:
+            resultado = None
+            auxiliar.execute("ROLLBACK TO SAVEPOINT recic3_explain")
+        auxiliar.execute("RELEASE SAVEPOINT recic3_explain")
+    if resultado is None:
+        return None
+    if isinstance(resultado, str):
+        resultado = json.loads(resultado)
+    plano = resultado[0]["Plan"]
+    return {
+        "total_cost": plano.get("Total Cost"),
+        "rows": plano.get("Plan Rows"),
+        "nodes": _resumir_plano(plano, []),
+    }
+
+
+class EstatisticasBanco:
+    """Consultas e tempo acumulados pelos cursores de uma requisição."""
+
+    def __init__(self, limite_repeticoes, *, lenta_ms=0, amostra_explain=0.0):
+        self.limite_repeticoes = limite_repeticoes
+        self.lenta_ms = lenta_ms
+        self.amostra_explain = amostra_explain
+        self.consultas = 0
+        self.tempo_ms = 0.0
+        self.repetidos = []
+        self._por_comando = Counter()
+
+    def registrar(self, comando, duracao_s, *, metodo="execute", parametros=None):
+        """Conta o comando; método e parâmetros servem a subclasses como a de planos_consulta."""
+        self.consultas += 1
+        self.tempo_ms += duracao_s * 1000
+        texto = _texto_comando(comando)
+        self._por_comando[texto] += 1
+        if (
+            self.limite_repeticoes
+            and self._por_comando[texto] == self.limite_repeticoes + 1
+        ):
+            self.repetidos.append(texto)
+            registrar_evento(
+                "database_repeated_query",
+                nivel="WARNING",
+                mensagem="Mesmo comando repetido na requisição; possível N+1.",
+                threshold=self.limite_repeticoes,
+                statement=texto[:TAMANHO_MAXIMO_COMANDO_LOG],
+            )
+
+    def campos_log(self):
+        campos = {
+            "db_queries": self.consultas,
+            "db_time_ms": round(self.tempo_ms, 3),
+        }
+        if self.repetidos:
+            campos["db_repeated_statements"] = len(self.repetidos)
+        return campos
+
+
+class CursorInstrumentado:
+    """Encaminha tudo ao cursor real, medindo execute, executemany e callproc."""
+
+    __slots__ = ("_cursor", "_estatisticas")
+
+    def __init__(self, cursor, estatisticas):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_estatisticas", estatisticas)
+
+    def _medir(self, metodo, comando, *argumentos, **opcoes):
+        parametros = argumentos[0] if argumentos else next(iter(opcoes.values()), None)
+        tipo_erro = None
+        inicio = time.perf_counter()
+        try:
+            return getattr(self._cursor, metodo)(comando, *argumentos, **opcoes)
+        except BaseException as erro:
+            # Cancelados por statement_timeout são justamente os mais lentos.
+            tipo_erro = type(erro).__name__
+            raise
+        finally:
+            duracao_s = time.perf_counter() - inicio
+            self._estatisticas.registrar(comando, duracao_s, metodo=metodo, parametros=parametros)
+            lenta_ms = self._estatisticas.lenta_ms
+            if lenta_ms and duracao_s * 1000 >= lenta_ms:
+                self._registrar_lenta(
+                    metodo, comando, parametros, duracao_s * 1000, tipo_erro=tipo_erro
+                )
+
+    def _registrar_lenta(self, metodo, comando, parametros, duracao_ms, *, tipo_erro=None):
+        normalizado = normalizar_comando(comando)
+        campos = {
+            "fingerprint": impressao_digital(normalizado),
+            "statement": normalizado[:TAMANHO_MAXIMO_COMANDO_LOG],
+            "duration_ms": round(duracao_ms, 3),
+            "threshold_ms": self._estatisticas.lenta_ms,
+            "parameters": redigir_dados(_forma_parametro(parametros)),
+        }
+        if tipo_erro is not None:
+            # A transação abortou: não há como rodar o EXPLAIN nela.
+            campos["error_type"] = tipo_erro
+        elif (
+            metodo == "execute"
+            and self._estatisticas.amostra_explain
+            and random.random() < self._estatisticas.amostra_explain
+        ):
+            try:
+                campos["plan"] = capturar_plano(self._cursor, comando, parametros)
+            except Exception:
+                campos["plan"] = None
+        registrar_evento(
+            "database_slow_query",
+            nivel="WARNING",
+            mensagem="Comando do banco acima do limite de duração.",
+            **campos,
+        )
+
+    def execute(self, comando, *argumentos, **opcoes):
+        return self._medir("execute", comando, *argumentos, **opcoes)
+
+    def executemany(self, comando, *argumentos, **opcoes):
+        return self._medir("executemany", comando, *argumentos, **opcoes)
+
+    def callproc(self, procedimento, *argumentos, **opcoes):
+        return self._medir("callproc", procedimento, *argumentos, **opcoes)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def __setattr__(self, nome, valor):
+        setattr(self._cursor, nome, valor)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, tipo, valor, rastreio):
+        return self._cursor.__exit__(tipo, valor, rastreio)
+
+
+def estatisticas_da_requisicao():
+    """Estatísticas da requisição atual; None fora dela ou sem configuração."""
+    if not has_request_context():
+        return None
+    estatisticas = g.get("_recic3_estatisticas_banco")
+    if estatisticas is None:
+        configuracao = current_app.extensions.get("recic3_instrumentacao_banco")
+        if configuracao is None:
+            return None
+        estatisticas = EstatisticasBanco(
+            configuracao["limite_repeticoes"],
+            lenta_ms=configuracao["lenta_ms"],
+            amostra_explain=configuracao["amostra_explain"],
+        )
+        g._recic3_estatisticas_banco = estatisticas
+    return estatisticas
+
+
+def instrumentar_cursor(cursor):
+    estatisticas = estatisticas_da_requisicao()
+    if estatisticas is None:
+        return cursor
+    return CursorInstrumentado(cursor, estatisticas)
+
+
+def cabecalho_server_timing(estatisticas, duracao_total_ms):
+    metricas = []
+    tempo_banco_ms = 0.0
+    if estatisticas is not None:
+        tempo_banco_ms = estatisticas.tempo_ms
+        metricas.append(
+            f'db;dur={tempo_banco_ms:.1f};desc="{estatisticas.consultas} consultas"'
+        )
+    if duracao_total_ms is not None:
+        metricas.append(f"app;dur={max(duracao_total_ms - tempo_banco_ms, 0.0):.1f}")
+    return ", ".join(metricas)
+
+
+def configurar_instrumentacao_banco(app, ambiente):
+    """Registra a medição dos cursores e os campos de banco no log de acesso.
+
+    O `after_request` roda antes do hook do logging operacional, registrado
+    primeiro, e entrega os campos por `g.campos_acesso`.
+    """
+    configuracao = ler_configuracao_instrumentacao(ambiente)
+    app.config.update(
+        DB_REPEATED_QUERY_THRESHOLD=configuracao["limite_repeticoes"],
+        DB_SLOW_QUERY_MS=configuracao["lenta_ms"],
+        DB_SLOW_QUERY_EXPLAIN_RATE=configuracao["amostra_explain"],
+    )
+    app.extensions["recic3_instrumentacao_banco"] = configuracao
+
+    @app.after_request
+    def registrar_tempo_banco(resposta):
+        estatisticas = g.get("_recic3_estatisticas_banco")
+        if estatisticas is not None:
+            g.campos_acesso = {**g.get("campos_acesso", {}), **estatisticas.campos_log()}
+        if configuracao["server_timing"]:
+            inicio = g.get("request_started_monotonic")
+            duracao_ms = (time.monotonic() - inicio) * 1000 if inicio else None
+            valor = cabecalho_server_timing(estatisticas, duracao_ms)
+            if valor:
+                resposta.headers["Server-Timing"] = valor
+        return resposta
+
+    return configuracao
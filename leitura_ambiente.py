@@ -0,0 +1,17 @@
+"""Leitura validada das variáveis de ambiente numéricas da configuração."""
+
+import os
+
+
+def ler_inteiro(nome, *, padrao, minimo, maximo):
+    """Inteiro de `nome` no intervalo; ausente ou vazio devolve `padrao`."""
+    valor = os.getenv(nome)
+    if valor is None or not valor.strip():
+        return padrao
+    try:
+        numero = int(valor.strip())
+    except ValueError as erro:
+        raise RuntimeError(f"{nome} deve ser um número inteiro.") from erro
+    if not minimo <= numero <= maximo:
+        raise RuntimeError(f"{nome} está fora do intervalo permitido.")
+    return numero
@@ -603,6 +603,8 @@ def configurar_logging_operacional(app, ambiente: str) -> dict[str, Any]:
                 mensagem="Requisição concluída.",
                 status_code=resposta.status_code,
                 duration_ms=round(duracao_ms, 3),
+                # Campos acrescentados por outros módulos, como o tempo de banco.
+                **g.get("campos_acesso", {}),
             )
         if resposta.status_code == 403:
             registrar_evento(
@@ -0,0 +1,420 @@
+"""Métricas no formato do Prometheus, somadas entre os workers do Gunicorn.
+
+Cada processo acumula contadores e histogramas em memória e grava um retrato
+em `METRICS_DIR/processo_<pid>.json` a cada `METRICS_FLUSH_SECONDS`. O
+processo principal do Gunicorn soma os arquivos e responde em `/metrics` numa
+porta própria (`METRICS_PORT`), fora das rotas da aplicação e exigindo
+`Authorization: Bearer <METRICS_TOKEN>`. Quando um worker encerra, seu
+retrato é somado a `encerrados.json`, para que os contadores não voltem atrás
+com a reciclagem de `max_requests`.
+
+Sem `METRICS_DIR` as métricas ficam só na memória do processo.
+"""
+
+import hmac
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from flask import g, request
+
+from leitura_ambiente import ler_inteiro
+from logging_operacional import registrar_evento
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+INTERVALO_GRAVACAO_PADRAO_S = 5
+INTERVALO_GRAVACAO_MAXIMO_S = 300
+PREFIXO_PROCESSO = "processo_"
+ARQUIVO_ENCERRADOS = "encerrados.json"
+ARQUIVO_TRAVA = ".trava"
+BUCKETS_DURACAO_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+METODOS_CONHECIDOS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+TIPO_CONTEUDO_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+
+# Nome: (tipo, ajuda, limites dos buckets dos histogramas).
+METRICAS = {
+    "recic3_http_requests_total": (
+        "counter", "Requisições concluídas por endpoint, método e status.", None,
+    ),
+    "recic3_http_request_duration_seconds": (
+        "histogram", "Duração das requisições por endpoint.", BUCKETS_DURACAO_S,
+    ),
+    "recic3_rate_limit_rejections_total": (
+        "counter", "Requisições recusadas pelo rate limit por endpoint.", None,
+    ),
+    "recic3_db_queries_total": (
+        "counter", "Comandos enviados ao banco por endpoint.", None,
+    ),
+    "recic3_db_time_seconds_total": (
+        "counter", "Tempo gasto no banco por endpoint.", None,
+    ),
+    "recic3_report_rows_total": (
+        "counter", "Linhas de relatório geradas por relatório e formato.", None,
+    ),
+    "recic3_upload_bytes_total": (
+        "counter", "Bytes recebidos em formulários multipart por endpoint.", None,
+    ),
+}
+
+
+def ler_configuracao_metricas():
+    pasta = (os.getenv("METRICS_DIR") or "").strip() or None
+    return {
+        "pasta": pasta,
+        "gravar_a_cada_s": ler_inteiro(
+            "METRICS_FLUSH_SECONDS",
+            padrao=INTERVALO_GRAVACAO_PADRAO_S,
+            minimo=1,
+            maximo=INTERVALO_GRAVACAO_MAXIMO_S,
+        ),
+    }
+
+
+def _chave(nome, rotulos):
+    return nome, tuple(sorted((str(chave), str(valor)) for chave, valor in rotulos.items()))
+
+
+def _somar(destino, itens):
+    for nome, rotulos, valor in itens:
+        chave = _chave(nome, rotulos)
+        atual = destino.get(chave)
+        if isinstance(valor, list):
+            destino[chave] = (
+                list(valor) if atual is None
+                else [soma + parcela for soma, parcela in zip(atual, valor)]
+            )
+        else:
+            destino[chave] = (atual or 0) + valor
+    return destino
+
+
+class RegistroMetricas:
+    """Contadores e histogramas do processo; reinicia sozinho depois de um fork."""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._pid = os.getpid()
+        self._valores = {}
+        self._pasta = None
+        self._gravar_a_cada_s = INTERVALO_GRAVACAO_PADRAO_S
+        self._gravado_em = 0.0
+
+    def configurar(self, pasta, gravar_a_cada_s):
+        self._pasta = Path(pasta) if pasta else None
+        self._gravar_a_cada_s = gravar_a_cada_s
+
+    def _verificar_processo(self):
+        # O worker herda do processo principal valores que não são dele.
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._valores = {}
+            self._gravado_em = 0.0
+
+    def incrementar(self, nome, valor=1, **rotulos):
+        if METRICAS[nome][0] != "counter":
+            raise ValueError(f"{nome} não é um contador.")
+        chave = _chave(nome, rotulos)
+        with self._trava:
+            self._verificar_processo()
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def observar(self, nome, valor, **rotulos):
+        limites = METRICAS[nome][2]
+        if limites is None:
+            raise ValueError(f"{nome} não é um histograma.")
+        chave = _chave(nome, rotulos)
+        with self._trava:
+            self._verificar_processo()
+            # Buckets já acumulados, como no formato de exposição, mais soma e total.
+            serie = self._valores.setdefault(chave, [0] * len(limites) + [0.0, 0])
+            for indice, limite in enumerate(limites):
+                if valor <= limite:
+                    serie[indice] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def retrato(self):
+        with self._trava:
+            self._verificar_processo()
+            return [
+                [nome, dict(rotulos), list(valor) if isinstance(valor, list) else valor]
+                for (nome, rotulos), valor in self._valores.items()
+            ]
+
+    def valores(self):
+        return _somar({}, self.retrato())
+
+    def _arquivo_processo(self):
+        return self._pasta / f"{PREFIXO_PROCESSO}{os.getpid()}.json"
+
+    def gravar(self):
+        if self._pasta is None:
+            return
+        _gravar_json(self._arquivo_processo(), self.retrato())
+        self._gravado_em = time.monotonic()
+
+    def gravar_se_necessario(self):
+        if (
+            self._pasta is None
+            or time.monotonic() - self._gravado_em < self._gravar_a_cada_s
+        ):
+            return
+        try:
+            self.gravar()
+        except OSError:
+            # Disco cheio ou pasta removida não derrubam a requisição; tenta no
+            # próximo intervalo.
+            self._gravado_em = time.monotonic()
+            registrar_evento(
+                "metrics_write_failed",
+                nivel="WARNING",
+                mensagem="Falha ao gravar as métricas do processo.",
+            )
+
+    def consolidar(self):
+        """Soma o retrato final do processo a `encerrados.json` e remove o arquivo dele."""
+        if self._pasta is None:
+            return
+        with _travar_pasta(self._pasta, exclusiva=True):
+            encerrados = _ler_json(self._pasta / ARQUIVO_ENCERRADOS)
+            _gravar_json(
+                self._pasta / ARQUIVO_ENCERRADOS,
+                _itens(_somar(_somar({}, encerrados), self.retrato())),
+            )
+            self._arquivo_processo().unlink(missing_ok=True)
+
+
+REGISTRO = RegistroMetricas()
+
+
+def incrementar(nome, valor=1, **rotulos):
+    REGISTRO.incrementar(nome, valor, **rotulos)
+
+
+def observar(nome, valor, **rotulos):
+    REGISTRO.observar(nome, valor, **rotulos)
+
+
+def registrar_linhas_relatorio(relatorio, formato, quantidade):
+    if quantidade:
+        incrementar("recic3_report_rows_total", quantidade, report=relatorio, format=formato)
+
+
+def contar_linhas_relatorio(linhas, relatorio, formato):
+    """Repassa as linhas de uma exportação em streaming e registra quantas saíram."""
+    quantidade = 0
+    try:
+        for linha in linhas:
+            quantidade += 1
+            yield linha
+    finally:
+        registrar_linhas_relatorio(relatorio, formato, quantidade)
+
+
+def _itens(valores):
+    return [[nome, dict(rotulos), valor] for (nome, rotulos), valor in valores.items()]
+
+
+def _gravar_json(caminho, itens):
+    # Grava ao lado e troca de uma vez: quem lê nunca vê o arquivo pela metade.
+    descritor, temporario = tempfile.mkstemp(dir=caminho.parent, suffix=".tmp")
+    with os.fdopen(descritor, "w", encoding="utf-8") as arquivo:
+        json.dump(itens, arquivo, separators=(",", ":"))
+    os.replace(temporario, caminho)
+
+
+def _ler_json(caminho):
+    try:
+        return json.loads(caminho.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return []
+
+
+@contextmanager
+def _travar_pasta(pasta, *, exclusiva):
+    """flock na pasta de métricas; sem fcntl (Windows) não há workers a coordenar."""
+    if fcntl is None:
+        yield
+        return
+    with open(Path(pasta) / ARQUIVO_TRAVA, "a") as arquivo:
+        fcntl.flock(arquivo, fcntl.LOCK_EX if exclusiva else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+
+def agregar(pasta):
+    """Soma os retratos dos processos vivos e dos já encerrados."""
+    pasta = Path(pasta)
+    valores = {}
+    with _travar_pasta(pasta, exclusiva=False):
+        for caminho in sorted(pasta.glob("*.json")):
+            _somar(valores, _ler_json(caminho))
+    return valores
+
+
+def preparar_pasta(pasta):
+    """Cria a pasta e descarta retratos de uma execução anterior do servidor."""
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    for caminho in pasta.glob("*.json"):
+        caminho.unlink(missing_ok=True)
+    return pasta
+
+
+def _escapar_rotulo(valor):
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _rotulos_texto(rotulos, extra=()):
+    pares = list(rotulos) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{nome}="{_escapar_rotulo(valor)}"' for nome, valor in pares) + "}"
+
+
+def _numero(valor):
+    if isinstance(valor, float):
+        if math.isinf(valor):
+            return "+Inf" if valor > 0 else "-Inf"
+        return repr(valor)
+    return str(valor)
+
+
+def formatar_prometheus(valores):
+    """Texto do formato de exposição 0.0.4 do Prometheus."""
+    linhas = []
+    for nome, (tipo, ajuda, limites) in METRICAS.items():
+        series = sorted(
+            (rotulos, valor) for (nome_serie, rotulos), valor in valores.items()
+            if nome_serie == nome
+        )
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        for rotulos, valor in series:
+            if tipo == "counter":
+                linhas.append(f"{nome}{_rotulos_texto(rotulos)} {_numero(valor)}")
+                continue
+            for limite, acumulado in zip(limites, valor):
+                linhas.append(
+                    f"{nome}_bucket{_rotulos_texto(rotulos, [('le', _numero(float(limite)))])} {acumulado}"
+                )
+            linhas.append(f'{nome}_bucket{_rotulos_texto(rotulos, [("le", "+Inf")])} {valor[-1]}')
+            linhas.append(f"{nome}_sum{_rotulos_texto(rotulos)} {_numero(float(valor[-2]))}")
+            linhas.append(f"{nome}_count{_rotulos_texto(rotulos)} {valor[-1]}")
+    return "\n".join(linhas) + "\n"
+
+
+_EXPORTADOR = None
+
+
+def criar_exportador(pasta, token, *, host="0.0.0.0", porta=0):
+    """Servidor HTTP do `/metrics`, para rodar numa thread do processo principal."""
+    esperado = f"Bearer {token}".encode("utf-8")
+
+    class ExportadorMetricas(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self._responder(404, b"")
+                return
+            recebido = (self.headers.get("Authorization") or "").encode("utf-8")
+            if not hmac.compare_digest(recebido, esperado):
+                self._responder(401, b"", {"WWW-Authenticate": "Bearer"})
+                return
+            corpo = formatar_prometheus(agregar(pasta)).encode("utf-8")
+            self._responder(200, corpo, {"Content-Type": TIPO_CONTEUDO_PROMETHEUS})
+
+        def _responder(self, status, corpo, cabecalhos=None):
+            self.send_response(status)
+            for nome, valor in (cabecalhos or {}).items():
+                self.send_header(nome, valor)
+            self.send_header("Content-Length", str(len(corpo)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *_):
+            # Os scrapes a cada poucos segundos só fariam ruído no log.
+            pass
+
+    servidor = ThreadingHTTPServer((host, porta), ExportadorMetricas)
+    servidor.daemon_threads = True
+    return servidor
+
+
+def iniciar_exportador(pasta, porta, token):
+    global _EXPORTADOR
+    _EXPORTADOR = criar_exportador(pasta, token, porta=porta)
+    threading.Thread(
+        target=_EXPORTADOR.serve_forever, name="exportador-metricas", daemon=True
+    ).start()
+    return _EXPORTADOR
+
+
+def fechar_exportador_herdado():
+    """Fecha no worker o socket do exportador herdado do processo principal."""
+    if _EXPORTADOR is not None:
+        _EXPORTADOR.socket.close()
+
+
+def configurar_metricas(app):
+    """Registra as métricas de cada requisição.
+
+    Deve ser chamado antes de `configurar_instrumentacao_banco`: o Flask executa
+    os `after_request` na ordem inversa, e o tempo de banco chega por
+    `g.campos_acesso`, preenchido pela instrumentação.
+    """
+    configuracao = ler_configuracao_metricas()
+    if configuracao["pasta"]:
+        Path(configuracao["pasta"]).mkdir(parents=True, exist_ok=True)
+    REGISTRO.configurar(configuracao["pasta"], configuracao["gravar_a_cada_s"])
+    app.config.update(
+        METRICS_DIR=configuracao["pasta"],
+        METRICS_FLUSH_SECONDS=configuracao["gravar_a_cada_s"],
+    )
+    app.extensions["recic3_metricas"] = REGISTRO
+
+    @app.after_request
+    def registrar_metricas_requisicao(resposta):
+        endpoint = request.endpoint or "unmatched"
+        metodo = request.method if request.method in METODOS_CONHECIDOS else "OTHER"
+        REGISTRO.incrementar(
+            "recic3_http_requests_total",
+            endpoint=endpoint,
+            method=metodo,
+            status=str(resposta.status_code),
+        )
+        inicio = g.get("request_started_monotonic")
+        if inicio:
+            REGISTRO.observar(
+                "recic3_http_request_duration_seconds",
+                max(0.0, time.monotonic() - inicio),
+                endpoint=endpoint,
+            )
+        campos = g.get("campos_acesso", {})
+        if "db_queries" in campos:
+            REGISTRO.incrementar("recic3_db_queries_total", campos["db_queries"], endpoint=endpoint)
+            REGISTRO.incrementar(
+                "recic3_db_time_seconds_total", campos["db_time_ms"] / 1000, endpoint=endpoint
+            )
+        if request.mimetype == "multipart/form-data" and request.content_length:
+            REGISTRO.incrementar(
+                "recic3_upload_bytes_total", request.content_length, endpoint=endpoint
+            )
+        REGISTRO.gravar_se_necessario()
+        return resposta
+
+    return configuracao
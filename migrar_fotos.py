@@ -0,0 +1,39 @@
+"""Move as fotos base64 antigas para a tabela de fotos e remove as órfãs."""
+
+import argparse
+
+
+CONFIRMACAO_EXIGIDA = "MIGRAR_FOTOS"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Converte as fotos de associados e patrimônio guardadas em base64 "
+            "e remove fotos sem registro que as use, no banco configurado."
+        )
+    )
+    parser.add_argument(
+        "--confirmar",
+        help=f"Informe exatamente {CONFIRMACAO_EXIGIDA} para prosseguir.",
+    )
+    parser.add_argument(
+        "--lote", type=int, default=100, help="Registros convertidos por transação."
+    )
+    argumentos = parser.parse_args()
+    if argumentos.confirmar != CONFIRMACAO_EXIGIDA:
+        parser.error("Confirmação inválida; nenhuma alteração foi executada.")
+    if argumentos.lote < 1:
+        parser.error("O lote deve ser maior que zero.")
+
+    from app import migrar_fotos_legadas
+
+    totais = migrar_fotos_legadas(argumentos.lote)
+    print(
+        f"Fotos migradas: {totais['migradas']}; inválidas mantidas: "
+        f"{totais['invalidas']}; órfãs removidas: {totais['removidas']}."
+    )
+
+
+if __name__ == "__main__":
+    main()
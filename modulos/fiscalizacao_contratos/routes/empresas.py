@@ -6,6 +6,7 @@ from flask_login import current_user
 from ..permissions import admin_json_required, admin_required
 from ..services.consultas_externas import (
     ConsultaExternaError,
+    ConsultaNaoEncontradaError,
     consultar_cep,
     consultar_cnpj,
 )
@@ -188,6 +189,8 @@ def registrar_rotas_empresas(blueprint, conectar_banco):
             return jsonify(consultar_cnpj(cnpj))
         except ValueError:
             return jsonify({"erro": "CNPJ inválido."}), 400
+        except ConsultaNaoEncontradaError:
+            return jsonify({"erro": "CNPJ não encontrado.", "preenchimento_manual": True}), 404
         except ConsultaExternaError:
             return jsonify({
                 "erro": "Não foi possível consultar o CNPJ agora. Preencha os dados manualmente.",
@@ -201,6 +204,8 @@ def registrar_rotas_empresas(blueprint, conectar_banco):
             return jsonify(consultar_cep(cep))
         except ValueError:
             return jsonify({"erro": "CEP inválido."}), 400
+        except ConsultaNaoEncontradaError:
+            return jsonify({"erro": "CEP não encontrado.", "preenchimento_manual": True}), 404
         except ConsultaExternaError:
             return jsonify({
                 "erro": "Não foi possível consultar o CEP agora. Preencha o endereço manualmente.",
@@ -6,6 +6,8 @@ from decimal import Decimal
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from busca_textual import padrao_busca
+
 
 class AditivoServiceError(Exception):
     """Falha interna tratada pelo módulo."""
@@ -30,7 +32,7 @@ class AditivoService:
     def listar(self, busca="", tipo_aditivo="", status_ativo="ativos", contrato_id=None):
         conexao = None
         busca = (busca or "").strip()
-        padrao = f"%{busca}%"
+        padrao = padrao_busca(busca)
         try:
             conexao = self._conectar_banco()
             with conexao.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -42,10 +44,10 @@ class AditivoService:
                     JOIN fc_contratos c ON c.id = a.contrato_id
                     JOIN fc_empresas e ON e.id = c.empresa_id
                     WHERE (
-                        %s = '' OR c.numero_contrato ILIKE %s
-                        OR COALESCE(c.processo_administrativo, '') ILIKE %s
-                        OR e.razao_social ILIKE %s OR a.numero_termo ILIKE %s
-                        OR a.tipo_aditivo ILIKE %s
+                        %s = '' OR busca_normalizada(c.numero_contrato) LIKE %s
+                        OR busca_normalizada(c.processo_administrativo) LIKE %s
+                        OR busca_normalizada(e.razao_social) LIKE %s OR busca_normalizada(a.numero_termo) LIKE %s
+                        OR busca_normalizada(a.tipo_aditivo) LIKE %s
                     )
                       AND (%s = '' OR a.tipo_aditivo = %s)
                       AND (%s::BIGINT IS NULL OR a.contrato_id = %s)
@@ -6,6 +6,8 @@ from decimal import Decimal, ROUND_HALF_UP
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from busca_textual import padrao_busca
+
 from .cloudinary_storage import CloudinaryStorageError
 from ..validacoes_atestes import CATEGORIAS_DOCUMENTO_ATESTE, CENTAVOS
 
@@ -28,7 +30,7 @@ class AtesteService:
 
     def listar(self, busca="", filtros=None):
         filtros = filtros or {}
-        padrao = f"%{str(busca or '').strip()}%"
+        padrao = padrao_busca(busca)
         conexao = self._conectar_banco()
         try:
             with conexao.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -43,12 +45,12 @@ class AtesteService:
                     JOIN fc_servidores s ON s.id=a.servidor_atestador_id
                     LEFT JOIN (SELECT ateste_id,SUM(valor_nota) AS total_notas
                         FROM fc_ateste_notas_fiscais WHERE ativo GROUP BY ateste_id) n ON n.ateste_id=a.id
-                    WHERE (%s='' OR CAST(a.numero_ateste AS TEXT) ILIKE %s OR CAST(m.numero_medicao AS TEXT) ILIKE %s
-                        OR c.numero_contrato ILIKE %s OR COALESCE(c.processo_administrativo,'') ILIKE %s
-                        OR e.razao_social ILIKE %s OR s.nome ILIKE %s
-                        OR COALESCE(a.protocolo_encaminhamento,'') ILIKE %s
+                    WHERE (%s='' OR CAST(a.numero_ateste AS TEXT) LIKE %s OR CAST(m.numero_medicao AS TEXT) LIKE %s
+                        OR busca_normalizada(c.numero_contrato) LIKE %s OR busca_normalizada(c.processo_administrativo) LIKE %s
+                        OR busca_normalizada(e.razao_social) LIKE %s OR busca_normalizada(s.nome) LIKE %s
+                        OR busca_normalizada(a.protocolo_encaminhamento) LIKE %s
                         OR EXISTS (SELECT 1 FROM fc_ateste_notas_fiscais nf WHERE nf.ateste_id=a.id AND nf.ativo
-                            AND (nf.numero_nota ILIKE %s OR COALESCE(nf.chave_acesso,'') ILIKE %s)))
+                            AND (busca_normalizada(nf.numero_nota) LIKE %s OR busca_normalizada(nf.chave_acesso) LIKE %s)))
                     AND (%s::BIGINT IS NULL OR c.id=%s) AND (%s::BIGINT IS NULL OR e.id=%s)
                     AND (%s::DATE IS NULL OR m.competencia=%s) AND (%s::BIGINT IS NULL OR a.servidor_atestador_id=%s)
                     AND (%s='' OR a.status=%s)
@@ -59,7 +61,7 @@ class AtesteService:
                     AND (%s=FALSE OR COALESCE(n.total_notas,0)<>a.valor_atestado)
                     AND (%s=FALSE OR a.status='Encaminhado para pagamento')
                     ORDER BY a.criado_em DESC,a.id DESC""",(
-                    padrao,padrao,padrao,padrao,padrao,padrao,padrao,padrao,padrao,padrao,
+                    (busca or '').strip(),padrao,padrao,padrao,padrao,padrao,padrao,padrao,padrao,padrao,
                     filtros.get("contrato_id"),filtros.get("contrato_id"),filtros.get("empresa_id"),filtros.get("empresa_id"),
                     filtros.get("competencia"),filtros.get("competencia"),filtros.get("servidor_id"),filtros.get("servidor_id"),
                     filtros.get("status",""),filtros.get("status",""),filtros.get("ateste_inicio"),filtros.get("ateste_inicio"),
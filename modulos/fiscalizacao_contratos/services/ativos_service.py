@@ -6,6 +6,8 @@ from decimal import Decimal
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from busca_textual import padrao_busca
+
 from ..validacoes_ativos import NATUREZAS_VINCULO
 
 
@@ -47,7 +49,7 @@ class AtivoService:
     ):
         conexao = None
         busca = (busca or "").strip()
-        padrao = f"%{busca}%"
+        padrao = padrao_busca(busca)
         try:
             conexao = self._conectar_banco()
             with conexao.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -62,16 +64,16 @@ class AtivoService:
                         FROM fc_ativo_vinculos WHERE ativo = TRUE GROUP BY ativo_id
                     ) v ON v.ativo_id = a.id
                     WHERE (
-                        %s = '' OR a.codigo_interno ILIKE %s OR a.descricao ILIKE %s
-                        OR COALESCE(a.marca, '') ILIKE %s OR COALESCE(a.modelo, '') ILIKE %s
-                        OR COALESCE(a.placa, '') ILIKE %s OR COALESCE(a.renavam, '') ILIKE %s
-                        OR COALESCE(a.chassi, '') ILIKE %s OR COALESCE(a.numero_serie, '') ILIKE %s
-                        OR COALESCE(a.numero_patrimonio, '') ILIKE %s
-                        OR COALESCE(e.razao_social, '') ILIKE %s
+                        %s = '' OR busca_normalizada(a.codigo_interno) LIKE %s OR busca_normalizada(a.descricao) LIKE %s
+                        OR busca_normalizada(a.marca) LIKE %s OR busca_normalizada(a.modelo) LIKE %s
+                        OR busca_normalizada(a.placa) LIKE %s OR busca_normalizada(a.renavam) LIKE %s
+                        OR busca_normalizada(a.chassi) LIKE %s OR busca_normalizada(a.numero_serie) LIKE %s
+                        OR busca_normalizada(a.numero_patrimonio) LIKE %s
+                        OR busca_normalizada(e.razao_social) LIKE %s
                         OR EXISTS (
                             SELECT 1 FROM fc_ativo_vinculos vx
                             JOIN fc_contratos cx ON cx.id = vx.contrato_id
-                            WHERE vx.ativo_id = a.id AND cx.numero_contrato ILIKE %s
+                            WHERE vx.ativo_id = a.id AND busca_normalizada(cx.numero_contrato) LIKE %s
                         )
                     )
                       AND (%s = '' OR a.tipo_ativo = %s)
@@ -373,7 +375,7 @@ class AtivoService:
 
     def listar_vinculos(self, busca="", status_ativo="todos"):
         conexao = None
-        padrao = f"%{(busca or '').strip()}%"
+        padrao = padrao_busca(busca)
         try:
             conexao = self._conectar_banco()
             with conexao.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -385,8 +387,8 @@ class AtivoService:
                     JOIN fc_ativos_contratuais a ON a.id=v.ativo_id
                     JOIN fc_contratos c ON c.id=v.contrato_id
                     JOIN fc_empresas e ON e.id=c.empresa_id
-                    WHERE (%s='' OR a.codigo_interno ILIKE %s OR a.descricao ILIKE %s
-                                      OR c.numero_contrato ILIKE %s)
+                    WHERE (%s='' OR busca_normalizada(a.codigo_interno) LIKE %s OR busca_normalizada(a.descricao) LIKE %s
+                                      OR busca_normalizada(c.numero_contrato) LIKE %s)
                       AND (%s='todos' OR (%s='ativos' AND v.ativo=TRUE)
                                            OR (%s='encerrados' AND v.ativo=FALSE))
                     ORDER BY v.ativo DESC, v.data_inicio DESC, v.id DESC
@@ -4,6 +4,7 @@ import logging
 
 import requests
 
+from consultas_cadastrais import ConsultaIndisponivel, RegistroNaoEncontrado, servico_consultas
 from logging_operacional import registrar_evento
 
 from ..validacoes import somente_numeros, validar_cep, validar_cnpj
@@ -11,11 +12,19 @@ from ..validacoes import somente_numeros, validar_cep, validar_cnpj
 
 logger = logging.getLogger(__name__)
 
+URL_BRASILAPI = "https://brasilapi.com.br/api"
+URL_OPENCNPJA = "https://open.cnpja.com"
+URL_VIACEP = "https://viacep.com.br/ws"
+
 
 class ConsultaExternaError(Exception):
     """Falha tratada de um serviço externo."""
 
 
+class ConsultaNaoEncontradaError(ConsultaExternaError):
+    """Os serviços responderam que o documento não existe."""
+
+
 class _RespostaExternaInvalida(Exception):
     """Resposta que não pode ser usada pelo módulo."""
 
@@ -168,54 +177,90 @@ def _mapear_opencnpja(dados):
     }
 
 
-def consultar_cnpj(cnpj):
-    cnpj = somente_numeros(cnpj)
-    if not validar_cnpj(cnpj):
-        raise ValueError("CNPJ inválido.")
+def _mapear_cep_brasilapi(dados):
+    return {
+        "logradouro": _texto(dados.get("street")),
+        "bairro": _texto(dados.get("neighborhood")),
+        "cidade": _texto(dados.get("city")),
+        "uf": _texto(dados.get("state")).upper(),
+    }
 
-    try:
-        dados = _consultar_json(
-            "BrasilAPI",
-            f"https://brasilapi.com.br/api/cnpj/v1/{cnpj}",
+
+def _mapear_viacep(dados):
+    # O ViaCEP responde 200 com {"erro": true} para CEP inexistente.
+    if dados.get("erro") in (True, "true"):
+        raise RegistroNaoEncontrado()
+    return {
+        "logradouro": _texto(dados.get("logradouro")),
+        "bairro": _texto(dados.get("bairro")),
+        "cidade": _texto(dados.get("localidade")),
+        "uf": _texto(dados.get("uf")).upper(),
+    }
+
+
+def _provedores_cnpj(cnpj):
+    def brasilapi():
+        return _mapear_brasilapi(
+            _consultar_json("BrasilAPI", f"{URL_BRASILAPI}/cnpj/v1/{cnpj}")
         )
-        return _mapear_brasilapi(dados)
-    except (requests.RequestException, _RespostaExternaInvalida):
+
+    def opencnpja():
         logger.info(
             "Consulta externa acionando alternativa: servico=OpenCNPJA "
             "segunda_opcao_acionada=True"
         )
+        return _mapear_opencnpja(
+            _consultar_json("OpenCNPJA", f"{URL_OPENCNPJA}/office/{cnpj}", segunda_opcao=True)
+        )
 
-    try:
-        dados = _consultar_json(
-            "OpenCNPJA",
-            f"https://open.cnpja.com/office/{cnpj}",
-            segunda_opcao=True,
+    return (("BrasilAPI", brasilapi), ("OpenCNPJA", opencnpja))
+
+
+def _provedores_cep(cep):
+    def brasilapi():
+        return _mapear_cep_brasilapi(
+            _consultar_json("BrasilAPI CEP", f"{URL_BRASILAPI}/cep/v1/{cep}")
         )
-        return _mapear_opencnpja(dados)
-    except (requests.RequestException, _RespostaExternaInvalida) as erro:
+
+    def viacep():
+        logger.info(
+            "Consulta externa acionando alternativa: servico=ViaCEP "
+            "segunda_opcao_acionada=True"
+        )
+        return _mapear_viacep(
+            _consultar_json("ViaCEP", f"{URL_VIACEP}/{cep}/json/", segunda_opcao=True)
+        )
+
+    return (("BrasilAPI CEP", brasilapi), ("ViaCEP", viacep))
+
+
+def consultar_cnpj(cnpj):
+    """Dados cadastrais do CNPJ pela BrasilAPI ou, em corrida, pela OpenCNPJA."""
+    cnpj = somente_numeros(cnpj)
+    if not validar_cnpj(cnpj):
+        raise ValueError("CNPJ inválido.")
+
+    try:
+        return servico_consultas().consultar("cnpj", cnpj, _provedores_cnpj(cnpj))
+    except RegistroNaoEncontrado as erro:
+        raise ConsultaNaoEncontradaError("CNPJ não encontrado.") from erro
+    except ConsultaIndisponivel as erro:
         raise ConsultaExternaError(
             "Não foi possível consultar o CNPJ agora. Preencha os dados manualmente."
         ) from erro
 
 
 def consultar_cep(cep):
+    """Endereço do CEP pela BrasilAPI ou, em corrida, pelo ViaCEP."""
     cep = somente_numeros(cep)
     if not validar_cep(cep):
         raise ValueError("CEP inválido.")
 
     try:
-        dados = _consultar_json(
-            "BrasilAPI CEP",
-            f"https://brasilapi.com.br/api/cep/v1/{cep}",
-        )
-    except (requests.RequestException, _RespostaExternaInvalida) as erro:
+        return servico_consultas().consultar("cep", cep, _provedores_cep(cep))
+    except RegistroNaoEncontrado as erro:
+        raise ConsultaNaoEncontradaError("CEP não encontrado.") from erro
+    except ConsultaIndisponivel as erro:
         raise ConsultaExternaError(
             "Não foi possível consultar o CEP agora. Preencha o endereço manualmente."
         ) from erro
-
-    return {
-        "logradouro": _texto(dados.get("street")),
-        "bairro": _texto(dados.get("neighborhood")),
-        "cidade": _texto(dados.get("city")),
-        "uf": _texto(dados.get("state")).upper(),
-    }
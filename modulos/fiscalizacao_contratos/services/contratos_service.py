@@ -3,6 +3,8 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from busca_textual import padrao_busca
+
 
 class ContratoServiceError(Exception):
     """Falha interna tratada pelo módulo."""
@@ -34,7 +36,7 @@ class ContratoService:
     ):
         conexao = None
         busca = (busca or "").strip()
-        padrao = f"%{busca}%"
+        padrao = padrao_busca(busca)
         try:
             conexao = self._conectar_banco()
             with conexao.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -52,9 +54,9 @@ class ContratoService:
                     FROM fc_contratos c
                     JOIN fc_empresas e ON e.id = c.empresa_id
                     WHERE (
-                        %s = '' OR c.numero_contrato ILIKE %s
-                        OR COALESCE(c.processo_administrativo, '') ILIKE %s
-                        OR c.objeto ILIKE %s OR e.razao_social ILIKE %s
+                        %s = '' OR busca_normalizada(c.numero_contrato) LIKE %s
+                        OR busca_normalizada(c.processo_administrativo) LIKE %s
+                        OR busca_normalizada(c.objeto) LIKE %s OR busca_normalizada(e.razao_social) LIKE %s
                     )
                       AND (%s = '' OR c.situacao = %s)
                       AND (%s::BIGINT IS NULL OR c.empresa_id = %s)
@@ -5,6 +5,8 @@ import logging
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from busca_textual import padrao_busca
+
 from .cloudinary_storage import CloudinaryStorageError
 
 
@@ -36,7 +38,7 @@ class DocumentoService:
     ):
         conexao = None
         busca = (busca or "").strip()
-        padrao = f"%{busca}%"
+        padrao = padrao_busca(busca)
         try:
             conexao = self._conectar_banco()
             with conexao.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -49,9 +51,9 @@ class DocumentoService:
                     JOIN fc_empresas e ON e.id = c.empresa_id
                     LEFT JOIN fc_aditivos a ON a.id = d.aditivo_id
                     WHERE (
-                        %s = '' OR d.titulo ILIKE %s OR d.nome_original ILIKE %s
-                        OR c.numero_contrato ILIKE %s OR e.razao_social ILIKE %s
-                        OR d.categoria ILIKE %s
+                        %s = '' OR busca_normalizada(d.titulo) LIKE %s OR busca_normalizada(d.nome_original) LIKE %s
+                        OR busca_normalizada(c.numero_contrato) LIKE %s OR busca_normalizada(e.razao_social) LIKE %s
+                        OR busca_normalizada(d.categoria) LIKE %s
                     )
                       AND (%s = '' OR d.categoria = %s)
                       AND (%s::BIGINT IS NULL OR d.contrato_id = %s)
@@ -3,6 +3,8 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from busca_textual import padrao_busca
+
 class FiscalizacaoServiceError(Exception):
     """Erro tratado sem expor detalhes do PostgreSQL ao usuário."""
 
@@ -18,7 +20,7 @@ class FiscalizacaoService:
 
     def listar(self, busca="", filtros=None):
         filtros = filtros or {}
-        padrao = f"%{(busca or '').strip()}%"
+        padrao = padrao_busca(busca)
         status_ativo = filtros.get("status_ativo", "ativos")
         try:
             with self._conectar_banco() as conexao:
@@ -30,11 +32,11 @@ class FiscalizacaoService:
                         JOIN fc_contratos c ON c.id=f.contrato_id
                         JOIN fc_empresas e ON e.id=c.empresa_id
                         JOIN fc_servidores s ON s.id=f.servidor_responsavel_id
-                        WHERE (%s='' OR c.numero_contrato ILIKE %s
-                            OR COALESCE(c.processo_administrativo,'') ILIKE %s
-                            OR e.razao_social ILIKE %s OR s.nome ILIKE %s
-                            OR f.objeto_verificado ILIKE %s
-                            OR COALESCE(f.local_fiscalizacao,'') ILIKE %s)
+                        WHERE (%s='' OR busca_normalizada(c.numero_contrato) LIKE %s
+                            OR busca_normalizada(c.processo_administrativo) LIKE %s
+                            OR busca_normalizada(e.razao_social) LIKE %s OR busca_normalizada(s.nome) LIKE %s
+                            OR busca_normalizada(f.objeto_verificado) LIKE %s
+                            OR busca_normalizada(f.local_fiscalizacao) LIKE %s)
                           AND (%s IS NULL OR f.contrato_id=%s)
                           AND (%s IS NULL OR c.empresa_id=%s)
                           AND (%s IS NULL OR f.servidor_responsavel_id=%s)
@@ -47,7 +49,7 @@ class FiscalizacaoService:
                               OR (%s='inativos' AND f.ativo=FALSE))
                         ORDER BY f.data_fiscalizacao DESC, f.id DESC
                     """, (
-                        padrao, padrao, padrao, padrao, padrao, padrao, padrao,
+                        (busca or '').strip(), padrao, padrao, padrao, padrao, padrao, padrao,
                         filtros.get("contrato_id"), filtros.get("contrato_id"),
                         filtros.get("empresa_id"), filtros.get("empresa_id"),
                         filtros.get("servidor_id"), filtros.get("servidor_id"),
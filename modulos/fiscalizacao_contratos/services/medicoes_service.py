@@ -6,6 +6,8 @@ from decimal import Decimal, ROUND_HALF_UP
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from busca_textual import padrao_busca
+
 from .cloudinary_storage import CloudinaryStorageError
 from ..validacoes_medicoes import (
     CATEGORIAS_DOCUMENTO_MEDICAO,
@@ -34,7 +36,7 @@ class MedicaoService:
 
     def listar(self, busca="", filtros=None):
         filtros = filtros or {}
-        padrao = f"%{(busca or '').strip()}%"
+        padrao = padrao_busca(busca)
         try:
             with self._conectar_banco() as conexao:
                 with conexao.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -44,10 +46,10 @@ class MedicaoService:
                         FROM fc_medicoes m JOIN fc_contratos c ON c.id=m.contrato_id
                         JOIN fc_empresas e ON e.id=c.empresa_id
                         JOIN fc_servidores s ON s.id=m.servidor_fiscal_id
-                        WHERE (%s='' OR CAST(m.numero_medicao AS TEXT) ILIKE %s
-                          OR c.numero_contrato ILIKE %s OR COALESCE(c.processo_administrativo,'') ILIKE %s
-                          OR e.razao_social ILIKE %s OR s.nome ILIKE %s
-                          OR COALESCE(m.observacoes,'') ILIKE %s)
+                        WHERE (%s='' OR CAST(m.numero_medicao AS TEXT) LIKE %s
+                          OR busca_normalizada(c.numero_contrato) LIKE %s OR busca_normalizada(c.processo_administrativo) LIKE %s
+                          OR busca_normalizada(e.razao_social) LIKE %s OR busca_normalizada(s.nome) LIKE %s
+                          OR busca_normalizada(m.observacoes) LIKE %s)
                         AND (%s IS NULL OR m.contrato_id=%s)
                         AND (%s IS NULL OR c.empresa_id=%s)
                         AND (%s IS NULL OR m.competencia=%s)
@@ -59,7 +61,7 @@ class MedicaoService:
                         AND (%s='todos' OR (%s='ativos' AND m.ativo) OR (%s='inativos' AND NOT m.ativo))
                         AND (%s=FALSE OR m.total_glosas>0) AND (%s=FALSE OR m.total_descontos>0)
                         ORDER BY m.competencia DESC,m.numero_medicao DESC,m.versao DESC""",(
-                        padrao,padrao,padrao,padrao,padrao,padrao,padrao,
+                        (busca or '').strip(),padrao,padrao,padrao,padrao,padrao,padrao,
                         filtros.get("contrato_id"),filtros.get("contrato_id"),filtros.get("empresa_id"),filtros.get("empresa_id"),
                         filtros.get("competencia"),filtros.get("competencia"),filtros.get("periodo_inicio"),filtros.get("periodo_inicio"),
                         filtros.get("periodo_fim"),filtros.get("periodo_fim"),filtros.get("servidor_id"),filtros.get("servidor_id"),
@@ -3,6 +3,8 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from busca_textual import padrao_busca
+
 from ..validacoes_ocorrencias import STATUS_OCORRENCIA
 
 
@@ -16,7 +18,7 @@ class OcorrenciaService:
     def __init__(self, conectar_banco): self._conectar_banco = conectar_banco
 
     def listar(self, busca="", filtros=None):
-        filtros=filtros or {}; padrao=f"%{(busca or '').strip()}%"; status_ativo=filtros.get("status_ativo","ativos")
+        filtros=filtros or {}; padrao=padrao_busca(busca); status_ativo=filtros.get("status_ativo","ativos")
         try:
             with self._conectar_banco() as conexao:
                 with conexao.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -27,9 +29,9 @@ class OcorrenciaService:
                         FROM fc_ocorrencias o JOIN fc_contratos c ON c.id=o.contrato_id
                         JOIN fc_empresas e ON e.id=c.empresa_id JOIN fc_servidores s ON s.id=o.servidor_responsavel_id
                         LEFT JOIN fc_ativos_contratuais a ON a.id=o.ativo_contratual_id
-                        WHERE (%s='' OR o.titulo ILIKE %s OR o.descricao ILIKE %s OR c.numero_contrato ILIKE %s
-                          OR e.razao_social ILIKE %s OR COALESCE(o.numero_notificacao,'') ILIKE %s
-                          OR COALESCE(a.codigo_interno,'') ILIKE %s OR s.nome ILIKE %s)
+                        WHERE (%s='' OR busca_normalizada(o.titulo) LIKE %s OR busca_normalizada(o.descricao) LIKE %s OR busca_normalizada(c.numero_contrato) LIKE %s
+                          OR busca_normalizada(e.razao_social) LIKE %s OR busca_normalizada(o.numero_notificacao) LIKE %s
+                          OR busca_normalizada(a.codigo_interno) LIKE %s OR busca_normalizada(s.nome) LIKE %s)
                         AND (%s IS NULL OR o.contrato_id=%s) AND (%s IS NULL OR o.fiscalizacao_id=%s)
                         AND (%s='' OR o.categoria=%s) AND (%s='' OR o.gravidade=%s)
                         AND (%s='' OR o.status=%s) AND (%s IS NULL OR o.servidor_responsavel_id=%s)
@@ -37,7 +39,7 @@ class OcorrenciaService:
                         AND (%s=FALSE OR o.exige_notificacao=TRUE)
                         AND (%s='todos' OR (%s='ativos' AND o.ativo) OR (%s='inativos' AND NOT o.ativo))
                         ORDER BY vencida DESC,o.data_identificacao DESC,o.id DESC""", (
-                        padrao,padrao,padrao,padrao,padrao,padrao,padrao,padrao,
+                        (busca or '').strip(),padrao,padrao,padrao,padrao,padrao,padrao,padrao,
                         filtros.get("contrato_id"),filtros.get("contrato_id"),filtros.get("fiscalizacao_id"),filtros.get("fiscalizacao_id"),
                         filtros.get("categoria",""),filtros.get("categoria",""),filtros.get("gravidade",""),filtros.get("gravidade",""),
                         filtros.get("status",""),filtros.get("status",""),filtros.get("servidor_id"),filtros.get("servidor_id"),
@@ -6,6 +6,8 @@ from decimal import Decimal
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from busca_textual import padrao_busca
+
 from ..validacoes_planilhas import calcular_total_item
 
 
@@ -48,7 +50,7 @@ class PlanilhaService:
     ):
         conexao = None
         busca = (busca or "").strip()
-        padrao = f"%{busca}%"
+        padrao = padrao_busca(busca)
         try:
             conexao = self._conectar_banco()
             with conexao.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -69,10 +71,10 @@ class PlanilhaService:
                         FROM fc_planilha_itens GROUP BY planilha_id
                     ) t ON t.planilha_id = p.id
                     WHERE (
-                        %s = '' OR p.nome ILIKE %s OR c.numero_contrato ILIKE %s
-                        OR COALESCE(c.processo_administrativo, '') ILIKE %s
-                        OR e.razao_social ILIKE %s
-                        OR COALESCE(p.descricao_referencia, '') ILIKE %s
+                        %s = '' OR busca_normalizada(p.nome) LIKE %s OR busca_normalizada(c.numero_contrato) LIKE %s
+                        OR busca_normalizada(c.processo_administrativo) LIKE %s
+                        OR busca_normalizada(e.razao_social) LIKE %s
+                        OR busca_normalizada(p.descricao_referencia) LIKE %s
                     )
                       AND (%s::BIGINT IS NULL OR p.contrato_id = %s)
                       AND (%s = '' OR p.tipo_planilha = %s)
@@ -3,6 +3,8 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from busca_textual import padrao_busca
+
 
 class ServidorServiceError(Exception):
     """Falha interna tratada pelo módulo."""
@@ -23,7 +25,7 @@ class ServidorService:
     def listar(self, busca="", incluir_inativos=False):
         conexao = None
         busca = (busca or "").strip()
-        padrao = f"%{busca}%"
+        padrao = padrao_busca(busca)
         try:
             conexao = self._conectar_banco()
             with conexao.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -33,7 +35,7 @@ class ServidorService:
                            ativo, criado_em, atualizado_em
                     FROM fc_servidores
                     WHERE (%s OR ativo = TRUE)
-                      AND (%s = '' OR nome ILIKE %s OR matricula ILIKE %s OR cargo ILIKE %s)
+                      AND (%s = '' OR busca_normalizada(nome) LIKE %s OR busca_normalizada(matricula) LIKE %s OR busca_normalizada(cargo) LIKE %s)
                     ORDER BY ativo DESC, nome
                     """,
                     (incluir_inativos, busca, padrao, padrao, padrao),
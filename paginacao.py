@@ -0,0 +1,178 @@
+"""Paginação por chave (keyset) compartilhada pelas buscas de gestão."""
+
+import hashlib
+import json
+from datetime import date
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+
+
+SALT_CURSOR = "sistema-recic3-paginacao"
+TIPOS_CHAVE = {"texto", "data", "inteiro"}
+
+
+class CursorInvalido(ValueError):
+    """O cursor informado não foi emitido para esta consulta."""
+
+
+class OrdemKeyset:
+    """Ordenação estável usada para paginar: colunas de ordenação e desempate.
+
+    A última coluna deve ser única (normalmente o id), para que duas linhas
+    nunca empatem. Cada coluna informa a expressão SQL, o tipo do valor no
+    cursor e a posição da coluna na linha retornada pelo SELECT.
+    """
+
+    def __init__(self, nome, colunas, *, descendente=False):
+        if not colunas:
+            raise ValueError("A ordenação precisa de ao menos uma coluna.")
+        for _, tipo, _ in colunas:
+            if tipo not in TIPOS_CHAVE:
+                raise ValueError(f"Tipo de chave inválido: {tipo}.")
+        self.nome = nome
+        self.colunas = tuple(colunas)
+        self.descendente = descendente
+
+    @property
+    def order_by(self):
+        direcao = "DESC" if self.descendente else "ASC"
+        return ", ".join(f"{expressao} {direcao}" for expressao, _, _ in self.colunas)
+
+    @property
+    def condicao(self):
+        expressoes = ", ".join(expressao for expressao, _, _ in self.colunas)
+        marcadores = ", ".join("%s" for _ in self.colunas)
+        operador = "<" if self.descendente else ">"
+        return f"({expressoes}) {operador} ({marcadores})"
+
+    def chave_da_linha(self, linha):
+        valores = []
+        for _, tipo, indice in self.colunas:
+            valor = linha[indice]
+            if tipo == "texto":
+                valores.append(valor or "")
+            elif tipo == "data":
+                valores.append(valor.isoformat())
+            else:
+                valores.append(int(valor))
+        return valores
+
+    def valores_do_cursor(self, valores):
+        if not isinstance(valores, list) or len(valores) != len(self.colunas):
+            raise CursorInvalido("Cursor incompatível com a ordenação.")
+        convertidos = []
+        try:
+            for (_, tipo, _), valor in zip(self.colunas, valores):
+                if tipo == "texto":
+                    if not isinstance(valor, str):
+                        raise TypeError
+                    convertidos.append(valor)
+                elif tipo == "data":
+                    convertidos.append(date.fromisoformat(valor))
+                else:
+                    if isinstance(valor, bool):
+                        raise TypeError
+                    convertidos.append(int(valor))
+        except (TypeError, ValueError) as erro:
+            raise CursorInvalido("Cursor incompatível com a ordenação.") from erro
+        return convertidos
+
+
+class Pagina:
+    def __init__(self, linhas, proximo_cursor, total_estimado=None):
+        self.linhas = linhas
+        self.proximo_cursor = proximo_cursor
+        self.total_estimado = total_estimado
+
+    def resposta(self, itens):
+        """Corpo JSON padrão das buscas paginadas."""
+        corpo = {"itens": itens, "next_cursor": self.proximo_cursor}
+        if self.total_estimado is not None:
+            corpo["total_estimado"] = self.total_estimado
+        return corpo
+
+
+def _serializador():
+    return URLSafeSerializer(current_app.secret_key, salt=SALT_CURSOR)
+
+
+def _assinatura_filtros(filtros):
+    bruto = json.dumps(filtros or {}, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(bruto.encode()).hexdigest()[:16]
+
+
+def codificar_cursor(ordem, linha, filtros=None):
+    return _serializador().dumps(
+        {"o": ordem.nome, "f": _assinatura_filtros(filtros), "v": ordem.chave_da_linha(linha)}
+    )
+
+
+def decodificar_cursor(ordem, cursor, filtros=None):
+    """Valida assinatura, consulta e filtros antes de usar os valores do cursor."""
+    try:
+        dados = _serializador().loads(cursor)
+    except BadSignature as erro:
+        raise CursorInvalido("Cursor inválido.") from erro
+    if (
+        not isinstance(dados, dict)
+        or dados.get("o") != ordem.nome
+        or dados.get("f") != _assinatura_filtros(filtros)
+    ):
+        raise CursorInvalido("Cursor emitido para outra consulta.")
+    return ordem.valores_do_cursor(dados.get("v"))
+
+
+def ler_parametros_pagina(args, *, limite_padrao, limite_maximo):
+    """Lê `limite`, `cursor` e `total` da query string; ValueError se inválidos."""
+    bruto = (args.get("limite") or "").strip()
+    if bruto:
+        if not bruto.isdigit() or not 1 <= int(bruto) <= limite_maximo:
+            raise ValueError("Limite de paginação inválido.")
+        limite = int(bruto)
+    else:
+        limite = limite_padrao
+    cursor = (args.get("cursor") or "").strip() or None
+    com_total = (args.get("total") or "").strip().lower() in {"1", "true", "sim"}
+    return limite, cursor, com_total
+
+
+def estimar_total(cur, sql, params):
+    """Estimativa do planejador, em tempo constante, em vez de COUNT(*)."""
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, tuple(params))
+    linha = cur.fetchone()
+    plano = linha[0] if linha else None
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    try:
+        return int(plano[0]["Plan"]["Plan Rows"])
+    except (TypeError, LookupError, ValueError):
+        return None
+
+
+def consultar_pagina(
+    cur, sql, params, ordem, *, limite, cursor=None, filtros=None, com_total=False
+):
+    """Executa `sql` (SELECT ... WHERE ...) limitado à página após o cursor.
+
+    O SQL base não pode ter ORDER BY nem LIMIT. A consulta busca uma linha a
+    mais para saber se existe próxima página sem contar o resultado inteiro.
+    """
+    total_estimado = None
+    if com_total and cursor is None:
+        total_estimado = estimar_total(cur, sql, params)
+
+    params = list(params)
+    if cursor is not None:
+        sql += f" AND {ordem.condicao}"
+        params.extend(decodificar_cursor(ordem, cursor, filtros))
+    sql += f" ORDER BY {ordem.order_by} LIMIT %s"
+    params.append(limite + 1)
+
+    cur.execute(sql, tuple(params))
+    linhas = cur.fetchall()
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = codificar_cursor(ordem, linhas[-1], filtros)
+    return Pagina(linhas, proximo, total_estimado)
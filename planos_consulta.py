@@ -0,0 +1,328 @@
+"""Confere os planos das consultas críticas contra um banco semeado descartável.
+
+Cada entrada de `REGISTRO` é uma requisição real da aplicação, feita pelo test
+client sobre um PostgreSQL de `postgres_efemero` populado por
+`gerar_dados_sinteticos.py`. Todas as leituras executadas na requisição são
+gravadas com os mesmos parâmetros e passam por `EXPLAIN (FORMAT JSON)`.
+
+Um plano falha quando faz Seq Scan em tabela com mais de --limite-linhas linhas
+(salvo as tabelas liberadas na entrada) ou quando o custo estimado passa do
+teto gravado para aquela consulta. Os tetos ficam em
+`planos_consulta_tetos.json`, gravado com --gravar-tetos na mesma escala e
+semente; consultas sem teto gravado só passam pela regra do Seq Scan.
+"""
+
+import argparse
+import json
+import os
+import secrets
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+
+from flask import g, request_started
+
+from instrumentacao_banco import (
+    PADRAO_LEITURA,
+    EstatisticasBanco,
+    _sql_original,
+    _texto_comando,
+    impressao_digital,
+    normalizar_comando,
+)
+
+
+RAIZ = Path(__file__).resolve().parent
+ARQUIVO_TETOS = RAIZ / "planos_consulta_tetos.json"
+LIMITE_LINHAS_PADRAO = 10000
+MARGEM_TETO_PADRAO = 0.5
+
+
+@dataclass(frozen=True)
+class ConsultaMonitorada:
+    """Requisição cujas leituras são conferidas; `requisicao(alvos)` devolve método, caminho e dados."""
+
+    nome: str
+    requisicao: object
+    seq_scan_permitido: frozenset = frozenset()
+
+
+REGISTRO = (
+    # TRIM(it.descricao) = TRIM(ps.item) no JOIN com o catálogo.
+    ConsultaMonitorada(
+        "relatorio_mes_item",
+        lambda a: ("POST", "/gerar_relatorio", {**a["mes"], "uvr": a["uvr"], "item_rel": a["item"]}),
+    ),
+    ConsultaMonitorada(
+        "extrato_mes",
+        lambda a: ("POST", "/gerar_extrato_bancario", {
+            "id_conta_corrente_extrato": a["id_conta"],
+            "data_inicial_extrato": a["mes"]["data_inicial"],
+            "data_final_extrato": a["mes"]["data_final"],
+        }),
+    ),
+    ConsultaMonitorada(
+        "buscar_associados",
+        lambda a: ("GET", "/buscar_associados", {"q": "silva", "uvr": a["uvr"]}),
+    ),
+    ConsultaMonitorada(
+        "buscar_cadastros",
+        lambda a: ("GET", "/buscar_cadastros", {"q": "ltda", "uvr": a["uvr"]}),
+    ),
+    ConsultaMonitorada(
+        "buscar_transacoes_gestao",
+        lambda a: ("GET", "/buscar_transacoes_gestao", {**a["mes"], "uvr": a["uvr"]}),
+    ),
+    # LOWER(banco_nome) LIKE %s.
+    ConsultaMonitorada(
+        "buscar_contas_correntes",
+        lambda a: ("GET", "/buscar_contas_correntes_gestao", {"q": "banco", "uvr": a["uvr"]}),
+    ),
+    # Predicados (%s IS NULL OR coluna = %s) dos serviços da fiscalização.
+    ConsultaMonitorada(
+        "medicoes_por_contrato",
+        lambda a: ("GET", "/fiscalizacao-contratos/medicoes", {"contrato_id": a["contrato_id"]}),
+    ),
+    ConsultaMonitorada(
+        "fiscalizacoes_por_contrato",
+        lambda a: ("GET", "/fiscalizacao-contratos/fiscalizacoes", {"contrato_id": a["contrato_id"]}),
+    ),
+    ConsultaMonitorada(
+        "medicao_detalhe",
+        lambda a: ("GET", f"/fiscalizacao-contratos/medicoes/{a['medicao_id']}", {}),
+    ),
+    ConsultaMonitorada(
+        "contrato_detalhe",
+        lambda a: ("GET", f"/fiscalizacao-contratos/contratos/{a['contrato_id']}", {}),
+    ),
+)
+
+
+class GravadorLeituras(EstatisticasBanco):
+    """Estatísticas da requisição que guardam cada leitura com seus parâmetros."""
+
+    def __init__(self):
+        super().__init__(0)
+        self.leituras = []
+
+    def registrar(self, comando, duracao_s, *, metodo="execute", parametros=None):
+        super().registrar(comando, duracao_s, metodo=metodo, parametros=parametros)
+        if metodo == "execute" and PADRAO_LEITURA.match(_texto_comando(comando)):
+            self.leituras.append((comando, parametros))
+
+
+def chave_consulta(nome, comando):
+    return f"{nome}:{impressao_digital(normalizar_comando(comando))}"
+
+
+def _nos(plano):
+    yield plano
+    for filho in plano.get("Plans", ()):
+        yield from _nos(filho)
+
+
+def violacoes(plano, tamanhos, *, limite_linhas, seq_scan_permitido=frozenset(), teto=None):
+    """Propriedades do plano que não se sustentam, em texto; vazio quando o plano passa."""
+    encontradas = []
+    for no in _nos(plano):
+        tabela = no.get("Relation Name")
+        if (
+            no.get("Node Type") == "Seq Scan"
+            and tabela not in seq_scan_permitido
+            and tamanhos.get(tabela, 0) > limite_linhas
+        ):
+            encontradas.append(f"Seq Scan em {tabela} ({int(tamanhos[tabela])} linhas)")
+    if teto is not None and plano["Total Cost"] > teto:
+        encontradas.append(f"custo {plano['Total Cost']:.0f} acima do teto {teto:.0f}")
+    return encontradas
+
+
+def tamanhos_tabelas(cursor):
+    cursor.execute("""
+        SELECT c.relname, c.reltuples
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'p') AND n.nspname = current_schema()
+    """)
+    return {tabela: linhas for tabela, linhas in cursor.fetchall()}
+
+
+def explicar(cursor, comando, parametros):
+    cursor.execute("EXPLAIN (FORMAT JSON) " + _sql_original(comando), parametros)
+    resultado = cursor.fetchone()[0]
+    if isinstance(resultado, str):
+        resultado = json.loads(resultado)
+    return resultado[0]["Plan"]
+
+
+def gravar_leituras(app_module, cliente, metodo, caminho, dados, token):
+    """Executa a requisição e devolve o status e as leituras que ela fez."""
+    gravador = GravadorLeituras()
+
+    def instalar(_app, **_extras):
+        g._recic3_estatisticas_banco = gravador
+
+    request_started.connect(instalar, app_module.app)
+    try:
+        if metodo == "GET":
+            resposta = cliente.get(caminho, query_string=dados)
+        else:
+            resposta = cliente.open(
+                caminho, method=metodo, json=dados, headers={"X-CSRFToken": token}
+            )
+    finally:
+        request_started.disconnect(instalar, app_module.app)
+    return resposta.status_code, gravador.leituras
+
+
+def _alvos(app_module):
+    from benchmark_endpoints import _localizar_alvos
+
+    alvos = _localizar_alvos(app_module, 0)
+    final = date.fromisoformat(alvos["data_final"])
+    alvos["mes"] = {
+        "data_inicial": final.replace(day=1).isoformat(),
+        "data_final": final.isoformat(),
+    }
+    conn = app_module.conectar_banco()
+    cur = conn.cursor()
+    cur.execute("SELECT item FROM produtos_servicos ORDER BY id LIMIT 1")
+    alvos["item"] = cur.fetchone()[0]
+    conn.close()
+    return alvos
+
+
+def conferir(sessao, *, limite_linhas, tetos):
+    """Confere o REGISTRO; devolve o custo por consulta e as falhas encontradas."""
+    custos, falhas = {}, []
+    with sessao["conexao"].cursor() as cursor:
+        tamanhos = tamanhos_tabelas(cursor)
+        for consulta in REGISTRO:
+            metodo, caminho, dados = consulta.requisicao(sessao["alvos"])
+            status, leituras = gravar_leituras(
+                sessao["app"], sessao["cliente"], metodo, caminho, dados, sessao["token"]
+            )
+            if status != 200:
+                falhas.append(f"{consulta.nome}: status {status}")
+            for comando, parametros in leituras:
+                chave = chave_consulta(consulta.nome, comando)
+                if chave in custos:
+                    continue
+                plano = explicar(cursor, comando, parametros)
+                custos[chave] = plano["Total Cost"]
+                problemas = violacoes(
+                    plano,
+                    tamanhos,
+                    limite_linhas=limite_linhas,
+                    seq_scan_permitido=consulta.seq_scan_permitido,
+                    teto=tetos.get(chave),
+                )
+                falhas.extend(f"{chave}: {problema}" for problema in problemas)
+                print(f"{'FALHA' if problemas else 'ok':<6} {chave:<48} custo {plano['Total Cost']:>12.1f}")
+    return custos, falhas
+
+
+@contextmanager
+def sessao_banco_semeado(escala, semente, *, pg_bin=None, porta=54330):
+    """Cluster efêmero semeado, aplicação importada e cliente admin autenticado."""
+    from benchmark_endpoints import _criar_admin
+    from benchmark_pagamentos_concorrentes import _cliente_autenticado
+    from postgres_efemero import PostgresEfemero
+
+    with PostgresEfemero(pg_bin, porta) as postgres:
+        dsn = postgres.semear("planos", escala, semente)
+        usuario, senha = "planos", secrets.token_urlsafe(16)
+        os.environ.update({
+            "APP_ENV": "testing",
+            "SECRET_KEY": secrets.token_urlsafe(32),
+            "DATABASE_URL": dsn,
+            "RATELIMIT_ENABLED": "false",
+        })
+        import app as app_module
+        import psycopg2
+
+        conexao = psycopg2.connect(dsn)
+        conexao.autocommit = True
+        try:
+            _criar_admin(app_module, usuario, senha)
+            cliente, token = _cliente_autenticado(app_module, usuario, senha)
+            yield {
+                "app": app_module,
+                "cliente": cliente,
+                "token": token,
+                "conexao": conexao,
+                "alvos": _alvos(app_module),
+            }
+        finally:
+            conexao.close()
+            app_module.app.extensions["recic3_banco_dados"].fechar()
+
+
+def executar(argumentos):
+    tetos = {}
+    if argumentos.tetos and not argumentos.gravar_tetos and Path(argumentos.tetos).is_file():
+        gravados = json.loads(Path(argumentos.tetos).read_text(encoding="utf-8"))
+        if (gravados["escala"], gravados["semente"]) != (argumentos.escala, argumentos.semente):
+            print("Os tetos foram gravados com outra escala ou semente; nada foi conferido.")
+            return 2
+        tetos = gravados["tetos"]
+
+    with sessao_banco_semeado(
+        argumentos.escala, argumentos.semente, pg_bin=argumentos.pg_bin, porta=argumentos.porta
+    ) as sessao:
+        custos, falhas = conferir(sessao, limite_linhas=argumentos.limite_linhas, tetos=tetos)
+
+    if argumentos.gravar_tetos:
+        Path(argumentos.gravar_tetos).write_text(
+            json.dumps(
+                {
+                    "escala": argumentos.escala,
+                    "semente": argumentos.semente,
+                    "tetos": {
+                        chave: round(custo * (1 + argumentos.margem), 1)
+                        for chave, custo in sorted(custos.items())
+                    },
+                },
+                indent=2,
+                ensure_ascii=False,
+            ) + "\n",
+            encoding="utf-8",
+        )
+    for falha in falhas:
+        print(f"REGRESSÃO {falha}")
+    return 1 if falhas else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Executa EXPLAIN nas leituras das consultas críticas em um PostgreSQL "
+            "local semeado e falha em Seq Scan de tabela grande ou custo acima do teto."
+        )
+    )
+    parser.add_argument("--pg-bin", default=os.getenv("PG_BIN"))
+    parser.add_argument("--porta", type=int, default=54330)
+    parser.add_argument("--escala", default="media")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--limite-linhas", type=int, default=LIMITE_LINHAS_PADRAO)
+    parser.add_argument("--tetos", default=str(ARQUIVO_TETOS))
+    parser.add_argument("--gravar-tetos", help="Arquivo JSON para os custos atuais com --margem.")
+    parser.add_argument("--margem", type=float, default=MARGEM_TETO_PADRAO)
+    argumentos = parser.parse_args()
+
+    from gerar_dados_sinteticos import ESCALAS
+
+    if argumentos.escala not in ESCALAS:
+        parser.error(f"--escala deve ser uma de: {', '.join(sorted(ESCALAS))}.")
+    if argumentos.limite_linhas < 0 or argumentos.margem < 0:
+        parser.error("--limite-linhas e --margem não podem ser negativos.")
+    try:
+        sys.exit(executar(argumentos))
+    except RuntimeError as erro:
+        parser.error(str(erro))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""PostgreSQL local e descartável para benchmarks e conferência de planos.
+
+O cluster é criado com initdb em uma pasta temporária, aceita conexões somente
+pelo socket Unix dessa pasta e é apagado ao sair do contexto. Não usa Docker,
+rede nem DATABASE_URL. Os binários vêm de --pg-bin/PG_BIN, do PATH ou das
+pastas de versão do Debian/Ubuntu.
+"""
+
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+
+RAIZ = Path(__file__).resolve().parent
+USUARIO = "postgres"
+# Durabilidade desligada: o cluster é descartado ao final de qualquer forma.
+OPCOES_SERVIDOR = (
+    "-c listen_addresses='' -c fsync=off -c synchronous_commit=off "
+    "-c full_page_writes=off -c shared_buffers=128MB"
+)
+
+
+def localizar_binarios(pasta=None):
+    """Pasta com initdb e pg_ctl; RuntimeError quando não há PostgreSQL local."""
+    candidatas = [pasta or os.getenv("PG_BIN")]
+    encontrado = shutil.which("initdb")
+    candidatas.append(os.path.dirname(encontrado) if encontrado else None)
+    candidatas.extend(sorted(glob.glob("/usr/lib/postgresql/*/bin"), reverse=True))
+    for candidata in filter(None, candidatas):
+        if all(os.access(os.path.join(candidata, nome), os.X_OK) for nome in ("initdb", "pg_ctl")):
+            return candidata
+    raise RuntimeError("initdb/pg_ctl não encontrados; informe PG_BIN ou --pg-bin.")
+
+
+class PostgresEfemero:
+    """Cluster temporário usado como gerenciador de contexto."""
+
+    def __init__(self, binarios=None, porta=5432):
+        self.binarios = localizar_binarios(binarios)
+        self.porta = porta
+        self.pasta = None
+
+    def _executar(self, programa, *argumentos):
+        subprocess.run(
+            [os.path.join(self.binarios, programa), *argumentos],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+
+    def __enter__(self):
+        if hasattr(os, "geteuid") and os.geteuid() == 0:
+            raise RuntimeError("initdb não roda como root; use um usuário comum.")
+        self.pasta = Path(tempfile.mkdtemp(prefix="recic3_pg_"))
+        try:
+            dados = self.pasta / "dados"
+            self._executar(
+                "initdb", "-D", str(dados), "-U", USUARIO, "-A", "trust",
+                "-E", "UTF8", "--no-locale", "--no-sync",
+            )
+            self._executar(
+                "pg_ctl", "-D", str(dados), "-l", str(self.pasta / "postgres.log"), "-w",
+                "-o", f"-k {self.pasta} -p {self.porta} {OPCOES_SERVIDOR}", "start",
+            )
+        except BaseException:
+            shutil.rmtree(self.pasta, ignore_errors=True)
+            raise
+        return self
+
+    def __exit__(self, *_):
+        try:
+            self._executar("pg_ctl", "-D", str(self.pasta / "dados"), "-m", "immediate", "-w", "stop")
+        finally:
+            shutil.rmtree(self.pasta, ignore_errors=True)
+        return False
+
+    def dsn(self, banco="postgres"):
+        from psycopg2.extensions import make_dsn
+
+        return make_dsn(host=str(self.pasta), port=self.porta, user=USUARIO, dbname=banco)
+
+    def criar_banco(self, nome):
+        import psycopg2
+        from psycopg2 import sql
+
+        conexao = psycopg2.connect(self.dsn())
+        conexao.autocommit = True
+        try:
+            with conexao.cursor() as cur:
+                cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(nome)))
+        finally:
+            conexao.close()
+        return self.dsn(nome)
+
+    def semear(self, nome, escala, semente, esquema="legado"):
+        """Cria o banco e roda gerar_dados_sinteticos.py em outro processo.
+
+        O processo separado importa a aplicação apontando para o banco novo sem
+        alterar o ambiente nem os módulos já importados por quem chamou.
+        """
+        from gerar_dados_sinteticos import CONFIRMACAO_EXIGIDA
+
+        dsn = self.criar_banco(nome)
+        ambiente = {chave: valor for chave, valor in os.environ.items() if chave != "DATABASE_URL"}
+        subprocess.run(
+            [
+                sys.executable, str(RAIZ / "gerar_dados_sinteticos.py"), "--dsn", dsn,
+                "--esquema", esquema, "--escala", escala, "--semente", str(semente),
+                "--confirmar", CONFIRMACAO_EXIGIDA,
+            ],
+            check=True, cwd=RAIZ, env=ambiente, stdout=subprocess.DEVNULL,
+        )
+        return dsn
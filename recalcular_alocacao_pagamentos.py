@@ -0,0 +1,30 @@
+"""Recalcula manualmente a alocação de pagamentos por item."""
+
+import argparse
+
+
+CONFIRMACAO_EXIGIDA = "RECALCULAR_ALOCACAO_PAGAMENTOS"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Recalcula a alocação de pagamentos de todas as NFs do banco "
+            "configurado. As colunas vêm de atualizar_esquema.py."
+        )
+    )
+    parser.add_argument(
+        "--confirmar",
+        help=f"Informe exatamente {CONFIRMACAO_EXIGIDA} para prosseguir.",
+    )
+    argumentos = parser.parse_args()
+    if argumentos.confirmar != CONFIRMACAO_EXIGIDA:
+        parser.error("Confirmação inválida; nenhuma alteração foi executada.")
+
+    from app import recalcular_alocacao_pagamentos
+
+    recalcular_alocacao_pagamentos()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Reconstrói manualmente os saldos mensais das contas correntes."""
+
+import argparse
+
+
+CONFIRMACAO_EXIGIDA = "RECALCULAR_SALDOS_CONTA"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Reconstrói os fechamentos mensais de todas as contas do banco "
+            "configurado. A tabela vem de atualizar_esquema.py."
+        )
+    )
+    parser.add_argument(
+        "--confirmar",
+        help=f"Informe exatamente {CONFIRMACAO_EXIGIDA} para prosseguir.",
+    )
+    argumentos = parser.parse_args()
+    if argumentos.confirmar != CONFIRMACAO_EXIGIDA:
+        parser.error("Confirmação inválida; nenhuma alteração foi executada.")
+
+    from app import recalcular_saldos_conta
+
+    recalcular_saldos_conta()
+
+
+if __name__ == "__main__":
+    main()
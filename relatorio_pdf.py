@@ -0,0 +1,198 @@
+"""Renderização rápida de relatórios tabulares longos em PDF.
+
+Em vez de um `Paragraph` por célula dentro de uma única `Table` gigante, cada
+página recebe uma `Table` própria de texto simples, com altura de linha fixa e
+estilo calculado uma única vez. Como a quantidade de linhas por página é
+conhecida de antemão, o ReportLab não precisa medir nem dividir tabelas, e
+cada página fecha com o subtotal das colunas somadas.
+
+O texto é desenhado literalmente (sem o parser de marcação do `Paragraph`),
+então não precisa ser escapado; o que não cabe na coluna é cortado com "…".
+"""
+
+import io
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Callable
+
+from reportlab.lib import colors
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import PageBreak, SimpleDocTemplate, Table, TableStyle
+
+
+FONTE = "Helvetica"
+FONTE_NEGRITO = "Helvetica-Bold"
+TAMANHO_FONTE = 7
+TAMANHO_FONTE_CABECALHO = 7.5
+ALTURA_LINHA = 10
+ALTURA_CABECALHO = 14
+PREENCHIMENTO_HORIZONTAL = 2
+# Folga contra arredondamentos do ReportLab ao encaixar a tabela no quadro.
+FOLGA_QUADRO = 2
+RETICENCIAS = "…"
+# Largura do glifo mais largo da Helvetica ("@"), em frações do corpo da fonte.
+LARGURA_MAXIMA_EM = 1.015
+
+
+@dataclass(frozen=True)
+class ColunaPdf:
+    titulo: str
+    largura: float
+    alinhamento: str = "LEFT"
+    formatar: Callable = str
+    somar: bool = False
+
+
+def _decimal(valor):
+    try:
+        return Decimal(str(valor)) if valor not in (None, "") else Decimal("0")
+    except InvalidOperation:
+        return Decimal("0")
+
+
+class _Cortador:
+    """Corta o texto na largura útil da coluna, lembrando os cortes já feitos."""
+
+    def __init__(self, largura_util):
+        self.largura_util = largura_util
+        self.caracteres_seguros = int(largura_util // (TAMANHO_FONTE * LARGURA_MAXIMA_EM))
+        self.cache = {}
+
+    def __call__(self, texto):
+        # Nenhum caractere da Helvetica passa de LARGURA_MAXIMA_EM; até esse
+        # comprimento o texto cabe sem precisar medir.
+        if len(texto) <= self.caracteres_seguros:
+            return texto
+        cortado = self.cache.get(texto)
+        if cortado is None:
+            cortado = texto
+            if stringWidth(texto, FONTE, TAMANHO_FONTE) > self.largura_util:
+                limite = self.largura_util - stringWidth(RETICENCIAS, FONTE, TAMANHO_FONTE)
+                while cortado and stringWidth(cortado, FONTE, TAMANHO_FONTE) > limite:
+                    cortado = cortado[:-1]
+                cortado = cortado.rstrip() + RETICENCIAS
+            if len(self.cache) < 4096:
+                self.cache[texto] = cortado
+        return cortado
+
+
+def _estilo_tabela(colunas, cor_cabecalho, linhas_rodape):
+    comandos = [
+        ("FONTNAME", (0, 0), (-1, -1), FONTE),
+        ("FONTSIZE", (0, 0), (-1, -1), TAMANHO_FONTE),
+        ("LEADING", (0, 0), (-1, -1), TAMANHO_FONTE + 1),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("LEFTPADDING", (0, 0), (-1, -1), PREENCHIMENTO_HORIZONTAL),
+        ("RIGHTPADDING", (0, 0), (-1, -1), PREENCHIMENTO_HORIZONTAL),
+        ("TOPPADDING", (0, 0), (-1, -1), 0),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 1),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("BACKGROUND", (0, 0), (-1, 0), cor_cabecalho),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+        ("FONTNAME", (0, 0), (-1, 0), FONTE_NEGRITO),
+        ("FONTSIZE", (0, 0), (-1, 0), TAMANHO_FONTE_CABECALHO),
+        ("ALIGN", (0, 0), (-1, 0), "CENTER"),
+    ]
+    for indice, coluna in enumerate(colunas):
+        comandos.append(("ALIGN", (indice, 1), (indice, -1), coluna.alinhamento))
+    primeira_soma = min(i for i, coluna in enumerate(colunas) if coluna.somar)
+    for linha in range(-linhas_rodape, 0):
+        comandos.extend([
+            ("FONTNAME", (0, linha), (-1, linha), FONTE_NEGRITO),
+            ("BACKGROUND", (0, linha), (-1, linha), colors.HexColor("#DCE6F1")),
+            ("SPAN", (0, linha), (primeira_soma - 1, linha)),
+            ("ALIGN", (0, linha), (0, linha), "RIGHT"),
+        ])
+    return TableStyle(comandos)
+
+
+def linhas_por_pagina(altura_quadro, linhas_rodape=1):
+    """Quantas linhas de dados cabem no quadro junto com cabeçalho e rodapé."""
+    disponivel = altura_quadro - FOLGA_QUADRO - ALTURA_CABECALHO - linhas_rodape * ALTURA_LINHA
+    return max(1, int(disponivel // ALTURA_LINHA))
+
+
+def renderizar_tabela_paginada(
+    linhas,
+    colunas,
+    *,
+    pagesize,
+    margens,
+    ao_desenhar_pagina=None,
+    cor_cabecalho=colors.HexColor("#4F81BD"),
+    rotulo_subtotal="Subtotal da página",
+    rotulo_total="Total geral",
+):
+    """Gera o PDF e retorna os bytes.
+
+    `linhas` é um iterável de sequências de valores brutos, na ordem de
+    `colunas`; `ColunaPdf.formatar` converte cada valor em texto e as colunas
+    com `somar=True` recebem subtotal por página e total geral no fim. Pelo
+    menos uma coluna precisa ter `somar=True`, depois da primeira.
+    `margens` é (superior, inferior, esquerda, direita).
+    """
+    superior, inferior, esquerda, direita = margens
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=pagesize,
+        topMargin=superior, bottomMargin=inferior,
+        leftMargin=esquerda, rightMargin=direita,
+    )
+    # O quadro padrão do SimpleDocTemplate tem 6 pt de preenchimento em cima e embaixo.
+    altura_quadro = doc.height - 12
+    capacidade = linhas_por_pagina(altura_quadro)
+
+    larguras = [coluna.largura for coluna in colunas]
+    cabecalho = [coluna.titulo for coluna in colunas]
+    indices_soma = [i for i, coluna in enumerate(colunas) if coluna.somar]
+    formatadores = [coluna.formatar for coluna in colunas]
+    cortadores = [
+        _Cortador(coluna.largura - 2 * PREENCHIMENTO_HORIZONTAL) for coluna in colunas
+    ]
+    estilo_pagina = _estilo_tabela(colunas, cor_cabecalho, 1)
+    estilo_ultima = _estilo_tabela(colunas, cor_cabecalho, 2)
+    formatar_soma = {i: colunas[i].formatar for i in indices_soma}
+
+    def rodape(rotulo, somas):
+        linha = [""] * len(colunas)
+        linha[0] = rotulo
+        for indice in indices_soma:
+            linha[indice] = formatar_soma[indice](somas[indice])
+        return linha
+
+    def tabela(pagina, somas_pagina, estilo, total=None):
+        dados = [cabecalho, *pagina, rodape(rotulo_subtotal, somas_pagina)]
+        if total is not None:
+            dados.append(rodape(rotulo_total, total))
+        alturas = [ALTURA_CABECALHO] + [ALTURA_LINHA] * (len(dados) - 1)
+        return Table(dados, colWidths=larguras, rowHeights=alturas, style=estilo)
+
+    story = []
+    total_geral = {i: Decimal("0") for i in indices_soma}
+    pagina, somas_pagina = [], {i: Decimal("0") for i in indices_soma}
+    for valores in linhas:
+        if len(pagina) == capacidade:
+            story.extend([tabela(pagina, somas_pagina, estilo_pagina), PageBreak()])
+            pagina, somas_pagina = [], {i: Decimal("0") for i in indices_soma}
+        for indice in indices_soma:
+            valor = _decimal(valores[indice])
+            somas_pagina[indice] += valor
+            total_geral[indice] += valor
+        pagina.append([
+            cortar(formatar(valor))
+            for cortar, formatar, valor in zip(cortadores, formatadores, valores)
+        ])
+
+    # A última página leva também o total geral; se não houver espaço, ele
+    # passa para uma página própria.
+    if len(pagina) > linhas_por_pagina(altura_quadro, linhas_rodape=2):
+        story.extend([tabela(pagina, somas_pagina, estilo_pagina), PageBreak()])
+        pagina, somas_pagina = [], {i: Decimal("0") for i in indices_soma}
+    story.append(tabela(pagina, somas_pagina, estilo_ultima, total_geral))
+
+    doc.build(
+        story,
+        onFirstPage=ao_desenhar_pagina or (lambda c, d: None),
+        onLaterPages=ao_desenhar_pagina or (lambda c, d: None),
+    )
+    return buffer.getvalue()
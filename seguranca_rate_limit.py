@@ -9,6 +9,7 @@ from flask_limiter import Limiter
 from flask_login import current_user
 
 from logging_operacional import registrar_evento
+from metricas import incrementar
 
 
 AMBIENTES_ONLINE = {"homologation", "production"}
@@ -42,6 +43,7 @@ ENDPOINTS_UPLOAD = {
     "fiscalizacao_contratos.atestes_nota_editar",
 }
 ENDPOINTS_DOWNLOAD = {
+    "arquivo_tarefa_relatorio",
     "fiscalizacao_contratos.documentos_arquivo",
 }
 ENDPOINTS_EXPOSTOS_ESPECIAIS = {
@@ -195,6 +197,10 @@ def configurar_rate_limit(app, ambiente):
             categoria_seguranca="rate_limit",
             status_code=429,
         )
+        incrementar(
+            "recic3_rate_limit_rejections_total",
+            endpoint=request.endpoint or "unmatched",
+        )
         classificador_json = current_app.config.get("JSON_ENDPOINT_CLASSIFIER")
         if classificador_json and classificador_json():
             resposta = jsonify(
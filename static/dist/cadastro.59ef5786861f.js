@@ -0,0 +1,3277 @@
+function escaparHtml(valor) {
+    return String(valor ?? "").replace(/[&<>"']/g, (caractere) => ({
+        "&": "&amp;",
+        "<": "&lt;",
+        ">": "&gt;",
+        '"': "&quot;",
+        "'": "&#39;",
+    })[caractere]);
+}
+
+function idNumericoSeguro(valor) {
+    if (valor === null || valor === undefined || valor === "") return null;
+    const numero = Number(valor);
+    return Number.isSafeInteger(numero) && numero >= 0 ? numero : null;
+}
+
+let redirecionandoParaLogin = false;
+function tratarSessaoExpirada(statusHttp) {
+    if (statusHttp !== 401 || redirecionandoParaLogin) return false;
+    redirecionandoParaLogin = true;
+    alert("Sua sessão terminou. Entre novamente para continuar.");
+    window.location.assign("/login");
+    return true;
+}
+
+let avisoLimiteExcedidoAtivo = false;
+function tratarLimiteExcedido(statusHttp) {
+    if (statusHttp !== 429 || avisoLimiteExcedidoAtivo) return false;
+    avisoLimiteExcedidoAtivo = true;
+    alert("Muitas solicitações. Aguarde um pouco e tente novamente.");
+    window.setTimeout(() => {
+        avisoLimiteExcedidoAtivo = false;
+    }, 1000);
+    return true;
+}
+
+$(document).ajaxSend(function (_evento, xhr, configuracao) {
+    const metodo = (configuracao.type || "GET").toUpperCase();
+    const destino = new URL(configuracao.url, window.location.href);
+    if (
+        ["POST", "PUT", "PATCH", "DELETE"].includes(metodo)
+        && destino.origin === window.location.origin
+    ) {
+        xhr.setRequestHeader(
+            "X-CSRFToken",
+            document.querySelector('meta[name="csrf-token"]').content,
+        );
+    }
+});
+
+$(document).ajaxError(function (_evento, xhr) {
+    if (!tratarSessaoExpirada(xhr.status)) {
+        tratarLimiteExcedido(xhr.status);
+    }
+});
+
+// Listas JSON marcadas com ETag pelo servidor: a página guarda a última cópia
+// em memória e revalida com If-None-Match. Com 304, os callbacks de sucesso
+// recebem a cópia guardada; nada é gravado no cache do navegador.
+const respostasComEtag = new Map();
+const MAX_RESPOSTAS_COM_ETAG = 50;
+
+$.ajaxPrefilter(function (configuracao, _originais, xhr) {
+    const metodo = (configuracao.type || "GET").toUpperCase();
+    let endereco = configuracao.url;
+    if (typeof configuracao.data === "string" && configuracao.data) {
+        endereco += (endereco.includes("?") ? "&" : "?") + configuracao.data;
+    }
+    const destino = new URL(endereco, window.location.href);
+    if (metodo !== "GET" || destino.origin !== window.location.origin) return;
+
+    const guardada = respostasComEtag.get(destino.href);
+    if (guardada) {
+        xhr.setRequestHeader("If-None-Match", guardada.etag);
+    }
+    const sucessos = [].concat(configuracao.success || []);
+    configuracao.success = function (dados, estado, requisicao) {
+        if (requisicao.status === 304 && guardada) {
+            dados = guardada.dados;
+            estado = "success";
+        } else {
+            const etag = requisicao.getResponseHeader("ETag");
+            respostasComEtag.delete(destino.href);
+            if (etag) {
+                if (respostasComEtag.size >= MAX_RESPOSTAS_COM_ETAG) {
+                    respostasComEtag.delete(respostasComEtag.keys().next().value);
+                }
+                respostasComEtag.set(destino.href, { etag, dados });
+            }
+        }
+        sucessos.forEach((callback) => callback.call(this, dados, estado, requisicao));
+    };
+});
+;
+// Tela de cadastro. usuarioLogadoUvr e usuarioIsAdmin vêm do script inline da
+// template, que roda antes deste arquivo.
+
+    // 2. LISTA DE BANCOS E FUNÇÃO
+    const bancosBrasil = [ 
+        { codigo: "001", nome: "Banco do Brasil S.A." }, 
+        { codigo: "104", nome: "Caixa Econômica Federal" }, 
+        { codigo: "237", nome: "Bradesco S.A." }, 
+        { codigo: "341", nome: "Itaú Unibanco S.A." }, 
+        { codigo: "033", nome: "Santander (Brasil) S.A." }, 
+        { codigo: "745", nome: "Citibank S.A." }, 
+        { codigo: "399", nome: "HSBC Bank Brasil S.A. - Banco Múltiplo" },  
+        { codigo: "077", nome: "Banco Inter S.A." }, 
+        { codigo: "260", nome: "Nu Pagamentos S.A. (Nubank)" }, 
+        { codigo: "212", nome: "Banco Original S.A." }, 
+        { codigo: "655", nome: "Banco Votorantim S.A." }, 
+        { codigo: "070", nome: "BRB - Banco de Brasília S.A." }, 
+        { codigo: "041", nome: "Banrisul - Banco do Estado do Rio Grande do Sul S.A." }, 
+        { codigo: "756", nome: "Sicoob - Banco Cooperativo do Brasil S.A." }, 
+        { codigo: "085", nome: "Ailos (Viacredi, CredCrea, etc)" }, 
+        { codigo: "099", nome: "Uniprime Central CCC Ltda" }, 
+        { codigo: "748", nome: "Sicredi - Banco Cooperativo Sicredi S.A." }, 
+        { codigo: "000", nome: "Outro (especificar no apelido)" } 
+    ];
+
+    function popularBancos() {
+        const selectBanco = $('#bancoContaSelect');
+        if (selectBanco.find('option').length <= 1 || selectBanco.val() === "") {
+            selectBanco.empty().append('<option value="">Selecione o Banco...</option>');
+            bancosBrasil.forEach(function(banco) { 
+                selectBanco.append(`<option value="${banco.codigo}|${banco.nome}">${banco.codigo} - ${banco.nome}</option>`); 
+            });
+        }
+    }
+
+    // 3. MAPA GLOBAL DE GRUPOS E SUBGRUPOS (ATUALIZADO PELO CSV)
+    // Usado em: Cadastro de Clientes, Produtos, Transações e Catálogo.
+    // Usamos 'var' para evitar erro de redeclaração se o script rodar 2x
+    var MAPA_GRUPOS_SISTEMA = {
+        "Receita": [
+            "Elétrico ou Eletrônico",
+            "Metal",
+            "Não convencionais",
+            "Outras Receitas",
+            "Papel",
+            "Plástico",
+            "Repasses Governamentais",
+            "Vidro"
+        ],
+        "Despesa": [
+            "Despesas de operação",
+            "Despesas de manutenção",
+            "Rateio dos Associados",
+        ]
+    };
+
+    // Lista unificada para telas que não filtram por tipo (ex: filtros gerais)
+    var TODOS_GRUPOS_UNIFICADOS = [...MAPA_GRUPOS_SISTEMA["Receita"], ...MAPA_GRUPOS_SISTEMA["Despesa"]].sort();
+
+    // --- FUNÇÕES ATUALIZADAS PARA USAR O NOVO MAPA ---
+
+    function atualizarAtividadesCadastroClienteFornecedor() {
+        var tipoCadastro = $('#tipoCadastroCF').val(); 
+        var selectAtividade = $('#tipoAtividadeCF'); 
+        selectAtividade.empty().append('<option value="">Selecione...</option>');
+        
+        let lista = [];
+        // Fornecedor/Prestador -> Usa lista de DESPESAS
+        if (tipoCadastro === "Fornecedor/Prestador") {
+            lista = MAPA_GRUPOS_SISTEMA["Despesa"];
+        } 
+        // Cliente -> Usa lista de RECEITAS
+        else if (tipoCadastro === "Cliente") {
+            lista = MAPA_GRUPOS_SISTEMA["Receita"];
+        }
+
+        if (lista) {
+            lista.sort().forEach(function(item) { selectAtividade.append(`<option value="${item}">${item}</option>`); });
+        }
+    }
+
+    function atualizarAtividadesProdutoServico() {
+        var tipoPS = $('#tipoProdutoServicoSelect').val(); 
+        var selectAtividadePS = $('#tipoAtividadeProdutoServicoSelect'); 
+        selectAtividadePS.empty().append('<option value="">Selecione...</option>');
+        
+        let lista = [];
+        if (tipoPS === "Despesa") lista = MAPA_GRUPOS_SISTEMA["Despesa"];
+        else if (tipoPS === "Receita") lista = MAPA_GRUPOS_SISTEMA["Receita"];
+
+        if (lista) {
+            lista.sort().forEach(function(item) { selectAtividadePS.append(`<option value="${item}">${item}</option>`); });
+        }
+    }
+
+    function atualizarAtividadesTransacao() { 
+        var tipo = $('#tipoTransacaoSelect').val(); 
+        var selectAtividade = $('#tipoAtividadeTransacaoSelect'); 
+        var currentAtividade = selectAtividade.val(); 
+        selectAtividade.empty().append('<option value="">Selecione...</option>');
+        
+        let lista = [];
+        if (tipo === "Despesa") lista = MAPA_GRUPOS_SISTEMA["Despesa"];
+        else if (tipo === "Receita") lista = MAPA_GRUPOS_SISTEMA["Receita"];
+        
+        if (lista) {
+            lista.sort().forEach(function(item) { selectAtividade.append(`<option value="${item}">${item}</option>`); });
+        }
+
+        // Mantém seleção se possível
+        if (currentAtividade && lista.includes(currentAtividade)) { 
+            selectAtividade.val(currentAtividade); 
+        } else { 
+            selectAtividade.val(''); 
+        }
+    }
+
+    function atualizarDataHora(selector) {
+        const now = new Date();
+        
+        // Pega as partes da data e garante que tenham 2 dígitos (ex: 05 em vez de 5)
+        const day = String(now.getDate()).padStart(2, '0');
+        const month = String(now.getMonth() + 1).padStart(2, '0');
+        const year = now.getFullYear();
+        
+        const hours = String(now.getHours()).padStart(2, '0');
+        const minutes = String(now.getMinutes()).padStart(2, '0');
+        const seconds = String(now.getSeconds()).padStart(2, '0');
+        
+        // Monta a string no formato exato que o Python espera: DD/MM/AAAA HH:MM:SS
+        const str = `${day}/${month}/${year} ${hours}:${minutes}:${seconds}`;
+        
+        $(selector).val(str);
+    }
+
+    
+    // --- INÍCIO DO DOCUMENT READY (CARREGAMENTO DA PÁGINA) ---
+    $(document).ready(function() {
+        $('.valor-monetario').mask('#.##0,00', {reverse: true});
+        $('#cnpj').mask('00.000.000/0000-00', {reverse: true});
+        $('#cepCF, #cepAssociado').mask('00000-000');
+        $('#telefoneCF, #telAssociado').mask('(00) 00000-0000');
+        $('#cpfAssociado').mask('000.000.000-00');
+
+        function preencherDataAtual(selector) {
+            const now = new Date();
+            const day = ("0" + now.getDate()).slice(-2);
+            const month = ("0" + (now.getMonth() + 1)).slice(-2);
+            const today = now.getFullYear() + "-" + (month) + "-" + (day);
+            $(selector).val(today);
+        }
+        function preencherDatasPadraoFluxo() {
+            const now = new Date();
+            const day = ("0" + now.getDate()).slice(-2);
+            const month = ("0" + (now.getMonth() + 1)).slice(-2);
+            const today = now.getFullYear() + "-" + (month) + "-" + (day);
+            
+            const firstDay = new Date(now.getFullYear(), now.getMonth(), 1);
+            const fDay = ("0" + firstDay.getDate()).slice(-2);
+            const fMonth = ("0" + (firstDay.getMonth() + 1)).slice(-2);
+            const firstDate = firstDay.getFullYear() + "-" + (fMonth) + "-" + (fDay);
+
+            $('#fluxoDataInicialFiltro').val(firstDate);
+            $('#fluxoDataFinalFiltro').val(today);
+        }
+
+        // --- PREENCHIMENTO AUTOMÁTICO DE ASSOCIAÇÃO ---
+        const mapUvrAssociacao = { "UVR 01": "ASCAMAR", "UVR 02": "ACAN" };
+        function preencherAssociacao(selectId, inputId) {
+            const uvr = $('#' + selectId).val();
+            $('#' + inputId).val(mapUvrAssociacao[uvr] || "");
+            if(selectId === 'uvrFluxoCaixa') $('#associacaoFluxoCaixa').val(mapUvrAssociacao[uvr] || "");
+        }
+
+// --- FUNÇÃO mostrarFormulario (ATUALIZADA) ---
+        window.mostrarFormulario = function(formId) {
+            // 1. Esconde todas as telas e mostra a selecionada
+            $('.form-container').hide();
+            $('#' + formId).show();
+
+            // 2. Lógica específica para cada tela
+            if (formId === 'clienteFornecedorForm') { 
+                atualizarDataHora('#dataHoraCadastroCF'); 
+                atualizarAtividadesCadastroClienteFornecedor(); 
+            }
+            else if (formId === 'associadoForm') { 
+                atualizarDataHora('#dataHoraCadastroAssociado'); 
+            }
+            else if (formId === 'produtoServicoForm') { 
+                atualizarDataHora('#dataHoraCadastroPS'); 
+                atualizarAtividadesProdutoServico(); 
+            }
+            else if (formId === 'contaCorrenteForm') { 
+                atualizarDataHora('#dataHoraCadastroConta'); 
+                popularBancos(); 
+            }
+            else if (formId === 'receitaDespesaForm') { 
+                atualizarDataHora('#dataHoraCadastroTransacao'); 
+                preencherDataAtual('#dataDocumentoTransacao'); 
+                
+                // Força atualização da lista de grupos
+                atualizarAtividadesTransacao(); 
+
+                if ($('#itensDocumentoContainer .item-row').length === 0) { adicionarItemLinha(); } 
+                $('#uvrSelectTransacao').trigger('change'); 
+            }
+            else if (formId === 'fluxoCaixaForm') { 
+                atualizarDataHora('#dataHoraRegistroFluxo'); 
+                preencherDataAtual('#dataEfetivaFluxo'); 
+                if(!$('#fluxoDataInicialFiltro').val()) preencherDatasPadraoFluxo();
+                $('#uvrFluxoCaixa').trigger('change'); 
+            }
+            else if (formId === 'relatoriosFormContainer') { 
+                loadRelatorioUVRs(); 
+                preencherDataAtual('#relDataInicial'); 
+                preencherDataAtual('#relDataFinal'); 
+                // Zera os filtros de catálogo do relatório
+                $('#relTipoTransacao').val('Todas').trigger('change');
+                $('#relUvr').trigger('change'); 
+            }
+            else if (formId === 'extratoBancarioContainer') { 
+                loadExtratoUVRs(); 
+                preencherDataAtual('#extratoDataInicial'); 
+                preencherDataAtual('#extratoDataFinal'); 
+            }
+            else if (formId === 'gestaoAssociadosContainer') { 
+                $('#inputBuscaAssociado').focus(); 
+            }
+            else if (formId === 'gestaoContasContainer') {
+                $('#inputBuscaConta').focus();
+                buscarContasCorrentes(); 
+            } 
+            else if (formId === 'gestaoTransacoesContainer') { 
+                if(!$('#filtroDataIniTransacao').val()) preencherDatasPadraoFluxo(); 
+                buscarTransacoesGestao(); 
+            }
+            else if (formId === 'gestaoCadastrosContainer') {
+                 // Apenas abre
+            }
+            
+            // --- NOVA TELA (ADICIONADA AQUI) ---
+            else if (formId === 'gestaoProdutosServicosContainer') {
+                // Inicializa o filtro de Grupo ao abrir a tela
+                const filtroGrupo = $('#filtroGrupoGestao');
+                // Garante que o select existe antes de tentar preencher
+                if (filtroGrupo.length > 0) {
+                    filtroGrupo.empty().append('<option value="">Todos os Grupos</option>');
+                    if (typeof TODOS_GRUPOS_UNIFICADOS !== 'undefined') {
+                        TODOS_GRUPOS_UNIFICADOS.forEach(g => filtroGrupo.append(`<option value="${g}">${g}</option>`));
+                    }
+                }
+                $('#filtroTipoGestao').val(''); // Reseta filtro de tipo
+                carregarTabelaProdutos('');     // Carrega todos os produtos
+            }
+        }
+
+        $('#btnClienteFornecedor').click(() => mostrarFormulario('clienteFornecedorForm'));
+        $('#btnAssociado').click(() => mostrarFormulario('associadoForm'));
+        $('#btnProdutoServico').click(() => mostrarFormulario('produtoServicoForm'));
+        $('#btnContaCorrente').click(() => mostrarFormulario('contaCorrenteForm'));
+        $('#btnGestaoTransacoes').click(() => mostrarFormulario('gestaoTransacoesContainer'));
+        $('#btnFluxoCaixa').click(() => mostrarFormulario('fluxoCaixaForm'));
+        $('#btnRelatorios').click(() => mostrarFormulario('relatoriosFormContainer'));
+        $('#btnExtratoBancario').click(() => mostrarFormulario('extratoBancarioContainer'));
+        $('#btnGestaoAssociados').click(() => mostrarFormulario('gestaoAssociadosContainer'));
+        $('#btnGestaoCadastros').click(() => mostrarFormulario('gestaoCadastrosContainer'));
+        $('#btnGestaoContas').click(() => mostrarFormulario('gestaoContasContainer'));
+        $('#btnReceitaDespesa').click(() => mostrarFormulario('receitaDespesaForm'));
+        $('#btnGestaoProdutosServicos').click(() => mostrarFormulario('gestaoProdutosServicosContainer'));
+        
+        $('#inputBuscaAssociado').keypress(function(e) { if(e.which == 13) buscarAssociados(); });
+
+        $('#uvrSelect').change(() => preencherAssociacao('uvrSelect', 'associacaoInput'));
+        $('#uvrSelectAssociado').change(() => preencherAssociacao('uvrSelectAssociado', 'associacaoInputAssociado'));
+        $('#uvrSelectConta').change(() => preencherAssociacao('uvrSelectConta', 'associacaoInputConta'));
+        
+        $('#uvrSelectTransacao').change(() => {
+            preencherAssociacao('uvrSelectTransacao', 'associacaoInputTransacao');
+            carregarOrigemTransacao(); 
+            $('#itensDocumentoContainer').empty(); 
+            adicionarItemLinha(); 
+        });
+        
+        $('#uvrFluxoCaixa').change(() => {
+            preencherAssociacao('uvrFluxoCaixa', 'associacaoFluxoCaixa');
+            carregarResumoFinanceiroFluxo();
+            carregarContasCorrentesFluxo($('#uvrFluxoCaixa').val(), '#contaCorrenteSelect'); 
+            atualizarCadastrosComNotasFluxo(); 
+        });
+
+        $('#fluxoDataInicialFiltro, #fluxoDataFinalFiltro').change(function() {
+            carregarResumoFinanceiroFluxo(); 
+            const idCadastro = $('#idCadastroCfStrHidden').val();
+            const isRateio = $('#isAssociadoRateioHidden').val() === 'true';
+            if(idCadastro) carregarNotasEmAbertoFluxo(idCadastro, isRateio);
+        });
+
+        $('#extratoUvr').change(() => { carregarContasCorrentesFluxo($('#extratoUvr').val(), '#extratoContaCorrente'); });
+
+        function atualizarAtividadesCadastroClienteFornecedor() {
+            var tipoCadastro = $('#tipoCadastroCF').val(); 
+            var selectAtividade = $('#tipoAtividadeCF'); 
+            selectAtividade.empty().append('<option value="">Selecione...</option>');
+            
+            let lista = [];
+            if (tipoCadastro === "Fornecedor/Prestador") {
+                lista = MAPA_GRUPOS_SISTEMA["Despesa"];
+            } else if (tipoCadastro === "Cliente") {
+                lista = MAPA_GRUPOS_SISTEMA["Receita"];
+            }
+
+            if (lista) {
+                lista.sort().forEach(function(item) { selectAtividade.append(`<option value="${item}">${item}</option>`); });
+            }
+        }
+        $('#tipoCadastroCF').change(atualizarAtividadesCadastroClienteFornecedor);
+        
+        function atualizarAtividadesProdutoServico() {
+            var tipoPS = $('#tipoProdutoServicoSelect').val(); 
+            var selectAtividadePS = $('#tipoAtividadeProdutoServicoSelect'); 
+            selectAtividadePS.empty().append('<option value="">Selecione...</option>');
+            
+            let lista = [];
+            if (tipoPS === "Despesa") { 
+                lista = MAPA_GRUPOS_SISTEMA["Despesa"];
+            } else if (tipoPS === "Receita") {
+                lista = MAPA_GRUPOS_SISTEMA["Receita"];
+            }
+
+            if (lista) {
+                lista.sort().forEach(function(item) { selectAtividadePS.append(`<option value="${item}">${item}</option>`); });
+            }
+        }
+        $('#tipoProdutoServicoSelect').change(atualizarAtividadesProdutoServico);
+
+        // --- BANCOS E CONTAS ---
+        $('#cadastroContaCorrenteForm').on('submit', function(e) {
+            const agencia = $('#agenciaContaInput').val().replace(/[^0-9]/g, '');
+            const conta = $('#contaCorrenteContaInput').val(); 
+            if (agencia.length === 0) { alert("O campo Agência é obrigatório e deve conter apenas números."); e.preventDefault(); return; }
+            if (conta.length === 0) { alert("O campo Conta Corrente é obrigatório."); e.preventDefault(); return; }
+        });
+
+        function carregarOrigemTransacao() {
+            const selectDropdown = $('#fornecedorPrestadorTransacaoSelect');
+            const uvr = $('#uvrSelectTransacao').val();
+            const tipoTransacao = $('#tipoTransacaoSelect').val(); 
+            const tipoAtividade = $('#tipoAtividadeTransacaoSelect').val(); 
+            const labelOrigem = $('#labelFornecedorPrestadorCliente');
+
+            selectDropdown.empty().append('<option value="">Carregando...</option>');
+            $('#nomeFornecedorPrestadorTransacaoInput').val(''); 
+
+            if (!uvr) {
+                selectDropdown.empty().append('<option value="">Selecione a UVR...</option>');
+                labelOrigem.text('Fornecedor / Prestador / Cliente / Associado');
+                selectDropdown.prop('required', true); 
+                return;
+            }
+
+            let url = '';
+            const params = [`uvr=${encodeURIComponent(uvr)}`];
+            let tipoOrigemDesc = ''; 
+            let isRequired = true; 
+
+            if (tipoAtividade === "Rateio dos Associados") {
+                url = '/get_associados_ativos'; 
+                tipoOrigemDesc = 'Associado (para Rateio)';
+                isRequired = false; 
+            } else { 
+                let tipoCadastroFiltro = '';
+                if (tipoTransacao === 'Despesa') {
+                    tipoCadastroFiltro = 'Fornecedor/Prestador';
+                    tipoOrigemDesc = 'Fornecedor/Prestador';
+                } else if (tipoTransacao === 'Receita') {
+                    tipoCadastroFiltro = 'Cliente';
+                    tipoOrigemDesc = 'Cliente';
+                }
+
+                if (!tipoCadastroFiltro) { 
+                    selectDropdown.empty().append('<option value="">Selecione Tipo de Transação...</option>');
+                    labelOrigem.text('Fornecedor / Prestador / Cliente');
+                    selectDropdown.prop('required', true);
+                    return;
+                }
+                url = '/get_cadastros_ativos'; 
+                params.push(`tipo_cadastro_filtro=${encodeURIComponent(tipoCadastroFiltro)}`);
+            }
+            labelOrigem.text(tipoOrigemDesc);
+            selectDropdown.prop('required', isRequired); 
+
+            if (params.length > 0) { url += `?${params.join('&')}`; }
+
+            $.getJSON(url, function(data) {
+                selectDropdown.empty();
+                if (tipoAtividade === "Rateio dos Associados") {
+                    selectDropdown.append('<option value="">Rateio Geral (Nenhum Associado Específico)</option>'); 
+                } else {
+                    selectDropdown.append(`<option value="">Selecione ${tipoOrigemDesc}...</option>`);
+                }
+
+                if (data && data.length > 0) {
+                    data.forEach(function(item) {
+                        const idVal = item.id; 
+                        const nomeVal = item.nome || item.razao_social; 
+                        const tipoVal = item.tipo_cadastro || 'Associado'; 
+                        selectDropdown.append(`<option value="${idVal}" data-nome="${nomeVal}">${nomeVal} (${tipoVal})</option>`);
+                    });
+                } else if (tipoAtividade !== "Rateio dos Associados") { 
+                     selectDropdown.append(`<option value="">Nenhum ${tipoOrigemDesc} encontrado</option>`);
+                }
+            }).fail(function(jqXHR, textStatus, errorThrown) { 
+                selectDropdown.empty().append('<option value="">Erro ao carregar</option>'); 
+            });
+        }
+        
+        $('#fornecedorPrestadorTransacaoSelect').change(function() {
+            const selectedOption = $(this).find('option:selected');
+            const nomeSelecionado = selectedOption.data('nome') || (selectedOption.text() ? selectedOption.text().split(' (')[0] : '');
+            $('#nomeFornecedorPrestadorTransacaoInput').val(nomeSelecionado);
+        });
+        
+        function atualizarAtividadesTransacao() { 
+        var tipo = $('#tipoTransacaoSelect').val(); // Pega "Receita" ou "Despesa"
+        var selectAtividade = $('#tipoAtividadeTransacaoSelect'); // O campo "Atividade/Grupo"
+        
+        // Limpa as opções atuais
+        selectAtividade.empty().append('<option value="">Selecione o Grupo...</option>');
+        
+        // Se não tiver tipo selecionado, para por aqui
+        if (!tipo) return;
+
+        let lista = [];
+        
+        // Pega a lista correta do MAPA GLOBAL
+        if (tipo === "Despesa") {
+            lista = MAPA_GRUPOS_SISTEMA["Despesa"];
+        } else if (tipo === "Receita") {
+            lista = MAPA_GRUPOS_SISTEMA["Receita"];
+        }
+        
+        // Preenche o select com os Grupos
+        if (lista && lista.length > 0) {
+            lista.sort().forEach(function(item) { 
+                selectAtividade.append(`<option value="${item}">${item}</option>`); 
+            });
+        }
+    }
+        
+        $('#tipoTransacaoSelect').change(function(){ atualizarAtividadesTransacao(); });
+
+        $('#tipoAtividadeTransacaoSelect').change(function() { 
+            carregarOrigemTransacao(); 
+            $('#itensDocumentoContainer .item-row').each(function() { populateGrupos($(this)); });
+        });
+
+        function populateGrupos(rowElement) {
+            const tipoTransacao = $('#tipoTransacaoSelect').val(); 
+            const tipoAtividade = $('#tipoAtividadeTransacaoSelect').val(); 
+            const grupoSelect = $(rowElement).find('.grupo-select');
+            
+            grupoSelect.empty().append('<option value="">Carregando Grupos...</option>');
+            $(rowElement).find('.subgrupo-select').empty().append('<option value="">Selecione Grupo</option>').prop('disabled', true);
+            $(rowElement).find('.item-select').empty().append('<option value="">Selecione Subgrupo</option>').prop('disabled', true);
+
+            if (!tipoTransacao || !tipoAtividade) {
+                grupoSelect.empty().append('<option value="">Selecione Tipo e Atividade da Transação</option>');
+                return;
+            }
+
+            let url = '/get_distinct_grupos'; 
+            let params = [];
+            if (tipoTransacao) params.push(`tipo=${encodeURIComponent(tipoTransacao)}`); 
+            if (tipoAtividade) params.push(`tipo_atividade=${encodeURIComponent(tipoAtividade)}`);
+            if (params.length > 0) url += `?${params.join('&')}`;
+
+            $.getJSON(url, function(data) {
+                grupoSelect.empty().append('<option value="">Selecione Grupo...</option>');
+                if (data && data.length > 0) {
+                    data.forEach(function(grupo) { grupoSelect.append(`<option value="${grupo}">${grupo}</option>`); });
+                } else { grupoSelect.append('<option value="">Nenhum grupo encontrado</option>'); }
+            }).fail(function() { grupoSelect.empty().append('<option value="">Erro ao carregar grupos</option>'); });
+        }
+
+        function populateSubgrupos(rowElement, selectedGrupo) {
+            const tipoTransacao = $('#tipoTransacaoSelect').val();
+            const tipoAtividade = $('#tipoAtividadeTransacaoSelect').val(); 
+            const subgrupoSelect = $(rowElement).find('.subgrupo-select');
+
+            subgrupoSelect.empty().append('<option value="">Carregando Subgrupos...</option>').prop('disabled', true);
+            $(rowElement).find('.item-select').empty().append('<option value="">Selecione Subgrupo</option>').prop('disabled', true);
+
+            if (!selectedGrupo) {
+                subgrupoSelect.empty().append('<option value="">Selecione Grupo Primeiro</option>').prop('disabled', true);
+                return;
+            }
+            if (!tipoTransacao || !tipoAtividade) {
+                subgrupoSelect.empty().append('<option value="">Selecione Tipo e Atividade da Transação</option>').prop('disabled', true);
+                return;
+            }
+
+            let url = `/get_distinct_subgrupos?grupo=${encodeURIComponent(selectedGrupo)}`;
+            let params = [];
+            if (tipoTransacao) params.push(`tipo=${encodeURIComponent(tipoTransacao)}`); 
+            if (tipoAtividade) params.push(`tipo_atividade=${encodeURIComponent(tipoAtividade)}`);
+            if (params.length > 0) url += `&${params.join('&')}`;
+            
+            $.getJSON(url, function(data) {
+                subgrupoSelect.empty().append('<option value="">Selecione Subgrupo...</option>');
+                subgrupoSelect.append('<option value="">(Nenhum)</option>'); 
+                if (data && data.length > 0) {
+                    data.forEach(function(subgrupo) { subgrupoSelect.append(`<option value="${subgrupo}">${subgrupo}</option>`); });
+                }
+                subgrupoSelect.prop('disabled', false);
+            }).fail(function() { subgrupoSelect.empty().append('<option value="">Erro ao carregar subgrupos</option>').prop('disabled', false); });
+        }
+
+        function populateItems(rowElement, selectedGrupo, selectedSubgrupo) {
+            const tipoTransacao = $('#tipoTransacaoSelect').val();
+            const tipoAtividade = $('#tipoAtividadeTransacaoSelect').val(); 
+            const itemSelect = $(rowElement).find('.item-select');
+
+            itemSelect.empty().append('<option value="">Carregando Itens...</option>').prop('disabled', true);
+
+            if (!selectedGrupo) { 
+                itemSelect.empty().append('<option value="">Selecione Grupo</option>').prop('disabled', true);
+                return;
+            }
+            if (!tipoTransacao || !tipoAtividade) {
+                itemSelect.empty().append('<option value="">Selecione Tipo e Atividade da Transação</option>').prop('disabled', true);
+                return;
+            }
+
+            let url = `/get_items_for_filters?grupo=${encodeURIComponent(selectedGrupo)}&subgrupo=${encodeURIComponent(selectedSubgrupo === null ? "" : selectedSubgrupo)}`;
+            let params = [];
+            if (tipoTransacao) params.push(`tipo=${encodeURIComponent(tipoTransacao)}`); 
+            if (tipoAtividade) params.push(`tipo_atividade=${encodeURIComponent(tipoAtividade)}`);
+            if (params.length > 0) url += `&${params.join('&')}`;
+
+            $.getJSON(url, function(data) {
+                itemSelect.empty().append('<option value="">Selecione Item...</option>');
+                if (data && data.length > 0) {
+                    data.forEach(function(item) { itemSelect.append(`<option value="${item}">${item}</option>`); });
+                } else { itemSelect.append('<option value="">Nenhum item encontrado</option>'); }
+                itemSelect.prop('disabled', false);
+            }).fail(function() { itemSelect.empty().append('<option value="">Erro ao carregar itens</option>').prop('disabled', false); });
+        }
+        
+        const unidadesMedida = ["UN", "PC", "CX", "KG", "G", "L", "ML", "M", "M2", "M3", "H", "SV", "PCT", "RL", "FD", "GL", "LT", "DZ", "PAR", "JG", "KIT", "OUTRO"];
+        let itemCounter = 0;
+
+        function adicionarItemLinha(carregarListas = true) {
+        itemCounter++;
+        
+        // Gera as options de unidade (mantendo sua lógica original)
+        let unidadeOptions = "";
+        if (typeof unidadesMedida !== 'undefined') {
+            unidadeOptions = unidadesMedida.map(u => `<option value="${u}">${u}</option>`).join('');
+        } else {
+            // Fallback caso a variável não exista
+            unidadeOptions = '<option value="UN">UN</option><option value="KG">KG</option><option value="HR">HR</option>';
+        }
+
+        const itemHtml = `
+            <div class="item-row" id="itemRow${itemCounter}">
+                <input type="hidden" name="produto_servico_id[]" value="">
+                <div class="item-fields-grid">
+                    <div class="form-group">
+                        <label for="grupo${itemCounter}">Grupo</label>
+                        <select class="form-select grupo-select" id="grupo${itemCounter}" name="produto_servico_grupo[]">
+                            <option value="">Selecione Grupo...</option>
+                        </select>
+                    </div>
+                    <div class="form-group">
+                        <label for="subgrupo${itemCounter}">Subgrupo</label>
+                        <select class="form-select subgrupo-select" id="subgrupo${itemCounter}" name="produto_servico_subgrupo[]" disabled>
+                            <option value="">Selecione Grupo Primeiro</option>
+                        </select>
+                    </div>
+                    <div class="form-group desc-produto-servico"> 
+                        <label for="desc${itemCounter}" class="required-field">Descrição Prod./Serv.</label>
+                        <select class="form-select item-select" id="desc${itemCounter}" name="produto_servico_descricao[]" required disabled>
+                            <option value="">Selecione Subgrupo Primeiro</option>
+                        </select>
+                    </div>
+                    <div class="form-group">
+                        <label for="un${itemCounter}" class="required-field">UN</label>
+                        <select class="form-select" id="un${itemCounter}" name="produto_servico_unidade[]" required>${unidadeOptions}</select>
+                    </div>
+                    <div class="form-group">
+                        <label for="qtd${itemCounter}" class="required-field">Qtd.</label>
+                        <input type="number" class="form-control item-calculavel" id="qtd${itemCounter}" name="produto_servico_quantidade[]" placeholder="Qtd." step="any" min="0.001" required>
+                    </div>
+                    <div class="form-group">
+                        <label for="vu${itemCounter}" class="required-field">Vl. Unit. (R$)</label>
+                        <input type="text" class="form-control item-calculavel valor-monetario" id="vu${itemCounter}" name="produto_servico_valor_unitario[]" placeholder="Unitário" required>
+                    </div>
+                    <div class="form-group">
+                        <label for="vt${itemCounter}">Vl. Total Item (R$)</label>
+                        <input type="text" class="form-control valor-total-item-input valor-monetario" id="vt${itemCounter}" name="produto_servico_valor_total_item[]" readonly>
+                    </div>
+                    <button type="button" class="btn btn-danger btn-sm remover-item" data-item="${itemCounter}"><i class="fas fa-times"></i></button>
+                </div>
+            </div>
+        `;
+        
+        $('#itensDocumentoContainer').append(itemHtml);
+
+        // --- AQUI ESTÁ A CORREÇÃO PRINCIPAL ---
+        // Só carrega a lista via AJAX se carregarListas for true.
+        // Na edição, passamos false para preencher manualmente e não resetar os campos.
+        if (carregarListas) {
+            populateGrupos($(`#itemRow${itemCounter}`)); 
+        }
+
+        $(`#vu${itemCounter}`).mask('#.##0,00', {reverse: true});
+        $(`#vt${itemCounter}`).mask('#.##0,00', {reverse: true}); 
+    }
+
+    // Torna a função acessível globalmente (importante para o botão de Editar chamar)
+    window.adicionarItemLinha = adicionarItemLinha;
+
+    // --- EVENT LISTENERS ---
+
+    // Botão Adicionar (Passa true para carregar listas)
+    $('#btnAdicionarItem').off('click').on('click', function() {
+        adicionarItemLinha(true);
+    });
+
+    // Remover Item
+    $('#itensDocumentoContainer').on('click', '.remover-item', function() {
+        $(this).closest('.item-row').remove();
+        calcularValorTotalDocumento();
+    });
+    
+    // Mudança de Grupo -> Carrega Subgrupo
+    $('#itensDocumentoContainer').on('change', '.grupo-select', function() {
+        const selectedGrupo = $(this).val();
+        const rowElement = $(this).closest('.item-row');
+        populateSubgrupos(rowElement, selectedGrupo);
+    });
+
+    // Mudança de Subgrupo -> Carrega Item
+    $('#itensDocumentoContainer').on('change', '.subgrupo-select', function() {
+        const selectedSubgrupo = $(this).val(); 
+        const rowElement = $(this).closest('.item-row');
+        const selectedGrupo = $(rowElement).find('.grupo-select').val();
+        populateItems(rowElement, selectedGrupo, selectedSubgrupo);
+    });
+
+    // Cálculo Automático
+    $('#itensDocumentoContainer').on('input change keyup', '.item-calculavel', function() { 
+        let row = $(this).closest('.item-row');
+        
+        // Pega QTD (Input Number usa ponto)
+        let qtdVal = row.find('input[name="produto_servico_quantidade[]"]').val();
+        let qtd = parseFloat(qtdVal) || 0;
+
+        // Pega Valor Unitário (Input Text usa Vírgula e Máscara)
+        let vuStr = row.find('input[name="produto_servico_valor_unitario[]"]').val();
+        let vu = parseFloat(vuStr.replace("R$", "").replace(/\./g, '').replace(',', '.')) || 0;
+
+        let totalItem = qtd * vu;
+        
+        // Formata e coloca no total
+        row.find('input[name="produto_servico_valor_total_item[]"]').val(totalItem.toLocaleString('pt-BR', {minimumFractionDigits: 2, maximumFractionDigits: 2}));
+        
+        calcularValorTotalDocumento();
+    });
+
+        function calcularValorTotalDocumento() {
+            let totalDocumento = 0;
+            $('#itensDocumentoContainer .item-row').each(function() {
+                let valorTotalItemStr = $(this).find('input[name="produto_servico_valor_total_item[]"]').val().replace("R$", "").replace(/\./g, '').replace(',', '.');
+                if (valorTotalItemStr) {
+                    totalDocumento += parseFloat(valorTotalItemStr) || 0;
+                }
+            });
+            $('#valorTotalDocumentoCalculado').val(totalDocumento.toLocaleString('pt-BR', {minimumFractionDigits: 2, maximumFractionDigits: 2}));
+        }
+        
+        $('#transacaoForm').on('submit', function(e) { 
+            if ($('#itensDocumentoContainer .item-row').length === 0) {
+                alert("Adicione pelo menos um produto/serviço à transação.");
+                e.preventDefault(); 
+                return false;
+            }
+            let itemValido = true;
+            $('#itensDocumentoContainer .item-row').each(function(index) {
+                const itemSelect = $(this).find('.item-select');
+                const grupoSelect = $(this).find('.grupo-select'); 
+                if (!itemSelect.val() && grupoSelect.val()) { 
+                    alert(`Por favor, selecione a Descrição do Produto/Serviço para o item ${index + 1}.`);
+                    itemSelect.focus();
+                    itemValido = false;
+                    return false; 
+                }
+            });
+            if (!itemValido) {
+                e.preventDefault();
+                return false;
+            }
+
+            const tipoAtividade = $('#tipoAtividadeTransacaoSelect').val();
+            const origemSelecionada = $('#fornecedorPrestadorTransacaoSelect').val(); 
+            const nomeOrigemInputHidden = $('#nomeFornecedorPrestadorTransacaoInput');
+
+            if (tipoAtividade === "Rateio dos Associados") {
+                if (!origemSelecionada) { 
+                     nomeOrigemInputHidden.val("Rateio Geral Associados");
+                } else { 
+                    if (!nomeOrigemInputHidden.val()) { 
+                         nomeOrigemInputHidden.val($('#fornecedorPrestadorTransacaoSelect option:selected').data('nome'));
+                    }
+                }
+            } else { 
+                if (!origemSelecionada) {
+                    alert("O campo '" + $('#labelFornecedorPrestadorCliente').text() + "' é obrigatório para este Tipo de Atividade.");
+                    $('#fornecedorPrestadorTransacaoSelect').focus();
+                    e.preventDefault();
+                    return false;
+                }
+                 if (!nomeOrigemInputHidden.val()) { 
+                     nomeOrigemInputHidden.val($('#fornecedorPrestadorTransacaoSelect option:selected').data('nome'));
+                 }
+            }
+            if (!nomeOrigemInputHidden.val() && tipoAtividade !== "Rateio dos Associados" && !origemSelecionada) {
+                 alert("O campo 'Nome do Fornecedor/Prestador/Cliente/Associado' é obrigatório.");
+                 e.preventDefault();
+                 return false;
+            }
+        });
+        
+        // --- LÓGICA PARA FLUXO DE CAIXA ---
+        function carregarResumoFinanceiroFluxo() {
+            const uvr = $('#uvrFluxoCaixa').val();
+            const dataIni = $('#fluxoDataInicialFiltro').val();
+            const dataFim = $('#fluxoDataFinalFiltro').val();
+
+            if (!uvr || !dataIni || !dataFim) {
+                $('#painelFluxoResumo').hide();
+                return;
+            }
+
+            $.get(`/get_resumo_fluxo_caixa?uvr=${uvr}&data_inicial=${dataIni}&data_final=${dataFim}`, function(resumo) {
+                $('#resumoReceitas').text(parseFloat(resumo.receitas_a_receber || 0).toLocaleString('pt-BR', { minimumFractionDigits: 2, maximumFractionDigits: 2 }));
+                $('#resumoDespesas').text(parseFloat(resumo.despesas_a_pagar || 0).toLocaleString('pt-BR', { minimumFractionDigits: 2, maximumFractionDigits: 2 }));
+                $('#resumoSaldo').text(parseFloat(resumo.saldo_projetado || 0).toLocaleString('pt-BR', { minimumFractionDigits: 2, maximumFractionDigits: 2 }));
+                $('#painelFluxoResumo').show();
+            }).fail(function() {
+                $('#painelFluxoResumo').hide();
+            });
+        }
+
+        function carregarContasCorrentesFluxo(uvr, selectId) {
+            const select = $(selectId); 
+            select.empty().append('<option value="">Carregando...</option>');
+            if (!uvr) {
+                select.empty().append('<option value="">Selecione a UVR...</option>');
+                select.prop('disabled', true); 
+                return;
+            }
+            $.get(`/get_contas_correntes?uvr=${uvr}`, function(data) { 
+                select.empty().append('<option value="">Selecione a Conta...</option>');
+                if (data && data.length > 0) {
+                    data.forEach(c => {
+                        select.append(
+                            $('<option>')
+                                .val(c.id)
+                                .attr('data-uvr-conta', c.uvr)
+                                .text(c.display_name)
+                        );
+                    });
+                    select.prop('disabled', false); 
+                } else {
+                    select.append('<option value="">Nenhuma conta encontrada para esta UVR</option>');
+                    select.prop('disabled', true); 
+                }
+            }).fail(function() {
+                select.empty().append('<option value="">Erro ao carregar contas</option>');
+                select.prop('disabled', true);
+            });
+        }
+
+        function atualizarCadastrosComNotasFluxo() {
+            const uvr = $('#uvrFluxoCaixa').val();
+            const tipoMov = $('#tipoMovimentacao').val();
+            const select = $('#cadastroCFSelect');
+            select.empty().append('<option value="">Carregando...</option>');
+            $('#nfsEmAbertoContainer').html('<small class="text-muted">Selecione para listar documentos.</small>');
+            $('#idCadastroCfStrHidden').val('');
+            $('#isAssociadoRateioHidden').val('');
+            $('#nomeCadastroCfDisplayHidden').val('');
+
+            if (!uvr || !tipoMov) {
+                select.empty().append('<option value="">Selecione UVR e Tipo Mov...</option>');
+                return;
+            }
+            
+            $('#labelClienteFornecedorFluxo').text(tipoMov === 'Recebimento' ? 'Cliente com Pendências' : 'Fornecedor/Associado com Pendências');
+            
+            $.get(`/get_clientes_fornecedores_com_pendencias?uvr=${uvr}&tipo_movimentacao=${tipoMov}`, function(data) {
+                select.empty().append(`<option value="">Selecione ${tipoMov === 'Recebimento' ? 'Cliente' : 'Fornecedor/Associado'}...</option>`);
+                
+                if (data && data.length > 0) {
+                    data.forEach(c => {
+                        const isRateio = c.is_associado_rateio || false;
+                        select.append(
+                            $('<option>')
+                                .val(c.id)
+                                .attr('data-nome', c.razao_social)
+                                .attr('data-is-associado-rateio', isRateio)
+                                .text(`${c.razao_social}${isRateio ? ' (Rateio)' : ''}`)
+                        );
+                    });
+                } else {
+                    select.append(`<option value="">Nenhum com pendências encontrado</option>`);
+                }
+            }).fail(function() { select.empty().append('<option value="">Erro ao carregar</option>'); });
+        }
+
+        $('#tipoMovimentacao').change(function() { atualizarCadastrosComNotasFluxo(); });
+
+        $('#cadastroCFSelect').change(function() {
+            const selectedOption = $(this).find('option:selected');
+            const idCadastroCfOriginal = selectedOption.val(); 
+            const nomeCadastroCfDisplay = selectedOption.data('nome') || selectedOption.text().split(' (')[0];
+            const isAssociadoRateio = selectedOption.data('is-associado-rateio') || false;
+            
+            $('#idCadastroCfStrHidden').val(idCadastroCfOriginal);
+            $('#isAssociadoRateioHidden').val(isAssociadoRateio);
+            $('#nomeCadastroCfDisplayHidden').val(nomeCadastroCfDisplay);
+
+            carregarNotasEmAbertoFluxo(idCadastroCfOriginal, isAssociadoRateio);
+        });
+
+        function carregarNotasEmAbertoFluxo(idCadastroOuNome, isRateio) { 
+            const uvr = $('#uvrFluxoCaixa').val();
+            const tipoMov = $('#tipoMovimentacao').val();
+            const dataIni = $('#fluxoDataInicialFiltro').val();
+            const dataFim = $('#fluxoDataFinalFiltro').val();
+            const container = $('#nfsEmAbertoContainer');
+
+            container.empty();
+
+            if (!idCadastroOuNome || !uvr || !tipoMov || !dataIni || !dataFim) {
+                container.html('<small class="text-muted">Informações insuficientes (Datas/Cadastro) para carregar documentos.</small>');
+                calcularSaldoOperacaoFluxo(); 
+                return;
+            }
+            
+            container.html('<small class="text-muted">Carregando documentos...</small>');
+
+            const params = new URLSearchParams({
+                uvr: uvr,
+                id_cadastro_cf: idCadastroOuNome, 
+                tipo_movimentacao: tipoMov,
+                is_associado_rateio: isRateio,
+                data_inicial: dataIni,
+                data_final: dataFim 
+            });
+            
+            $.get(`/get_notas_em_aberto?${params.toString()}`, function(notas) {
+                container.empty();
+                if (notas && notas.length > 0) {
+                    notas.forEach(nf => {
+                        const idNota = idNumericoSeguro(nf.id);
+                        const valorPendente = Number(nf.valor_restante);
+                        if (idNota === null || !Number.isFinite(valorPendente)) return;
+                        let dataDocFormatada = new Date(nf.data_documento + 'T00:00:00').toLocaleDateString('pt-BR');
+                        const idCampo = `fluxo_nf_${idNota}`;
+                        const linha = $('<div>').addClass('form-check');
+                        $('<input>').attr({
+                            class: 'form-check-input nf-checkbox',
+                            type: 'checkbox',
+                            id: idCampo,
+                            'data-valor-pendente': String(valorPendente)
+                        }).val(idNota).appendTo(linha);
+                        $('<label>').addClass('form-check-label')
+                            .attr('for', idCampo)
+                            .text(
+                                `${nf.numero_documento || 'Sem doc'} (${dataDocFormatada}) - `
+                                + `R$ ${valorPendente.toLocaleString('pt-BR', {minimumFractionDigits: 2})}`
+                            )
+                            .appendTo(linha);
+                        container.append(linha);
+                    });
+                } else { container.html('<small class="text-muted">Nenhum documento em aberto encontrado neste período.</small>'); }
+                calcularSaldoOperacaoFluxo(); 
+            }).fail(function() { container.html('<small class="text-danger">Erro ao carregar documentos.</small>'); calcularSaldoOperacaoFluxo(); });
+        }
+        
+        function calcularSaldoOperacaoFluxo() {
+            let valorEfetivo = parseFloat($('#valorEfetivo').val().replace(/\./g, '').replace(',', '.')) || 0;
+            let totalNfsSelecionadas = 0;
+            
+            $('.nf-checkbox:checked').each(function() {
+                totalNfsSelecionadas += parseFloat($(this).data('valor-pendente')) || 0;
+            });
+            
+            let saldo = totalNfsSelecionadas - valorEfetivo;
+            $('#saldoOperacaoDisplay').val('R$ ' + saldo.toLocaleString('pt-BR', {minimumFractionDigits: 2}));
+        }
+
+        $('#valorEfetivo').on('input change keyup paste', calcularSaldoOperacaoFluxo);
+        $('#nfsEmAbertoContainer').on('change', '.nf-checkbox', calcularSaldoOperacaoFluxo);
+
+
+        $('#formRegistrarFluxoCaixa').on('submit', function(e) {
+            e.preventDefault();
+            const uvr = $('#uvrFluxoCaixa').val();
+            const tipoMov = $('#tipoMovimentacao').val();
+            const idCadastroCfStr = $('#idCadastroCfStrHidden').val(); 
+            const idConta = $('#contaCorrenteSelect').val();
+            const dataEfetiva = $('#dataEfetivaFluxo').val();
+            const valorEfetivo = $('#valorEfetivo').val(); 
+            
+            if (!uvr || !tipoMov || !idCadastroCfStr || !idConta || !dataEfetiva || !valorEfetivo) {
+                alert("Preencha todos os campos obrigatórios do Fluxo de Caixa.");
+                return;
+            }
+            
+            const nfsSelecionadas = $('.nf-checkbox:checked');
+            if (nfsSelecionadas.length === 0) {
+                alert("Selecione pelo menos uma NF (transação) para registrar a movimentação.");
+                return;
+            }
+            
+            const formData = {
+                uvr: uvr,
+                associacao: $('#associacaoFluxoCaixa').val(),
+                tipo_movimentacao: tipoMov,
+                id_cadastro_cf_str: idCadastroCfStr,
+                is_associado_rateio: ($('#isAssociadoRateioHidden').val() === 'true'), 
+                nome_cadastro_cf_display: $('#nomeCadastroCfDisplayHidden').val(),
+                id_conta_corrente: idConta,
+                numero_documento_bancario: $('input[name="numero_documento_bancario"]').val(),
+                data_efetiva: dataEfetiva,
+                valor_efetivo: valorEfetivo.replace(/\./g, '').replace(',', '.'), 
+                data_hora_registro_fluxo: $('#dataHoraRegistroFluxo').val(), 
+                observacoes: $('textarea[name="observacoes"]').val(),
+                ids_nfs_selecionadas: nfsSelecionadas.map(function() { return this.value; }).get()
+            };
+            
+            $.ajax({
+                url: '/registrar_fluxo_caixa',
+                type: 'POST',
+                contentType: 'application/json', 
+                data: JSON.stringify(formData),
+                success: function(response) {
+                    if (response.status === 'sucesso') {
+                        alert("Movimentação de Fluxo de Caixa registrada com sucesso!");
+                        $('#formRegistrarFluxoCaixa')[0].reset(); 
+                        $('#nfsEmAbertoContainer').empty().html('<small class="text-muted">Selecione para listar documentos.</small>');
+                        $('#saldoOperacaoDisplay').val('');
+                        preencherDataAtual('#dataEfetivaFluxo'); 
+                        atualizarDataHora('#dataHoraRegistroFluxo'); 
+                        if (uvr) {
+                            carregarResumoFinanceiroFluxo(); // Recarrega resumo
+                            atualizarCadastrosComNotasFluxo(); 
+                        }
+                    } else {
+                        alert("Erro ao registrar Fluxo de Caixa: " + (response.error || "Erro desconhecido."));
+                    }
+                },
+                error: function(xhr) {
+                    let errorMsg = "Erro ao registrar Fluxo de Caixa.";
+                    if (xhr.responseJSON && xhr.responseJSON.error) {
+                        errorMsg += " Detalhes: " + xhr.responseJSON.error;
+                    }
+                    alert(errorMsg);
+                }
+            });
+        });
+
+
+        // --- LÓGICA PARA RELATÓRIOS FINANCEIROS ---
+        function loadRelatorioUVRs() { 
+            $.getJSON('/get_relatorio_uvrs', function(data) {
+                const selects = $('#relUvr, #extratoUvr'); 
+                selects.find('option:not(:first)').remove(); // Limpa opções anteriores, exceto a primeira ("Todas" ou "Selecione")
+                data.forEach(uvr => selects.append($('<option>').val(uvr).text(uvr)));
+            });
+        }
+        function loadExtratoUVRs() { loadRelatorioUVRs(); } // Reutiliza a função
+
+        function loadRelatorioTiposAtividadeTransacao(tipoTransacao) {
+            const select = $('#relTipoAtividadeTransacao');
+            select.find('option:not(:first)').remove().end().val(''); 
+            select.prop('disabled', true);
+            $('#relGrupo').find('option:not(:first)').remove().end().val('').prop('disabled', true); 
+            $('#relSubgrupo').find('option:not(:first)').remove().end().val('').prop('disabled', true);
+            $('#relItem').find('option:not(:first)').remove().end().val('').prop('disabled', true);
+
+            if (!tipoTransacao) { 
+                 loadRelatorioCatalogOptions('grupo', {}); 
+                 return;
+            }
+
+            $.getJSON(`/get_relatorio_tipos_atividade_transacao?tipo_transacao=${tipoTransacao}`, function(data) {
+                if (data && data.length > 0) {
+                    data.forEach(atv => select.append($('<option>').val(atv).text(atv)));
+                    select.prop('disabled', false);
+                }
+                loadRelatorioCatalogOptions('grupo', { tipo_transacao: tipoTransacao, tipo_atividade_catalogo: select.val() }); 
+            });
+        }
+        
+        function loadRelatorioCatalogOptions(optionType, filters = {}) {
+            const selectMap = {
+                'grupo': $('#relGrupo'),
+                'subgrupo': $('#relSubgrupo'),
+                'item': $('#relItem')
+            };
+            const currentSelect = selectMap[optionType];
+            currentSelect.find('option:not(:first)').remove().end().val(''); 
+            currentSelect.prop('disabled', true);
+
+            if (optionType === 'grupo') {
+                $('#relSubgrupo').find('option:not(:first)').remove().end().val('').prop('disabled', true);
+                $('#relItem').find('option:not(:first)').remove().end().val('').prop('disabled', true);
+            } else if (optionType === 'subgrupo') {
+                $('#relItem').find('option:not(:first)').remove().end().val('').prop('disabled', true);
+            }
+
+            if (optionType === 'subgrupo' && !filters.grupo) { return; }
+            if (optionType === 'item' && !filters.grupo ) { return; } 
+
+            let queryParams = `option_type=${optionType}`;
+            if (filters.tipo_transacao) queryParams += `&tipo_transacao=${encodeURIComponent(filters.tipo_transacao)}`;
+            if (filters.tipo_atividade_catalogo) queryParams += `&tipo_atividade_catalogo=${encodeURIComponent(filters.tipo_atividade_catalogo)}`;
+            if (filters.grupo) queryParams += `&grupo=${encodeURIComponent(filters.grupo)}`;
+            if (filters.subgrupo) queryParams += `&subgrupo=${encodeURIComponent(filters.subgrupo)}`;
+
+            $.getJSON(`/get_relatorio_catalog_options?${queryParams}`, function(data) {
+                if (data && data.length > 0) {
+                    data.forEach(opt => currentSelect.append($('<option>').val(opt).text(opt)));
+                    if(optionType === 'subgrupo') { 
+                        currentSelect.append('<option value="(Nenhum)">(Nenhum)</option>'); 
+                    }
+                    currentSelect.prop('disabled', false);
+                } else if (optionType === 'subgrupo') { 
+                     currentSelect.append('<option value="(Nenhum)">(Nenhum)</option>');
+                     currentSelect.prop('disabled', false);
+                }
+            });
+        }
+
+        function loadRelatorioEntidades() {
+            const tipoEntidade = $('#relTipoEntidade').val();
+            const uvr = $('#relUvr').val();
+            const tipoTransacao = $('#relTipoTransacao').val();
+            const selectNomeEntidade = $('#relNomeEntidade');
+            
+            selectNomeEntidade.empty().append('<option value="">Carregando...</option>').prop('disabled', true);
+
+            if (!tipoEntidade) {
+                selectNomeEntidade.empty().append('<option value="">Selecione Tipo Entidade</option>').prop('disabled', true);
+                return;
+            }
+
+            let queryParams = `tipo_entidade=${encodeURIComponent(tipoEntidade)}`;
+            if (uvr) queryParams += `&uvr=${encodeURIComponent(uvr)}`;
+            if (tipoTransacao) queryParams += `&tipo_transacao_rel=${encodeURIComponent(tipoTransacao)}`;
+
+
+            $.getJSON(`/get_relatorio_entidades_para_filtro?${queryParams}`, function(data) {
+                selectNomeEntidade.empty().append(`<option value="">Todos(as) os(as) ${tipoEntidade.toLowerCase()}s</option>`);
+                if (data && data.length > 0) {
+                    data.forEach(entidade => {
+                        selectNomeEntidade.append(
+                            $('<option>')
+                                .val(entidade.id)
+                                .attr('data-nome-entidade', entidade.nome)
+                                .text(entidade.nome)
+                        );
+                    });
+                    selectNomeEntidade.prop('disabled', false);
+                } else {
+                    selectNomeEntidade.append(`<option value="">Nenhum(a) ${tipoEntidade.toLowerCase()} encontrado(a)</option>`);
+                     selectNomeEntidade.prop('disabled', true); 
+                }
+            }).fail(function() {
+                selectNomeEntidade.empty().append('<option value="">Erro ao carregar entidades</option>').prop('disabled', true);
+            });
+        }
+        
+        $('#relUvr, #relTipoTransacao, #relTipoEntidade').change(function() { loadRelatorioEntidades(); });
+
+        $('#relTipoAtividadeTransacao').change(function() {
+            const tipoTransacao = $('#relTipoTransacao').val();
+            const tipoAtividadeTransacao = $(this).val(); 
+            loadRelatorioCatalogOptions('grupo', { tipo_transacao: tipoTransacao, tipo_atividade_catalogo: tipoAtividadeTransacao });
+        });
+
+        $('#relGrupo').change(function() {
+            const tipoTransacao = $('#relTipoTransacao').val();
+            const tipoAtividadeTransacao = $('#relTipoAtividadeTransacao').val();
+            const grupo = $(this).val();
+            loadRelatorioCatalogOptions('subgrupo', { tipo_transacao: tipoTransacao, tipo_atividade_catalogo: tipoAtividadeTransacao, grupo: grupo });
+        });
+
+        $('#relSubgrupo').change(function() {
+            const tipoTransacao = $('#relTipoTransacao').val();
+            const tipoAtividadeTransacao = $('#relTipoAtividadeTransacao').val();
+            const grupo = $('#relGrupo').val();
+            const subgrupo = $(this).val();
+            loadRelatorioCatalogOptions('item', { tipo_transacao: tipoTransacao, tipo_atividade_catalogo: tipoAtividadeTransacao, grupo: grupo, subgrupo: subgrupo });
+        });
+
+        let currentReportFilters = {}; 
+        $('#btnGerarRelatorio').click(function() {
+            const nomeEntidadeSelecionada = $('#relNomeEntidade option:selected').data('nome-entidade');
+
+            currentReportFilters = {
+                data_inicial: $('#relDataInicial').val(), data_final: $('#relDataFinal').val(),
+                uvr: $('#relUvr').val(), 
+                tipo_transacao_rel: $('#relTipoTransacao').val(), // Movido para antes
+                tipo_entidade: $('#relTipoEntidade').val(), 
+                id_entidade: $('#relNomeEntidade').val(),  
+                nome_entidade_display: nomeEntidadeSelecionada || $('#relNomeEntidade option:selected').text().split(" (")[0], // Para PDF
+                tipo_atividade_transacao_rel: $('#relTipoAtividadeTransacao').val(), 
+                grupo_rel: $('#relGrupo').val(), subgrupo_rel: $('#relSubgrupo').val(), 
+                item_rel: $('#relItem').val(), status_pagamento_rel: $('#relStatusPagamento').val(),
+                listar_por: $('#relListarPor').val() 
+            };
+            
+            if (!currentReportFilters.data_inicial || !currentReportFilters.data_final) {
+                alert("Por favor, selecione Data Inicial e Data Final."); return;
+            }
+            if (new Date(currentReportFilters.data_inicial) > new Date(currentReportFilters.data_final)) {
+                alert("A Data Inicial não pode ser maior que a Data Final."); return;
+            }
+
+            $('#relatorioStatus').text('Gerando relatório...').show();
+            $('#tabelaRelatorio thead').empty(); $('#tabelaRelatorio tbody').empty();
+            $('#btnBaixarCsv').hide(); $('#btnBaixarPdfRelatorioFinanceiro').hide();
+
+            $.ajax({
+                url: '/gerar_relatorio', type: 'POST', contentType: 'application/json',
+                data: JSON.stringify(currentReportFilters),
+                success: function(data) {
+                    $('#relatorioStatus').hide();
+                    if (data.error) { alert(`Erro ao gerar relatório: ${data.error}`); return; }
+                    if (data.length === 0) { $('#relatorioStatus').text('Nenhum dado encontrado para os filtros selecionados.').show(); return; }
+
+                    const headers = [
+                        "UVR", "Associação", "Fornecedor/Cliente/Associado", "Nº Doc.", 
+                        "Data Doc.", "Data Efetiva Pag./Rec.", 
+                        "Tipo Trans.", "Tipo Ativ. Trans.", "Item Descrição", 
+                        "Tipo Item (Cat.)", "Tipo Ativ. (Cat.)", "Grupo (Cat.)", "Subgrupo (Cat.)", 
+                        "UN", "Qtd.", "Vl. Unit. (R$)", "Vl. Total Item (R$)", 
+                        "Status Pag. NF", "Valor Pago/Rec. Item (R$)" 
+                    ];
+                    const headerKeys = [
+                        "uvr", "associacao", "nome_cadastro_origem", "numero_documento", 
+                        "data_documento", "data_efetiva_pag_rec", 
+                        "tipo_transacao", "tipo_atividade_transacao", "item_descricao", 
+                        "item_tipo_catalogo", "item_tipo_atividade_catalogo", "item_grupo_catalogo", "item_subgrupo_catalogo",
+                        "unidade", "quantidade", "valor_unitario", "valor_total_item", 
+                        "status_pagamento", "valor_pago_neste_item" 
+                    ];
+                    
+                    let headerHtml = '<tr>'; headers.forEach(h => headerHtml += `<th>${h}</th>`); headerHtml += '</tr>';
+                    $('#tabelaRelatorio thead').html(headerHtml);
+                    let tbodyHtml = '';
+                    data.forEach(row => {
+                        tbodyHtml += '<tr>';
+                        headerKeys.forEach(key => {
+                            let value = row[key] !== null && row[key] !== undefined ? row[key] : '';
+                            if (key === 'data_documento' && value) { 
+                                if (String(value).includes('-')) { 
+                                     try { value = new Date(value + 'T00:00:00').toLocaleDateString('pt-BR'); } catch(e) { /* mantem original */ }
+                                }
+                            } else if (key === 'data_efetiva_pag_rec' && value) { 
+                                if (String(value).includes('-')) {
+                                     try { value = new Date(value + 'T00:00:00').toLocaleDateString('pt-BR'); } catch(e) { /* mantem original */ }
+                                }
+                            } else if (key === 'data_hora_registro' && value) { 
+                                if (String(value).includes('T')) {
+                                     try { value = new Date(value).toLocaleString('pt-BR'); } catch(e) { /* mantem original */ }
+                                }
+                            } else if (['valor_unitario', 'valor_total_item', 'valor_pago_neste_item'].includes(key) && value) { 
+                                try { value = parseFloat(value).toLocaleString('pt-BR', { minimumFractionDigits: 2, maximumFractionDigits: 2 }); } catch(e) { /* mantem original */ }
+                            } else if (key === 'quantidade' && value) {
+                                try { value = parseFloat(value).toLocaleString('pt-BR', { minimumFractionDigits: 3, maximumFractionDigits: 3 }); } catch(e) { /* mantem original */ }
+                            }
+                            tbodyHtml += `<td>${escaparHtml(value)}</td>`;
+                        });
+                        tbodyHtml += '</tr>';
+                    });
+                    $('#tabelaRelatorio tbody').html(tbodyHtml);
+                    $('#btnBaixarCsv').show();
+                    $('#btnBaixarPdfRelatorioFinanceiro').show();
+                },
+                error: function(xhr) {
+                    $('#relatorioStatus').hide();
+                    alert(`Erro ao gerar relatório: ${xhr.responseJSON?.error || 'Erro desconhecido'}`);
+                }
+            });
+        });
+
+        function baixarArquivo(url, filters, defaultFilename) {
+            fetch(url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': document.querySelector('meta[name="csrf-token"]').content
+                },
+                body: JSON.stringify(filters)
+            })
+            .then(async resp => {
+                if (tratarSessaoExpirada(resp.status)) return;
+                if (resp.status === 202) {
+                    // PDF gerado em segundo plano: acompanha a tarefa até o arquivo ficar pronto.
+                    const tarefa = await resp.json();
+                    acompanharTarefaRelatorio(tarefa.status_url, defaultFilename);
+                } else if (resp.ok) {
+                    await salvarRespostaComoArquivo(resp, defaultFilename);
+                } else {
+                    await alertarErroDownload(resp);
+                }
+            })
+            .catch(() => {
+                alert("Erro ao baixar arquivo.");
+            });
+        }
+
+        function acompanharTarefaRelatorio(statusUrl, defaultFilename, espera = 1000) {
+            setTimeout(() => {
+                fetch(statusUrl, { headers: { 'Accept': 'application/json' } })
+                .then(async resp => {
+                    if (tratarSessaoExpirada(resp.status)) return;
+                    if (!resp.ok) { await alertarErroDownload(resp); return; }
+                    const tarefa = await resp.json();
+                    if (!tarefa.concluida) {
+                        acompanharTarefaRelatorio(statusUrl, defaultFilename, Math.min(espera * 1.5, 5000));
+                    } else if (tarefa.arquivo_url) {
+                        const arquivo = await fetch(tarefa.arquivo_url);
+                        if (tratarSessaoExpirada(arquivo.status)) return;
+                        if (arquivo.ok) { await salvarRespostaComoArquivo(arquivo, defaultFilename); }
+                        else { await alertarErroDownload(arquivo); }
+                    } else {
+                        alert(`Erro ao baixar arquivo: ${tarefa.mensagem || 'relatório não gerado.'}`);
+                    }
+                })
+                .catch(() => {
+                    alert("Erro ao baixar arquivo.");
+                });
+            }, espera);
+        }
+
+        async function salvarRespostaComoArquivo(resp, defaultFilename) {
+            const blob = await resp.blob();
+            let filename = defaultFilename;
+            const disposition = resp.headers.get('Content-Disposition');
+            if (disposition && disposition.indexOf('attachment') !== -1) {
+                const filenameRegex = /filename[^;=\n]*=((['"]).*?\2|[^;\n]*)/;
+                const matches = filenameRegex.exec(disposition);
+                if (matches != null && matches[1]) { filename = matches[1].replace(/['"]/g, '');}
+            }
+            const link = document.createElement('a');
+            link.href = window.URL.createObjectURL(blob);
+            link.download = filename;
+            document.body.appendChild(link);
+            link.click();
+            document.body.removeChild(link);
+            window.URL.revokeObjectURL(link.href);
+        }
+
+        async function alertarErroDownload(resp) {
+            const errorData = await resp.json().catch(() => null);
+            let errorMsg = "Erro ao baixar arquivo";
+            if (errorData && errorData.message) { errorMsg += `: ${errorData.message}`; }
+            else if (errorData && errorData.error) { errorMsg += `: ${errorData.error}`; }
+            else { errorMsg += `: ${resp.statusText}`; }
+            alert(errorMsg);
+        }
+
+        $('#btnBaixarCsv').click(function() {
+            if (Object.keys(currentReportFilters).length === 0) { alert("Gere um relatório financeiro primeiro."); return; }
+            baixarArquivo('/baixar_csv_relatorio', currentReportFilters, 'relatorio_financeiro.csv');
+        });
+        $('#btnBaixarPdfRelatorioFinanceiro').click(function() {
+            if (Object.keys(currentReportFilters).length === 0) { alert("Gere um relatório financeiro primeiro."); return; }
+            baixarArquivo('/baixar_pdf_relatorio_financeiro', currentReportFilters, 'relatorio_financeiro.pdf');
+        });
+        
+// --- LÓGICA PARA EXTRATO BANCÁRIO ---
+        let currentExtratoFilters = {};
+        
+        $('#btnGerarExtrato').click(function() {
+            currentExtratoFilters = {
+                id_conta_corrente_extrato: $('#extratoContaCorrente').val(),
+                data_inicial_extrato: $('#extratoDataInicial').val(),
+                data_final_extrato: $('#extratoDataFinal').val(),
+            };
+
+            if (!currentExtratoFilters.id_conta_corrente_extrato || !currentExtratoFilters.data_inicial_extrato || !currentExtratoFilters.data_final_extrato) {
+                alert("Por favor, selecione Conta Corrente, Data Inicial e Data Final para o extrato."); return;
+            }
+            if (new Date(currentExtratoFilters.data_inicial_extrato) > new Date(currentExtratoFilters.data_final_extrato)) {
+                alert("A Data Inicial do extrato não pode ser maior que a Data Final."); return;
+            }
+
+            // Limpa a tela antes de buscar
+            $('#extratoStatus').text('Gerando extrato...').show();
+            $('#tabelaExtrato thead, #tabelaExtrato tbody').empty();
+            $('#saldoInicialExtrato, #saldoFinalExtrato, #infoContaExtrato').hide().empty();
+            $('#btnBaixarCsvExtrato, #btnBaixarPdfExtrato').hide();
+
+            $.ajax({
+                url: '/gerar_extrato_bancario', 
+                type: 'POST', 
+                contentType: 'application/json',
+                data: JSON.stringify(currentExtratoFilters),
+                success: function(data) {
+                    $('#extratoStatus').hide();
+                    if (data.error) { alert(`Erro ao gerar extrato: ${data.error}`); return; }
+                    
+                    // Preenche Info da Conta
+                    const contaInfo = data.conta_info || {};
+                    $('#extratoNomeConta').text(contaInfo.display_name || 'N/A');
+                    $('#extratoPeriodo').text(contaInfo.periodo || 'N/A');
+                    $('#infoContaExtrato').show();
+
+                    // Saldo Inicial
+                    $('#saldoInicialExtrato').html(`<strong>Saldo Inicial:</strong> R$ ${parseFloat(data.saldo_inicial || 0).toLocaleString('pt-BR', {minimumFractionDigits: 2, maximumFractionDigits: 2})}`).show();
+                    
+                    if (data.movimentacoes && data.movimentacoes.length === 0) {
+                        $('#extratoStatus').text('Nenhuma movimentação encontrada para os filtros selecionados.').show();
+                    } else if (data.movimentacoes) {
+                        
+                        // 1. Cabeçalho com a coluna "Ações"
+                        const headers = ["Data", "Histórico", "Entrada (R$)", "Saída (R$)", "Saldo (R$)", "Ações"];
+                        let headerHtml = '<tr>'; 
+                        headers.forEach(h => headerHtml += `<th class="text-center">${h}</th>`); 
+                        headerHtml += '</tr>';
+                        $('#tabelaExtrato thead').html(headerHtml);
+                        
+                        let tbodyHtml = '';
+                        data.movimentacoes.forEach(mov => {
+                            // Proteção de strings para evitar erro no javascript ao clicar
+                            tbodyHtml += `<tr>
+                                <td class="text-center">${escaparHtml(mov.data)}</td>
+                                <td style="white-space: normal;">${escaparHtml(mov.historico)}</td>
+                                <td class="text-end text-success">${parseFloat(mov.entrada || 0) > 0 ? parseFloat(mov.entrada).toLocaleString('pt-BR', {minimumFractionDigits: 2}) : ''}</td>
+                                <td class="text-end text-danger">${parseFloat(mov.saida || 0) > 0 ? parseFloat(mov.saida).toLocaleString('pt-BR', {minimumFractionDigits: 2}) : ''}</td>
+                                <td class="text-end fw-bold">${parseFloat(mov.saldo_parcial || 0).toLocaleString('pt-BR', {minimumFractionDigits: 2})}</td>
+                                
+                                <td class="text-center">
+                                    <button class="btn btn-sm btn-info me-1 text-white" onclick="visualizarMovimentacao(${idNumericoSeguro(mov.id)})" title="Ver Detalhes">
+                                        <i class="fas fa-eye"></i>
+                                    </button>
+                                    <button class="btn btn-sm btn-danger" onclick="excluirMovimentacao(${idNumericoSeguro(mov.id)})" title="Excluir/Estornar">
+                                        <i class="fas fa-trash"></i>
+                                    </button>
+                                </td>
+                            </tr>`;
+                        });
+                        
+                        $('#tabelaExtrato tbody').html(tbodyHtml);
+                        $('#btnBaixarCsvExtrato, #btnBaixarPdfExtrato').show();
+                    }
+                    
+                    // Saldo Final
+                    $('#saldoFinalExtrato').html(`<strong>Saldo Final:</strong> R$ ${parseFloat(data.saldo_final || 0).toLocaleString('pt-BR', {minimumFractionDigits: 2, maximumFractionDigits: 2})}`).show();
+                },
+                error: function(xhr) { 
+                    $('#extratoStatus').hide(); 
+                    let msg = "Erro desconhecido";
+                    if(xhr.responseJSON && xhr.responseJSON.error) msg = xhr.responseJSON.error;
+                    alert(`Erro ao gerar extrato: ${msg}`); 
+                }
+            });
+        });
+
+        // Botões de Download
+        $('#btnBaixarCsvExtrato').click(function() {
+            if (Object.keys(currentExtratoFilters).length === 0 || !currentExtratoFilters.id_conta_corrente_extrato) { alert("Gere um extrato primeiro."); return; }
+            baixarArquivo('/baixar_csv_extrato', currentExtratoFilters, 'extrato_bancario.csv');
+        });
+        
+        $('#btnBaixarPdfExtrato').click(function() {
+            if (Object.keys(currentExtratoFilters).length === 0 || !currentExtratoFilters.id_conta_corrente_extrato) { alert("Gere um extrato primeiro."); return; }
+            baixarArquivo('/baixar_pdf_extrato', currentExtratoFilters, 'extrato_bancario.pdf');
+        });
+
+        // --- TRAVA DE SEGURANÇA (PERMISSÕES DE USUÁRIO) ---
+        if (typeof usuarioLogadoUvr !== 'undefined' && usuarioLogadoUvr && typeof usuarioIsAdmin !== 'undefined' && !usuarioIsAdmin) {
+            const uvrSelects = $('select[name="uvr"], select[name="uvr_conta"], select[name="uvr_transacao"], #extratoUvr, #relUvr, #uvrSelectAssociado, #uvrFluxoCaixa');
+            uvrSelects.each(function() {
+                const select = $(this);
+                select.val(usuarioLogadoUvr);
+                select.trigger('change'); 
+                select.prop('disabled', true); 
+                if (select.attr('name')) {
+                    const hiddenName = select.attr('name');
+                    $(`input[type="hidden"][name="${hiddenName}"]`).remove();
+                    $('<input>').attr({ type: 'hidden', name: hiddenName, value: usuarioLogadoUvr }).insertAfter(select);
+                }
+            });
+        }
+    }); // Fim do $(document).ready
+
+    // --- FUNÇÕES GLOBAIS (FORA DO READY) PARA FUNCIONAR NO ONCLICK ---
+    
+    // --- LÓGICA DE APROVAÇÕES (ADMIN) ---
+    $(document).on('click', '#btnAprovacoes', function() {
+        // CORREÇÃO: Fazemos a troca de tela manualmente, sem depender da função 'mostrarFormulario'
+        $('.form-container').hide();
+        $('#aprovacoesContainer').show();
+        
+        carregarAprovacoes();
+    });
+
+    function carregarAprovacoes() {
+        const tbody = $('#tabelaAprovacoesBody');
+        tbody.html('<tr><td colspan="5" class="text-center">Carregando...</td></tr>');
+        $('#msgSemAprovacoes').hide();
+
+        $.getJSON('/get_solicitacoes_pendentes', function(data) {
+            tbody.empty();
+            if (data.length === 0) {
+                $('#msgSemAprovacoes').show();
+                return;
+            }
+
+            data.forEach(item => {
+                tbody.append(`
+                    <tr>
+                        <td>${escaparHtml(item.data)}</td>
+                        <td>${escaparHtml(item.solicitante)}</td>
+                        <td>${escaparHtml(item.nome_atual)}</td>
+                        <td class="text-primary fw-bold">${escaparHtml(item.nome_novo)}</td>
+                        <td class="text-center">
+                            <button class="btn btn-sm btn-info text-white me-1" onclick="verDetalhesSolicitacao(${idNumericoSeguro(item.id)})" title="Ver o que mudou">
+                                <i class="fas fa-eye"></i> Detalhes
+                            </button>
+                        </td>
+                    </tr>
+                `);
+            });
+        }).fail(function() {
+            tbody.html('<tr><td colspan="5" class="text-center text-danger">Erro ao carregar solicitações.</td></tr>');
+        });
+    }
+
+    function verDetalhesSolicitacao(id) {
+        id = idNumericoSeguro(id);
+        if (id === null) {
+            alert('Não foi possível identificar a solicitação.');
+            return;
+        }
+        $('#tabelaComparacaoBody').html('<tr><td colspan="3" class="text-center">Carregando comparação...</td></tr>');
+        $('#areaComparacaoFoto').hide();
+        
+        $('#btnAprovarModal').attr('onclick', `responderSolicitacao(${id}, 'aprovar')`);
+        $('#btnRejeitarModal').attr('onclick', `responderSolicitacao(${id}, 'rejeitar')`);
+
+        const modal = new bootstrap.Modal(document.getElementById('modalDetalhesAprovacao'));
+        modal.show();
+
+        $.getJSON(`/get_detalhes_solicitacao/${id}`, function(data) {
+            $('#detalheSolicitante').text(data.usuario);
+// Preenche o campo (ou coloca um traço se estiver vazio)
+$('#detalheData').text(data.data || data.data_documento || "--/--/----");
+            
+            const tbody = $('#tabelaComparacaoBody');
+            tbody.empty();
+
+            data.comparacao.forEach(row => {
+                const rowClass = row.mudou ? 'table-warning' : '';
+                const iconChange = row.mudou ? '<i class="fas fa-exclamation-triangle text-warning"></i> ' : '';
+                
+                let valAntigo = row.valor_atual
+                    ? (row.html_seguro ? row.valor_atual : escaparHtml(row.valor_atual))
+                    : '<span class="text-muted small">vazio</span>';
+                let valNovo = row.valor_novo
+                    ? (row.html_seguro ? row.valor_novo : escaparHtml(row.valor_novo))
+                    : '<span class="text-muted small">vazio</span>';
+
+                if (row.mudou) valNovo = `<strong>${valNovo}</strong>`;
+
+                tbody.append(`
+                    <tr class="${rowClass}">
+                        <td>${iconChange}${escaparHtml(row.campo)}</td>
+                        <td class="text-muted">${valAntigo}</td>
+                        <td>${valNovo}</td>
+                    </tr>
+                `);
+            });
+
+            if (data.foto_nova_url) {
+                $('#imgFotoNovaProposta').attr('src', data.foto_nova_url);
+                $('#areaComparacaoFoto').show();
+            }
+
+        }).fail(function(xhr) {
+            let msg = "Erro desconhecido ao buscar detalhes.";
+            if(xhr.responseJSON && xhr.responseJSON.error) {
+                msg = xhr.responseJSON.error;
+            }
+            alert("Erro do Sistema: " + msg);
+            var modalEl = document.getElementById('modalDetalhesAprovacao');
+            var modalInstance = bootstrap.Modal.getInstance(modalEl);
+            if(modalInstance) modalInstance.hide();
+        });
+    }
+
+    function responderSolicitacao(id, acao) {
+        if (!confirm(`Tem certeza que deseja ${acao.toUpperCase()} esta solicitação?`)) return;
+
+        $.ajax({
+            url: '/responder_solicitacao',
+            type: 'POST',
+            contentType: 'application/json',
+            data: JSON.stringify({ id: id, acao: acao }),
+            success: function(response) {
+                alert(response.message);
+                const modalEl = document.getElementById('modalDetalhesAprovacao');
+                const modal = bootstrap.Modal.getInstance(modalEl);
+                if (modal) modal.hide();
+                carregarAprovacoes(); 
+            },
+            error: function(xhr) {
+                alert("Erro ao processar: " + (xhr.responseJSON?.error || "Erro desconhecido"));
+            }
+        });
+    }
+
+    // --- PAGINAÇÃO DAS BUSCAS DE GESTÃO ---
+    // A primeira página substitui o conteúdo da tabela; as seguintes são
+    // anexadas pelo botão "Carregar mais", que usa o next_cursor do servidor.
+    function carregarPaginaGestao(opcoes, cursor) {
+        const consulta = new URLSearchParams(opcoes.params);
+        if (cursor) consulta.set('cursor', cursor);
+        const tbody = opcoes.tbody;
+        tbody.find('.linha-carregar-mais').remove();
+        if (!cursor) tbody.html(`<tr><td colspan="${opcoes.colunas}" class="text-center">Buscando...</td></tr>`);
+
+        return $.getJSON(`${opcoes.url}?${consulta.toString()}`, function(data) {
+            if (!cursor) tbody.empty();
+            if (!cursor && data.itens.length === 0) {
+                tbody.html(`<tr><td colspan="${opcoes.colunas}" class="text-center">${opcoes.vazio}</td></tr>`);
+                return;
+            }
+            data.itens.forEach(item => tbody.append(opcoes.montarLinha(item)));
+            if (data.next_cursor) {
+                const botao = $('<button type="button" class="btn btn-sm btn-outline-secondary">Carregar mais</button>');
+                botao.on('click', () => carregarPaginaGestao(opcoes, data.next_cursor).fail(opcoes.aoFalhar));
+                tbody.append(
+                    $('<tr class="linha-carregar-mais">').append(
+                        $(`<td colspan="${opcoes.colunas}" class="text-center">`).append(botao)
+                    )
+                );
+            }
+        });
+    }
+
+    // Percorre todas as páginas de uma busca (listas de seleção).
+    function buscarTodasPaginas(url, params, itens = [], cursor = null) {
+        const consulta = new URLSearchParams(params);
+        consulta.set('limite', '200');
+        if (cursor) consulta.set('cursor', cursor);
+        return $.getJSON(`${url}?${consulta.toString()}`).then(data => {
+            itens.push(...data.itens);
+            return data.next_cursor ? buscarTodasPaginas(url, params, itens, data.next_cursor) : itens;
+        });
+    }
+
+    // --- LÓGICA DE GESTÃO DE CLIENTES/FORNECEDORES ---
+    function buscarCadastros() {
+        const termo = $('#inputBuscaCadastro').val();
+        const tipo = $('#filtroTipoCadastro').val();
+        const uvr = $('#filtroUvrCadastro').val() || "";
+        const tbody = $('#tabelaCadastrosBody');
+        const aoFalhar = () => tbody.html('<tr><td colspan="6" class="text-center text-danger">Erro ao buscar.</td></tr>');
+
+        carregarPaginaGestao({
+            url: '/buscar_cadastros',
+            params: { q: termo, tipo: tipo, uvr: uvr },
+            tbody: tbody,
+            colunas: 6,
+            vazio: 'Nenhum registro encontrado.',
+            aoFalhar: aoFalhar,
+            montarLinha: c => `
+                    <tr>
+                        <td>${escaparHtml(c.razao)}</td><td>${escaparHtml(c.cnpj)}</td><td>${escaparHtml(c.tipo)}</td><td>${escaparHtml(c.cidade)}</td><td>${escaparHtml(c.uvr)}</td>
+                        <td class="text-center">
+                            <button class="btn btn-sm btn-info text-white" onclick="visualizarCadastro(${idNumericoSeguro(c.id)})"><i class="fas fa-eye"></i></button>
+                            <button class="btn btn-sm btn-success" onclick="imprimirFichaCadastro(${idNumericoSeguro(c.id)})"><i class="fas fa-print"></i></button>
+                            <button class="btn btn-sm btn-warning text-white" onclick="iniciarEdicaoCadastro(${idNumericoSeguro(c.id)})"><i class="fas fa-edit"></i></button>
+                            <button class="btn btn-sm btn-danger" onclick="solicitarExclusaoCadastro(${idNumericoSeguro(c.id)})"><i class="fas fa-trash"></i></button>
+                        </td>
+                    </tr>
+                `
+        }).fail(aoFalhar);
+    }
+// --- FUNÇÃO PARA BUSCAR ASSOCIADOS ---
+    function buscarAssociados() {
+        const termo = $('#inputBuscaAssociado').val();
+        const status = $('#filtroStatusAssociado').val();
+        const uvr = $('#filtroUvrAssociado').length ? $('#filtroUvrAssociado').val() : '';
+        
+        const tbody = $('#tabelaAssociadosBody');
+        const aoFalhar = function() {
+            tbody.html('<tr><td colspan="6" class="text-center text-danger">Erro ao buscar dados. Tente novamente.</td></tr>');
+        };
+
+        carregarPaginaGestao({
+            url: '/buscar_associados',
+            params: { q: termo, status: status, uvr: uvr },
+            tbody: tbody,
+            colunas: 6,
+            vazio: 'Nenhum associado encontrado.',
+            aoFalhar: aoFalhar,
+            montarLinha: assoc => {
+                let corStatus = 'bg-secondary';
+                if(assoc.status === 'Ativo') corStatus = 'bg-success';
+                else if(assoc.status === 'Inativo') corStatus = 'bg-danger';
+                else if(assoc.status === 'Afastado') corStatus = 'bg-warning text-dark';
+
+                // AQUI ESTÁ A MUDANÇA: Adicionamos o botão btn-danger (vermelho) na última coluna
+                return `
+                    <tr>
+                        <td>${escaparHtml(assoc.nome)}</td>
+                        <td>${escaparHtml(assoc.cpf)}</td>
+                        <td><span class="badge ${corStatus}">${escaparHtml(assoc.status)}</span></td>
+                        <td>${escaparHtml(assoc.uvr)}</td>
+                        <td>${escaparHtml(assoc.data_admissao || '-')}</td>
+                        <td class="text-center">
+                            <button class="btn btn-sm btn-info text-white" onclick="visualizarAssociado(${idNumericoSeguro(assoc.id)})" title="Ver Detalhes"><i class="fas fa-eye"></i></button>
+                            <button class="btn btn-sm btn-success" onclick="imprimirFichaAssociado(${idNumericoSeguro(assoc.id)})" title="Imprimir Ficha"><i class="fas fa-print"></i></button>
+                            <button class="btn btn-sm btn-warning text-white" onclick="iniciarEdicaoAssociado(${idNumericoSeguro(assoc.id)})" title="Editar"><i class="fas fa-edit"></i></button>
+                            <button class="btn btn-sm btn-danger" onclick="solicitarExclusaoAssociado(${idNumericoSeguro(assoc.id)})" title="Excluir"><i class="fas fa-trash"></i></button>
+                        </td>
+                    </tr>
+                `;
+            }
+        }).fail(aoFalhar);
+    }
+
+// ==========================================
+    // FUNÇÕES DE VISUALIZAR E IMPRIMIR ASSOCIADO
+    // ==========================================
+
+    // 1. Função para IMPRIMIR
+    function imprimirFichaAssociado(id) {
+        // Abre uma nova aba chamando a rota do Python que gera o PDF
+        window.open(`/imprimir_ficha_associado/${id}`, '_blank');
+    }
+
+    // 2. Função para VISUALIZAR (Abre o Modal)
+    function visualizarAssociado(id) {
+        // Busca os dados atualizados no Python
+        $.getJSON(`/get_associado/${id}`, function(data) {
+            if (data.error) {
+                alert(data.error);
+                return;
+            }
+
+            // Preenche os campos do Modal
+            $('#verAssocNome').text(data.nome);
+            $('#verAssocCpf').text(data.cpf);
+            $('#verAssocRg').text(data.rg);
+            $('#verAssocNasc').text(data.data_nascimento);
+            $('#verAssocAdm').text(data.data_admissao);
+            $('#verAssocTel').text(data.telefone);
+            $('#verAssocUvr').text(data.uvr);
+            
+            // Endereço completo
+            const endereco = `${data.logradouro}, ${data.numero} - ${data.bairro}, ${data.cidade}/${data.uf} - CEP: ${data.cep}`;
+            $('#verAssocEndereco').text(endereco);
+
+            // Status e Cor
+            const status = data.status;
+            $('#verAssocStatus').text(status);
+            $('#verAssocStatus').removeClass('bg-success bg-danger bg-warning bg-secondary');
+            if(status === 'Ativo') $('#verAssocStatus').addClass('bg-success');
+            else if(status === 'Inativo') $('#verAssocStatus').addClass('bg-danger');
+            else $('#verAssocStatus').addClass('bg-warning text-dark');
+
+            // Foto
+            if (data.foto_url) {
+                $('#verAssocFoto').attr('src', data.foto_url).show();
+                $('#verAssocIcone').hide();
+            } else {
+                $('#verAssocFoto').hide();
+                $('#verAssocIcone').show();
+            }
+
+            // Configura os botões do rodapé do modal para funcionarem com este ID
+            const associadoId = idNumericoSeguro(data.id);
+            $('#btnImprimirNoModal').off('click').on('click', function() {
+                if (associadoId !== null) imprimirFichaAssociado(associadoId);
+            });
+            $('#btnEditarNoModal').off('click').on('click', function() {
+                if (associadoId !== null) iniciarEdicaoAssociado(associadoId);
+            });
+
+            // Abre o modal na tela
+            var modal = new bootstrap.Modal(document.getElementById('modalVisualizarAssociado'));
+            modal.show();
+
+        }).fail(function() {
+            alert("Erro ao buscar detalhes do associado.");
+        });
+    }
+// --- FUNÇÕES DE EDIÇÃO DE ASSOCIADO ---
+
+    function iniciarEdicaoAssociado(id) {
+        // 1. Busca os dados do associado no servidor
+        $.getJSON(`/get_associado/${id}`, function(data) {
+            if (data.error) {
+                alert(data.error);
+                return;
+            }
+
+            // 2. Esconde a lista e mostra o formulário
+            $('#gestaoAssociadosContainer').hide();
+            $('#associadoForm').show();
+
+            // 3. Muda o estado do formulário para "Edição"
+            $('#cadastroAssociadoForm').attr('action', '/editar_associado');
+            $('#idAssociadoHidden').val(data.id);
+            $('#btnSalvarAssociado').text('SALVAR ALTERAÇÕES').removeClass('btn-primary').addClass('btn-warning');
+            $('#btnCancelarEdicaoAssociado').show();
+
+            // 4. Preenche os campos de texto
+            // Note que precisamos tratar a data para o formato yyyy-mm-dd que o input type="date" exige
+            
+            // Função auxiliar para converter dd/mm/aaaa para aaaa-mm-dd
+            function converterDataParaInput(dataStr) {
+                if (!dataStr || dataStr === '-') return '';
+                // Espera formato dd/mm/yyyy
+                var partes = dataStr.split('/'); 
+                if (partes.length === 3) return `${partes[2]}-${partes[1]}-${partes[0]}`;
+                return '';
+            }
+
+            $('#uvrSelectAssociado').val(data.uvr).trigger('change'); // Dispara o change para preencher a Associação
+            $('#nomeAssociado').val(data.nome);
+            $('#cpfAssociado').val(data.cpf);
+            $('#rgAssociado').val(data.rg);
+            $('#nascAssociado').val(converterDataParaInput(data.data_nascimento));
+            $('#admAssociado').val(converterDataParaInput(data.data_admissao));
+            
+            $('#cepAssociado').val(data.cep);
+            $('#logAssociado').val(data.logradouro);
+            $('#numAssociado').val(data.numero);
+            $('#bairroAssociado').val(data.bairro);
+            $('#cidadeAssociado').val(data.cidade);
+            $('#ufAssociado').val(data.uf);
+            
+            $('#telAssociado').val(data.telefone);
+            $('#statusAssociado').val(data.status);
+            
+            // 5. Tratamento da Foto
+            if (data.foto_url) {
+                // Se tem foto, mostra o preview e esconde o ícone de câmera;
+                // sem foto nova no envio, o servidor mantém a atual.
+                $('#previewFotoAssociado').attr('src', data.foto_url).show();
+                $('#textoSemFoto').hide();
+                $('#fotoExistenteBase64').val('');
+            } else {
+                // Se não tem foto, mostra o ícone
+                $('#previewFotoAssociado').hide();
+                $('#textoSemFoto').show();
+                $('#fotoExistenteBase64').val('');
+            }
+            
+            // Rola a tela para o topo do formulário
+            $('html, body').animate({ scrollTop: $("#associadoForm").offset().top - 100 }, 500);
+        }).fail(function() {
+            alert("Erro ao carregar dados do associado.");
+        });
+    }
+
+    function cancelarEdicaoAssociado() {
+        // Limpa o formulário
+        $('#cadastroAssociadoForm')[0].reset();
+        
+        // Reseta o estado para "Novo Cadastro"
+        $('#cadastroAssociadoForm').attr('action', '/cadastrar_associado');
+        $('#idAssociadoHidden').val('');
+        $('#btnSalvarAssociado').text('SALVAR ASSOCIADO').removeClass('btn-warning').addClass('btn-primary');
+        $('#btnCancelarEdicaoAssociado').hide();
+        
+        // Reseta a área da foto
+        $('#previewFotoAssociado').attr('src', '').hide();
+        $('#textoSemFoto').show();
+        $('#fotoExistenteBase64').val('');
+
+        // Troca as telas: Esconde o formulário e volta para a lista
+        $('#associadoForm').hide();
+        $('#gestaoAssociadosContainer').show();
+    }
+
+function solicitarExclusaoAssociado(id) {
+        if (confirm('Tem certeza que deseja excluir ou solicitar a exclusão deste associado?')) {
+            $.ajax({
+                url: `/excluir_associado/${id}`,
+                type: 'POST',
+                success: function(response) {
+                    if (response.status === 'sucesso') {
+                        alert(response.message);
+                        buscarAssociados(); // Atualiza a tabela para o associado sumir
+                    } else {
+                        alert("Erro: " + (response.message || "Erro desconhecido."));
+                    }
+                },
+                error: function(xhr) {
+                    let msg = "Erro ao processar exclusão.";
+                    if (xhr.responseJSON && xhr.responseJSON.error) {
+                        msg += "\nDetalhe: " + xhr.responseJSON.error;
+                    }
+                    alert(msg);
+                }
+            });
+        }
+    }
+
+    function visualizarCadastro(id) {
+        $.getJSON(`/get_cadastro/${id}`, function(data) {
+            if(data.error) { alert(data.error); return; }
+            $('#verCadRazao').text(data.razao_social); $('#verCadCnpj').text(data.cnpj);
+            $('#verCadTipo').text(data.tipo_cadastro); $('#verCadUvr').text(data.uvr);
+            $('#verCadAtiv').text(data.tipo_atividade); $('#verCadTel').text(data.telefone);
+            $('#verCadEnd').text(`${data.logradouro}, ${data.numero} - ${data.bairro}, ${data.cidade}/${data.uf}`);
+            
+            const cadastroId = idNumericoSeguro(data.id);
+            $('#btnEditarCadNoModal').off('click').on('click', function() {
+                if (cadastroId !== null) iniciarEdicaoCadastro(cadastroId);
+            });
+            $('#btnImprimirCadNoModal').off('click').on('click', function() {
+                if (cadastroId !== null) imprimirFichaCadastro(cadastroId);
+            });
+            
+            new bootstrap.Modal(document.getElementById('modalVisualizarCadastro')).show();
+        });
+    }
+
+    function iniciarEdicaoCadastro(id) {
+        var m = document.getElementById('modalVisualizarCadastro');
+        if(m) { var inst = bootstrap.Modal.getInstance(m); if(inst) inst.hide(); }
+
+        $.getJSON(`/get_cadastro/${id}`, function(data) {
+            $('.form-container').hide(); $('#clienteFornecedorForm').show();
+            
+            $('#btnSalvarCadastro').text('SALVAR ALTERAÇÕES (Enviar)').removeClass('btn-primary').addClass('btn-warning');
+            $('#btnCancelarEdicaoCadastro').show();
+            $('#cadastroForm').attr('action', '/editar_cadastro');
+            $('#idCadastroHidden').val(data.id);
+            
+            $('#uvrSelect').val(data.uvr).trigger('change');
+            $('#tipoCadastroCF').val(data.tipo_cadastro).trigger('change');
+            setTimeout(() => { $('#tipoAtividadeCF').val(data.tipo_atividade); }, 100);
+            
+            $('#cnpj').val(data.cnpj); $('#razaoSocialCF').val(data.razao_social);
+            $('#cepCF').val(data.cep); $('#logradouroCF').val(data.logradouro);
+            $('#numeroCF').val(data.numero); $('#bairroCF').val(data.bairro);
+            $('#cidadeCF').val(data.cidade); $('#ufCF').val(data.uf);
+            $('#telefoneCF').val(data.telefone);
+        });
+    }
+
+    function cancelarEdicaoCadastro() {
+        $('#cadastroForm')[0].reset();
+        $('#btnSalvarCadastro').text('CADASTRAR').removeClass('btn-warning').addClass('btn-primary');
+        $('#btnCancelarEdicaoCadastro').hide();
+        $('#cadastroForm').attr('action', '/cadastrar');
+        $('#idCadastroHidden').val('');
+        $('.form-container').hide(); $('#gestaoCadastrosContainer').show();
+    }
+    
+    function imprimirFichaCadastro(id) { window.open(`/imprimir_ficha_cadastro/${id}`, '_blank'); }
+    
+    function solicitarExclusaoCadastro(id) {
+        if (confirm("Tem certeza que deseja excluir ou solicitar a exclusão deste cadastro?")) {
+            $.ajax({
+                url: "/excluir_cadastro/" + id,
+                type: 'POST',
+                success: function(response) {
+                    if (response.status === 'sucesso') {
+                        alert(response.message);
+                        buscarCadastros(); 
+                    } else {
+                        alert("Atenção: " + (response.message || "Erro desconhecido."));
+                    }
+                },
+                error: function(xhr) {
+                    let msg = "Erro ao processar exclusão.";
+                    if (xhr.responseJSON && xhr.responseJSON.error) {
+                        msg += "\nDetalhe: " + xhr.responseJSON.error;
+                    }
+                    alert(msg);
+                }
+            });
+        }
+    }
+
+    // --- LÓGICA DE GESTÃO DE CONTAS CORRENTES ---
+    function buscarContasCorrentes() {
+        const termo = $('#inputBuscaConta').val();
+        const uvr = $('#filtroUvrConta').val() || "";
+        const tbody = $('#tabelaContasBody');
+        tbody.html('<tr><td colspan="5" class="text-center">Buscando...</td></tr>');
+
+        const params = new URLSearchParams({ q: termo, uvr: uvr });
+
+        $.getJSON(`/buscar_contas_correntes_gestao?${params.toString()}`, function(data) {
+            tbody.empty();
+            if (data.length === 0) {
+                tbody.html('<tr><td colspan="5" class="text-center">Nenhuma conta encontrada.</td></tr>');
+                return;
+            }
+
+            data.forEach(c => {
+                tbody.append(`
+                    <tr>
+                        <td>${escaparHtml(c.banco)}</td>
+                        <td>Ag: ${escaparHtml(c.agencia)} | CC: ${escaparHtml(c.conta)}</td>
+                        <td>${escaparHtml(c.descricao || '-')}</td>
+                        <td>${escaparHtml(c.uvr)}</td>
+                        <td class="text-center">
+                            <button class="btn btn-sm btn-warning text-white" onclick="iniciarEdicaoConta(${idNumericoSeguro(c.id)})"><i class="fas fa-edit"></i></button>
+                            <button class="btn btn-sm btn-danger" onclick="excluirConta(${idNumericoSeguro(c.id)})"><i class="fas fa-trash"></i></button>
+                        </td>
+                    </tr>
+                `);
+            });
+        }).fail(() => tbody.html('<tr><td colspan="5" class="text-center text-danger">Erro ao buscar contas.</td></tr>'));
+    }
+
+    function iniciarEdicaoConta(id) {
+        $.getJSON(`/get_conta_corrente_detalhe/${id}`, function(data) {
+            if(data.error) { alert(data.error); return; }
+
+            $('.form-container').hide(); 
+            $('#contaCorrenteForm').show();
+
+            $('#cadastroContaCorrenteForm').attr('action', '/editar_conta_corrente');
+            $('#idContaHidden').val(data.id);
+            
+            // --- AJUSTE DE SEGURANÇA NO BOTÃO ---
+            const textoBotao = usuarioIsAdmin ? 'SALVAR ALTERAÇÕES' : 'SOLICITAR ALTERAÇÃO';
+            $('#btnSalvarConta').text(textoBotao).removeClass('btn-primary').addClass('btn-warning');
+            // -------------------------------------
+            
+            $('#btnCancelarEdicaoConta').show();
+
+            $('#uvrSelectConta').val(data.uvr).trigger('change');
+            $('#agenciaContaInput').val(data.agencia);
+            $('#contaCorrenteContaInput').val(data.conta_corrente);
+            $('#descricaoApelidoContaInput').val(data.descricao_conta);
+
+            const valorBancoCombinado = `${data.banco_codigo}|${data.banco_nome}`;
+            
+            popularBancos();
+            $('#bancoContaSelect').val(valorBancoCombinado);
+
+            $('html, body').animate({ scrollTop: $("#contaCorrenteForm").offset().top - 100 }, 500);
+        });
+    }
+
+    function cancelarEdicaoConta() {
+        $('#cadastroContaCorrenteForm')[0].reset();
+        $('#cadastroContaCorrenteForm').attr('action', '/cadastrar_conta_corrente');
+        $('#idContaHidden').val('');
+        $('#btnSalvarConta').text('CADASTRAR CONTA').removeClass('btn-warning').addClass('btn-primary');
+        $('#btnCancelarEdicaoConta').hide();
+        
+        $('.form-container').hide(); 
+        $('#gestaoContasContainer').show();
+    }
+
+    function excluirConta(id) {
+        if (confirm('ATENÇÃO: deseja excluir esta conta? A operação será bloqueada se houver lançamentos vinculados.')) {
+            $.ajax({
+                url: `/excluir_conta_corrente/${id}`,
+                type: 'POST',
+                success: function(response) {
+                    if (response.status === 'sucesso') {
+                        alert(response.message);
+                        buscarContasCorrentes();
+                    } else {
+                        alert("Erro: " + response.error);
+                    }
+                },
+                error: function(xhr) {
+                    let msg = "Erro ao excluir.";
+                    if (xhr.responseJSON && xhr.responseJSON.error) msg += "\n" + xhr.responseJSON.error;
+                    alert(msg);
+                }
+            });
+        }
+    }
+
+// --- LÓGICA DE GESTÃO DE TRANSAÇÕES (ATUALIZADA) ---
+    function buscarTransacoesGestao() {
+        const dataIni = $('#filtroDataIniTransacao').val();
+        const dataFim = $('#filtroDataFimTransacao').val();
+        const tipo = $('#filtroTipoTransacao').val();
+        const uvr = $('#filtroUvrTransacao').val();
+        const q = $('#filtroTextoTransacao').val();
+
+        const tbody = $('#tabelaTransacoesBody');
+        const aoFalhar = function() {
+            tbody.html('<tr><td colspan="7" class="text-center text-danger">Erro ao buscar dados.</td></tr>');
+        };
+
+        carregarPaginaGestao({
+            url: '/buscar_transacoes_gestao',
+            params: {
+                data_inicial: dataIni,
+                data_final: dataFim,
+                tipo: tipo,
+                uvr: uvr,
+                q: q
+            },
+            tbody: tbody,
+            colunas: 7,
+            vazio: 'Nenhuma transação encontrada.',
+            aoFalhar: aoFalhar,
+            montarLinha: t => {
+                let badgeClass = 'bg-secondary';
+                if (t.status === 'Liquidado') badgeClass = 'bg-success';
+                else if (t.status === 'Aberto') badgeClass = 'bg-danger';
+                else if (t.status.includes('Parcial')) badgeClass = 'bg-warning text-dark';
+
+                const corValor = t.tipo === 'Receita' ? 'text-success' : 'text-danger';
+
+                return `
+                    <tr>
+                        <td>${escaparHtml(t.data)}</td>
+                        <td>${escaparHtml(t.tipo)}</td>
+                        <td>
+                            ${escaparHtml(t.origem)} <br>
+                            <small class="text-muted">${escaparHtml(t.uvr)}</small>
+                        </td>
+                        <td>${escaparHtml(t.doc)}</td>
+                        <td class="text-end fw-bold ${corValor}">${escaparHtml(t.valor)}</td>
+                        <td class="text-center"><span class="badge ${badgeClass}">${escaparHtml(t.status)}</span></td>
+                        <td class="text-center">
+                            <button class="btn btn-sm btn-info text-white me-1" onclick="verDetalhesTransacao(${idNumericoSeguro(t.id)})" title="Ver Itens">
+                                <i class="fas fa-list"></i>
+                            </button>
+                            <button class="btn btn-sm btn-warning text-white me-1" onclick="iniciarEdicaoTransacao(${idNumericoSeguro(t.id)})" title="Editar">
+                                <i class="fas fa-edit"></i>
+                            </button>
+                            <button class="btn btn-sm btn-danger" onclick="solicitarExclusaoTransacao(${idNumericoSeguro(t.id)})" title="Excluir">
+                                <i class="fas fa-trash"></i>
+                            </button>
+                        </td>
+                    </tr>
+                `;
+            }
+        }).fail(aoFalhar);
+    }
+
+    // --- FUNÇÃO DE DETALHES (Agora sim, no lugar certo!) ---
+// --- FUNÇÃO DE DETALHES ---
+    function verDetalhesTransacao(id) {
+        // Limpa o modal antes de abrir
+        $('#tabelaItensDetalheBody').html('<tr><td colspan="5" class="text-center">Carregando itens...</td></tr>');
+        
+        // Abre o modal
+        const modal = new bootstrap.Modal(document.getElementById('modalDetalhesTransacao'));
+        modal.show();
+
+        // Busca os dados no Python
+        $.getJSON(`/get_transacao_detalhes/${id}`, function(data) {
+            $('#detalheIdTransacao').text(data.id);
+            $('#detalheOrigem').text(data.origem);
+            $('#detalheUvrTipo').text(`${data.uvr} - ${data.tipo} (${data.atividade})`);
+            
+            // --- CORREÇÃO AQUI ---
+            $('#detalheDataTransacao').text(data.data);
+            // ---------------------
+
+            $('#detalheDoc').text(data.doc);
+            
+            const totalFmt = data.valor_total.toLocaleString('pt-BR', {style: 'currency', currency: 'BRL'});
+            $('#detalheValorTotal').text(totalFmt);
+
+            const tbody = $('#tabelaItensDetalheBody');
+            tbody.empty();
+
+            data.itens.forEach(item => {
+                const qtd = item.quantidade.toLocaleString('pt-BR', {minimumFractionDigits: 3});
+                const unit = item.valor_unitario.toLocaleString('pt-BR', {minimumFractionDigits: 2});
+                const total = item.valor_total.toLocaleString('pt-BR', {minimumFractionDigits: 2});
+
+                tbody.append(`
+                    <tr>
+                        <td>${escaparHtml(item.descricao)}</td>
+                        <td class="text-center">${escaparHtml(item.unidade)}</td>
+                        <td class="text-end">${qtd}</td>
+                        <td class="text-end">${unit}</td>
+                        <td class="text-end fw-bold">${total}</td>
+                    </tr>
+                `);
+            });
+        }).fail(function() {
+            alert("Erro ao carregar detalhes da transação.");
+        });
+    }
+
+// --- LÓGICA DE GESTÃO DE PRODUTOS E SUBGRUPOS (CASCATA COMPLETA) ---
+
+    // 1. Definição do Mapa de Grupos (Separação Receita vs Despesa - Baseado no CSV)
+    const MAPA_GRUPOS = {
+        "Receita": [
+            "Elétrico ou Eletrônico",
+            "Metal",
+            "Não convencionais",
+            "Outras Receitas",
+            "Papel",
+            "Plástico",
+            "Repasses Governamentais",
+            "Vidro"
+        ],
+        "Despesa": [
+            "Despesas de operação",
+            "Despesas de manutenção",
+            "Rateio dos Associados"
+      
+          
+        ]
+    };
+
+    // Cria uma lista única ordenada para usar nos Modais de Cadastro (onde não tem filtro de Tipo)
+    var TODOS_GRUPOS_UNIFICADOS = [...MAPA_GRUPOS["Receita"], ...MAPA_GRUPOS["Despesa"]].sort();
+
+    // 2. Inicialização e Eventos dos Filtros
+    $(document).ready(function() {
+        // Inicializa o filtro de Grupo com tudo
+        const filtroGrupo = $('#filtroGrupoGestao');
+        filtroGrupo.empty().append('<option value="">Todos os Grupos</option>');
+        TODOS_GRUPOS_UNIFICADOS.forEach(g => filtroGrupo.append(`<option value="${g}">${g}</option>`));
+
+// --- EVENTO 1: Mudou o TIPO (Receita/Despesa) ---
+        $('#filtroTipoGestao').change(function() {
+            const tipo = $(this).val();
+            const selectGrupo = $('#filtroGrupoGestao');
+            const selectSub = $('#filtroSubgrupoGestao');
+
+            // Limpa Grupos e Subgrupos
+            selectGrupo.empty().append('<option value="">Todos os Grupos</option>');
+            selectSub.empty().append('<option value="">Selecione o Grupo...</option>').prop('disabled', true);
+
+            let listaParaExibir = [];
+            
+            if (tipo === "Receita") listaParaExibir = MAPA_GRUPOS_SISTEMA["Receita"];
+            else if (tipo === "Despesa") listaParaExibir = MAPA_GRUPOS_SISTEMA["Despesa"];
+            else listaParaExibir = TODOS_GRUPOS_UNIFICADOS; // Se "Todos", mostra tudo
+
+            // Preenche o select de Grupos
+            listaParaExibir.sort().forEach(g => selectGrupo.append(`<option value="${g}">${g}</option>`));
+            
+            // Recarrega a tabela
+            carregarTabelaProdutos();
+        });
+
+        $('#filtroGrupoGestao').change(function() {
+            const grupo = $(this).val();
+            const selectSub = $('#filtroSubgrupoGestao');
+            
+            // Trava o select com a mensagem de carregamento
+            selectSub.empty().append('<option value="">Carregando...</option>').prop('disabled', true);
+
+            if (!grupo) {
+                selectSub.empty().append('<option value="">Selecione o Grupo...</option>');
+                carregarTabelaProdutos(); // Recarrega tabela sem filtro de subgrupo
+                return;
+            }
+
+            // CORREÇÃO: Usamos /api/subgrupos para pegar ID e NOME
+            $.getJSON(`/api/subgrupos?atividade=${encodeURIComponent(grupo)}`, function(data) {
+                selectSub.empty().append('<option value="">Todos os Subgrupos</option>');
+                
+                if (data && data.length > 0) {
+                    data.forEach(sub => {
+                        // AQUI ESTÁ O TRUQUE: Usamos sub.id no value, e sub.nome no texto
+                        selectSub.append($('<option>').val(sub.id).text(sub.nome));
+                    });
+                    selectSub.prop('disabled', false);
+                } else {
+                    selectSub.append('<option value="">(Sem subgrupos cadastrados)</option>');
+                    selectSub.prop('disabled', true);
+                }
+                
+                carregarTabelaProdutos(); // Atualiza a tabela de produtos
+            }).fail(function() {
+                selectSub.empty().append('<option value="">Erro ao carregar</option>');
+            });
+        });
+
+        // --- EVENTO 3: Mudou o SUBGRUPO ---
+        $('#filtroSubgrupoGestao').change(function() {
+            carregarTabelaProdutos();
+        });
+    }); // FIM DO DOCUMENT READY
+
+    // 3. Função Principal: Carregar a Tabela
+    function carregarTabelaProdutos(grupoForcado = null) {
+        const tbody = $('#tabelaProdutosBody');
+        tbody.html('<tr><td colspan="5" class="text-center">Carregando...</td></tr>');
+
+        // Pega valores dos selects
+        let grupo = grupoForcado !== null ? grupoForcado : $('#filtroGrupoGestao').val();
+        let tipo = $('#filtroTipoGestao').val();
+        let idSubgrupo = $('#filtroSubgrupoGestao').val();
+
+        let url = '/api/produtos_crud?';
+        if (grupo) url += `&grupo=${encodeURIComponent(grupo)}`;
+        if (tipo) url += `&tipo=${encodeURIComponent(tipo)}`;
+        if (idSubgrupo) url += `&id_subgrupo=${encodeURIComponent(idSubgrupo)}`;
+
+        $.getJSON(url, function(data) {
+            tbody.empty();
+            if (data.length === 0) {
+                tbody.html('<tr><td colspan="5" class="text-center text-muted">Nenhum produto encontrado com esses filtros.</td></tr>');
+                return;
+            }
+            data.forEach(p => {
+                // Badge colorido para o Tipo
+                let badge = p.tipo === 'Receita' 
+                    ? '<span class="badge bg-success">Receita</span>' 
+                    : (p.tipo === 'Despesa' ? '<span class="badge bg-danger">Despesa</span>' : '<span class="badge bg-secondary">-</span>');
+                const itemCodificado = encodeURIComponent(String(p.item || '')).replace(/'/g, '%27');
+                const grupoCodificado = encodeURIComponent(String(p.grupo || '')).replace(/'/g, '%27');
+
+                tbody.append(`
+                    <tr>
+                        <td class="fw-bold">${escaparHtml(p.item)}</td>
+                        <td class="text-center">${badge}</td>
+                        <td>${escaparHtml(p.subgrupo_nome || '-')}</td>
+                        <td><small>${escaparHtml(p.grupo)}</small></td>
+                        <td class="text-center">
+                            <button class="btn btn-sm btn-warning text-white" onclick="editarProduto(${idNumericoSeguro(p.id)}, decodeURIComponent('${itemCodificado}'), ${idNumericoSeguro(p.id_subgrupo)}, decodeURIComponent('${grupoCodificado}'))"><i class="fas fa-edit"></i></button>
+                            <button class="btn btn-sm btn-danger" onclick="excluirProduto(${idNumericoSeguro(p.id)})"><i class="fas fa-trash"></i></button>
+                        </td>
+                    </tr>
+                `);
+            });
+        }).fail(() => tbody.html('<tr><td colspan="5" class="text-center text-danger">Erro ao carregar dados.</td></tr>'));
+    }
+
+    // --- FUNÇÕES AUXILIARES E MODAIS ---
+
+    function preencherSelectGrupos(selectId) {
+        const sel = $('#' + selectId);
+        sel.empty().append('<option value="">Selecione...</option>');
+        // Usa a lista unificada para os Modais de Cadastro
+        TODOS_GRUPOS_UNIFICADOS.forEach(g => {
+            sel.append(`<option value="${g}">${g}</option>`);
+        });
+    }
+
+    // --- GESTÃO DE SUBGRUPOS (MODAL) ---
+    function abrirModalSubgrupos() {
+        preencherSelectGrupos('selectGrupoPaiSubgrupo');
+        limparFormSubgrupo();
+        $('#listaSubgruposExistentes').html('<li class="list-group-item text-muted">Selecione um grupo acima.</li>');
+        new bootstrap.Modal(document.getElementById('modalSubgrupos')).show();
+    }
+
+    function listarSubgruposNoModal() {
+        const atividade = $('#selectGrupoPaiSubgrupo').val();
+        const lista = $('#listaSubgruposExistentes');
+        if(!atividade) { lista.html(''); return; }
+        
+        lista.html('<li class="list-group-item">Carregando...</li>');
+        
+        $.getJSON(`/api/subgrupos?atividade=${encodeURIComponent(atividade)}`, function(data) {
+            lista.empty();
+            if(data.length === 0) lista.html('<li class="list-group-item text-muted">Nenhum subgrupo cadastrado.</li>');
+            
+            data.forEach(sub => {
+                const nomeCodificado = encodeURIComponent(String(sub.nome || '')).replace(/'/g, '%27');
+                lista.append(`
+                    <li class="list-group-item d-flex justify-content-between align-items-center">
+                        ${escaparHtml(sub.nome)}
+                        <div>
+                            <button class="btn btn-sm btn-outline-warning me-1" onclick="prepararEdicaoSubgrupo(${idNumericoSeguro(sub.id)}, decodeURIComponent('${nomeCodificado}'))"><i class="fas fa-edit"></i></button>
+                            <button class="btn btn-sm btn-outline-danger" onclick="excluirSubgrupo(${idNumericoSeguro(sub.id)})"><i class="fas fa-trash"></i></button>
+                        </div>
+                    </li>
+                `);
+            });
+        });
+    }
+
+    function salvarSubgrupo() {
+        const nome = $('#inputNomeSubgrupo').val();
+        const atividade = $('#selectGrupoPaiSubgrupo').val();
+        const id = $('#idSubgrupoEdicao').val();
+        
+        if(!nome || !atividade) { alert("Selecione o grupo e digite um nome."); return; }
+
+        const payload = {
+            acao: id ? 'editar' : 'novo',
+            id: id,
+            nome: nome,
+            atividade_pai: atividade
+        };
+
+        $.ajax({
+            url: '/api/subgrupos', type: 'POST', contentType: 'application/json',
+            data: JSON.stringify(payload),
+            success: function(res) {
+                limparFormSubgrupo();
+                listarSubgruposNoModal();
+            },
+            error: function(xhr) { alert("Erro: " + (xhr.responseJSON?.erro || "Erro desconhecido")); }
+        });
+    }
+
+    function prepararEdicaoSubgrupo(id, nome) {
+        $('#idSubgrupoEdicao').val(id);
+        $('#inputNomeSubgrupo').val(nome).focus();
+        $('#btnCancelarEdicaoSub').show();
+    }
+
+    function limparFormSubgrupo() {
+        $('#idSubgrupoEdicao').val('');
+        $('#inputNomeSubgrupo').val('');
+        $('#btnCancelarEdicaoSub').hide();
+    }
+
+    function excluirSubgrupo(id) {
+        if(!confirm("Tem certeza? Isso apagará o subgrupo.")) return;
+        $.ajax({
+            url: '/api/subgrupos', type: 'POST', contentType: 'application/json',
+            data: JSON.stringify({ acao: 'excluir', id: id }),
+            success: function() { listarSubgruposNoModal(); },
+            error: function(xhr) { alert(xhr.responseJSON?.erro || "Erro ao excluir. Verifique se não há produtos vinculados."); }
+        });
+    }
+
+    // --- GESTÃO DE PRODUTOS (MODAL) ---
+    function abrirModalProduto() {
+        $('#idProdutoEdicao').val('');
+        $('#tituloModalProduto').text('Novo Produto');
+        preencherSelectGrupos('selectGrupoProduto');
+        $('#selectSubgrupoProduto').empty().append('<option value="">Selecione Grupo Primeiro</option>');
+        $('#inputNomeProduto').val('');
+        new bootstrap.Modal(document.getElementById('modalProdutoEdicao')).show();
+    }
+
+    function carregarSubgruposParaProduto(subgrupoSelecionadoId = null) {
+        const grupo = $('#selectGrupoProduto').val();
+        const selectSub = $('#selectSubgrupoProduto');
+        
+        if(!grupo) { 
+            selectSub.empty().append('<option value="">Selecione Grupo Primeiro</option>'); 
+            return; 
+        }
+
+        $.getJSON(`/api/subgrupos?atividade=${encodeURIComponent(grupo)}`, function(data) {
+            selectSub.empty().append('<option value="">(Sem Subgrupo)</option>');
+            data.forEach(sub => {
+                // --- CORREÇÃO AQUI ---
+                // Usa 'nome' (novo padrão) OU 'nome_subgrupo' (caso venha legado)
+                selectSub.append(
+                    $('<option>').val(sub.id).text(sub.nome || sub.nome_subgrupo)
+                );
+            });
+            if(subgrupoSelecionadoId) selectSub.val(subgrupoSelecionadoId);
+        });
+    }
+
+    function salvarProduto() {
+        const grupo = $('#selectGrupoProduto').val();
+        const nome = $('#inputNomeProduto').val();
+        
+        if(!grupo || !nome) { alert("Grupo e Nome do produto são obrigatórios."); return; }
+
+        const payload = {
+            id: $('#idProdutoEdicao').val(),
+            grupo: grupo,
+            id_subgrupo: $('#selectSubgrupoProduto').val() || null,
+            item: nome
+        };
+
+        $.ajax({
+            url: '/api/produtos_crud', type: 'POST', contentType: 'application/json',
+            data: JSON.stringify(payload),
+            success: function() {
+                bootstrap.Modal.getInstance(document.getElementById('modalProdutoEdicao')).hide();
+                carregarTabelaProdutos(grupo); // Recarrega tabela filtrada pelo grupo salvo
+                $('#filtroGrupoGestao').val(grupo); // Atualiza filtro da tela
+            },
+            error: function(xhr) { alert("Erro: " + (xhr.responseJSON?.erro || "Erro desconhecido")); }
+        });
+    }
+
+    function editarProduto(id, item, idSubgrupo, grupo) {
+        $('#idProdutoEdicao').val(id);
+        $('#tituloModalProduto').text('Editar Produto');
+        $('#inputNomeProduto').val(item);
+        
+        preencherSelectGrupos('selectGrupoProduto');
+        $('#selectGrupoProduto').val(grupo);
+        
+        // Carrega subgrupos e seleciona o correto
+        carregarSubgruposParaProduto(idSubgrupo);
+        
+        new bootstrap.Modal(document.getElementById('modalProdutoEdicao')).show();
+    }
+
+    function excluirProduto(id) {
+        if(!confirm("Excluir este produto?")) return;
+        $.ajax({
+            url: `/api/produtos_crud?id=${id}`, type: 'DELETE',
+            success: function() { 
+                carregarTabelaProdutos($('#filtroGrupoGestao').val()); 
+            },
+            error: function(xhr) { alert(xhr.responseJSON?.erro || "Erro ao excluir."); }
+        });
+    }
+
+// ==========================================
+    // FUNÇÕES DE FOTO (ARQUIVO E WEBCAM) - VERSÃO OTIMIZADA E UNIFICADA
+    // ==========================================
+
+    let webcamTarget = ''; // Variável para saber o destino ('associado' ou 'patrimonio')
+    let streamWebcam = null;
+
+    // Função Genérica de Redimensionamento (Para evitar repetição de código)
+    function processarImagem(file, callback) {
+        var reader = new FileReader();
+        reader.onload = function(e) {
+            var img = new Image();
+            img.onload = function() {
+                // Configuração de redimensionamento
+                const MAX_WIDTH = 800;
+                const MAX_HEIGHT = 800;
+                let width = img.width;
+                let height = img.height;
+
+                if (width > height) {
+                    if (width > MAX_WIDTH) { height *= MAX_WIDTH / width; width = MAX_WIDTH; }
+                } else {
+                    if (height > MAX_HEIGHT) { width *= MAX_HEIGHT / height; height = MAX_HEIGHT; }
+                }
+
+                var canvas = document.createElement('canvas');
+                canvas.width = width;
+                canvas.height = height;
+                var ctx = canvas.getContext('2d');
+                ctx.drawImage(img, 0, 0, width, height);
+
+                // Retorna Base64 Otimizado (JPG 80%)
+                callback(canvas.toDataURL('image/jpeg', 0.8));
+            }
+            img.src = e.target.result;
+        }
+        reader.readAsDataURL(file);
+    }
+
+    // 1. Preview Arquivo - ASSOCIADO
+    function previewImagemArquivo(input) {
+        if (input.files && input.files[0]) {
+            processarImagem(input.files[0], function(dataURL) {
+                $('#previewFotoAssociado').attr('src', dataURL).show();
+                $('#textoSemFoto').hide();
+                $('#fotoWebcamBase64').val(dataURL); // Salva versão leve no hidden
+                $('#fotoExistenteBase64').val('');   // Limpa flag de foto antiga
+                input.value = ''; // Limpa input físico para evitar envio pesado
+            });
+        }
+    }
+
+    // 2. Preview Arquivo - PATRIMÔNIO (Novo)
+    function previewImagemPatrimonio(input) {
+        if (input.files && input.files[0]) {
+            processarImagem(input.files[0], function(dataURL) {
+                $('#previewFotoPatrimonio').attr('src', dataURL).show();
+                $('#textoSemFotoPatrimonio').hide();
+                $('#fotoPatrimonioWebcamBase64').val(dataURL); // Salva versão leve no hidden
+                input.value = ''; // Limpa input físico
+            });
+        }
+    }
+
+    // 3. Abrir Webcam (Com Alvo)
+    function abrirModalWebcam(target) {
+        webcamTarget = target || 'associado'; // Padrão é associado
+        const video = document.getElementById('videoWebcam');
+        
+        navigator.mediaDevices.getUserMedia({ video: { facingMode: "environment" }, audio: false }) // Tenta câmera traseira no celular
+            .catch(() => navigator.mediaDevices.getUserMedia({ video: true, audio: false })) // Fallback para qualquer câmera
+            .then(function(stream) {
+                streamWebcam = stream;
+                video.srcObject = stream;
+                video.play();
+                new bootstrap.Modal(document.getElementById('modalWebcam')).show();
+            })
+            .catch(function(err) {
+                console.error("Erro câmera: ", err);
+                alert("Não foi possível acessar a câmera. Verifique as permissões ou se está usando HTTPS.");
+            });
+    }
+
+    // 4. Tirar Foto da Webcam (Redimensionada)
+    function tirarFotoWebcam() {
+        const video = document.getElementById('videoWebcam');
+        const canvas = document.getElementById('canvasWebcam');
+        const context = canvas.getContext('2d');
+
+        // Lógica de redimensionamento para webcam
+        const MAX_WIDTH = 800;
+        const MAX_HEIGHT = 800;
+        let width = video.videoWidth;
+        let height = video.videoHeight;
+
+        if (width > height) {
+            if (width > MAX_WIDTH) { height *= MAX_WIDTH / width; width = MAX_WIDTH; }
+        } else {
+            if (height > MAX_HEIGHT) { width *= MAX_HEIGHT / height; height = MAX_HEIGHT; }
+        }
+
+        canvas.width = width;
+        canvas.height = height;
+        context.drawImage(video, 0, 0, width, height);
+
+        const dataURL = canvas.toDataURL('image/jpeg', 0.8);
+
+        // Decide onde jogar a foto
+        if (webcamTarget === 'patrimonio') {
+            $('#previewFotoPatrimonio').attr('src', dataURL).show();
+            $('#textoSemFotoPatrimonio').hide();
+            $('#fotoPatrimonioWebcamBase64').val(dataURL);
+            $('#inputFotoPatrimonioArquivo').val(''); // Limpa conflito de arquivo
+        } else {
+            // Associado
+            $('#previewFotoAssociado').attr('src', dataURL).show();
+            $('#textoSemFoto').hide();
+            $('#fotoWebcamBase64').val(dataURL);
+            $('#fotoExistenteBase64').val('');
+            $('#inputFotoArquivo').val('');
+        }
+
+        // Fecha modal e para câmera
+        var modalEl = document.getElementById('modalWebcam');
+        var modal = bootstrap.Modal.getInstance(modalEl);
+        if(modal) modal.hide();
+        pararWebcam();
+    }
+
+    // 5. Parar Webcam
+    function pararWebcam() {
+        if (streamWebcam) {
+            streamWebcam.getTracks().forEach(track => track.stop());
+            streamWebcam = null;
+        }
+    }
+
+    document.getElementById('modalWebcam').addEventListener('hidden.bs.modal', function () {
+       pararWebcam();
+    });
+
+    // --- BUSCA AUTOMÁTICA DE CEP ---
+    function configurarBuscaCep(seletorCep, prefixoId) {
+        $(seletorCep).blur(function() {
+            // 1. Limpa o CEP para envio
+            var cep = $(this).val().replace(/\D/g, '');
+
+            // 2. Define os IDs corretos baseado no formulário (CF ou Associado)
+            var idLogradouro = (prefixoId === 'Associado') ? '#logAssociado' : '#logradouroCF';
+            var idBairro = `#bairro${prefixoId}`;
+            var idCidade = `#cidade${prefixoId}`;
+            var idUf = `#uf${prefixoId}`;
+            var idNumero = (prefixoId === 'Associado') ? '#endereco_numero' : '#numeroCF'; 
+            
+            // CORREÇÃO: No seu HTML o ID é numAssociado
+            if (prefixoId === 'Associado') idNumero = '#numAssociado';
+
+            // 3. Verifica se tem 8 dígitos
+            if (cep.length === 8) {
+                // Feedback visual ("...")
+                $(idLogradouro).val('...');
+                $(idBairro).val('...');
+                $(idCidade).val('...');
+                $(idUf).val('...');
+
+                $.getJSON(`/buscar_cep/${cep}`, function(data) {
+                    if (!("erro" in data)) {
+                        $(idLogradouro).val(data.logradouro);
+                        $(idBairro).val(data.bairro);
+                        $(idCidade).val(data.cidade);
+                        $(idUf).val(data.uf);
+                        
+                        // Foca no número
+                        $(idNumero).focus();
+                    } else {
+                        alert("CEP não encontrado.");
+                        // Limpa campos
+                        $(idLogradouro).val(""); $(idBairro).val(""); 
+                        $(idCidade).val(""); $(idUf).val("");
+                    }
+                }).fail(function() {
+                    alert("Erro ao buscar CEP.");
+                    $(idLogradouro).val(""); $(idBairro).val(""); 
+                    $(idCidade).val(""); $(idUf).val("");
+                });
+            }
+        });
+    }
+
+    // Ativa a função de CEP
+    configurarBuscaCep('#cepCF', 'CF');
+    configurarBuscaCep('#cepAssociado', 'Associado');
+
+// --- FUNÇÕES DE EDIÇÃO/EXCLUSÃO DE TRANSAÇÕES ---
+
+    function iniciarEdicaoTransacao(id) {
+        // 1. Busca os detalhes completos
+        $.getJSON(`/get_transacao_detalhes/${id}`, function(data) {
+            if(data.error) { alert(data.error); return; }
+
+            // --- TRAVA DE SEGURANÇA (IMPORTANTE) ---
+            // Impede edição se já houver pagamentos (status diferente de 'Aberto')
+            if (data.status !== 'Aberto') {
+                alert(`⚠️ AÇÃO BLOQUEADA\n\nEsta transação está com status: ${data.status.toUpperCase()}.\n\nPor segurança contábil, não é possível alterar uma nota que já possui movimentação financeira registrada.\n\nSOLUÇÃO: Vá ao Fluxo de Caixa, exclua o(s) pagamento(s) referente(s) a esta nota para que ela volte ao status 'Aberto'. Em seguida, tente editar novamente.`);
+                return; // Para tudo aqui.
+            }
+
+            // 2. Muda para a aba de Cadastro
+            mostrarFormulario('receitaDespesaForm');
+            
+            // 3. Ajusta o formulário para modo "Edição"
+            $('#transacaoForm').attr('action', '/editar_transacao');
+            $('#idTransacaoHidden').val(data.id);
+            $('#btnSalvarTransacao').text('SALVAR ALTERAÇÕES').removeClass('btn-success').addClass('btn-warning');
+            $('#btnCancelarEdicaoTransacao').show();
+            
+            // 4. Preenche Cabeçalho (UVR e Tipo)
+            $('#uvrSelectTransacao').val(data.uvr).trigger('change');
+            $('#tipoTransacaoSelect').val(data.tipo).trigger('change');
+            
+            // Limpa os itens antes de começar qualquer coisa para evitar conflitos visual
+            $('#itensDocumentoContainer').empty();
+
+            // Delay para carregar dependentes (Atividade e Fornecedor)
+            setTimeout(() => {
+                // Define a atividade e dispara a mudança
+                $('#tipoAtividadeTransacaoSelect').val(data.atividade).trigger('change');
+                
+                // Formata Data (yyyy-mm-dd)
+                if(data.data && data.data.includes('/')) {
+                    const partes = data.data.split('/');
+                    $('#dataDocumentoTransacao').val(`${partes[2]}-${partes[1]}-${partes[0]}`);
+                }
+                
+                $('input[name="numero_documento_transacao"]').val(data.doc === '-' ? '' : data.doc);
+
+                // Seleciona Fornecedor/Cliente
+                setTimeout(() => {
+                    let found = false;
+                    $('#fornecedorPrestadorTransacaoSelect option').each(function() {
+                        if ($(this).data('nome') === data.origem) {
+                            $(this).prop('selected', true);
+                            found = true;
+                        }
+                    });
+                    
+                    if(found) {
+                        $('#fornecedorPrestadorTransacaoSelect').trigger('change');
+                    } else if (data.origem) {
+                        $('#nomeFornecedorPrestadorTransacaoInput').val(data.origem);
+                    }
+                }, 300); // Pequeno delay interno para o fornecedor
+
+                // 5. Preenche Itens (MOVIDO PARA CÁ - Roda DEPOIS do cabeçalho)
+                if (data.itens && data.itens.length > 0) {
+                    data.itens.forEach(item => {
+                        // Cria a linha SEM carregar listas automáticas (passando false)
+                        if (typeof window.adicionarItemLinha === "function") {
+                            window.adicionarItemLinha(false); 
+                        }
+
+                        const lastRow = $('#itensDocumentoContainer .item-row').last();
+                        // O id permite ao servidor saber qual item gravado cada linha mostra
+                        lastRow.find('input[name="produto_servico_id[]"]').val(item.id);
+                        
+                        // Injeta manualmente os valores nos selects
+                        
+                        // 1. Grupo
+                        const selGrupo = lastRow.find('.grupo-select');
+                        if (item.grupo) {
+                            selGrupo.empty().append(
+                                $('<option>').val(item.grupo).text(item.grupo).prop('selected', true)
+                            );
+                        } else {
+                            selGrupo.empty().append(`<option value="" selected>Original</option>`);
+                        }
+
+                        // 2. Subgrupo
+                        const selSub = lastRow.find('.subgrupo-select');
+                        if (item.subgrupo) {
+                            selSub.empty().append(
+                                $('<option>').val(item.subgrupo).text(item.subgrupo).prop('selected', true)
+                            ).prop('disabled', false);
+                        } else {
+                            selSub.empty().append('<option value="" selected>(Nenhum)</option>').prop('disabled', false);
+                        }
+
+                        // 3. Item (Descrição)
+                        const selDesc = lastRow.find('.item-select');
+                        selDesc.empty().append(
+                            $('<option>').val(item.descricao).text(item.descricao).prop('selected', true)
+                        ).prop('disabled', false);
+                        
+                        // 4. Unidade e Quantidade
+                        lastRow.find('select[name="produto_servico_unidade[]"]').val(item.unidade);
+                        lastRow.find('input[name="produto_servico_quantidade[]"]').val(item.quantidade);
+
+                        // 5. Valores Monetários
+                        const valorFmt = item.valor_unitario.toLocaleString('pt-BR', {minimumFractionDigits: 2, maximumFractionDigits: 2});
+                        const totalFmt = item.valor_total.toLocaleString('pt-BR', {minimumFractionDigits: 2, maximumFractionDigits: 2});
+
+                        lastRow.find('input[name="produto_servico_valor_unitario[]"]').val(valorFmt);
+                        lastRow.find('input[name="produto_servico_valor_total_item[]"]').val(totalFmt);
+                    });
+                    
+                    $('#valorTotalDocumentoCalculado').val(data.valor_total.toLocaleString('pt-BR', {minimumFractionDigits: 2}));
+                } else {
+                    // Se não tem itens, cria uma linha vazia padrão (com listas)
+                    if (typeof window.adicionarItemLinha === "function") window.adicionarItemLinha(true);
+                }
+                
+                // Rola a tela
+                $('html, body').animate({ scrollTop: $("#receitaDespesaForm").offset().top - 100 }, 500);
+
+            }, 500); // Fim do setTimeout principal
+
+        }).fail(function() { alert("Erro ao carregar dados para edição."); });
+    }
+    
+    // --- FUNÇÃO PARA VER DETALHES (E LISTAR ITENS) ---
+    function verDetalhesTransacao(id) {
+        // Busca dados no Python
+        $.getJSON(`/get_transacao_detalhes/${id}`, function(data) {
+            if(data.error) { alert(data.error); return; }
+
+            // Preenche Cabeçalho
+            $('#detalheTransacaoOrigem').text(data.origem);
+            $('#detalheTransacaoDoc').text(data.doc);
+            $('#detalheTransacaoData').text(data.data);
+            $('#detalheTransacaoTipo').text(data.tipo);
+            $('#detalheTransacaoAtividade').text(data.atividade);
+            
+            // Valor e Status
+            const valorFmt = data.valor_total.toLocaleString('pt-BR', {style: 'currency', currency: 'BRL'});
+            $('#detalheTransacaoValor').text(valorFmt);
+            
+            // Cor do valor
+            if(data.tipo === 'Receita') $('#detalheTransacaoValor').removeClass('text-danger').addClass('text-success');
+            else $('#detalheTransacaoValor').removeClass('text-success').addClass('text-danger');
+
+            $('#detalheTransacaoStatus').text(data.status);
+
+            // Preenche Tabela de Itens
+            const tbody = $('#tabelaItensDetalheBody');
+            tbody.empty();
+            
+            if(data.itens && data.itens.length > 0) {
+                data.itens.forEach(item => {
+                    const vlrUnit = item.valor_unitario.toLocaleString('pt-BR', {minimumFractionDigits: 2});
+                    const vlrTotal = item.valor_total.toLocaleString('pt-BR', {minimumFractionDigits: 2});
+                    
+                    tbody.append(`
+                        <tr>
+                            <td>${escaparHtml(item.descricao)}</td>
+                            <td class="text-center">${escaparHtml(item.unidade)}</td>
+                            <td class="text-center">${escaparHtml(item.quantidade)}</td>
+                            <td class="text-end">R$ ${vlrUnit}</td>
+                            <td class="text-end fw-bold">R$ ${vlrTotal}</td>
+                        </tr>
+                    `);
+                });
+            } else {
+                tbody.append('<tr><td colspan="5" class="text-center text-muted">Nenhum item detalhado.</td></tr>');
+            }
+
+            // Configura o botão de "Editar" para abrir o formulário principal com este ID
+            const transacaoId = idNumericoSeguro(data.id);
+            $('#btnEditarNoModalTransacao').off('click').on('click', function() {
+                if (transacaoId !== null) iniciarEdicaoTransacao(transacaoId);
+            });
+
+            // Abre o modal
+            new bootstrap.Modal(document.getElementById('modalDetalhesTransacao')).show();
+
+        }).fail(function() { alert("Erro ao carregar detalhes."); });
+    }
+    function cancelarEdicaoTransacao() {
+        $('#transacaoForm')[0].reset();
+        $('#transacaoForm').attr('action', '/registrar_transacao_financeira');
+        $('#idTransacaoHidden').val('');
+        $('#btnSalvarTransacao').text('REGISTRAR TRANSAÇÃO').removeClass('btn-warning').addClass('btn-success');
+        $('#btnCancelarEdicaoTransacao').hide();
+        
+        $('#itensDocumentoContainer').empty();
+        adicionarItemLinha(); // Volta a ter 1 linha vazia
+        
+        mostrarFormulario('gestaoTransacoesContainer');
+    }
+
+    function solicitarExclusaoTransacao(id) {
+        if (confirm('Tem certeza que deseja excluir esta transação? A operação será bloqueada se houver pagamentos vinculados.')) {
+            $.ajax({
+                url: `/excluir_transacao/${id}`,
+                type: 'POST',
+                success: function(response) {
+                    if (response.status === 'sucesso') {
+                        alert(response.message);
+                        buscarTransacoesGestao();
+                    } else {
+                        alert("Erro: " + (response.message || "Erro desconhecido."));
+                    }
+                },
+                error: function(xhr) {
+                    let msg = "Erro ao excluir.";
+                    if (xhr.responseJSON && xhr.responseJSON.error) msg += "\n" + xhr.responseJSON.error;
+                    alert(msg);
+                }
+            });
+        }
+    }
+// --- FUNÇÕES DE CRUD DO FLUXO DE CAIXA (Adicione isto ao final do script) ---
+
+function visualizarMovimentacao(id) {
+        $.getJSON(`/get_movimentacao_detalhes/${id}`, function(data) {
+            if(data.error) { alert(data.error); return; }
+            
+            // Preenche os novos campos
+            $('#viewCaixaData').val(data.data);
+            $('#viewCaixaDoc').val(data.documento_exibicao);
+            $('#viewCaixaAtividade').val(data.atividade);
+            
+            const valorFmt = parseFloat(data.valor).toLocaleString('pt-BR', {minimumFractionDigits: 2});
+            $('#viewCaixaValor').val(valorFmt);
+
+            // Aviso visual de vínculo
+            if(data.vinculado) {
+                $('#viewCaixaInfoExtra').show();
+            } else {
+                $('#viewCaixaInfoExtra').hide();
+            }
+
+            new bootstrap.Modal(document.getElementById('modalVisualizarCaixa')).show();
+        });
+    }
+
+    function excluirMovimentacao(id) {
+        if(confirm('ATENÇÃO: deseja realmente excluir/estornar este lançamento? Se houver nota fiscal vinculada, o status será recalculado.')) {
+            $.ajax({
+                url: `/excluir_movimentacao/${id}`,
+                type: 'POST',
+                success: function(res) {
+                    if(res.status === 'sucesso') {
+                        alert(res.message);
+                        // Atualiza a tabela simulando um clique no botão de gerar
+                        $('#btnGerarExtrato').click(); 
+                    } else {
+                        alert("Erro: " + res.error);
+                    }
+                },
+                error: function(xhr) {
+                    let msg = "Erro ao excluir.";
+                    if (xhr.responseJSON && xhr.responseJSON.error) msg = xhr.responseJSON.error;
+                    alert(msg);
+                }
+            });
+        }
+    }
+// ==========================================
+    // LÓGICA DE PATRIMÔNIO E FROTA (CRUD COMPLETO)
+    // ==========================================
+
+    // 1. Controle Visual (Show/Hide) dos Campos
+    function ajustarCamposPatrimonio() {
+        const cat = $('#categoriaBem').val();
+        
+        if (cat === 'Frota') {
+            $('#divDadosVeiculo').show();
+            // Pré-seleciona KM para frota se estiver vazio
+            if (!$('select[name="controle_por"]').val()) $('select[name="controle_por"]').val('km');
+        } else {
+            $('#divDadosVeiculo').hide();
+            // Limpa campos de veículo para não enviar lixo
+            $('#divDadosVeiculo input').val('');
+            // Sugere Horas se estiver vazio
+            if (!$('select[name="controle_por"]').val()) $('select[name="controle_por"]').val('horas');
+        }
+    }
+
+    function ajustarCamposPropriedade() {
+        const sit = $('#situacaoPropriedade').val();
+        if (sit === 'Comodato') {
+            $('.div-comodato').show();
+        } else {
+            $('.div-comodato').hide();
+            $('.div-comodato input').val('');
+        }
+    }
+
+    // 2. Carregamento Dinâmico de Responsáveis por UVR
+    function carregarAssociadosNaUvrPatrimonio(uvr) {
+        const selects = $('.select-associado-uvr'); // Seleciona Resp e Operador
+        selects.empty().append('<option value="">Carregando...</option>');
+
+        if (!uvr) {
+            selects.empty().append('<option value="">Selecione a UVR acima primeiro...</option>');
+            return;
+        }
+
+        // Busca associados ATIVOS da UVR específica
+        buscarTodasPaginas('/buscar_associados', { status: 'Ativo', uvr: uvr }).done(function(data) {
+            selects.empty().append('<option value="">Selecione...</option>');
+            if (data && data.length > 0) {
+                data.forEach(assoc => {
+                    selects.append($('<option>').val(assoc.nome).text(assoc.nome));
+                });
+            } else {
+                selects.append('<option value="">Nenhum associado ativo encontrado nesta UVR.</option>');
+            }
+        }).fail(function() {
+            selects.empty().append('<option value="">Erro ao carregar lista.</option>');
+        });
+    }
+
+    // Evento: Quando muda a UVR, atualiza Associação e Lista de Pessoas
+    $('#uvrPatrimonioSelect').change(function() {
+        const uvr = $(this).val();
+        
+        // 1. Preenche visualmente a Associação
+        const mapAssociacao = { "UVR 01": "ASCAMAR", "UVR 02": "ACAN" };
+        $('#associacaoPatrimonioInput').val(mapAssociacao[uvr] || "");
+
+        // 2. Recarrega os selects de responsáveis
+        carregarAssociadosNaUvrPatrimonio(uvr);
+    });
+
+    // 3. Buscar e Listar Bens
+    function buscarPatrimonio() {
+        const q = $('#buscaPatrimonioInput').val();
+        const cat = $('#filtroCategoriaPatrimonio').val();
+        
+        // Se usuário comum, filtra pela UVR dele. Se admin, pode ver tudo (se não filtrar).
+        const uvr = (typeof usuarioLogadoUvr !== 'undefined' && usuarioLogadoUvr) ? usuarioLogadoUvr : '';
+
+        carregarPaginaGestao({
+            url: '/buscar_patrimonio',
+            params: { q: q, categoria: cat, uvr: uvr },
+            tbody: $('#tabelaPatrimonio tbody'),
+            colunas: 7,
+            vazio: 'Nenhum bem encontrado.',
+            aoFalhar: xhr => alert(xhr.responseJSON?.error || 'Erro ao buscar patrimônio.'),
+            montarLinha: item => {
+                // Define o título do botão de excluir com base na permissão
+                const tituloExcluir = usuarioIsAdmin ? 'Excluir' : 'Solicitar Exclusão';
+                
+                return `
+                    <tr>
+                        <td><strong>${escaparHtml(item.descricao)}</strong><br><small class="text-muted">ID: ${idNumericoSeguro(item.id)}</small></td>
+                        <td>${escaparHtml(item.categoria)}<br><small>${escaparHtml(item.tipo)}</small></td>
+                        <td>${escaparHtml(item.placa)}</td>
+                        <td>${escaparHtml(item.medidor)} (${escaparHtml(item.controle_por)})</td>
+                        <td>${escaparHtml(item.responsavel)}</td>
+                        <td><span class="badge bg-${item.status === 'Ativo' ? 'success' : 'secondary'}">${escaparHtml(item.status)}</span></td>
+                        <td class="text-center">
+                            <button class="btn btn-sm btn-info text-white me-1" onclick="visualizarPatrimonio(${idNumericoSeguro(item.id)})" title="Ver Detalhes">
+                                <i class="fas fa-eye"></i>
+                            </button>
+                            <button class="btn btn-sm btn-warning me-1" onclick="iniciarEdicaoPatrimonio(${idNumericoSeguro(item.id)})" title="Editar">
+                                <i class="fas fa-edit"></i>
+                            </button>
+                            <button class="btn btn-sm btn-danger" onclick="excluirPatrimonio(${idNumericoSeguro(item.id)})" title="${tituloExcluir}">
+                                <i class="fas fa-trash"></i>
+                            </button>
+                        </td>
+                    </tr>
+                `;
+            }
+        }).fail(xhr => alert(xhr.responseJSON?.error || 'Erro ao buscar patrimônio.'));
+    }
+
+    // 4. Visualizar (Modal)
+    function visualizarPatrimonio(id) {
+        $.getJSON(`/get_patrimonio_detalhes/${id}`, function(data) {
+            if(data.error) { alert(data.error); return; }
+
+            // Preenche Geral
+            $('#viewPatrimonioDescricao').text(data.descricao);
+            $('#viewPatrimonioCodigo').text(data.codigo_patrimonio || '-');
+            $('#viewPatrimonioStatus').text(data.status_bem)
+                .removeClass('bg-success bg-secondary bg-warning bg-danger')
+                .addClass('badge ' + (data.status_bem==='Ativo' ? 'bg-success' : 'bg-secondary'));
+            
+            // Foto
+            if(data.foto_url) {
+                $('#viewPatrimonioFoto').attr('src', data.foto_url).show();
+                $('#viewPatrimonioIcone').hide();
+            } else {
+                $('#viewPatrimonioFoto').hide();
+                $('#viewPatrimonioIcone').show();
+            }
+
+            // Abas
+            $('#viewPatrimonioUvr').text(data.uvr);
+            $('#viewPatrimonioTipo').text(`${data.categoria} - ${data.tipo_bem}`);
+            $('#viewPatrimonioPropriedade').text(`${data.situacao_propriedade} (${data.entidade_proprietaria})`);
+            $('#viewPatrimonioPlaca').text(data.placa || (data.codigo_patrimonio ? 'Cód: '+data.codigo_patrimonio : '-'));
+
+            $('#viewPatrimonioMarca').text(`${data.marca || ''} / ${data.modelo || ''}`);
+            $('#viewPatrimonioAno').text(`Ano: ${data.ano_fabricacao || '-'} / Série: ${data.numero_serie_chassi || '-'}`);
+            $('#viewPatrimonioCombustivel').text(data.combustivel || '-');
+            $('#viewPatrimonioMedidor').text(`${data.medidor_atual || 0} ${data.controle_por}`);
+
+            $('#viewPatrimonioResp').text(data.nome_responsavel || '-');
+            $('#viewPatrimonioOp').text(data.nome_operador_principal || '-');
+            $('#viewPatrimonioLocal').text(`${data.setor_uso || ''} - ${data.local_instalacao || ''}`);
+            $('#viewPatrimonioObs').text(data.observacoes_gerais || 'Nenhuma observação registrada.');
+
+            const patrimonioId = idNumericoSeguro(data.id);
+            $('#btnEditarPatrimonioModal').off('click').on('click', function() {
+                if (patrimonioId !== null) iniciarEdicaoPatrimonio(patrimonioId);
+            });
+            new bootstrap.Modal(document.getElementById('modalVisualizarPatrimonio')).show();
+        });
+    }
+
+    // 5. Editar (Carregar no Form)
+    function iniciarEdicaoPatrimonio(id) {
+        var viewModalEl = document.getElementById('modalVisualizarPatrimonio');
+        var viewModal = bootstrap.Modal.getInstance(viewModalEl);
+        if(viewModal) viewModal.hide();
+
+        $.getJSON(`/get_patrimonio_detalhes/${id}`, function(data) {
+            if(data.error) { alert(data.error); return; }
+
+            // Muda para a aba de cadastro
+            var tabEl = document.querySelector('#tab-novo-patrimonio');
+            var tab = new bootstrap.Tab(tabEl);
+            tab.show();
+
+            // Configura modo EDIÇÃO
+            $('#formPatrimonio').attr('action', '/editar_patrimonio');
+            
+            // Cria input hidden para ID se não existir
+            if ($('#idPatrimonioHidden').length === 0) {
+                $('<input>').attr({type: 'hidden', id: 'idPatrimonioHidden', name: 'id_patrimonio'}).appendTo('#formPatrimonio');
+            }
+            $('#idPatrimonioHidden').val(data.id);
+
+            // Muda botão e exibe se é Admin ou Usuário
+            const textoBotao = usuarioIsAdmin ? 'SALVAR ALTERAÇÕES' : 'SOLICITAR ALTERAÇÃO';
+            $('#formPatrimonio button[type="submit"]')
+                .html(`<i class="fas fa-save"></i> ${textoBotao}`)
+                .removeClass('btn-success').addClass('btn-warning');
+
+            // Botão Cancelar
+            if ($('#btnCancelarEdicaoPatrimonio').length === 0) {
+                $('<button>').attr({type: 'button', id: 'btnCancelarEdicaoPatrimonio', class: 'btn btn-secondary ms-2'})
+                             .html('<i class="fas fa-times"></i> CANCELAR')
+                             .click(cancelarEdicaoPatrimonio)
+                             .insertAfter('#formPatrimonio button[type="submit"]');
+            }
+            $('#btnCancelarEdicaoPatrimonio').show();
+
+            // Preenche dados
+            $('#uvrPatrimonioSelect').val(data.uvr).trigger('change');
+
+            // Timeout para esperar o carregamento dos associados da UVR (via AJAX)
+            setTimeout(() => {
+                $('input[name="descricao_bem"]').val(data.descricao);
+                $('#categoriaBem').val(data.categoria).trigger('change');
+                $('select[name="tipo_bem"]').val(data.tipo_bem);
+                
+                $('input[name="marca_bem"]').val(data.marca);
+                $('input[name="modelo_bem"]').val(data.modelo);
+                $('input[name="ano_fabricacao"]').val(data.ano_fabricacao);
+                $('input[name="serie_chassi"]').val(data.numero_serie_chassi);
+                $('input[name="codigo_patrimonio"]').val(data.codigo_patrimonio);
+                
+                $('input[name="eh_bem_publico"]').prop('checked', data.eh_bem_publico);
+                $('input[name="uso_compartilhado"]').prop('checked', data.uso_compartilhado);
+
+                $('#situacaoPropriedade').val(data.situacao_propriedade).trigger('change');
+                $('select[name="entidade_proprietaria"]').val(data.entidade_proprietaria);
+                $('input[name="orgao_cedente"]').val(data.orgao_cedente);
+                $('input[name="num_termo"]').val(data.numero_termo_comodato);
+                $('input[name="data_inicio_comodato"]').val(data.data_inicio_comodato);
+                $('input[name="data_fim_comodato"]').val(data.data_fim_comodato);
+
+                $('input[name="placa"]').val(data.placa);
+                $('input[name="renavam"]').val(data.renavam);
+                $('select[name="combustivel"]').val(data.combustivel);
+                $('input[name="capacidade_carga"]').val(data.capacidade_carga);
+
+                $('select[name="controle_por"]').val(data.controle_por);
+                $('input[name="medidor_inicial"]').val(data.medidor_inicial);
+                
+                $('select[name="local_instalacao"]').val(data.local_instalacao);
+                $('select[name="setor_uso"]').val(data.setor_uso);
+
+                $('select[name="nome_responsavel"]').val(data.nome_responsavel);
+                $('select[name="nome_operador"]').val(data.nome_operador_principal);
+
+                $('select[name="status_bem"]').val(data.status_bem);
+                $('select[name="estado_conservacao"]').val(data.estado_conservacao);
+                $('input[name="alerta_preventiva"]').val(data.alerta_preventiva);
+                
+                $('input[name="permite_abastecimento"]').prop('checked', data.permite_abastecimento);
+                $('input[name="permite_manutencao"]').prop('checked', data.permite_manutencao);
+                
+                $('textarea[name="observacoes_gerais"]').val(data.observacoes_gerais);
+
+                if (data.foto_url) {
+                    $('#previewFotoPatrimonio').attr('src', data.foto_url).show();
+                    $('#textoSemFotoPatrimonio').hide();
+                } else {
+                    $('#previewFotoPatrimonio').hide();
+                    $('#textoSemFotoPatrimonio').show();
+                }
+
+                $('html, body').animate({ scrollTop: $("#formPatrimonio").offset().top - 150 }, 500);
+
+            }, 600);
+        });
+    }
+
+    // 7. Cancelar Edição
+    function cancelarEdicaoPatrimonio() {
+        // Limpa form
+        $('#formPatrimonio')[0].reset();
+        
+        // Restaura estado original (Modo Criação)
+        $('#formPatrimonio').attr('action', '/cadastrar_patrimonio');
+        $('#idPatrimonioHidden').val('');
+        $('#formPatrimonio button[type="submit"]').html('<i class="fas fa-save"></i> SALVAR CADASTRO').removeClass('btn-warning').addClass('btn-success');
+        $('#btnCancelarEdicaoPatrimonio').hide();
+        
+        // Limpa visualização da foto
+        $('#previewFotoPatrimonio').hide().attr('src', '');
+        $('#textoSemFotoPatrimonio').show();
+        $('#fotoPatrimonioWebcamBase64').val('');
+        
+        // Retorna para a aba de lista
+        var tabEl = document.querySelector('#tab-lista-patrimonio');
+        var tab = new bootstrap.Tab(tabEl);
+        tab.show();
+    }
+
+    // 6. Excluir (ou Solicitar Exclusão)
+    function excluirPatrimonio(id) {
+        const msg = usuarioIsAdmin ? 
+            'Tem certeza que deseja excluir este bem? Essa ação não pode ser desfeita.' :
+            'Deseja solicitar a exclusão deste bem? O administrador precisará aprovar.';
+
+        if(confirm(msg)) {
+            $.post(`/excluir_patrimonio/${id}`, function(res) {
+                if(res.status === 'sucesso') {
+                    // Exibe mensagem retornada pelo servidor (Excluído ou Solicitado)
+                    alert(res.message);
+                    buscarPatrimonio(); 
+                } else {
+                    alert('Erro: ' + res.error);
+                }
+            }).fail(function() { alert("Erro de comunicação com o servidor."); });
+        }
+    }
+
+    // Inicialização da Tela
+    $('#tab-novo-patrimonio').on('shown.bs.tab', function () {
+        ajustarCamposPatrimonio(); ajustarCamposPropriedade();
+    });
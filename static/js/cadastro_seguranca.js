@@ -53,3 +53,41 @@ $(document).ajaxError(function (_evento, xhr) {
         tratarLimiteExcedido(xhr.status);
     }
 });
+
+// Listas JSON marcadas com ETag pelo servidor: a página guarda a última cópia
+// em memória e revalida com If-None-Match. Com 304, os callbacks de sucesso
+// recebem a cópia guardada; nada é gravado no cache do navegador.
+const respostasComEtag = new Map();
+const MAX_RESPOSTAS_COM_ETAG = 50;
+
+$.ajaxPrefilter(function (configuracao, _originais, xhr) {
+    const metodo = (configuracao.type || "GET").toUpperCase();
+    let endereco = configuracao.url;
+    if (typeof configuracao.data === "string" && configuracao.data) {
+        endereco += (endereco.includes("?") ? "&" : "?") + configuracao.data;
+    }
+    const destino = new URL(endereco, window.location.href);
+    if (metodo !== "GET" || destino.origin !== window.location.origin) return;
+
+    const guardada = respostasComEtag.get(destino.href);
+    if (guardada) {
+        xhr.setRequestHeader("If-None-Match", guardada.etag);
+    }
+    const sucessos = [].concat(configuracao.success || []);
+    configuracao.success = function (dados, estado, requisicao) {
+        if (requisicao.status === 304 && guardada) {
+            dados = guardada.dados;
+            estado = "success";
+        } else {
+            const etag = requisicao.getResponseHeader("ETag");
+            respostasComEtag.delete(destino.href);
+            if (etag) {
+                if (respostasComEtag.size >= MAX_RESPOSTAS_COM_ETAG) {
+                    respostasComEtag.delete(respostasComEtag.keys().next().value);
+                }
+                respostasComEtag.set(destino.href, { etag, dados });
+            }
+        }
+        sucessos.forEach((callback) => callback.call(this, dados, estado, requisicao));
+    };
+});
@@ -0,0 +1,236 @@
+"""Testes da alocação de pagamentos por item mantida pelas rotas financeiras."""
+
+import io
+import sys
+import unittest
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from test_csrf_h2a2 import APP_MODULE, obter_token
+
+
+def sqls_executados(cursor):
+    return [" ".join(chamada.args[0].split()) for chamada in cursor.execute.call_args_list]
+
+
+class TestAlocacaoPagamentos(unittest.TestCase):
+    def test_01_relatorio_le_alocacao_sem_janela_sobre_o_historico(self):
+        sql, parametros = APP_MODULE._montar_consulta_relatorio(
+            MagicMock(),
+            {"uvr": "UVR 01", "data_inicial": "2026-01-01", "data_final": "2026-01-31"},
+        )
+        self.assertNotIn("OVER (", sql)
+        self.assertNotIn("WITH ", sql)
+        self.assertNotIn("fluxo_caixa", sql)
+        self.assertIn("it.valor_pago_item as valor_pago_neste_item", sql)
+        self.assertIn("tf.data_ultimo_pagamento >= %s", sql)
+        self.assertEqual(
+            parametros, ("2026-01-01", "2026-01-01", "2026-01-31", "2026-01-31", "UVR 01")
+        )
+
+    def test_02_atualizacao_restrita_as_nfs_informadas(self):
+        cursor = MagicMock()
+        APP_MODULE._atualizar_alocacao_pagamentos(cursor, ["7", 3, 7])
+        self.assertEqual(cursor.execute.call_count, 2)
+        for chamada in cursor.execute.call_args_list:
+            self.assertIn("= ANY(%s)", chamada.args[0])
+            self.assertEqual(chamada.args[1], ([3, 7],))
+
+    def test_03_escopo_de_uvr_e_lista_vazia(self):
+        cursor = MagicMock()
+        APP_MODULE._atualizar_alocacao_pagamentos(cursor, [], uvr="UVR 01")
+        cursor.execute.assert_not_called()
+        APP_MODULE._atualizar_alocacao_pagamentos(cursor, [5], uvr="UVR 01")
+        for chamada in cursor.execute.call_args_list:
+            self.assertIn(".uvr = %s", chamada.args[0])
+            self.assertEqual(chamada.args[1], ([5], "UVR 01"))
+
+    def test_04_recalculo_completo_confirma_sem_alterar_a_estrutura(self):
+        conexao = MagicMock()
+        with (
+            patch.object(APP_MODULE, "conectar_banco", return_value=conexao),
+            patch.object(APP_MODULE, "registrar_evento"),
+        ):
+            APP_MODULE.recalcular_alocacao_pagamentos()
+        sqls = sqls_executados(conexao.cursor.return_value)
+        self.assertEqual(len(sqls), 2)
+        self.assertIn("WHERE (TRUE)", sqls[-1])
+        self.assertFalse(any(
+            comando in sql for sql in sqls for comando in ("ALTER TABLE", "CREATE INDEX", "DROP ", "DELETE ")
+        ))
+        conexao.commit.assert_called_once()
+
+    def test_05_script_exige_confirmacao(self):
+        import recalcular_alocacao_pagamentos as script
+
+        recalcular = MagicMock()
+        saida = io.StringIO()
+        with (
+            patch.object(sys, "argv", ["recalcular_alocacao_pagamentos.py"]),
+            patch.object(sys, "stderr", saida),
+            patch.dict(sys.modules, {"app": SimpleNamespace(recalcular_alocacao_pagamentos=recalcular)}),
+            self.assertRaises(SystemExit),
+        ):
+            script.main()
+        recalcular.assert_not_called()
+        with (
+            patch.object(
+                sys,
+                "argv",
+                ["recalcular_alocacao_pagamentos.py", "--confirmar", script.CONFIRMACAO_EXIGIDA],
+            ),
+            patch.dict(sys.modules, {"app": SimpleNamespace(recalcular_alocacao_pagamentos=recalcular)}),
+        ):
+            script.main()
+        recalcular.assert_called_once_with()
+
+
+class TestRotasAtualizamAlocacao(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = APP_MODULE.app
+        cls.carregador_original = APP_MODULE.login_manager._user_callback
+
+    @classmethod
+    def tearDownClass(cls):
+        APP_MODULE.login_manager._user_callback = cls.carregador_original
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        APP_MODULE.login_manager._user_callback = (
+            lambda user_id: APP_MODULE.User(1, "administrador", "admin", None)
+        )
+        with self.client.session_transaction() as sessao:
+            sessao["_user_id"] = "1"
+            sessao["_fresh"] = True
+
+    def test_06_excluir_movimentacao_recalcula_depois_de_remover_vinculos(self):
+        conexao = MagicMock()
+        cursor = conexao.cursor.return_value
+        cursor.fetchone.side_effect = [(9, 4, date(2026, 1, 5)), (100, 60)]
+        cursor.fetchall.return_value = [(4, 60)]
+        cursor.rowcount = 1
+        token, _ = obter_token(self.client)
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            resposta = self.client.post(
+                "/excluir_movimentacao/9", headers={"X-CSRFToken": token}
+            )
+        self.assertEqual(resposta.status_code, 200)
+        sqls = sqls_executados(cursor)
+        exclusao = next(i for i, sql in enumerate(sqls) if sql.startswith("DELETE FROM fluxo_caixa"))
+        alocacao = [i for i, sql in enumerate(sqls) if "valor_pago_item" in sql or "data_ultimo_pagamento" in sql]
+        self.assertEqual(len(alocacao), 2)
+        self.assertTrue(all(i > exclusao for i in alocacao))
+        self.assertEqual(cursor.execute.call_args_list[alocacao[0]].args[1], ([4],))
+        conexao.commit.assert_called_once()
+
+    def pagar(self, ids, valor, travadas):
+        conexao = MagicMock()
+        cursor = conexao.cursor.return_value
+        cursor.fetchall.return_value = travadas
+        cursor.fetchone.return_value = (30,)
+        cursor.rowcount = len(travadas)
+        dados = {
+            "uvr": "UVR 01",
+            "id_conta_corrente": 1,
+            "ids_nfs_selecionadas": ids,
+            "id_cadastro_cf_str": 3,
+            "is_associado_rateio": False,
+            "nome_cadastro_cf_display": "Fornecedor",
+            "tipo_movimentacao": "Pagamento",
+            "data_efetiva": "2026-01-10",
+            "valor_efetivo": valor,
+            "data_hora_registro_fluxo": "10/01/2026 10:00:00",
+        }
+        token, _ = obter_token(self.client)
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            resposta = self.client.post(
+                "/registrar_fluxo_caixa", json=dados, headers={"X-CSRFToken": token}
+            )
+        return resposta, conexao, cursor
+
+    def test_07_fluxo_trava_e_aplica_em_lote_independente_de_n(self):
+        for quantidade in (1, 40):
+            with self.subTest(quantidade=quantidade):
+                ids = list(range(quantidade, 0, -1))
+                travadas = [(i, Decimal("0"), Decimal("10.00")) for i in sorted(ids)]
+                resposta, conexao, cursor = self.pagar(ids, "1000.00", travadas)
+                self.assertEqual(resposta.status_code, 200)
+                self.assertEqual(cursor.execute.call_count, 9)
+                sqls = sqls_executados(cursor)
+                self.assertIn("ORDER BY id FOR UPDATE", sqls[0])
+                self.assertEqual(cursor.execute.call_args_list[0].args[1], (ids, "UVR 01"))
+                conexao.commit.assert_called_once()
+
+    def test_08_distribuicao_segue_a_ordem_selecionada(self):
+        travadas = [
+            (5, Decimal("0"), Decimal("50.00")),
+            (9, Decimal("20.00"), Decimal("50.00")),
+        ]
+        resposta, _, cursor = self.pagar([9, 5, 9], "40.00", travadas)
+        self.assertEqual(resposta.status_code, 200)
+        vinculos = next(
+            c.args[1] for c in cursor.execute.call_args_list
+            if "INSERT INTO fluxo_caixa_transacoes_link" in c.args[0]
+        )
+        self.assertEqual(vinculos[1:3], ([9, 5], [Decimal("30.00"), Decimal("10.00")]))
+        baixas = next(
+            c.args[1] for c in cursor.execute.call_args_list
+            if c.args[0].lstrip().startswith("UPDATE transacoes_financeiras tf")
+        )
+        self.assertEqual(
+            baixas,
+            (
+                [9, 5],
+                [Decimal("50.00"), Decimal("10.00")],
+                ["Liquidado", "Parcialmente Pago/Recebido"],
+                "UVR 01",
+            ),
+        )
+
+    def test_09_nf_ausente_no_conjunto_travado_bloqueia_sem_gravar(self):
+        resposta, conexao, cursor = self.pagar(
+            [1, 2], "10.00", [(1, Decimal("0"), Decimal("10.00"))]
+        )
+        self.assertEqual(resposta.status_code, 403)
+        self.assertEqual(cursor.execute.call_count, 1)
+        conexao.commit.assert_not_called()
+        conexao.rollback.assert_called()
+
+    def test_10_vinculo_recusado_desfaz_o_lancamento(self):
+        conexao = MagicMock()
+        cursor = conexao.cursor.return_value
+        cursor.fetchall.return_value = [
+            (1, Decimal("0"), Decimal("10.00")),
+            (2, Decimal("0"), Decimal("10.00")),
+        ]
+        cursor.fetchone.return_value = (30,)
+        cursor.rowcount = 1
+        dados = {
+            "uvr": "UVR 01",
+            "id_conta_corrente": 1,
+            "ids_nfs_selecionadas": [1, 2],
+            "id_cadastro_cf_str": 3,
+            "nome_cadastro_cf_display": "Fornecedor",
+            "tipo_movimentacao": "Pagamento",
+            "data_efetiva": "2026-01-10",
+            "valor_efetivo": "15.00",
+            "data_hora_registro_fluxo": "10/01/2026 10:00:00",
+        }
+        token, _ = obter_token(self.client)
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            resposta = self.client.post(
+                "/registrar_fluxo_caixa", json=dados, headers={"X-CSRFToken": token}
+            )
+        self.assertEqual(resposta.status_code, 403)
+        self.assertFalse(
+            any("UPDATE transacoes_financeiras" in sql for sql in sqls_executados(cursor))
+        )
+        conexao.commit.assert_not_called()
+        conexao.rollback.assert_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -157,7 +157,8 @@ class TestReprodutibilidadeH2B1(unittest.TestCase):
         procfile = (RAIZ / "Procfile").read_text(encoding="utf-8").strip()
         self.assertEqual(
             procfile,
-            "web: gunicorn --config gunicorn.conf.py app:app",
+            "web: gunicorn --config gunicorn.conf.py app:app\n"
+            "worker: python worker_relatorios.py",
         )
         self.assertNotRegex(procfile.casefold(), r"migr|upgrade|psql|flask\s+db")
 
@@ -0,0 +1,72 @@
+"""Testes da atualização manual do esquema nos bancos já implantados."""
+
+import io
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from test_csrf_h2a2 import APP_MODULE
+
+
+class TestAtualizarEsquema(unittest.TestCase):
+    def test_01_preparadores_rodam_em_uma_transacao(self):
+        conexao = MagicMock()
+        preparadores = (MagicMock(), MagicMock())
+        with (
+            patch.object(APP_MODULE, "conectar_banco", return_value=conexao),
+            patch.object(APP_MODULE, "PREPARADORES_ESQUEMA", preparadores),
+            patch.object(APP_MODULE, "registrar_evento"),
+        ):
+            APP_MODULE.atualizar_esquema_aplicacao()
+        for preparar in preparadores:
+            preparar.assert_called_once_with(conexao.cursor.return_value)
+        conexao.commit.assert_called_once()
+        conexao.close.assert_called_once()
+
+        preparadores[1].side_effect = RuntimeError("sem permissão")
+        conexao = MagicMock()
+        with (
+            patch.object(APP_MODULE, "conectar_banco", return_value=conexao),
+            patch.object(APP_MODULE, "PREPARADORES_ESQUEMA", preparadores),
+            patch.object(APP_MODULE, "registrar_evento"),
+            self.assertRaises(RuntimeError),
+        ):
+            APP_MODULE.atualizar_esquema_aplicacao()
+        conexao.rollback.assert_called_once()
+        conexao.commit.assert_not_called()
+
+    def test_02_estruturas_das_rotas_estao_na_atualizacao(self):
+        self.assertIn(APP_MODULE.preparar_alocacao_pagamentos, APP_MODULE.PREPARADORES_ESQUEMA)
+        self.assertIn(APP_MODULE.preparar_saldos_conta, APP_MODULE.PREPARADORES_ESQUEMA)
+        self.assertIn(APP_MODULE.preparar_paginacao, APP_MODULE.PREPARADORES_ESQUEMA)
+        self.assertIn(APP_MODULE.preparar_busca_textual, APP_MODULE.PREPARADORES_ESQUEMA)
+        self.assertIn(APP_MODULE.preparar_fila_relatorios, APP_MODULE.PREPARADORES_ESQUEMA)
+        self.assertIn(APP_MODULE.preparar_versoes_dados, APP_MODULE.PREPARADORES_ESQUEMA)
+        self.assertIn(APP_MODULE.preparar_dados_referencia, APP_MODULE.PREPARADORES_ESQUEMA)
+        self.assertIn(APP_MODULE.preparar_consultas_cadastrais, APP_MODULE.PREPARADORES_ESQUEMA)
+        self.assertIn(APP_MODULE.preparar_fotos, APP_MODULE.PREPARADORES_ESQUEMA)
+
+    def test_03_script_exige_confirmacao(self):
+        import atualizar_esquema as script
+
+        atualizar = MagicMock()
+        app_falso = SimpleNamespace(atualizar_esquema_aplicacao=atualizar)
+        with (
+            patch.object(sys, "argv", ["atualizar_esquema.py"]),
+            patch.object(sys, "stderr", io.StringIO()),
+            patch.dict(sys.modules, {"app": app_falso}),
+            self.assertRaises(SystemExit),
+        ):
+            script.main()
+        atualizar.assert_not_called()
+        with (
+            patch.object(sys, "argv", ["atualizar_esquema.py", "--confirmar", script.CONFIRMACAO_EXIGIDA]),
+            patch.dict(sys.modules, {"app": app_falso}),
+        ):
+            script.main()
+        atualizar.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
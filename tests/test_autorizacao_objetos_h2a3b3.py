@@ -565,7 +565,7 @@ class TestAutorizacaoObjetosH2A3B3(unittest.TestCase):
         token, _ = obter_token(self.client)
         with (
             patch.object(APP_MODULE, "conectar_banco", return_value=conexao),
-            patch.object(APP_MODULE.base64, "b64encode") as codificar,
+            patch.object(APP_MODULE, "ler_foto_enviada") as codificar,
             patch.object(APP_MODULE.requests, "get") as api,
             patch.object(APP_MODULE, "SimpleDocTemplate") as documento,
         ):
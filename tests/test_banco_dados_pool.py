@@ -0,0 +1,459 @@
+"""Testes do pool de conexões sem PostgreSQL real."""
+
+import os
+import runpy
+import threading
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import psycopg2
+from flask import Flask, Response, jsonify, stream_with_context
+from psycopg2 import extensions
+
+from banco_dados import (
+    ConexaoEmprestada,
+    PoolConexoes,
+    PoolEsgotadoError,
+    ler_configuracao_pool,
+)
+from configuracao_ambiente import configurar_aplicacao
+
+
+RAIZ = Path(__file__).resolve().parents[1]
+BANCO_TESTE = "postgresql://usuario-ficticio@host-ficticio/banco-ficticio"
+
+
+class CursorFalso:
+    def __init__(self, conexao):
+        self.conexao = conexao
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+    def execute(self, sql, parametros=None):
+        if self.conexao.quebrada:
+            raise psycopg2.OperationalError("conexão perdida")
+        self.conexao.comandos.append(sql)
+        self.conexao.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class ConexaoFalsa:
+    def __init__(self):
+        self.closed = 0
+        self.quebrada = False
+        self.comandos = []
+        self.rollbacks = 0
+        self.commits = 0
+        self.sessoes = []
+        self.readonly = None
+        self.info = SimpleNamespace(
+            transaction_status=extensions.TRANSACTION_STATUS_IDLE
+        )
+
+    def cursor(self, *args, **kwargs):
+        return CursorFalso(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *_):
+        if tipo is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def commit(self):
+        self.commits += 1
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def set_session(self, **kwargs):
+        self.sessoes.append(kwargs)
+        self.readonly = kwargs.get("readonly")
+
+    def close(self):
+        self.closed = 1
+
+
+def criar_pool(**extras):
+    opcoes = {
+        "maximo": 2,
+        "espera_s": 1,
+        "verificar_apos_s": 30,
+        "vida_maxima_s": 1800,
+    }
+    opcoes.update(extras)
+    return PoolConexoes(BANCO_TESTE, **opcoes)
+
+
+class TestPoolConexoes(unittest.TestCase):
+    def test_01_close_devolve_e_reutiliza_a_mesma_conexao(self):
+        pool = criar_pool()
+        with patch("psycopg2.connect", side_effect=lambda _dsn: ConexaoFalsa()) as conectar:
+            primeira = pool.emprestar()
+            real = primeira._conexao
+            primeira.close()
+            segunda = pool.emprestar()
+            self.assertIs(segunda._conexao, real)
+            segunda.close()
+
+        conectar.assert_called_once_with(BANCO_TESTE)
+        metricas = pool.metricas()
+        self.assertEqual(metricas["emprestimos"], 2)
+        self.assertEqual(metricas["devolucoes"], 2)
+        self.assertEqual(metricas["abertas"], 1)
+        self.assertEqual(metricas["em_uso"], 0)
+        self.assertEqual(metricas["ociosas"], 1)
+
+    def test_02_devolucao_desfaz_transacao_pendente_e_restaura_sessao(self):
+        pool = criar_pool()
+        with patch("psycopg2.connect", return_value=ConexaoFalsa()):
+            conexao = pool.emprestar()
+            conexao.cursor().execute("UPDATE tabela SET coluna = 1")
+            real = conexao._conexao
+            conexao.close()
+
+        self.assertEqual(real.rollbacks, 1)
+        self.assertEqual(real.sessoes[-1]["autocommit"], False)
+        self.assertEqual(real.closed, 0)
+
+    def test_03_close_repetido_e_uso_apos_close_sao_seguros(self):
+        pool = criar_pool()
+        with patch("psycopg2.connect", return_value=ConexaoFalsa()):
+            conexao = pool.emprestar()
+            conexao.close()
+            conexao.close()
+
+        self.assertEqual(conexao.closed, 1)
+        self.assertEqual(pool.metricas()["devolucoes"], 1)
+        with self.assertRaises(psycopg2.InterfaceError):
+            conexao.cursor()
+
+    def test_04_pool_esgotado_aguarda_e_falha_sem_abrir_extra(self):
+        pool = criar_pool(maximo=1, espera_s=0.05)
+        with patch("psycopg2.connect", side_effect=lambda _dsn: ConexaoFalsa()) as conectar:
+            ocupada = pool.emprestar()
+            with self.assertRaises(PoolEsgotadoError):
+                pool.emprestar()
+            ocupada.close()
+
+        conectar.assert_called_once()
+        self.assertEqual(pool.metricas()["esgotamentos"], 1)
+
+    def test_05_thread_em_espera_recebe_conexao_devolvida(self):
+        pool = criar_pool(maximo=1, espera_s=2)
+        recebidas = []
+        with patch("psycopg2.connect", side_effect=lambda _dsn: ConexaoFalsa()) as conectar:
+            ocupada = pool.emprestar()
+            thread = threading.Thread(target=lambda: recebidas.append(pool.emprestar()))
+            thread.start()
+            ocupada.close()
+            thread.join(timeout=5)
+            recebidas[0].close()
+
+        conectar.assert_called_once()
+        self.assertEqual(pool.metricas()["esperas"], 1)
+
+    def test_06_verificacao_descarta_conexao_quebrada(self):
+        pool = criar_pool(verificar_apos_s=0)
+        with patch("psycopg2.connect", side_effect=lambda _dsn: ConexaoFalsa()) as conectar:
+            conexao = pool.emprestar()
+            quebrada = conexao._conexao
+            conexao.close()
+            quebrada.quebrada = True
+            nova = pool.emprestar()
+            self.assertIsNot(nova._conexao, quebrada)
+            nova.close()
+
+        self.assertEqual(conectar.call_count, 2)
+        self.assertEqual(quebrada.closed, 1)
+        metricas = pool.metricas()
+        self.assertEqual(metricas["falhas_verificacao"], 1)
+        self.assertEqual(metricas["conexoes_descartadas"], 1)
+        self.assertEqual(metricas["abertas"], 1)
+
+    def test_07_conexao_fechada_pelo_servidor_nao_volta_ao_pool(self):
+        pool = criar_pool()
+        with patch("psycopg2.connect", side_effect=lambda _dsn: ConexaoFalsa()):
+            conexao = pool.emprestar()
+            conexao._conexao.closed = 2
+            conexao.close()
+
+        metricas = pool.metricas()
+        self.assertEqual(metricas["abertas"], 0)
+        self.assertEqual(metricas["ociosas"], 0)
+
+    def test_08_falha_ao_conectar_libera_a_vaga(self):
+        pool = criar_pool(maximo=1)
+        with patch("psycopg2.connect", side_effect=psycopg2.OperationalError("falha")):
+            with self.assertRaises(psycopg2.OperationalError):
+                pool.emprestar()
+
+        self.assertEqual(pool.metricas()["abertas"], 0)
+        self.assertEqual(pool.metricas()["em_uso"], 0)
+
+    def test_09_processo_filho_nao_reutiliza_conexoes_do_pai(self):
+        pool = criar_pool()
+        with patch("psycopg2.connect", side_effect=lambda _dsn: ConexaoFalsa()) as conectar:
+            conexao = pool.emprestar()
+            herdada = conexao._conexao
+            conexao.close()
+            pool._pid = -1
+            nova = pool.emprestar()
+            self.assertIsNot(nova._conexao, herdada)
+            nova.close()
+
+        self.assertEqual(conectar.call_count, 2)
+        self.assertEqual(herdada.closed, 0)
+
+    def test_10_bloco_with_confirma_sem_devolver_a_conexao(self):
+        pool = criar_pool()
+        with patch("psycopg2.connect", return_value=ConexaoFalsa()):
+            conexao = pool.emprestar()
+        with conexao as dentro:
+            self.assertIs(dentro, conexao)
+            dentro.cursor().execute("INSERT INTO tabela VALUES (1)")
+        self.assertIsInstance(conexao, ConexaoEmprestada)
+        self.assertFalse(conexao.devolvida)
+        self.assertEqual(conexao._conexao.commits, 1)
+        conexao.close()
+        self.assertTrue(conexao.devolvida)
+
+
+class TestConfiguracaoPool(unittest.TestCase):
+    def test_11_teto_padrao_acompanha_threads_do_gunicorn(self):
+        with patch.dict(os.environ, {"GUNICORN_THREADS": "6"}, clear=True):
+            self.assertEqual(ler_configuracao_pool()["maximo"], 6)
+        with patch.dict(os.environ, {"GUNICORN_THREADS": "6", "DB_POOL_MAX": "3"}, clear=True):
+            self.assertEqual(ler_configuracao_pool()["maximo"], 3)
+
+    def test_12_valores_invalidos_interrompem_inicializacao(self):
+        for nome, valor in (
+            ("DB_POOL_MAX", "0"),
+            ("DB_POOL_MAX", "muitos"),
+            ("DB_POOL_TIMEOUT", "999"),
+            ("DB_POOL_MAX_LIFETIME", "1"),
+        ):
+            with self.subTest(nome=nome, valor=valor):
+                with patch.dict(os.environ, {nome: valor}, clear=True):
+                    with self.assertRaisesRegex(RuntimeError, nome):
+                        ler_configuracao_pool()
+
+    def test_13_gunicorn_exporta_teto_e_respeita_orcamento(self):
+        base = {"APP_ENV": "homologation", "PORT": "10000"}
+        with patch.dict(os.environ, {**base, "GUNICORN_THREADS": "3"}, clear=True):
+            config = runpy.run_path(str(RAIZ / "gunicorn.conf.py"))
+            self.assertEqual(os.environ["DB_POOL_MAX"], "3")
+        self.assertEqual(config["db_pool_max"], 3)
+        self.assertTrue(callable(config["worker_exit"]))
+
+        excedido = {**base, "WEB_CONCURRENCY": "4", "DB_POOL_MAX": "8", "DB_MAX_CONNECTIONS": "20"}
+        with patch.dict(os.environ, excedido, clear=True):
+            with self.assertRaisesRegex(RuntimeError, "DB_MAX_CONNECTIONS"):
+                runpy.run_path(str(RAIZ / "gunicorn.conf.py"))
+
+
+class TestTeardownRequisicao(unittest.TestCase):
+    def criar_app(self):
+        ambiente = {
+            "APP_ENV": "testing",
+            "SECRET_KEY": "segredo-ficticio-pool",
+            "DATABASE_URL": BANCO_TESTE,
+            "RATELIMIT_ENABLED": "false",
+        }
+        with patch.dict(os.environ, ambiente, clear=True):
+            app = Flask(__name__)
+            configurar_aplicacao(app)
+        app.config["PROPAGATE_EXCEPTIONS"] = False
+        provedor = app.extensions["recic3_banco_dados"]
+
+        @app.get("/esquece")
+        def esquece():
+            provedor.conectar().cursor().execute("SELECT 1")
+            return jsonify(ok=True)
+
+        @app.route("/tres-etapas", methods=["GET", "POST"])
+        def tres_etapas():
+            # Simula user loader, autorização por UVR e a rota em si.
+            for _etapa in range(3):
+                conexao = provedor.conectar()
+                conexao.cursor().execute("SELECT 1")
+                conexao.close()
+            return jsonify(ok=True)
+
+        @app.post("/aninhada")
+        def aninhada():
+            externa = provedor.conectar()
+            externa.cursor().execute("UPDATE tabela SET coluna = 1")
+            interna = provedor.conectar()
+            interna.cursor().execute("SELECT uvr FROM tabela")
+            interna.close()
+            pendente = externa.info.transaction_status
+            externa.commit()
+            externa.close()
+            return jsonify(pendente=pendente)
+
+        @app.post("/sem-commit")
+        def sem_commit():
+            conexao = provedor.conectar()
+            conexao.cursor().execute("UPDATE tabela SET coluna = 1")
+            conexao.close()
+            return jsonify(status=provedor.conectar().info.transaction_status)
+
+        @app.get("/falha")
+        def falha():
+            provedor.conectar()
+            raise RuntimeError("falha ficticia")
+
+        return app, provedor
+
+    def test_14_teardown_devolve_conexao_esquecida(self):
+        app, provedor = self.criar_app()
+        real = ConexaoFalsa()
+        with (
+            patch("psycopg2.connect", return_value=real) as conectar,
+            patch("banco_dados.registrar_evento") as evento,
+        ):
+            cliente = app.test_client()
+            self.assertEqual(cliente.get("/esquece").status_code, 200)
+            self.assertEqual(cliente.get("/falha").status_code, 500)
+
+        conectar.assert_called_once()
+        metricas = provedor.metricas()
+        self.assertEqual(metricas["em_uso"], 0)
+        self.assertEqual(metricas["recuperadas_no_teardown"], 2)
+        self.assertGreaterEqual(real.rollbacks, 1)
+        eventos = [chamada.args[0] for chamada in evento.call_args_list]
+        self.assertEqual(eventos.count("database_connection_reclaimed"), 2)
+
+    def test_16_requisicao_reutiliza_uma_unica_conexao(self):
+        app, provedor = self.criar_app()
+        with patch("psycopg2.connect", side_effect=lambda _dsn: ConexaoFalsa()) as conectar:
+            cliente = app.test_client()
+            self.assertEqual(cliente.get("/tres-etapas").status_code, 200)
+            self.assertEqual(cliente.post("/tres-etapas").status_code, 200)
+
+        conectar.assert_called_once()
+        metricas = provedor.metricas()
+        self.assertEqual(metricas["emprestimos"], 2)
+        self.assertEqual(metricas["em_uso"], 0)
+        self.assertEqual(metricas["recuperadas_no_teardown"], 0)
+
+    def test_17_leitura_usa_um_snapshot_somente_leitura(self):
+        app, _provedor = self.criar_app()
+        real = ConexaoFalsa()
+        with patch("psycopg2.connect", return_value=real):
+            app.test_client().get("/tres-etapas")
+
+        snapshot = real.sessoes[0]
+        self.assertEqual(
+            snapshot["isolation_level"], extensions.ISOLATION_LEVEL_REPEATABLE_READ
+        )
+        self.assertTrue(snapshot["readonly"])
+        # O snapshot atravessa as três etapas e só termina na devolução ao pool.
+        self.assertEqual(real.rollbacks, 1)
+        self.assertEqual(real.sessoes[-1]["readonly"], "DEFAULT")
+
+    def test_18_escrita_nao_usa_modo_somente_leitura(self):
+        app, _provedor = self.criar_app()
+        real = ConexaoFalsa()
+        with patch("psycopg2.connect", return_value=real):
+            app.test_client().post("/tres-etapas")
+        self.assertNotIn(True, [sessao.get("readonly") for sessao in real.sessoes])
+
+    def test_19_endpoint_post_declarado_como_leitura_usa_snapshot(self):
+        app, _provedor = self.criar_app()
+        app.config["DB_READ_ONLY_ENDPOINTS"] = frozenset({"tres_etapas"})
+        real = ConexaoFalsa()
+        with patch("psycopg2.connect", return_value=real):
+            app.test_client().post("/tres-etapas")
+        self.assertTrue(real.sessoes[0]["readonly"])
+
+    def test_20_visao_interna_nao_desfaz_transacao_externa(self):
+        app, _provedor = self.criar_app()
+        real = ConexaoFalsa()
+        with patch("psycopg2.connect", return_value=real):
+            resposta = app.test_client().post("/aninhada")
+        self.assertEqual(
+            resposta.get_json()["pendente"], extensions.TRANSACTION_STATUS_INTRANS
+        )
+        self.assertEqual(real.commits, 1)
+
+    def test_21_ultima_visao_fechada_descarta_escrita_sem_commit(self):
+        app, _provedor = self.criar_app()
+        real = ConexaoFalsa()
+        with patch("psycopg2.connect", return_value=real):
+            resposta = app.test_client().post("/sem-commit")
+        self.assertEqual(
+            resposta.get_json()["status"], extensions.TRANSACTION_STATUS_IDLE
+        )
+        self.assertEqual(real.commits, 0)
+
+    def test_22_transacao_com_erro_nao_contamina_proxima_visao(self):
+        app, provedor = self.criar_app()
+        real = ConexaoFalsa()
+        with patch("psycopg2.connect", return_value=real), app.test_request_context("/"):
+            conexao = provedor.conectar()
+            real.info.transaction_status = extensions.TRANSACTION_STATUS_INERROR
+            conexao.close()
+            self.assertEqual(real.info.transaction_status, extensions.TRANSACTION_STATUS_IDLE)
+            with self.assertRaises(psycopg2.InterfaceError):
+                conexao.cursor()
+
+    def test_23_streaming_recebe_a_conexao_e_a_devolve_ao_terminar(self):
+        app, provedor = self.criar_app()
+        em_uso = []
+
+        @app.get("/streaming")
+        def streaming():
+            autorizacao = provedor.conectar()
+            autorizacao.cursor().execute("SELECT uvr FROM tabela")
+            autorizacao.close()
+            conexao = provedor.conectar_para_streaming()
+
+            def gerar():
+                try:
+                    for parte in ("a", "b"):
+                        em_uso.append(provedor.metricas()["em_uso"])
+                        yield parte
+                finally:
+                    conexao.close()
+
+            return Response(stream_with_context(gerar()))
+
+        real = ConexaoFalsa()
+        with (
+            patch("psycopg2.connect", return_value=real) as conectar,
+            patch("banco_dados.registrar_evento") as evento,
+        ):
+            resposta = app.test_client().get("/streaming")
+            self.assertEqual(resposta.get_data(as_text=True), "ab")
+        self.assertEqual(em_uso, [1, 1])
+        self.assertEqual(provedor.metricas()["em_uso"], 0)
+        conectar.assert_called_once()
+        self.assertTrue(real.sessoes[0]["readonly"])
+        evento.assert_not_called()
+
+    def test_15_inicializacao_nao_abre_conexao(self):
+        with patch("psycopg2.connect", side_effect=AssertionError("conexão antecipada")):
+            _app, provedor = self.criar_app()
+        self.assertEqual(provedor.metricas()["abertas"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
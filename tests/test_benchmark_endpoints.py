@@ -0,0 +1,80 @@
+"""Testes da comparação com a baseline do benchmark de endpoints."""
+
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from benchmark_endpoints import comparar, contar_consultas
+from instrumentacao_banco import cabecalho_server_timing
+from postgres_efemero import localizar_binarios
+
+
+def medicao(p95_ms=10.0, consultas=4, pico=100, status=(200,)):
+    return {
+        "p50_ms": p95_ms / 2,
+        "p95_ms": p95_ms,
+        "max_ms": p95_ms,
+        "consultas": consultas,
+        "pico_memoria_kib": pico,
+        "status": list(status),
+    }
+
+
+class EstatisticasFalsas:
+    consultas = 7
+    tempo_ms = 3.5
+
+
+class TestBenchmarkEndpoints(unittest.TestCase):
+    def test_01_consultas_lidas_do_server_timing_da_aplicacao(self):
+        self.assertEqual(contar_consultas(cabecalho_server_timing(EstatisticasFalsas(), 12.0)), 7)
+        self.assertIsNone(contar_consultas(cabecalho_server_timing(None, 12.0)))
+        self.assertIsNone(contar_consultas(None))
+
+    def test_02_regressoes_respeitam_tolerancia_e_folga(self):
+        base = {"cenarios": {"relatorio": medicao(100.0), "busca": medicao(2.0), "extrato": medicao()}}
+        dentro = {
+            "cenarios": {
+                "relatorio": medicao(124.0, pico=124),
+                "busca": medicao(6.5),
+                "extrato": medicao(consultas=3),
+                "novo": medicao(500.0),
+            }
+        }
+        self.assertEqual(comparar(base, dentro, 0.25, 5.0), [])
+
+        fora = {
+            "cenarios": {
+                "relatorio": medicao(126.0, pico=130),
+                "busca": medicao(7.5, status=(200, 500)),
+            }
+        }
+        regressoes = comparar(base, fora, 0.25, 5.0)
+        self.assertEqual(len(regressoes), 5)
+        self.assertTrue(regressoes[0].startswith("busca: status"))
+        self.assertIn("extrato: cenário ausente", regressoes[2])
+        self.assertEqual(
+            comparar(base, {"cenarios": {**dentro["cenarios"], "extrato": medicao(consultas=5)}}, 0.25, 5.0),
+            ["extrato: 5 consultas (baseline 4)"],
+        )
+
+    def test_03_binarios_do_postgres_vem_da_pasta_informada(self):
+        pasta = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, pasta)
+        with patch("shutil.which", return_value=None), patch("glob.glob", return_value=[]):
+            with patch.dict(os.environ, {"PG_BIN": str(pasta)}):
+                with self.assertRaisesRegex(RuntimeError, "PG_BIN"):
+                    localizar_binarios()
+                for nome in ("initdb", "pg_ctl"):
+                    arquivo = pasta / nome
+                    arquivo.write_text("#!/bin/sh\n")
+                    arquivo.chmod(arquivo.stat().st_mode | stat.S_IXUSR)
+                self.assertEqual(localizar_binarios(), str(pasta))
+
+
+if __name__ == "__main__":
+    unittest.main()
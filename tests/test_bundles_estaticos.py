@@ -0,0 +1,111 @@
+"""Testes dos bundles estáticos com hash no nome e cache imutável."""
+
+import gzip
+import re
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import bundles_estaticos
+from bundles_estaticos import (
+    BUNDLES,
+    CACHE_IMUTAVEL,
+    bundles_desatualizados,
+    gerar_bundles,
+    ler_manifesto,
+)
+from test_csrf_h2a2 import APP_MODULE
+
+
+class TestGeracaoBundles(unittest.TestCase):
+    def setUp(self):
+        self.raiz = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.raiz)
+        for fonte in {fonte for fontes in BUNDLES.values() for fonte in fontes}:
+            destino = self.raiz / fonte
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(bundles_estaticos.RAIZ_STATIC / fonte, destino)
+
+    def test_01_dist_versionado_corresponde_as_fontes(self):
+        self.assertEqual(bundles_desatualizados(), [])
+
+    def test_02_nome_muda_com_o_conteudo_e_versao_antiga_e_removida(self):
+        self.assertEqual(bundles_desatualizados(self.raiz), sorted(BUNDLES))
+        primeiro = gerar_bundles(self.raiz)
+        self.assertEqual(bundles_desatualizados(self.raiz), [])
+        self.assertRegex(primeiro["cadastro.js"], r"^dist/cadastro\.[0-9a-f]{12}\.js$")
+
+        javascript = (self.raiz / primeiro["cadastro.js"]).read_text(encoding="utf-8")
+        self.assertLess(javascript.index("function escaparHtml"), javascript.index("const bancosBrasil"))
+
+        with open(self.raiz / "js/cadastro.js", "a", encoding="utf-8") as arquivo:
+            arquivo.write("// alteração\n")
+        self.assertEqual(bundles_desatualizados(self.raiz), ["cadastro.js"])
+        segundo = gerar_bundles(self.raiz)
+        self.assertNotEqual(segundo["cadastro.js"], primeiro["cadastro.js"])
+        self.assertEqual(segundo["cadastro.css"], primeiro["cadastro.css"])
+        self.assertFalse((self.raiz / primeiro["cadastro.js"]).exists())
+        self.assertEqual(ler_manifesto(self.raiz), segundo)
+
+
+class TestServicoBundles(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = APP_MODULE.app
+        cls.carregador_original = APP_MODULE.login_manager._user_callback
+        cls.manifesto = ler_manifesto()
+
+    @classmethod
+    def tearDownClass(cls):
+        APP_MODULE.login_manager._user_callback = cls.carregador_original
+
+    def setUp(self):
+        self.client = self.app.test_client()
+
+    def test_03_pagina_aponta_para_bundles_e_mantem_so_o_script_curto(self):
+        APP_MODULE.login_manager._user_callback = (
+            lambda user_id: APP_MODULE.User(2, "usuario", "usuario", "UVR 01")
+        )
+        with self.client.session_transaction() as sessao:
+            sessao["_user_id"] = "2"
+            sessao["_fresh"] = True
+        pagina = self.client.get("/").get_data(as_text=True)
+        for nome in ("cadastro.js", "cadastro.css"):
+            self.assertIn(f'"/static/{self.manifesto[nome]}"', pagina)
+        inline = re.findall(r"<script nonce=[^>]*>(.*?)</script>", pagina, re.DOTALL)
+        self.assertEqual(len(inline), 1)
+        self.assertIn('const usuarioLogadoUvr = "UVR 01";', inline[0])
+        self.assertLess(len(inline[0]), 500)
+        self.assertLess(pagina.index("usuarioLogadoUvr"), pagina.index(self.manifesto["cadastro.js"]))
+
+    def test_04_bundle_imutavel_e_comprimido_uma_vez(self):
+        url = "/static/" + self.manifesto["cadastro.js"]
+        original = (bundles_estaticos.RAIZ_STATIC / self.manifesto["cadastro.js"]).read_bytes()
+
+        simples = self.client.get(url)
+        self.assertEqual(simples.status_code, 200)
+        self.assertEqual(simples.headers["Cache-Control"], CACHE_IMUTAVEL)
+        self.assertNotIn("Content-Encoding", simples.headers)
+        self.assertEqual(simples.get_data(), original)
+
+        comprimida = self.client.get(url, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(comprimida.headers["Content-Encoding"], "gzip")
+        self.assertEqual(comprimida.headers["Cache-Control"], CACHE_IMUTAVEL)
+        self.assertIn("Accept-Encoding", comprimida.headers["Vary"])
+        self.assertNotIn("ETag", comprimida.headers)
+        self.assertEqual(gzip.decompress(comprimida.get_data()), original)
+        self.assertLess(len(comprimida.get_data()), len(original) // 3)
+
+    def test_05_fontes_e_demais_estaticos_nao_sao_imutaveis(self):
+        for url in ("/static/js/cadastro.js", "/static/css/autenticacao.css"):
+            with self.subTest(url=url):
+                resposta = self.client.get(url, headers={"Accept-Encoding": "gzip"})
+                self.assertEqual(resposta.status_code, 200)
+                self.assertNotIn("immutable", resposta.headers.get("Cache-Control", ""))
+                self.assertNotIn("Content-Encoding", resposta.headers)
+                resposta.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
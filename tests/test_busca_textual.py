@@ -0,0 +1,168 @@
+"""Testes da busca sem acento apoiada em índices trigram, sem banco real."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+
+from busca_textual import condicao_busca, normalizar_texto, padrao_busca, preparar_busca_textual
+from modulos.fiscalizacao_contratos.services.aditivos_service import AditivoService
+from modulos.fiscalizacao_contratos.services.atestes_service import AtesteService
+from modulos.fiscalizacao_contratos.services.ativos_service import AtivoService
+from modulos.fiscalizacao_contratos.services.contratos_service import ContratoService
+from modulos.fiscalizacao_contratos.services.documentos_service import DocumentoService
+from modulos.fiscalizacao_contratos.services.fiscalizacoes_service import FiscalizacaoService
+from modulos.fiscalizacao_contratos.services.medicoes_service import MedicaoService
+from modulos.fiscalizacao_contratos.services.ocorrencias_service import OcorrenciaService
+from modulos.fiscalizacao_contratos.services.planilhas_service import PlanilhaService
+from modulos.fiscalizacao_contratos.services.servidores_service import ServidorService
+from test_csrf_h2a2 import APP_MODULE
+
+
+class CursorFake:
+    def __init__(self, falhar_em=(), existentes=()):
+        self.falhar_em = falhar_em
+        self.existentes = existentes
+        self.executados = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql, params=None):
+        self.executados.append((" ".join(sql.split()), params))
+        if any(trecho in sql for trecho in self.falhar_em):
+            raise psycopg2.Error("sem permissão")
+
+    def fetchone(self):
+        return (False,)
+
+    def fetchall(self):
+        return [(tabela,) for tabela in self.existentes]
+
+
+class ConexaoFake:
+    def __init__(self):
+        self.cursor_fake = CursorFake()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def cursor(self, **kwargs):
+        return self.cursor_fake
+
+    def close(self):
+        pass
+
+
+class TestBuscaTextual(unittest.TestCase):
+    def test_01_normalizacao_igual_a_do_banco(self):
+        self.assertEqual(normalizar_texto("  JOÃO da Conceição "), "joao da conceicao")
+        self.assertEqual(padrao_busca("Açaí"), "%acai%")
+        self.assertEqual(padrao_busca("50%_a\\b"), "%50\\%\\_a\\\\b%")
+        self.assertEqual(padrao_busca(None), "%%")
+
+    def test_02_condicao_usa_expressao_indexada_e_digitos_do_documento(self):
+        self.assertEqual(condicao_busca("  ", ("nome",), ("cpf",)), ("", []))
+        sql, params = condicao_busca("José", ("nome",), ("cpf",))
+        self.assertEqual(sql, "(busca_normalizada(nome) LIKE %s)")
+        self.assertEqual(params, ["%jose%"])
+        sql, params = condicao_busca("123.456", ("nome",), ("cpf",))
+        self.assertEqual(sql, "(busca_normalizada(nome) LIKE %s OR cpf LIKE %s)")
+        self.assertEqual(params, ["%123.456%", "%123456%"])
+
+    def test_03_sem_unaccent_usa_translate_e_indexa_so_tabelas_existentes(self):
+        cursor = CursorFake(
+            falhar_em=("EXTENSION IF NOT EXISTS unaccent",),
+            existentes=("associados", "fc_contratos"),
+        )
+        self.assertTrue(preparar_busca_textual(cursor))
+        sqls = [sql for sql, _ in cursor.executados]
+        self.assertIn("ROLLBACK TO SAVEPOINT busca_textual_extensao", sqls)
+        self.assertTrue(any("translate(lower(texto)" in sql for sql in sqls))
+        self.assertFalse(any("public.unaccent(" in sql for sql in sqls))
+        indices = [sql for sql in sqls if sql.startswith("CREATE INDEX")]
+        self.assertIn(
+            "CREATE INDEX IF NOT EXISTS idx_associados_busca_nome "
+            "ON associados USING gin ((busca_normalizada(nome)) gin_trgm_ops)",
+            indices,
+        )
+        self.assertIn(
+            "CREATE INDEX IF NOT EXISTS idx_associados_busca_cpf "
+            "ON associados USING gin (cpf gin_trgm_ops)",
+            indices,
+        )
+        self.assertEqual(
+            {sql.split(" ON ")[1].split()[0] for sql in indices}, {"associados", "fc_contratos"}
+        )
+
+    def test_04_sem_pg_trgm_a_busca_funciona_sem_indices(self):
+        cursor = CursorFake(falhar_em=("EXTENSION IF NOT EXISTS pg_trgm",), existentes=("associados",))
+        self.assertFalse(preparar_busca_textual(cursor))
+        sqls = [sql for sql, _ in cursor.executados]
+        self.assertTrue(any("public.unaccent('public.unaccent'::regdictionary" in sql for sql in sqls))
+        self.assertFalse(any(sql.startswith("CREATE INDEX") for sql in sqls))
+
+    def test_05_servicos_de_fiscalizacao_usam_a_busca_normalizada(self):
+        for servico in (
+            AditivoService, AtesteService, AtivoService, ContratoService, DocumentoService,
+            FiscalizacaoService, MedicaoService, OcorrenciaService, PlanilhaService, ServidorService,
+        ):
+            with self.subTest(servico=servico.__name__):
+                conexao = ConexaoFake()
+                servico(lambda: conexao).listar("São Tomé")
+                sql, params = conexao.cursor_fake.executados[0]
+                self.assertNotIn("ILIKE", sql)
+                self.assertIn("busca_normalizada(", sql)
+                self.assertEqual(sql.count("%s"), len(params))
+                self.assertIn("%sao tome%", params)
+
+
+class TestBuscasGestao(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = APP_MODULE.app
+        cls.carregador_original = APP_MODULE.login_manager._user_callback
+
+    @classmethod
+    def tearDownClass(cls):
+        APP_MODULE.login_manager._user_callback = cls.carregador_original
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        APP_MODULE.login_manager._user_callback = (
+            lambda user_id: APP_MODULE.User(2, "usuario", "usuario", "UVR 01")
+        )
+        with self.client.session_transaction() as sessao:
+            sessao["_user_id"] = "2"
+            sessao["_fresh"] = True
+
+    def test_06_rotas_de_gestao_buscam_sem_acento(self):
+        casos = (
+            ("/buscar_associados", "busca_normalizada(nome) LIKE %s"),
+            ("/buscar_cadastros", "busca_normalizada(razao_social) LIKE %s"),
+            ("/buscar_transacoes_gestao", "busca_normalizada(nome_cadastro_origem) LIKE %s"),
+            ("/buscar_patrimonio", "busca_normalizada(placa) LIKE %s"),
+        )
+        for rota, trecho in casos:
+            with self.subTest(rota=rota):
+                conexao = MagicMock()
+                cursor = conexao.cursor.return_value
+                cursor.fetchall.return_value = []
+                with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+                    resposta = self.client.get(rota, query_string={"q": "Conceição"})
+                self.assertEqual(resposta.status_code, 200)
+                sql, parametros = cursor.execute.call_args.args
+                self.assertIn(trecho, sql)
+                self.assertNotIn("LOWER(", sql)
+                self.assertIn("%conceicao%", parametros)
+                self.assertEqual(sql.count("%s"), len(parametros))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,225 @@
+"""Testes do cache do relatório financeiro, sem banco nem Redis reais."""
+
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+from cache_relatorios import (
+    MAX_LINHAS_CACHE,
+    CacheRelatorios,
+    chave_relatorio,
+    incrementar_versao_dados,
+    ler_ttl_cache_relatorios,
+    ler_versao_dados,
+)
+from test_cache_usuarios import RedisFalso, RedisIndisponivel
+from test_csrf_h2a2 import APP_MODULE, obter_token
+from test_exportacao_csv import linha_relatorio
+
+
+COLUNAS_RELATORIO = (
+    "uvr", "associacao", "nome_cadastro_origem", "numero_documento",
+    "data_documento", "data_efetiva_pag_rec", "tipo_transacao",
+    "tipo_atividade_transacao", "item_descricao", "item_tipo_catalogo",
+    "item_tipo_atividade_catalogo", "item_grupo_catalogo", "item_subgrupo_catalogo",
+    "unidade", "quantidade", "valor_unitario", "valor_total_item",
+    "status_pagamento", "valor_pago_neste_item", "data_hora_registro",
+)
+
+
+class RedisBinario(RedisFalso):
+    def set(self, chave, valor, ex=None):
+        self.dados[chave] = valor
+        self.expiracoes[chave] = ex
+
+
+FILTROS = {"uvr": "UVR 01", "data_inicial": "2026-01-01", "_uvr_autorizada": "UVR 01"}
+
+
+def conexao_relatorio(versoes, linhas):
+    """Cursor que responde a versão dos dados e, na consulta do relatório, as linhas."""
+    conexao = MagicMock()
+    cursor = conexao.cursor.return_value
+    cursor.fetchone.side_effect = [(versao, 1) for versao in versoes]
+    cursor.description = [(coluna,) for coluna in COLUNAS_RELATORIO]
+    cursor.fetchall.return_value = linhas
+    return conexao, cursor
+
+
+class TestCacheRelatorios(unittest.TestCase):
+    def test_01_chave_ignora_ordem_tipos_e_filtros_vazios(self):
+        chave = chave_relatorio(
+            "r", {"id_entidade": 5, "uvr": "UVR 01", "item_rel": ""},
+            uvr_autorizada="UVR 01", versao=3,
+        )
+        self.assertEqual(
+            chave,
+            chave_relatorio(
+                "r", {"uvr": "UVR 01", "id_entidade": "5", "grupo_rel": None},
+                uvr_autorizada="UVR 01", versao=3,
+            ),
+        )
+        for variacao in (
+            {"uvr_autorizada": None, "versao": 3},
+            {"uvr_autorizada": "UVR 01", "versao": 4},
+        ):
+            with self.subTest(**variacao):
+                self.assertNotEqual(
+                    chave,
+                    chave_relatorio("r", {"id_entidade": 5, "uvr": "UVR 01"}, **variacao),
+                )
+
+    def test_02_cache_local_expira_e_limita_tamanho(self):
+        cache = CacheRelatorios(60)
+        with patch("cache_relatorios.time.monotonic", return_value=100.0):
+            cache.guardar("k", [{"a": "1"}])
+            self.assertEqual(cache.obter("k"), [{"a": "1"}])
+        with patch("cache_relatorios.time.monotonic", return_value=161.0):
+            self.assertIsNone(cache.obter("k"))
+        cache.guardar("grande", [{}] * (MAX_LINHAS_CACHE + 1))
+        self.assertIsNone(cache.obter("grande"))
+        desativado = CacheRelatorios(0)
+        desativado.guardar("k", [])
+        self.assertIsNone(desativado.obter("k"))
+
+    def test_03_redis_compartilha_e_falha_sem_derrubar_o_relatorio(self):
+        cache = CacheRelatorios(60, redis_uri="redis://cache")
+        cache._redis = RedisBinario()
+        cache.guardar("k", [{"a": "ç"}])
+        self.assertEqual(cache._redis.expiracoes["k"], 60)
+        self.assertEqual(cache.obter("k"), [{"a": "ç"}])
+
+        cache._redis = RedisIndisponivel()
+        with patch("cache_relatorios.registrar_evento") as evento:
+            cache.guardar("k", [])
+            self.assertIsNone(cache.obter("k"))
+        evento.assert_called_once()
+
+    def test_04_versao_por_uvr_e_geral(self):
+        cur = MagicMock()
+        incrementar_versao_dados(cur)
+        cur.execute.assert_not_called()
+        incrementar_versao_dados(cur, uvrs=["UVR 02", "UVR 01", "UVR 02", None], ids_transacao=["7", 3])
+        sql, params = cur.execute.call_args.args
+        self.assertIn("ON CONFLICT (uvr) DO UPDATE", sql)
+        self.assertEqual(params, (["UVR 01", "UVR 02"], [3, 7]))
+
+        cur.fetchone.return_value = (5, 2)
+        self.assertEqual(ler_versao_dados(cur, "UVR 01"), (5, 2))
+        self.assertEqual(cur.execute.call_args.args[1], ("UVR 01",))
+        ler_versao_dados(cur)
+        self.assertIn("SUM(versao)", cur.execute.call_args.args[0])
+        self.assertIn("nome = 'catalogo'", cur.execute.call_args.args[0])
+
+    def test_05_configuracao_do_ttl(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(ler_ttl_cache_relatorios("production"), 300)
+            self.assertEqual(ler_ttl_cache_relatorios("testing"), 0)
+        with patch.dict(os.environ, {"REPORT_CACHE_TTL_SECONDS": "7200"}):
+            with self.assertRaisesRegex(RuntimeError, "REPORT_CACHE_TTL_SECONDS"):
+                ler_ttl_cache_relatorios("production")
+
+
+class TestRelatorioEmCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = CacheRelatorios(60)
+        self.extensao = patch.dict(
+            APP_MODULE.app.extensions, {"recic3_cache_relatorios": self.cache}
+        )
+        self.extensao.start()
+        self.addCleanup(self.extensao.stop)
+
+    def test_06_mesma_versao_reaproveita_e_nova_versao_consulta(self):
+        conexao, cursor = conexao_relatorio([1, 1, 2], [linha_relatorio(1)])
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            primeira = APP_MODULE.fetch_report_data(dict(FILTROS))
+            segunda = APP_MODULE.fetch_report_data(dict(FILTROS, nome_entidade_display="X"))
+            self.assertEqual(cursor.fetchall.call_count, 1)
+            APP_MODULE.fetch_report_data(dict(FILTROS))
+        self.assertEqual(primeira, segunda)
+        self.assertEqual(cursor.fetchall.call_count, 2)
+
+    def test_07_csv_do_cache_igual_ao_do_streaming(self):
+        linhas = [linha_relatorio(1), linha_relatorio(2, descricao="PET")]
+        conexao, _ = conexao_relatorio([1, 1], linhas)
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            APP_MODULE.fetch_report_data(dict(FILTROS))
+            em_cache = APP_MODULE.relatorio_em_cache(dict(FILTROS))
+        for original, cacheada in zip(linhas, em_cache):
+            self.assertEqual(
+                [APP_MODULE._celula_csv(v) for v in original[:19]],
+                [APP_MODULE._celula_csv(v) for v in APP_MODULE._linha_relatorio_do_cache(cacheada)[:19]],
+            )
+
+
+class TestRotasVersaoDados(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = APP_MODULE.app
+        cls.carregador_original = APP_MODULE.login_manager._user_callback
+
+    @classmethod
+    def tearDownClass(cls):
+        APP_MODULE.login_manager._user_callback = cls.carregador_original
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        APP_MODULE.login_manager._user_callback = (
+            lambda user_id: APP_MODULE.User(1, "administrador", "admin", None)
+        )
+        with self.client.session_transaction() as sessao:
+            sessao["_user_id"] = "1"
+            sessao["_fresh"] = True
+
+    def test_08_exclusao_de_nf_marca_a_uvr_antes_do_delete(self):
+        conexao = MagicMock()
+        cursor = conexao.cursor.return_value
+        cursor.fetchone.return_value = (0, "12", "Cliente")
+        cursor.rowcount = 1
+        token, _ = obter_token(self.client)
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            resposta = self.client.post("/excluir_transacao/7", headers={"X-CSRFToken": token})
+        self.assertEqual(resposta.status_code, 200)
+        sqls = [chamada.args for chamada in cursor.execute.call_args_list]
+        versao = next(i for i, (sql, _) in enumerate(sqls) if "versoes_dados_uvr" in sql)
+        exclusao = next(i for i, (sql, _) in enumerate(sqls) if sql.startswith("DELETE"))
+        self.assertLess(versao, exclusao)
+        self.assertEqual(sqls[versao][1], ([], [7]))
+        conexao.commit.assert_called_once()
+
+    def test_09_edicao_do_catalogo_troca_a_chave_do_relatorio(self):
+        versoes = {"catalogo": 1}
+        conexao = MagicMock()
+        cursor = conexao.cursor.return_value
+        cursor.rowcount = 1
+        cursor.description = [(coluna,) for coluna in COLUNAS_RELATORIO]
+        cursor.fetchall.return_value = [linha_relatorio(1)]
+
+        def executar(sql, parametros=None):
+            if "UPDATE versoes_referencia" in sql and "catalogo" in parametros[0]:
+                versoes["catalogo"] += 1
+            cursor.fetchone.return_value = (3, versoes["catalogo"])
+
+        cursor.execute.side_effect = executar
+        token, _ = obter_token(self.client)
+        with (
+            patch.dict(APP_MODULE.app.extensions, {"recic3_cache_relatorios": CacheRelatorios(60)}),
+            patch.object(APP_MODULE, "conectar_banco", return_value=conexao),
+        ):
+            chave_antes = APP_MODULE._chave_cache_relatorio(cursor, dict(FILTROS))
+            APP_MODULE.fetch_report_data(dict(FILTROS))
+            APP_MODULE.fetch_report_data(dict(FILTROS))
+            self.assertEqual(cursor.fetchall.call_count, 1)
+            resposta = self.client.post(
+                "/api/produtos_crud",
+                json={"id": 4, "item": "Papelão ondulado", "grupo": "Venda de Recicláveis"},
+                headers={"X-CSRFToken": token},
+            )
+            self.assertEqual(resposta.status_code, 200)
+            self.assertNotEqual(APP_MODULE._chave_cache_relatorio(cursor, dict(FILTROS)), chave_antes)
+            APP_MODULE.fetch_report_data(dict(FILTROS))
+        self.assertEqual(cursor.fetchall.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
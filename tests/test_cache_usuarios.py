@@ -0,0 +1,194 @@
+"""Testes do cache de usuários autenticados, sem banco nem Redis reais."""
+
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+from werkzeug.security import generate_password_hash
+
+from cache_usuarios import (
+    CacheUsuarios,
+    invalidar_usuario_atualizado,
+    invalidar_usuario_fora_da_aplicacao,
+    ler_ttl_cache_usuarios,
+)
+from test_csrf_h2a2 import APP_MODULE, obter_token
+
+
+USUARIO = {"id": 2, "username": "usuario", "role": "usuario", "uvr_acesso": "UVR 01"}
+
+
+class RedisFalso:
+    def __init__(self):
+        self.dados = {}
+        self.expiracoes = {}
+
+    def get(self, chave):
+        return self.dados.get(chave)
+
+    def set(self, chave, valor, ex=None):
+        self.dados[chave] = valor.encode()
+        self.expiracoes[chave] = ex
+
+    def delete(self, chave):
+        self.dados.pop(chave, None)
+
+
+class RedisIndisponivel:
+    def __getattr__(self, _nome):
+        def falhar(*_args, **_kwargs):
+            raise ConnectionError("redis fora do ar")
+
+        return falhar
+
+
+class TestCacheLocal(unittest.TestCase):
+    def test_01_guarda_somente_campos_publicos_do_usuario(self):
+        cache = CacheUsuarios(30)
+        cache.guardar("2", {**USUARIO, "password_hash": "nunca"})
+        self.assertEqual(cache.obter("2"), USUARIO)
+
+    def test_02_entrada_expira_pelo_ttl(self):
+        cache = CacheUsuarios(30)
+        with patch("cache_usuarios.time.monotonic", return_value=100.0):
+            cache.guardar("2", USUARIO)
+        with patch("cache_usuarios.time.monotonic", return_value=129.0):
+            self.assertIsNotNone(cache.obter("2"))
+        with patch("cache_usuarios.time.monotonic", return_value=131.0):
+            self.assertIsNone(cache.obter("2"))
+
+    def test_03_invalidacao_remove_a_entrada(self):
+        cache = CacheUsuarios(30)
+        cache.guardar(2, USUARIO)
+        cache.invalidar("2")
+        self.assertIsNone(cache.obter(2))
+
+    def test_04_ttl_zero_desativa_o_cache(self):
+        cache = CacheUsuarios(0)
+        cache.guardar("2", USUARIO)
+        self.assertIsNone(cache.obter("2"))
+
+    def test_05_quantidade_de_entradas_e_limitada(self):
+        cache = CacheUsuarios(30, max_itens=3)
+        for identificador in range(10):
+            cache.guardar(identificador, {**USUARIO, "id": identificador})
+        self.assertEqual(len(cache._locais), 3)
+        self.assertIsNotNone(cache.obter(9))
+        self.assertIsNone(cache.obter(0))
+
+    def test_06_configuracao_do_ttl(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(ler_ttl_cache_usuarios("production"), 30)
+            self.assertEqual(ler_ttl_cache_usuarios("testing"), 0)
+        with patch.dict(os.environ, {"USER_CACHE_TTL_SECONDS": "10"}, clear=True):
+            self.assertEqual(ler_ttl_cache_usuarios("testing"), 10)
+        for valor in ("-1", "301", "meio minuto"):
+            with self.subTest(valor=valor):
+                with patch.dict(os.environ, {"USER_CACHE_TTL_SECONDS": valor}, clear=True):
+                    with self.assertRaisesRegex(RuntimeError, "USER_CACHE_TTL_SECONDS"):
+                        ler_ttl_cache_usuarios("production")
+
+
+class TestCacheCompartilhado(unittest.TestCase):
+    def test_07_redis_compartilha_e_invalida_entre_workers(self):
+        redis = RedisFalso()
+        with patch("cache_usuarios._criar_cliente_redis", return_value=redis):
+            worker_a = CacheUsuarios(30, redis_uri="redis://cache-ficticio.invalid/0")
+            worker_b = CacheUsuarios(30, redis_uri="redis://cache-ficticio.invalid/0")
+            worker_a.guardar("2", USUARIO)
+            self.assertEqual(worker_b.obter("2"), USUARIO)
+            worker_b.invalidar("2")
+            self.assertIsNone(worker_a.obter("2"))
+        self.assertEqual(redis.expiracoes["sistema-recic3:usuario:2"], 30)
+
+    def test_08_falha_do_redis_recorre_ao_banco_e_avisa_uma_vez(self):
+        with (
+            patch("cache_usuarios._criar_cliente_redis", return_value=RedisIndisponivel()),
+            patch("cache_usuarios.registrar_evento") as evento,
+        ):
+            cache = CacheUsuarios(30, redis_uri="redis://cache-ficticio.invalid/0")
+            cache.guardar("2", USUARIO)
+            self.assertIsNone(cache.obter("2"))
+            cache.invalidar("2")
+        evento.assert_called_once()
+        self.assertEqual(evento.call_args.args[0], "user_cache_unavailable")
+
+    def test_09_script_administrativo_invalida_somente_com_redis(self):
+        redis = RedisFalso()
+        redis.dados["sistema-recic3:usuario:7"] = b"{}"
+        with patch("cache_usuarios._criar_cliente_redis", return_value=redis):
+            with patch.dict(os.environ, {"RATELIMIT_STORAGE_URI": "memory://"}, clear=True):
+                self.assertFalse(invalidar_usuario_fora_da_aplicacao(7))
+            with patch.dict(
+                os.environ,
+                {"RATELIMIT_STORAGE_URI": "redis://cache-ficticio.invalid/0"},
+                clear=True,
+            ):
+                self.assertTrue(invalidar_usuario_fora_da_aplicacao(7))
+        self.assertNotIn("sistema-recic3:usuario:7", redis.dados)
+
+        # Os scripts só invalidam o usuário que já existia antes da escrita.
+        with patch("cache_usuarios.invalidar_usuario_fora_da_aplicacao", return_value=True) as invalidar:
+            self.assertFalse(invalidar_usuario_atualizado(None))
+            self.assertTrue(invalidar_usuario_atualizado((7,)))
+        invalidar.assert_called_once_with(7)
+
+
+class TestCarregadorDaAplicacao(unittest.TestCase):
+    def setUp(self):
+        self.app = APP_MODULE.app
+        self.cache_original = self.app.extensions["recic3_cache_usuarios"]
+        self.cache = CacheUsuarios(30)
+        self.app.extensions["recic3_cache_usuarios"] = self.cache
+
+    def tearDown(self):
+        self.app.extensions["recic3_cache_usuarios"] = self.cache_original
+
+    def test_10_load_user_consulta_o_banco_uma_vez_por_ttl(self):
+        conexao = MagicMock()
+        conexao.cursor.return_value.fetchone.return_value = (2, "usuario", "usuario", "UVR 01")
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao) as conectar:
+            primeiro = APP_MODULE.load_user("2")
+            segundo = APP_MODULE.load_user("2")
+        conectar.assert_called_once()
+        self.assertEqual(
+            (segundo.id, segundo.username, segundo.role, segundo.uvr_acesso),
+            (primeiro.id, primeiro.username, primeiro.role, primeiro.uvr_acesso),
+        )
+
+    def test_11_usuario_inativo_nao_e_guardado(self):
+        conexao = MagicMock()
+        conexao.cursor.return_value.fetchone.return_value = None
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao) as conectar:
+            self.assertIsNone(APP_MODULE.load_user("3"))
+            self.assertIsNone(APP_MODULE.load_user("3"))
+        self.assertEqual(conectar.call_count, 2)
+
+    def test_12_alterar_senha_invalida_o_cache(self):
+        self.cache.guardar("2", USUARIO)
+        cliente = self.app.test_client()
+        with cliente.session_transaction() as sessao:
+            sessao["_user_id"] = "2"
+            sessao["_fresh"] = True
+        token, _ = obter_token(cliente)
+        conexao = MagicMock()
+        conexao.cursor.return_value.fetchone.return_value = (
+            generate_password_hash("senha-antiga"),
+        )
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            resposta = cliente.post(
+                "/alterar_senha",
+                data={
+                    "senha_atual": "senha-antiga",
+                    "nova_senha": "senha-nova",
+                    "confirmar_senha": "senha-nova",
+                    "csrf_token": token,
+                },
+            )
+        self.assertEqual(resposta.status_code, 200)
+        conexao.commit.assert_called_once()
+        self.assertIsNone(self.cache.obter("2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+"""Testes da compressão gzip/brotli das respostas."""
+
+import gzip
+import importlib.util
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+from flask import Flask, Response
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+import compressao_respostas
+from compressao_respostas import (
+    comprimir_fluxo,
+    configurar_compressao,
+    escolher_codificacao,
+    ler_configuracao_compressao,
+)
+from test_csrf_h2a2 import APP_MODULE
+
+
+GZIP = {"Accept-Encoding": "gzip, deflate"}
+
+
+def aceitas(cabecalho):
+    return parse_accept_header(cabecalho, Accept)
+
+
+class Blocos:
+    """Iterável de streaming que registra o close(), como os geradores de CSV."""
+
+    def __init__(self, blocos):
+        self.blocos = blocos
+        self.fechado = False
+
+    def __iter__(self):
+        return iter(self.blocos)
+
+    def close(self):
+        self.fechado = True
+
+
+def app_teste():
+    app = Flask("teste_compressao")
+    configurar_compressao(app)
+    app.blocos = Blocos(["uvr;valor\n"] + ["UVR 01;10,00\n"] * 2000)
+
+    @app.get("/csv")
+    def csv():
+        return Response(app.blocos, mimetype="text/csv; charset=utf-8")
+
+    @app.get("/pequeno")
+    def pequeno():
+        return {"ok": True}
+
+    @app.get("/sem_transformar")
+    def sem_transformar():
+        return Response("x" * 5000, headers={"Cache-Control": "no-transform"})
+
+    @app.get("/vazio")
+    def vazio():
+        return Response(status=204)
+
+    return app
+
+
+class TestCompressaoRespostas(unittest.TestCase):
+    def test_01_pagina_html_comprimida_mantem_cabecalhos_de_seguranca(self):
+        cliente = APP_MODULE.app.test_client()
+        simples = cliente.get("/login")
+        comprimida = cliente.get("/login", headers=GZIP)
+        self.assertEqual(comprimida.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", comprimida.headers["Vary"])
+        self.assertNotIn("Content-Encoding", simples.headers)
+
+        corpo = gzip.decompress(comprimida.get_data()).decode("utf-8")
+        self.assertLess(len(comprimida.get_data()), len(simples.get_data()))
+        self.assertEqual(int(comprimida.headers["Content-Length"]), len(comprimida.get_data()))
+        self.assertIn("Sistema Recic3", corpo)
+        self.assertIn("default-src 'self'", comprimida.headers["Content-Security-Policy"])
+        self.assertIn("no-store", comprimida.headers["Cache-Control"])
+
+    def test_02_requisicao_de_outro_site_nao_e_comprimida(self):
+        cliente = APP_MODULE.app.test_client()
+        for origem in ("cross-site", "same-site"):
+            with self.subTest(origem=origem):
+                resposta = cliente.get("/login", headers={**GZIP, "Sec-Fetch-Site": origem})
+                self.assertNotIn("Content-Encoding", resposta.headers)
+        mesma = cliente.get("/login", headers={**GZIP, "Sec-Fetch-Site": "same-origin"})
+        self.assertEqual(mesma.headers["Content-Encoding"], "gzip")
+
+    def test_03_streaming_comprime_por_bloco_e_repassa_close(self):
+        app = app_teste()
+        resposta = app.test_client().get("/csv", headers=GZIP)
+        self.assertEqual(resposta.headers["Content-Encoding"], "gzip")
+        self.assertNotIn("Content-Length", resposta.headers)
+        texto = gzip.decompress(resposta.get_data()).decode("utf-8")
+        self.assertEqual(texto, "".join(app.blocos.blocos))
+        resposta.close()
+        self.assertTrue(app.blocos.fechado)
+
+        blocos = Blocos(["a"] * 10)
+        fluxo = comprimir_fluxo(blocos, "gzip", 6)
+        next(iter(fluxo), None)
+        fluxo.close()
+        self.assertTrue(blocos.fechado)
+
+    def test_04_respostas_que_nao_sao_comprimidas(self):
+        cliente = app_teste().test_client()
+        pequeno = cliente.get("/pequeno", headers=GZIP)
+        self.assertNotIn("Content-Encoding", pequeno.headers)
+        self.assertIn("Accept-Encoding", pequeno.headers["Vary"])
+        for url in ("/sem_transformar", "/vazio"):
+            with self.subTest(url=url):
+                self.assertNotIn("Content-Encoding", cliente.get(url, headers=GZIP).headers)
+        self.assertNotIn("Content-Encoding", cliente.get("/csv", headers={"Accept-Encoding": "identity"}).headers)
+
+    def test_05_negociacao_prefere_brotli_quando_disponivel(self):
+        casos = {
+            "gzip, br": ("br", "gzip"),
+            "br;q=0.5, gzip": ("gzip", "gzip"),
+            "br": ("br", None),
+            "identity": (None, None),
+            "*": ("br", "gzip"),
+            "*, gzip;q=0": ("br", None),
+        }
+        for cabecalho, (com_brotli, sem_brotli) in casos.items():
+            with self.subTest(cabecalho=cabecalho):
+                self.assertEqual(escolher_codificacao(aceitas(cabecalho), brotli_disponivel=True), com_brotli)
+                self.assertEqual(escolher_codificacao(aceitas(cabecalho), brotli_disponivel=False), sem_brotli)
+
+    def test_06_configuracao_e_nivel_zero(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(ler_configuracao_compressao(), {"nivel": 6, "minimo_bytes": 1024})
+        for nome, valor in (("COMPRESSION_LEVEL", "10"), ("COMPRESSION_MIN_BYTES", "-1"), ("COMPRESSION_LEVEL", "x")):
+            with self.subTest(nome=nome, valor=valor), patch.dict(os.environ, {nome: valor}):
+                with self.assertRaisesRegex(RuntimeError, nome):
+                    ler_configuracao_compressao()
+        with patch.dict(os.environ, {"COMPRESSION_LEVEL": "0"}):
+            cliente = app_teste().test_client()
+        self.assertNotIn("Content-Encoding", cliente.get("/csv", headers=GZIP).headers)
+
+    @unittest.skipIf(compressao_respostas.brotli is None, "Brotli não instalado")
+    def test_07_brotli_quando_instalado(self):
+        resposta = app_teste().test_client().get("/csv", headers={"Accept-Encoding": "br"})
+        self.assertEqual(resposta.headers["Content-Encoding"], "br")
+        self.assertTrue(compressao_respostas.brotli.decompress(resposta.get_data()).startswith(b"uvr;valor"))
+
+    def test_08_brotlicffi_substitui_brotli_ausente(self):
+        brotlicffi = type(sys)("brotlicffi")
+        especificacao = importlib.util.find_spec("compressao_respostas")
+        for instalados, esperado in (({"brotlicffi": brotlicffi}, brotlicffi), ({"brotlicffi": None}, None)):
+            with self.subTest(instalados=instalados), patch.dict(sys.modules, {"brotli": None, **instalados}):
+                modulo = importlib.util.module_from_spec(especificacao)
+                especificacao.loader.exec_module(modulo)
+                self.assertIs(modulo.brotli, esperado)
+
+    def test_09_desconexao_antes_do_primeiro_bloco_fecha_o_gerador(self):
+        estado = {"fechado": False}
+
+        def gerador_csv():
+            try:
+                yield "uvr;valor\n"
+            finally:
+                estado["fechado"] = True
+
+        # stream_with_context já inicia o gerador que a resposta recebe.
+        interno = gerador_csv()
+        next(interno)
+        fluxo = comprimir_fluxo(interno, "gzip", 6)
+        fluxo.close()
+        self.assertTrue(estado["fechado"])
+
+        blocos = Blocos(["a"] * 10)
+        comprimir_fluxo(blocos, "br" if compressao_respostas.brotli else "gzip", 6).close()
+        self.assertTrue(blocos.fechado)
+
+
+if __name__ == "__main__":
+    unittest.main()
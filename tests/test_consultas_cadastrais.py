@@ -0,0 +1,284 @@
+"""Testes do cache, da corrida e da deduplicação das consultas de CNPJ e CEP.
+
+Os provedores são servidores HTTP locais; nenhuma chamada sai da máquina.
+"""
+
+import json
+import os
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import psycopg2
+
+from consultas_cadastrais import (
+    ConsultasCadastrais,
+    configurar_consultas_cadastrais,
+    ler_configuracao_consultas,
+)
+from modulos.fiscalizacao_contratos.services.consultas_externas import (
+    ConsultaExternaError,
+    ConsultaNaoEncontradaError,
+    consultar_cep,
+    consultar_cnpj,
+)
+from test_banco_dados_pool import ConexaoFalsa, CursorFalso, criar_pool
+from test_csrf_h2a2 import APP_MODULE
+
+
+CNPJ = "04252011000110"
+OUTRO_CNPJ = "11222333000181"
+CEP = "01001000"
+MODULO = "modulos.fiscalizacao_contratos.services.consultas_externas"
+
+
+class ProvedoresLocais:
+    """Servidor HTTP que responde por prefixo de caminho e conta os acessos."""
+
+    def __init__(self):
+        self.rotas = {}
+        self.acessos = {}
+        provedores = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                prefixo = next((p for p in provedores.rotas if self.path.startswith(p)), None)
+                status, corpo, atraso = provedores.rotas.get(prefixo, (404, {}, 0))
+                provedores.acessos[prefixo] = provedores.acessos.get(prefixo, 0) + 1
+                time.sleep(atraso)
+                conteudo = json.dumps(corpo).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(conteudo)))
+                self.end_headers()
+                self.wfile.write(conteudo)
+
+            def log_message(self, *_):
+                pass
+
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manipulador)
+        self.servidor.daemon_threads = True
+        self.servidor.block_on_close = False
+        self.url = f"http://127.0.0.1:{self.servidor.server_address[1]}"
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+
+    def responder(self, prefixo, status=200, corpo=None, atraso=0):
+        self.rotas[prefixo] = (status, corpo or {}, atraso)
+
+    def encerrar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+class CursorCacheFalso(CursorFalso):
+    """Guarda as linhas de SQL_GRAVAR_CACHE e, como o PostgreSQL, recusa o INSERT somente leitura."""
+
+    def __init__(self, conexao):
+        super().__init__(conexao)
+        self.description = None
+        self._linha = None
+
+    def execute(self, sql, parametros=None):
+        if sql.lstrip().startswith("INSERT") and self.conexao.readonly is True:
+            raise psycopg2.errors.ReadOnlySqlTransaction(
+                "cannot execute INSERT in a read-only transaction"
+            )
+        super().execute(sql, parametros)
+        if sql.lstrip().startswith("INSERT"):
+            tipo, chave, encontrado, dados, provedor, horas = parametros
+            self.conexao.linhas[(tipo, chave)] = (encontrado, dados, provedor, horas)
+            self.description = None
+        else:
+            self.description = (("encontrado",), ("dados",))
+            linha = self.conexao.linhas.get(parametros)
+            self._linha = linha[:2] if linha else None
+
+    def fetchone(self):
+        return self._linha
+
+
+class ConexaoCacheFalsa(ConexaoFalsa):
+    def __init__(self, linhas):
+        super().__init__()
+        self.linhas = linhas
+
+    def cursor(self, *args, **kwargs):
+        return CursorCacheFalso(self)
+
+
+class TestConsultasCadastrais(unittest.TestCase):
+    def setUp(self):
+        self.provedores = ProvedoresLocais()
+        self.addCleanup(self.provedores.encerrar)
+        for nome in ("URL_BRASILAPI", "URL_OPENCNPJA", "URL_VIACEP"):
+            patcher = patch(f"{MODULO}.{nome}", self.provedores.url + "/" + nome.lower())
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        evento = patch(f"{MODULO}.registrar_evento")
+        self.evento = evento.start()
+        self.addCleanup(evento.stop)
+
+    def usar(self, servico):
+        patcher = patch("consultas_cadastrais.SERVICO_SEM_CACHE", servico)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return servico
+
+    def cliente_com_cache(self, pool=None):
+        """Cliente logado com o serviço da aplicação sobre o pool real e conexões falsas.
+
+        As rotas são GET, então a conexão da requisição é somente leitura. O
+        usuário é carregado do banco, como na aplicação, e a requisição já
+        segura a sua conexão quando a consulta começa.
+        """
+        app = APP_MODULE.app
+        provedor_banco = app.extensions["recic3_banco_dados"]
+        linhas = {}
+        self.enterContext(patch.dict(app.extensions))
+        self.enterContext(patch.object(provedor_banco, "_dsn", "postgresql://ficticio/banco"))
+        self.enterContext(patch.object(provedor_banco, "_pool", pool or criar_pool()))
+        self.enterContext(patch("psycopg2.connect", side_effect=lambda _dsn: ConexaoCacheFalsa(linhas)))
+        ambiente = {
+            "CONSULTAS_CACHE_TTL_HORAS": "720",
+            "CONSULTAS_CACHE_NEGATIVO_HORAS": "24",
+            "CONSULTAS_HEDGE_MS": "5000",
+        }
+        with patch.dict(os.environ, ambiente):
+            configurar_consultas_cadastrais(app, "production")
+
+        carregador = APP_MODULE.login_manager._user_callback
+        self.addCleanup(setattr, APP_MODULE.login_manager, "_user_callback", carregador)
+
+        def carregar_usuario(user_id):
+            conexao = provedor_banco.conectar()
+            conexao.cursor().execute("SELECT id FROM usuarios WHERE id = %s", (user_id,))
+            conexao.close()
+            return APP_MODULE.User(2, "usuario", "usuario", "UVR 01")
+
+        APP_MODULE.login_manager._user_callback = carregar_usuario
+        cliente = app.test_client()
+        with cliente.session_transaction() as sessao:
+            sessao["_user_id"] = "2"
+            sessao["_fresh"] = True
+        return cliente, linhas
+
+    def test_01_provedor_lento_perde_a_corrida_para_o_segundo(self):
+        self.usar(ConsultasCadastrais(hedge_ms=50))
+        self.provedores.responder("/url_brasilapi/cnpj", corpo={"razao_social": "Lenta"}, atraso=1.5)
+        self.provedores.responder("/url_opencnpja/office", corpo={"company": {"name": "Rápida SA"}})
+
+        inicio = time.monotonic()
+        dados = consultar_cnpj(CNPJ)
+
+        self.assertLess(time.monotonic() - inicio, 1.0)
+        self.assertEqual(dados["razao_social"], "Rápida SA")
+        self.assertEqual(self.provedores.acessos["/url_brasilapi/cnpj"], 1)
+
+    def test_02_primeiro_provedor_rapido_dispensa_o_segundo(self):
+        self.usar(ConsultasCadastrais(hedge_ms=200))
+        self.provedores.responder("/url_brasilapi/cep", corpo={"street": "Praça da Sé", "state": "sp"})
+        self.provedores.responder("/url_viacep", corpo={"logradouro": "Outra"})
+
+        dados = consultar_cep(CEP)
+        time.sleep(0.3)
+
+        self.assertEqual(dados["logradouro"], "Praça da Sé")
+        self.assertEqual(dados["uf"], "SP")
+        self.assertNotIn("/url_viacep", self.provedores.acessos)
+
+    def test_03_pedidos_simultaneos_compartilham_a_consulta_em_andamento(self):
+        self.usar(ConsultasCadastrais(hedge_ms=5000))
+        self.provedores.responder("/url_brasilapi/cnpj", corpo={"razao_social": "Única"}, atraso=0.3)
+        resultados = []
+        threads = [
+            threading.Thread(target=lambda: resultados.append(consultar_cnpj(CNPJ)))
+            for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.provedores.acessos["/url_brasilapi/cnpj"], 1)
+        self.assertEqual([dados["razao_social"] for dados in resultados], ["Única"] * 6)
+
+    def test_04_rotas_get_guardam_encontrados_e_inexistentes_com_ttl_proprio(self):
+        cliente, linhas = self.cliente_com_cache()
+        self.provedores.responder(f"/url_brasilapi/cnpj/v1/{CNPJ}", corpo={"razao_social": "Guardada"})
+        self.provedores.responder(f"/url_brasilapi/cnpj/v1/{OUTRO_CNPJ}", status=404)
+        self.provedores.responder(f"/url_opencnpja/office/{OUTRO_CNPJ}", status=404)
+        self.provedores.responder("/url_brasilapi/cep", status=404)
+        self.provedores.responder("/url_viacep", corpo={"erro": True})
+
+        for _ in range(2):
+            resposta = cliente.get(f"/buscar_cnpj/{CNPJ}")
+            self.assertEqual(resposta.status_code, 200)
+            self.assertEqual(resposta.get_json()["razao_social"], "Guardada")
+            self.assertEqual(cliente.get(f"/buscar_cnpj/{OUTRO_CNPJ}").status_code, 404)
+            self.assertEqual(cliente.get(f"/buscar_cep/{CEP}").status_code, 404)
+
+        self.assertEqual(set(self.provedores.acessos.values()), {1})
+        self.assertEqual(linhas[("cnpj", CNPJ)][2:], ("BrasilAPI", 720))
+        self.assertEqual(linhas[("cnpj", OUTRO_CNPJ)], (False, None, None, 24))
+        self.assertFalse(linhas[("cep", CEP)][0])
+
+    def test_05_falha_de_rede_nao_e_guardada_e_sem_banco_a_consulta_segue(self):
+        cliente, linhas = self.cliente_com_cache()
+        self.provedores.responder("/url_brasilapi/cnpj", status=500)
+        self.provedores.responder("/url_opencnpja/office", status=502)
+        self.assertEqual(cliente.get(f"/buscar_cnpj/{CNPJ}").status_code, 503)
+        with self.assertRaises(ConsultaExternaError) as erro:
+            consultar_cnpj(CNPJ)
+        self.assertNotIsInstance(erro.exception, ConsultaNaoEncontradaError)
+        self.assertEqual(linhas, {})
+
+        def sem_banco():
+            raise RuntimeError("banco indisponível")
+
+        self.usar(ConsultasCadastrais(sem_banco, ttl_horas=720, hedge_ms=5000))
+        self.provedores.responder("/url_brasilapi/cnpj", corpo={"razao_social": "Sem cache"})
+        with patch("consultas_cadastrais.registrar_evento") as aviso:
+            self.assertEqual(consultar_cnpj(CNPJ)["razao_social"], "Sem cache")
+            consultar_cnpj(CNPJ)
+        aviso.assert_called_once()
+        self.assertEqual(aviso.call_args.args[0], "lookup_cache_unavailable")
+
+
+    def test_07_gravacao_do_cache_nao_empresta_segunda_conexao(self):
+        pool = criar_pool(maximo=1, espera_s=1)
+        cliente, linhas = self.cliente_com_cache(pool)
+        self.provedores.responder(f"/url_brasilapi/cnpj/v1/{CNPJ}", corpo={"razao_social": "Guardada"})
+
+        with patch("consultas_cadastrais.registrar_evento") as aviso:
+            for _ in range(2):
+                resposta = cliente.get(f"/buscar_cnpj/{CNPJ}")
+                self.assertEqual(resposta.get_json()["razao_social"], "Guardada")
+
+        aviso.assert_not_called()
+        self.assertEqual(self.provedores.acessos[f"/url_brasilapi/cnpj/v1/{CNPJ}"], 1)
+        self.assertEqual(linhas[("cnpj", CNPJ)][2:], ("BrasilAPI", 720))
+        metricas = pool.metricas()
+        self.assertEqual((metricas["abertas"], metricas["em_uso"], metricas["esgotamentos"]), (1, 0, 0))
+
+class TestConfiguracaoConsultas(unittest.TestCase):
+    def test_06_ambiente_de_testes_desliga_cache_e_limites_sao_validados(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(
+                ler_configuracao_consultas("testing"),
+                {"ttl_horas": 0, "ttl_negativo_horas": 0, "hedge_ms": 800},
+            )
+            self.assertEqual(ler_configuracao_consultas("production")["ttl_horas"], 720)
+        for nome, valor in (
+            ("CONSULTAS_CACHE_TTL_HORAS", "dias"),
+            ("CONSULTAS_CACHE_NEGATIVO_HORAS", "-1"),
+            ("CONSULTAS_HEDGE_MS", "60000"),
+        ):
+            with self.subTest(nome=nome), patch.dict(os.environ, {nome: valor}, clear=True):
+                with self.assertRaisesRegex(RuntimeError, nome):
+                    ler_configuracao_consultas("production")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,227 @@
+"""Testes das listas de referência em memória, sem banco real."""
+
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+from dados_referencia import (
+    DadosReferencia,
+    incrementar_versao_referencia,
+    ler_intervalo_dados_referencia,
+    SQL_REGISTRAR_REFERENCIAS,
+    registrar_referencias,
+)
+from test_csrf_h2a2 import APP_MODULE, obter_token
+
+
+CATALOGO = (
+    (1, "Caixa", "Receita", "Venda", "Papel", "Papelão", 2, 2),
+    (2, "Garrafa", "Receita", "Venda", "Plástico", "PET", 3, 1),
+    (3, "Jornal", "Receita", "Venda", "Papel", "", 2, 3),
+    (4, "Luva", "Despesa", "Compra", "EPI", "", 1, 3),
+)
+SUBGRUPOS = (("PET", "Plástico"), ("Papelão", "Papel"))
+UVRS = ("UVR 01", "UVR 02")
+ATIVIDADES = (("Despesa", "Compra"), ("Receita", "Serviço"), ("Despesa", "Serviço"), ("Receita", "Venda"))
+
+
+def conexao_referencia(versoes, conjuntos):
+    """Cursor que responde as versões e, depois de cada carga, o conjunto pedido."""
+    conexao = MagicMock()
+    cursor = conexao.cursor.return_value
+    respostas = []
+
+    def executar(sql, params=None):
+        if "FROM versoes_referencia" in sql:
+            respostas.append(list(versoes.items()))
+        else:
+            nome = next(nome for nome, marca in (
+                ("catalogo", "produtos_servicos"), ("subgrupos", "FROM subgrupos"),
+                ("uvrs", "uvrs_registradas"), ("atividades", "atividades_transacao"),
+            ) if marca in sql)
+            respostas.append(list(conjuntos[nome]))
+
+    cursor.execute.side_effect = executar
+    cursor.fetchall.side_effect = lambda: respostas.pop(0)
+    return conexao, cursor
+
+
+class TestDadosReferencia(unittest.TestCase):
+    def test_01_reaproveita_no_intervalo_e_recarrega_quando_a_versao_muda(self):
+        versoes = {"catalogo": 1, "uvrs": 1}
+        conexao, cursor = conexao_referencia(versoes, {"uvrs": [("UVR 02",), ("UVR 01",)]})
+        conectar = MagicMock(return_value=conexao)
+        dados = DadosReferencia(30)
+        with patch("dados_referencia.time.monotonic", return_value=100.0):
+            self.assertEqual(dados.obter("uvrs", conectar), UVRS)
+            self.assertEqual(dados.obter("uvrs", conectar), UVRS)
+        self.assertEqual(conectar.call_count, 1)
+
+        with patch("dados_referencia.time.monotonic", return_value=131.0):
+            dados.obter("uvrs", conectar)
+        self.assertEqual(conectar.call_count, 2)
+        self.assertEqual(cursor.execute.call_count, 3)
+
+        versoes["uvrs"] = 2
+        with patch("dados_referencia.time.monotonic", return_value=162.0):
+            dados.obter("uvrs", conectar)
+        self.assertEqual(cursor.execute.call_count, 5)
+        conexao.close.assert_called()
+
+    def test_02_invalidar_e_modo_desativado(self):
+        conexao, cursor = conexao_referencia(
+            {"subgrupos": 1}, {"subgrupos": SUBGRUPOS}
+        )
+        conectar = MagicMock(return_value=conexao)
+        dados = DadosReferencia(30)
+        dados.obter("subgrupos", conectar)
+        dados.invalidar("subgrupos")
+        dados.obter("subgrupos", conectar)
+        self.assertEqual(conectar.call_count, 2)
+
+        desativado = DadosReferencia(0)
+        self.assertEqual(desativado.obter("subgrupos", conectar), SUBGRUPOS)
+        self.assertIn("FROM subgrupos", cursor.execute.call_args.args[0])
+
+    def test_03_registro_so_com_valores_e_versoes(self):
+        cur = MagicMock()
+        registrar_referencias(cur)
+        cur.execute.assert_not_called()
+        registrar_referencias(cur, uvr="UVR 03", tipo_transacao="Receita", tipo_atividade="Venda")
+        sql, params = cur.execute.call_args.args
+        self.assertIn("UPDATE versoes_referencia", sql)
+        self.assertEqual(params, ("UVR 03", "UVR 03", "Receita", "Venda", "Venda"))
+        incrementar_versao_referencia(cur, "catalogo", "subgrupos")
+        self.assertEqual(cur.execute.call_args.args[1], (["catalogo", "subgrupos"],))
+
+    def test_04_configuracao_do_intervalo(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(ler_intervalo_dados_referencia("production"), 30)
+            self.assertEqual(ler_intervalo_dados_referencia("testing"), 0)
+        for valor in ("601", "-1", "x"):
+            with self.subTest(valor=valor), patch.dict(
+                os.environ, {"REFERENCE_CACHE_CHECK_SECONDS": valor}
+            ):
+                with self.assertRaisesRegex(RuntimeError, "REFERENCE_CACHE_CHECK_SECONDS"):
+                    ler_intervalo_dados_referencia("production")
+
+
+class TestRotasDadosReferencia(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = APP_MODULE.app
+        cls.carregador_original = APP_MODULE.login_manager._user_callback
+
+    @classmethod
+    def tearDownClass(cls):
+        APP_MODULE.login_manager._user_callback = cls.carregador_original
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        APP_MODULE.login_manager._user_callback = (
+            lambda user_id: APP_MODULE.User(1, "administrador", "admin", None)
+        )
+        with self.client.session_transaction() as sessao:
+            sessao["_user_id"] = "1"
+            sessao["_fresh"] = True
+        self.dados = DadosReferencia(60)
+        extensao = patch.dict(
+            APP_MODULE.app.extensions, {"recic3_dados_referencia": self.dados}
+        )
+        extensao.start()
+        self.addCleanup(extensao.stop)
+        conexao, _ = conexao_referencia(
+            dict.fromkeys(("catalogo", "subgrupos", "uvrs", "atividades"), 1),
+            {
+                "catalogo": CATALOGO,
+                "subgrupos": SUBGRUPOS,
+                "uvrs": [(uvr,) for uvr in UVRS],
+                "atividades": ATIVIDADES,
+            },
+        )
+        self.conectar = patch.object(APP_MODULE, "conectar_banco", return_value=conexao)
+        self.conectar.start()
+        self.addCleanup(self.conectar.stop)
+
+    def get_json(self, url):
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200, url)
+        return resposta.get_json()
+
+    def test_05_opcoes_do_catalogo_filtram_e_ordenam(self):
+        casos = {
+            "/get_relatorio_catalog_options?option_type=grupo": ["EPI", "Papel", "Plástico"],
+            "/get_relatorio_catalog_options?option_type=grupo&tipo_transacao=Receita": ["Papel", "Plástico"],
+            "/get_relatorio_catalog_options?option_type=subgrupo": ["PET", "Papelão"],
+            "/get_relatorio_catalog_options?option_type=item&grupo=Papel": ["Caixa", "Jornal"],
+            "/get_relatorio_catalog_options?option_type=item&subgrupo=(Nenhum)": ["Jornal", "Luva"],
+            "/get_relatorio_catalog_options?option_type=item&tipo_atividade_catalogo=Compra": ["Luva"],
+        }
+        for url, esperado in casos.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.get_json(url), esperado)
+        resposta = self.client.get("/get_relatorio_catalog_options?option_type=uvr")
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_06_subgrupos_itens_uvrs_e_atividades(self):
+        self.assertEqual(self.get_json("/get_distinct_subgrupos?grupo=Papel"), ["Papelão"])
+        self.assertEqual(self.get_json("/get_items_for_filters?grupo=Venda"), ["Caixa", "Garrafa", "Jornal"])
+        self.assertEqual(self.get_json("/get_items_for_filters?grupo=Papel&subgrupo=Papelão"), ["Caixa"])
+        self.assertEqual(self.get_json("/get_relatorio_uvrs"), list(UVRS))
+        self.assertEqual(
+            self.get_json("/get_relatorio_tipos_atividade_transacao"),
+            ["Compra", "Serviço", "Venda"],
+        )
+        self.assertEqual(
+            self.get_json("/get_relatorio_tipos_atividade_transacao?tipo_transacao=Despesa"),
+            ["Compra", "Serviço"],
+        )
+        self.assertEqual(len(self.get_json("/get_produtos_servicos")), len(CATALOGO))
+        self.assertEqual(APP_MODULE.conectar_banco.call_count, 4)
+
+    def test_07_alteracao_de_subgrupo_incrementa_versao_e_descarta_copia(self):
+        self.dados.obter("subgrupos", APP_MODULE.conectar_banco)
+        conexao = MagicMock()
+        cursor = conexao.cursor.return_value
+        cursor.rowcount = 1
+        token, _ = obter_token(self.client)
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            resposta = self.client.post(
+                "/api/subgrupos",
+                json={"acao": "editar", "id": 3, "nome": "Papel branco", "atividade_pai": "Papel"},
+                headers={"X-CSRFToken": token},
+            )
+        self.assertEqual(resposta.status_code, 200)
+        sql, params = cursor.execute.call_args.args
+        self.assertIn("UPDATE versoes_referencia", sql)
+        self.assertEqual(params, (["catalogo", "subgrupos"],))
+        conexao.commit.assert_called_once()
+        self.assertNotIn("subgrupos", self.dados._conjuntos)
+
+    def test_08_admin_que_move_conta_de_uvr_registra_a_nova_uvr(self):
+        conexao = MagicMock()
+        cursor = conexao.cursor.return_value
+        cursor.rowcount = 1
+        token, _ = obter_token(self.client)
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            resposta = self.client.post(
+                "/editar_conta_corrente",
+                data={
+                    "csrf_token": token,
+                    "id_conta": "5",
+                    "uvr_conta": "UVR 09",
+                    "banco_conta": "001|Banco do Brasil",
+                    "agencia_conta": "1234",
+                    "conta_corrente_conta": "56789-0",
+                },
+            )
+        self.assertEqual(resposta.status_code, 200)
+        chamadas = [chamada for chamada in conexao.mock_calls if chamada[0] in ("cursor().execute", "commit")]
+        registro = chamadas.index(
+            ("cursor().execute", (SQL_REGISTRAR_REFERENCIAS, ("UVR 09", "UVR 09", None, None, None)), {})
+        )
+        self.assertEqual(chamadas[registro + 1][0], "commit")
+
+
+if __name__ == "__main__":
+    unittest.main()
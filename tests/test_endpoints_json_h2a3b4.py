@@ -378,6 +378,7 @@ class TestEndpointsJsonH2A3B4(unittest.TestCase):
         fonte = (
             Path("templates/cadastro.html").read_text(encoding="utf-8")
             + Path("static/js/cadastro_seguranca.js").read_text(encoding="utf-8")
+            + Path("static/js/cadastro.js").read_text(encoding="utf-8")
         )
         self.assertIn("function escaparHtml", fonte)
         self.assertNotIn("xhr.responseText", fonte)
@@ -442,9 +443,9 @@ class TestEndpointsJsonH2A3B4(unittest.TestCase):
         self.assertNotIn("tabela", corpo)
         self.assertNotIn("host", corpo)
 
-    def test_21_inventario_runtime_preserva_177_rotas(self):
+    def test_21_inventario_runtime_preserva_180_rotas(self):
         regras = list(self.app.url_map.iter_rules())
-        self.assertEqual(len(regras), 177)
+        self.assertEqual(len(regras), 180)
 
     def test_22_fontes_nao_desativam_csrf_nem_expoem_excecao_json(self):
         fonte = Path("app.py").read_text(encoding="utf-8")
@@ -677,6 +678,7 @@ class TestEndpointsJsonH2A3B4(unittest.TestCase):
         fonte = (
             Path("templates/cadastro.html").read_text(encoding="utf-8")
             + Path("static/js/cadastro_seguranca.js").read_text(encoding="utf-8")
+            + Path("static/js/cadastro.js").read_text(encoding="utf-8")
         )
         self.assertIn("function tratarSessaoExpirada", fonte)
         self.assertRegex(fonte, r"window\.location\.assign\([\"']/login[\"']\)")
@@ -0,0 +1,197 @@
+"""Testes da exportação CSV em streaming do relatório e do extrato."""
+
+import unittest
+from datetime import date, datetime
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from test_csrf_h2a2 import APP_MODULE, obter_token
+
+
+def linha_relatorio(indice, descricao="Papelão"):
+    return (
+        "UVR 01", "Associação", "Cliente", f"NF-{indice}",
+        date(2026, 1, 5), date(2026, 1, 10),
+        "Receita", "Venda", descricao,
+        "Produto", "Venda", "Recicláveis", None,
+        "kg", Decimal("10.500"), Decimal("1.20"), Decimal("12.60"),
+        "Pago", Decimal("12.60"), datetime(2026, 1, 5, 8, 30),
+    )
+
+
+class CursorNomeado:
+    def __init__(self, linhas, tamanho_maximo_lote):
+        self.linhas = list(linhas)
+        self.tamanho_maximo_lote = tamanho_maximo_lote
+        self.executado = None
+        self.lotes_lidos = 0
+        self.fechado = False
+
+    def execute(self, sql, parametros=None):
+        self.executado = (sql, parametros)
+
+    def fetchmany(self, tamanho):
+        if tamanho > self.tamanho_maximo_lote:
+            raise AssertionError("lote maior que o esperado")
+        lote, self.linhas = self.linhas[:tamanho], self.linhas[tamanho:]
+        if lote:
+            self.lotes_lidos += 1
+        return lote
+
+    def fetchall(self):
+        raise AssertionError("exportação não pode carregar tudo de uma vez")
+
+    def close(self):
+        self.fechado = True
+
+
+def conexao_exportacao(linhas, *, cabecalho_extrato=None):
+    conexao = MagicMock()
+    nomeado = CursorNomeado(linhas, APP_MODULE.TAMANHO_LOTE_EXPORTACAO)
+    comum = MagicMock()
+    if cabecalho_extrato is not None:
+        comum.fetchone.side_effect = cabecalho_extrato
+
+    def cursor(name=None):
+        return nomeado if name else comum
+
+    conexao.cursor.side_effect = cursor
+    return conexao, nomeado
+
+
+class TestExportacaoCsv(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = APP_MODULE.app
+        cls.carregador_original = APP_MODULE.login_manager._user_callback
+
+    @classmethod
+    def tearDownClass(cls):
+        APP_MODULE.login_manager._user_callback = cls.carregador_original
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        APP_MODULE.login_manager._user_callback = (
+            lambda user_id: APP_MODULE.User(1, "administrador", "admin", None)
+        )
+        with self.client.session_transaction() as sessao:
+            sessao["_user_id"] = "1"
+            sessao["_fresh"] = True
+
+    def post_json(self, rota, dados, **kwargs):
+        token, _ = obter_token(self.client)
+        return self.client.post(
+            rota, json=dados, headers={"X-CSRFToken": token}, **kwargs
+        )
+
+    def test_01_relatorio_e_lido_em_lotes_de_cursor_nomeado(self):
+        total = APP_MODULE.TAMANHO_LOTE_EXPORTACAO * 2 + 7
+        conexao, cursor = conexao_exportacao(
+            [linha_relatorio(indice) for indice in range(total)]
+        )
+        with (
+            patch.object(APP_MODULE, "conectar_banco_streaming", return_value=conexao),
+            patch.object(
+                APP_MODULE,
+                "fetch_report_data",
+                side_effect=AssertionError("CSV não deve materializar o relatório"),
+            ),
+        ):
+            resposta = self.post_json("/baixar_csv_relatorio", {"uvr": "UVR 01"})
+            self.assertTrue(resposta.is_streamed)
+            texto = resposta.get_data(as_text=True)
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn("attachment;filename=relatorio_financeiro.csv", resposta.headers["Content-Disposition"])
+        linhas = texto.splitlines()
+        self.assertEqual(len(linhas), total + 1)
+        self.assertTrue(linhas[0].startswith("UVR;Associação;"))
+        self.assertEqual(
+            linhas[1],
+            "UVR 01;Associação;Cliente;NF-0;05/01/2026;10/01/2026;Receita;Venda;"
+            "Papelão;Produto;Venda;Recicláveis;;kg;10,500;1,20;12,60;Pago;12,60",
+        )
+        self.assertEqual(cursor.lotes_lidos, 3)
+        self.assertIn("tf.uvr = %s", cursor.executado[0])
+        self.assertTrue(cursor.fechado)
+        conexao.close.assert_called_once()
+
+    def test_02_relatorio_vazio_responde_404_e_libera_conexao(self):
+        conexao, cursor = conexao_exportacao([])
+        with patch.object(APP_MODULE, "conectar_banco_streaming", return_value=conexao):
+            resposta = self.post_json("/baixar_csv_relatorio", {})
+        self.assertEqual(resposta.status_code, 404)
+        self.assertTrue(cursor.fechado)
+        conexao.close.assert_called_once()
+
+    def test_03_csv_neutraliza_formulas_nas_celulas_textuais(self):
+        conexao, _ = conexao_exportacao([linha_relatorio(1, "=HYPERLINK(1)")])
+        with patch.object(APP_MODULE, "conectar_banco_streaming", return_value=conexao):
+            resposta = self.post_json("/baixar_csv_relatorio", {})
+            texto = resposta.get_data(as_text=True)
+        self.assertIn(";'=HYPERLINK(1);", texto)
+
+    def test_04_download_interrompido_libera_a_conexao(self):
+        conexao, cursor = conexao_exportacao(
+            [linha_relatorio(indice) for indice in range(5000)]
+        )
+        with patch.object(APP_MODULE, "conectar_banco_streaming", return_value=conexao):
+            resposta = self.post_json(
+                "/baixar_csv_relatorio", {}, buffered=False
+            )
+            next(resposta.response)
+            resposta.close()
+        self.assertTrue(cursor.fechado)
+        conexao.close.assert_called_once()
+        self.assertLess(cursor.lotes_lidos, 3)
+
+    def test_05_extrato_acumula_saldo_durante_o_streaming(self):
+        movimentacoes = [
+            (1, date(2026, 1, 2), "Recebimento", Decimal("100.00"), "Cliente", "", "", "NF-1"),
+            (2, date(2026, 1, 3), "Pagamento", Decimal("30.50"), "Fornecedor", "TED-9", "", None),
+        ]
+        conexao, cursor = conexao_exportacao(
+            movimentacoes,
+            cabecalho_extrato=[
+                ("UVR 01", "Associação", "Banco", "0001", "12345", "Conta principal"),
+                (Decimal("10.00"),),
+            ],
+        )
+        filtros = {
+            "id_conta_corrente_extrato": 7,
+            "data_inicial_extrato": "2026-01-01",
+            "data_final_extrato": "2026-01-31",
+        }
+        with patch.object(APP_MODULE, "conectar_banco_streaming", return_value=conexao):
+            resposta = self.post_json("/baixar_csv_extrato", filtros)
+            linhas = resposta.get_data(as_text=True).splitlines()
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn("extrato_UVR_01_12345_2026-01-01_a_2026-01-31.csv", resposta.headers["Content-Disposition"])
+        self.assertEqual(linhas[3], "Saldo Inicial:;10,00")
+        self.assertEqual(
+            linhas[6], "02/01/2026;Recebimento de/para Cliente (NFs: NF-1);100,00;0,00;110,00"
+        )
+        self.assertEqual(
+            linhas[7], "03/01/2026;Pagamento de/para Fornecedor (Doc: TED-9);0,00;30,50;79,50"
+        )
+        self.assertEqual(linhas[-1], "Saldo Final:;79,50")
+        self.assertEqual(cursor.executado[1][0], 7)
+        conexao.close.assert_called_once()
+
+    def test_06_extrato_de_conta_inexistente_responde_400_e_libera_conexao(self):
+        conexao, cursor = conexao_exportacao([], cabecalho_extrato=[None])
+        filtros = {
+            "id_conta_corrente_extrato": 7,
+            "data_inicial_extrato": "2026-01-01",
+            "data_final_extrato": "2026-01-31",
+        }
+        with patch.object(APP_MODULE, "conectar_banco_streaming", return_value=conexao):
+            resposta = self.post_json("/baixar_csv_extrato", filtros)
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIsNone(cursor.executado)
+        conexao.close.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
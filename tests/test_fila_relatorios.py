@@ -0,0 +1,273 @@
+"""Testes da fila de relatórios no PostgreSQL, sem banco real."""
+
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+
+import banco_dados
+from fila_relatorios import (
+    MAXIMO_TENTATIVAS,
+    RelatorioSemDados,
+    ler_configuracao_fila,
+    limpar_tarefas,
+    registrar_falha,
+    reservar_proxima_tarefa,
+)
+from test_banco_dados_pool import ConexaoFalsa, CursorFalso, criar_pool
+from test_csrf_h2a2 import APP_MODULE, obter_token
+
+
+CONFIGURACAO = {"retencao_horas": 24, "intervalo_s": 2, "execucao_maxima_s": 900}
+
+
+def conexao_com_tarefa(tarefa):
+    conexao = MagicMock()
+    conexao.cursor.return_value.fetchone.return_value = tarefa
+    return conexao
+
+
+class CursorRecusaEscritaSomenteLeitura(CursorFalso):
+    def execute(self, sql, parametros=None):
+        if self.conexao.readonly is True and sql.lstrip().startswith("INSERT"):
+            raise psycopg2.errors.ReadOnlySqlTransaction(
+                "cannot execute INSERT in a read-only transaction"
+            )
+        super().execute(sql, parametros)
+
+
+class ConexaoComModoSomenteLeitura(ConexaoFalsa):
+    def cursor(self, *args, **kwargs):
+        return CursorRecusaEscritaSomenteLeitura(self)
+
+
+def sqls_executados(conexao):
+    return [" ".join(c.args[0].split()) for c in conexao.cursor.return_value.execute.call_args_list]
+
+
+class TestFilaRelatorios(unittest.TestCase):
+    def test_01_reserva_pula_tarefas_bloqueadas_e_le_parametros(self):
+        cur = MagicMock()
+        cur.fetchone.return_value = (4, "pdf_extrato", '{"uvr": "UVR 01"}', 1)
+        tarefa = reservar_proxima_tarefa(cur, execucao_maxima_s=900)
+        self.assertEqual(tarefa, (4, "pdf_extrato", {"uvr": "UVR 01"}, 1))
+        sql, params = cur.execute.call_args.args
+        self.assertIn("FOR UPDATE SKIP LOCKED", sql)
+        self.assertEqual(params, (900, MAXIMO_TENTATIVAS))
+        cur.fetchone.return_value = None
+        self.assertIsNone(reservar_proxima_tarefa(cur, execucao_maxima_s=900))
+
+    def test_02_falha_volta_para_fila_ate_esgotar_tentativas(self):
+        cur = MagicMock()
+        self.assertEqual(registrar_falha(cur, 4, 1), "PENDENTE")
+        self.assertIn("SET status = 'PENDENTE'", cur.execute.call_args.args[0])
+        self.assertEqual(registrar_falha(cur, 4, MAXIMO_TENTATIVAS), "FALHOU")
+        self.assertEqual(cur.execute.call_args.args[1][0], "FALHOU")
+
+    def test_03_limpeza_respeita_retencao_e_configuracao_valida(self):
+        cur = MagicMock()
+        cur.rowcount = 3
+        self.assertEqual(limpar_tarefas(cur, retencao_horas=48, execucao_maxima_s=900), 3)
+        sql, params = cur.execute.call_args.args
+        self.assertIn("DELETE FROM tarefas_relatorio", sql)
+        self.assertEqual(params, (48,))
+        with patch.dict(os.environ, {"RELATORIOS_RETENCAO_HORAS": "0"}):
+            with self.assertRaisesRegex(RuntimeError, "RELATORIOS_RETENCAO_HORAS"):
+                ler_configuracao_fila()
+
+    def test_04_worker_conclui_tarefa_com_o_arquivo_gerado(self):
+        conexao = conexao_com_tarefa((10, "pdf_teste", {"uvr": "UVR 01"}, 1))
+        gerador = MagicMock(return_value=("r.pdf", "application/pdf", b"%PDF"))
+        with (
+            patch.object(APP_MODULE, "conectar_banco", return_value=conexao),
+            patch.dict(APP_MODULE.GERADORES_RELATORIO, {"pdf_teste": gerador}),
+        ):
+            self.assertTrue(APP_MODULE.executar_proxima_tarefa_relatorio(CONFIGURACAO))
+        gerador.assert_called_once_with({"uvr": "UVR 01"})
+        self.assertIn("SET status = 'CONCLUIDA'", sqls_executados(conexao)[-1])
+        self.assertEqual(
+            conexao.cursor.return_value.execute.call_args.args[1],
+            ("r.pdf", "application/pdf", b"%PDF", 10),
+        )
+        self.assertEqual(conexao.commit.call_count, 2)
+
+    def test_05_worker_registra_periodo_vazio_e_devolve_falha_a_fila(self):
+        casos = (
+            (RelatorioSemDados(), "SEM_DADOS"),
+            (ValueError("data"), "FALHOU"),
+        )
+        for erro, status in casos:
+            with self.subTest(status=status):
+                conexao = conexao_com_tarefa((10, "pdf_teste", {}, 1))
+                with (
+                    patch.object(APP_MODULE, "conectar_banco", return_value=conexao),
+                    patch.dict(
+                        APP_MODULE.GERADORES_RELATORIO,
+                        {"pdf_teste": MagicMock(side_effect=erro)},
+                    ),
+                ):
+                    APP_MODULE.executar_proxima_tarefa_relatorio(CONFIGURACAO)
+                self.assertEqual(
+                    conexao.cursor.return_value.execute.call_args.args[1][0], status
+                )
+
+        conexao = conexao_com_tarefa((10, "pdf_teste", {}, 1))
+        with (
+            patch.object(APP_MODULE, "conectar_banco", return_value=conexao),
+            patch.dict(
+                APP_MODULE.GERADORES_RELATORIO,
+                {"pdf_teste": MagicMock(side_effect=ConnectionError())},
+            ),
+        ):
+            APP_MODULE.executar_proxima_tarefa_relatorio(CONFIGURACAO)
+        self.assertIn("SET status = 'PENDENTE'", sqls_executados(conexao)[-1])
+
+        conexao = conexao_com_tarefa(None)
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            self.assertFalse(APP_MODULE.executar_proxima_tarefa_relatorio(CONFIGURACAO))
+
+    def test_06_gerador_produz_pdf_sem_contexto_de_requisicao(self):
+        linha = {
+            "data_documento": "2026-01-05", "data_efetiva_pag_rec": None,
+            "uvr": "UVR 01", "nome_cadastro_origem": "Cliente", "numero_documento": "12",
+            "tipo_transacao": "Receita", "tipo_atividade_transacao": "Venda",
+            "item_descricao": "Papelão", "item_grupo_catalogo": "Papel",
+            "item_subgrupo_catalogo": "Ondulado", "quantidade": "10",
+            "valor_unitario": "1.50", "valor_total_item": "15.00",
+            "status_pagamento": "Pago", "valor_pago_neste_item": "15.00",
+        }
+        filtros = {"uvr": "UVR 01", "data_inicial": "2026-01-01", "data_final": "2026-01-31"}
+        with patch.object(APP_MODULE, "fetch_report_data", return_value=[linha]):
+            nome, tipo_mime, conteudo = APP_MODULE._gerar_pdf_relatorio_financeiro(filtros)
+        self.assertEqual(nome, "relatorio_financeiro_UVR_01_2026-01-01_a_2026-01-31.pdf")
+        self.assertEqual(tipo_mime, "application/pdf")
+        self.assertTrue(conteudo.startswith(b"%PDF"))
+        with (
+            patch.object(APP_MODULE, "fetch_report_data", return_value=[]),
+            self.assertRaises(RelatorioSemDados),
+        ):
+            APP_MODULE._gerar_pdf_relatorio_financeiro(filtros)
+
+
+class TestRotasFilaRelatorios(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = APP_MODULE.app
+        cls.carregador_original = APP_MODULE.login_manager._user_callback
+
+    @classmethod
+    def tearDownClass(cls):
+        APP_MODULE.login_manager._user_callback = cls.carregador_original
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        APP_MODULE.login_manager._user_callback = (
+            lambda user_id: APP_MODULE.User(2, "usuario", "usuario", "UVR 01")
+        )
+        with self.client.session_transaction() as sessao:
+            sessao["_user_id"] = "2"
+            sessao["_fresh"] = True
+
+    def test_07_pdf_e_enfileirado_sem_gerar_na_requisicao(self):
+        conexao = conexao_com_tarefa((31,))
+        token, _ = obter_token(self.client)
+        with (
+            patch.object(APP_MODULE, "conectar_banco", return_value=conexao),
+            patch.object(APP_MODULE, "fetch_report_data") as relatorio,
+            patch.object(APP_MODULE, "SimpleDocTemplate") as documento,
+        ):
+            resposta = self.client.post(
+                "/baixar_pdf_relatorio_financeiro",
+                json={"uvr": "UVR 01", "data_inicial": "2026-01-01"},
+                headers={"X-CSRFToken": token},
+            )
+        self.assertEqual(resposta.status_code, 202)
+        self.assertEqual(resposta.get_json()["status_url"], "/relatorios/tarefas/31")
+        self.assertTrue(resposta.headers["Location"].endswith("/relatorios/tarefas/31"))
+        relatorio.assert_not_called()
+        documento.assert_not_called()
+        conexao.commit.assert_called_once()
+        params = conexao.cursor.return_value.execute.call_args.args[1]
+        self.assertEqual(params[0], "pdf_relatorio_financeiro")
+        self.assertIn('"uvr": "UVR 01"', params[1])
+        self.assertEqual(params[2], 2)
+
+    def test_08_status_e_arquivo_sao_do_proprio_usuario(self):
+        conexao = conexao_com_tarefa(("EXECUTANDO", None, None))
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            dados = self.client.get("/relatorios/tarefas/31").get_json()
+        self.assertEqual(dados["status"], "EXECUTANDO")
+        self.assertFalse(dados["concluida"])
+        self.assertIsNone(dados["arquivo_url"])
+        self.assertEqual(conexao.cursor.return_value.execute.call_args.args[1], (31, 2))
+
+        conexao = conexao_com_tarefa(("CONCLUIDA", None, "r.pdf"))
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            dados = self.client.get("/relatorios/tarefas/31").get_json()
+        self.assertTrue(dados["concluida"])
+        self.assertEqual(dados["arquivo_url"], "/relatorios/tarefas/31/arquivo")
+
+        conexao = conexao_com_tarefa(None)
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            self.assertEqual(self.client.get("/relatorios/tarefas/32").status_code, 404)
+            self.assertEqual(
+                self.client.get("/relatorios/tarefas/32/arquivo").status_code, 404
+            )
+
+    def test_09_arquivo_concluido_e_baixado_sem_cache(self):
+        conexao = conexao_com_tarefa(("r.pdf", "application/pdf", memoryview(b"%PDF-1.4")))
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            resposta = self.client.get("/relatorios/tarefas/31/arquivo")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data, b"%PDF-1.4")
+        self.assertEqual(resposta.headers["Content-Disposition"], "attachment;filename=r.pdf")
+        self.assertIn("no-store", resposta.headers["Cache-Control"])
+        sql, params = conexao.cursor.return_value.execute.call_args.args
+        self.assertIn("status = 'CONCLUIDA'", sql)
+        self.assertEqual(params, (31, 2))
+
+    def test_10_pdf_grava_a_tarefa_fora_do_snapshot_somente_leitura(self):
+        provedor = self.app.extensions["recic3_banco_dados"]
+        unidades = []
+        conexoes = []
+        unidade_real = banco_dados.UnidadeTrabalho
+
+        def registrar_unidade(*args, **kwargs):
+            unidades.append(unidade_real(*args, **kwargs))
+            return unidades[-1]
+
+        def abrir(_dsn):
+            conexoes.append(ConexaoComModoSomenteLeitura())
+            return conexoes[-1]
+
+        rotas = (
+            ("/baixar_pdf_relatorio_financeiro", {"uvr": "UVR 01", "data_inicial": "2026-01-01"}),
+            (
+                "/baixar_pdf_extrato",
+                {"data_inicial_extrato": "2026-01-01", "data_final_extrato": "2026-01-31"},
+            ),
+        )
+        token, _ = obter_token(self.client)
+        for rota, filtros in rotas:
+            with self.subTest(rota=rota):
+                unidades.clear()
+                conexoes.clear()
+                with (
+                    patch.object(APP_MODULE, "DATABASE_URL", "postgresql://ficticio/banco"),
+                    patch.object(provedor, "_dsn", "postgresql://ficticio/banco"),
+                    patch.object(provedor, "_pool", criar_pool()),
+                    patch.object(banco_dados, "UnidadeTrabalho", side_effect=registrar_unidade),
+                    patch("psycopg2.connect", side_effect=abrir),
+                ):
+                    resposta = self.client.post(rota, json=filtros, headers={"X-CSRFToken": token})
+                self.assertEqual(resposta.status_code, 202)
+                self.assertEqual([unidade.somente_leitura for unidade in unidades], [False])
+                (conexao,) = conexoes
+                self.assertNotIn(True, [sessao.get("readonly") for sessao in conexao.sessoes])
+                self.assertTrue(conexao.comandos[-1].lstrip().startswith("INSERT INTO tarefas_relatorio"))
+                self.assertEqual(conexao.commits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+"""Testes do armazenamento de fotos fora da linha do registro, sem banco real."""
+
+import base64
+import io
+import unittest
+from contextlib import redirect_stderr
+from unittest.mock import MagicMock, patch
+
+from PIL import Image
+
+import migrar_fotos
+from fotos import (
+    LADO_MAXIMO_FOTO,
+    LADO_MINIATURA,
+    FotoInvalida,
+    decodificar_data_url,
+    migrar_lote_fotos,
+    processar_foto,
+)
+from test_csrf_h2a2 import APP_MODULE
+
+
+def imagem_png(largura, altura):
+    saida = io.BytesIO()
+    Image.new("RGB", (largura, altura), (30, 120, 60)).save(saida, format="PNG")
+    return saida.getvalue()
+
+
+class TestProcessamentoFotos(unittest.TestCase):
+    def test_01_reduz_foto_e_gera_miniatura_jpeg(self):
+        foto = processar_foto(imagem_png(3000, 1500))
+        self.assertEqual((foto.largura, foto.altura), (LADO_MAXIMO_FOTO, LADO_MAXIMO_FOTO // 2))
+        with Image.open(io.BytesIO(foto.miniatura)) as miniatura:
+            self.assertEqual(miniatura.format, "JPEG")
+            self.assertEqual(max(miniatura.size), LADO_MINIATURA)
+        self.assertTrue(foto.imagem.startswith(b"\xff\xd8"))
+        self.assertEqual(len(foto.sha256), 64)
+
+    def test_02_conteudo_que_nao_e_imagem_e_recusado(self):
+        for conteudo in (b"", b"nao sou imagem", None):
+            with self.subTest(conteudo=conteudo), self.assertRaises(FotoInvalida):
+                processar_foto(conteudo)
+
+    def test_03_data_url_e_base64_puro(self):
+        bruto = imagem_png(4, 4)
+        codificado = base64.b64encode(bruto).decode()
+        self.assertEqual(decodificar_data_url(f"data:image/png;base64,{codificado}"), bruto)
+        self.assertEqual(decodificar_data_url(codificado), bruto)
+        self.assertIsNone(decodificar_data_url("  "))
+        with self.assertRaises(FotoInvalida):
+            decodificar_data_url("data:image/png;base64,@@@")
+
+    def test_04_lote_migra_validas_e_mantem_invalidas(self):
+        valida = "data:image/png;base64," + base64.b64encode(imagem_png(8, 8)).decode()
+        cur = MagicMock()
+        cur.fetchall.return_value = [(3, valida), (7, "lixo")]
+        cur.fetchone.return_value = (41,)
+        self.assertEqual(migrar_lote_fotos(cur, "patrimonio", 0, 2), (7, 1, 1))
+        selecao = cur.execute.call_args_list[0].args
+        self.assertIn("FOR UPDATE SKIP LOCKED", selecao[0])
+        self.assertEqual(selecao[1], (0, 2))
+        atualizacao = cur.execute.call_args_list[-1].args
+        self.assertIn("foto_bem_base64 = NULL", atualizacao[0])
+        self.assertEqual(atualizacao[1], (41, 3))
+
+        cur.fetchall.return_value = []
+        self.assertEqual(migrar_lote_fotos(cur, "patrimonio", 7, 2), (None, 0, 0))
+
+    def test_05_script_exige_confirmacao(self):
+        with (
+            patch("sys.argv", ["migrar_fotos.py"]),
+            patch.object(APP_MODULE, "migrar_fotos_legadas") as migrar,
+            redirect_stderr(io.StringIO()),
+            self.assertRaises(SystemExit),
+        ):
+            migrar_fotos.main()
+        migrar.assert_not_called()
+
+
+class TestRotasFotos(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = APP_MODULE.app
+        cls.carregador_original = APP_MODULE.login_manager._user_callback
+
+    @classmethod
+    def tearDownClass(cls):
+        APP_MODULE.login_manager._user_callback = cls.carregador_original
+
+    def autenticar(self, usuario):
+        APP_MODULE.login_manager._user_callback = lambda user_id: usuario
+        with self.client.session_transaction() as sessao:
+            sessao["_user_id"] = str(usuario.id)
+            sessao["_fresh"] = True
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.autenticar(APP_MODULE.User(2, "usuario", "usuario", "UVR 01"))
+
+    def consultar(self, rota, linha, **kwargs):
+        conexao = MagicMock()
+        cursor = conexao.cursor.return_value
+        cursor.fetchone.return_value = linha
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            resposta = self.client.get(rota, **kwargs)
+        return resposta, cursor
+
+    def test_06_foto_tem_cache_imutavel_e_escopo_da_uvr(self):
+        resposta, cursor = self.consultar("/fotos/associados/5/9", (b"jpeg", "a" * 64))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.mimetype, "image/jpeg")
+        self.assertEqual(resposta.data, b"jpeg")
+        cache = resposta.headers["Cache-Control"]
+        self.assertIn("private", cache)
+        self.assertIn("immutable", cache)
+        self.assertIn("max-age=31536000", cache)
+        self.assertNotIn("no-store", cache)
+        sql, params = cursor.execute.call_args.args
+        self.assertIn("f.imagem", sql)
+        self.assertIn("LOWER(TRIM(r.uvr))", sql)
+        self.assertEqual(params, (5, 9, "UVR 01"))
+
+        etag = resposta.headers["ETag"]
+        resposta, _ = self.consultar(
+            "/fotos/associados/5/9", (b"jpeg", "a" * 64), headers={"If-None-Match": etag}
+        )
+        self.assertEqual(resposta.status_code, 304)
+
+    def test_07_miniatura_e_fotos_inexistentes(self):
+        resposta, cursor = self.consultar(
+            "/fotos/patrimonio/5/9?tamanho=miniatura", (b"mini", "b" * 64)
+        )
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn("f.miniatura", cursor.execute.call_args.args[0])
+        resposta, _ = self.consultar("/fotos/patrimonio/5/8", None)
+        self.assertEqual(resposta.status_code, 404)
+        resposta, cursor = self.consultar("/fotos/usuarios/5/9", (b"x", "c" * 64))
+        self.assertEqual(resposta.status_code, 404)
+        cursor.execute.assert_not_called()
+
+    def test_08_foto_proposta_em_solicitacao_e_so_do_admin(self):
+        resposta, cursor = self.consultar("/fotos/solicitacoes/3/9", (b"x", "d" * 64))
+        self.assertEqual(resposta.status_code, 404)
+        cursor.execute.assert_not_called()
+        self.autenticar(APP_MODULE.User(1, "administrador", "admin", None))
+        resposta, cursor = self.consultar("/fotos/solicitacoes/3/9", (b"x", "d" * 64))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn("solicitacoes_alteracao", cursor.execute.call_args.args[0])
+
+    def test_09_detalhe_do_associado_traz_url_e_nao_base64(self):
+        linha = (5, "Ana", "123", "", None, None, "ATIVO", "UVR 01") + ("",) * 8 + (9,)
+        resposta, _ = self.consultar("/get_associado/5", linha)
+        self.assertEqual(resposta.status_code, 200)
+        dados = resposta.get_json()
+        self.assertEqual(dados["foto_url"], "/fotos/associados/5/9")
+        self.assertEqual(dados["foto_miniatura_url"], "/fotos/associados/5/9?tamanho=miniatura")
+        self.assertNotIn("foto_base64", dados)
+
+        resposta, _ = self.consultar("/get_associado/5", linha[:-1] + (None,))
+        self.assertIsNone(resposta.get_json()["foto_url"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""Testes do gerador de dados sintéticos para carga e planos de consulta."""
+
+import csv
+import io
+import os
+import sys
+import unittest
+from collections import Counter, defaultdict
+from dataclasses import replace
+from decimal import Decimal
+from unittest.mock import patch
+
+from gerar_dados_sinteticos import (
+    ESCALAS,
+    TABELAS,
+    CargaCopy,
+    GeradorSintetico,
+    linhas_baseline,
+    linhas_legado,
+    main,
+)
+from modulos.fiscalizacao_contratos.validacoes import validar_cnpj
+from test_csrf_h2a2 import APP_MODULE
+
+
+ESCALA = replace(ESCALAS["pequena"], transacoes=3000)
+
+
+def por_tabela(linhas, esquema):
+    tabelas = defaultdict(list)
+    for tabela, linha in linhas:
+        tabelas[tabela].append(dict(zip(TABELAS[esquema][tabela], linha)))
+    return tabelas
+
+
+class CursorCopy:
+    def __init__(self):
+        self.copias = []
+
+    def copy_expert(self, comando, arquivo):
+        tabela = comando.seq[1].strings[0]
+        self.copias.append((tabela, list(csv.reader(io.StringIO(arquivo.read())))))
+
+
+class TestGeradorSintetico(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.legado = por_tabela(linhas_legado(GeradorSintetico(ESCALA, 7), 1), "legado")
+
+    def test_01_mesma_semente_gera_as_mesmas_linhas(self):
+        for linhas in (linhas_legado, linhas_baseline):
+            with self.subTest(esquema=linhas.__name__):
+                primeira = list(linhas(GeradorSintetico(ESCALAS["pequena"], 3), 1))
+                self.assertEqual(primeira, list(linhas(GeradorSintetico(ESCALAS["pequena"], 3), 1)))
+                self.assertNotEqual(primeira, list(linhas(GeradorSintetico(ESCALAS["pequena"], 4), 1)))
+        self.assertEqual(
+            set(TABELAS["legado"]) - {"fc_empresas", "fc_servidores"},
+            set(self.legado) - {"fc_empresas", "fc_servidores"},
+        )
+
+    def test_02_uvrs_pesadas_e_contas_longas_concentram_o_movimento(self):
+        por_uvr = Counter(nf["uvr"] for nf in self.legado["transacoes_financeiras"])
+        self.assertGreater(por_uvr["UVR 01"], 2 * por_uvr["UVR 04"])
+        self.assertGreater(
+            Counter(a["uvr"] for a in self.legado["associados"])["UVR 01"],
+            Counter(a["uvr"] for a in self.legado["associados"])["UVR 04"],
+        )
+
+        contas = {c["id"]: c for c in self.legado["contas_correntes"]}
+        longas = {i for i, c in contas.items() if c["descricao_conta"] == "Conta principal"}
+        fluxos = self.legado["fluxo_caixa"]
+        self.assertGreater(sum(f["id_conta_corrente"] in longas for f in fluxos), len(fluxos) / 2)
+        for fluxo in fluxos:
+            abertura = contas[fluxo["id_conta_corrente"]]["data_hora_cadastro"].date()
+            self.assertGreaterEqual(fluxo["data_efetiva"], abertura)
+            self.assertEqual(contas[fluxo["id_conta_corrente"]]["uvr"], fluxo["uvr"])
+
+    def test_03_totais_pagamentos_e_documentos_sao_consistentes(self):
+        itens = defaultdict(Decimal)
+        for item in self.legado["itens_transacao"]:
+            itens[item["id_transacao"]] += item["valor_total_item"]
+        vinculos = {v["id_transacao_financeira"]: v for v in self.legado["fluxo_caixa_transacoes_link"]}
+        for nf in self.legado["transacoes_financeiras"]:
+            self.assertEqual(itens[nf["id"]], nf["valor_total_documento"])
+            pago = vinculos[nf["id"]]["valor_aplicado_nesta_nf"] if nf["id"] in vinculos else 0
+            self.assertEqual(nf["valor_pago_recebido"], pago)
+            self.assertEqual(nf["status_pagamento"] == "Liquidado", pago == nf["valor_total_documento"])
+            rateio = nf["tipo_atividade"] == "Rateio dos Associados"
+            self.assertEqual(nf["id_cadastro_origem"] is None, rateio)
+
+        cpfs = [a["cpf"] for a in self.legado["associados"]]
+        cnpjs = [c["cnpj"] for c in self.legado["cadastros"]]
+        self.assertEqual(len(set(cpfs)), len(cpfs))
+        self.assertEqual(len(set(cnpjs)), len(cnpjs))
+        self.assertTrue(all(APP_MODULE.validar_cpf(cpf) for cpf in cpfs))
+        self.assertTrue(all(validar_cnpj(cnpj) for cnpj in cnpjs))
+
+    def test_04_medicoes_respeitam_as_regras_do_modulo(self):
+        previstos = {i["id"]: i["quantidade"] for i in self.legado["fc_planilha_itens"]}
+        valores = defaultdict(Decimal)
+        for item in self.legado["fc_medicao_itens"]:
+            self.assertLessEqual(item["quantidade_medida"], previstos[item["planilha_item_id"]])
+            valores[item["medicao_id"]] += item["valor_medido"]
+        competencias = Counter()
+        for medicao in self.legado["fc_medicoes"]:
+            self.assertEqual(medicao["competencia"].day, 1)
+            self.assertEqual(medicao["status"] == "Aprovada", medicao["aprovado_em"] is not None)
+            self.assertEqual(medicao["valor_bruto"], valores[medicao["id"]])
+            competencias[(medicao["contrato_id"], medicao["competencia"])] += 1
+        self.assertEqual(set(competencias.values()), {1})
+        self.assertEqual(
+            len(self.legado["fc_planilhas_orcamentarias"]), len(self.legado["fc_contratos"])
+        )
+
+
+class TestCargaCopy(unittest.TestCase):
+    def test_05_lote_grava_pais_antes_dos_filhos_em_csv(self):
+        cursor = CursorCopy()
+        carga = CargaCopy(cursor, TABELAS["legado"], lote=3)
+        carga.adicionar("itens_transacao", (1, 1, "PET", "kg", Decimal("1.5"), Decimal("2.00"), Decimal("3.00")))
+        carga.adicionar("cadastros", (1,) + ("x",) * 11)
+        carga.adicionar("fluxo_caixa", (1, "UVR 01", "A", "Pagamento", None, "N", 1, "D", None, 1, 0, None))
+        self.assertEqual([tabela for tabela, _ in cursor.copias], ["cadastros", "itens_transacao", "fluxo_caixa"])
+        self.assertEqual(cursor.copias[2][1][0][4], "")
+        carga.adicionar("subgrupos", (1, "Papel", "Papel"))
+        carga.descarregar()
+        self.assertEqual(carga.contagem["subgrupos"], 1)
+        self.assertEqual(carga.pendentes, 0)
+
+    def test_06_linha_de_comando_exige_confirmacao_e_outro_banco(self):
+        invalidos = (
+            ["--dsn", "postgresql://teste/sinteticos"],
+            ["--dsn", "postgresql://teste/producao", "--confirmar", "BANCO_DESCARTAVEL"],
+            ["--dsn", "postgresql://teste/s", "--confirmar", "BANCO_DESCARTAVEL", "--uvrs", "90"],
+        )
+        ambiente = {"DATABASE_URL": "postgresql://teste/producao"}
+        for argumentos in invalidos:
+            with (
+                self.subTest(argumentos=argumentos),
+                patch.object(sys, "argv", ["gerar_dados_sinteticos.py", *argumentos]),
+                patch.dict(os.environ, ambiente),
+                patch("gerar_dados_sinteticos.executar") as executar,
+                patch("sys.stderr", io.StringIO()),
+            ):
+                with self.assertRaises(SystemExit) as saida:
+                    main()
+                self.assertEqual(saida.exception.code, 2)
+                executar.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
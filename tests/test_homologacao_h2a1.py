@@ -703,7 +703,11 @@ class TestIntegracaoInicializacao(unittest.TestCase):
 
     def test_procfile_nao_executa_script_administrativo(self):
         procfile = (RAIZ / "Procfile").read_text(encoding="utf-8").strip()
-        self.assertEqual(procfile, "web: gunicorn --config gunicorn.conf.py app:app")
+        self.assertEqual(
+            procfile,
+            "web: gunicorn --config gunicorn.conf.py app:app\n"
+            "worker: python worker_relatorios.py",
+        )
         self.assertNotIn("executar_migracao_produtos", procfile)
 
 
@@ -0,0 +1,279 @@
+"""Testes da medição de consultas e tempo de banco por requisição."""
+
+import os
+import re
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import psycopg2
+from flask import Flask, jsonify
+from psycopg2 import extensions
+
+from configuracao_ambiente import configurar_aplicacao
+from instrumentacao_banco import (
+    CursorInstrumentado,
+    EstatisticasBanco,
+    impressao_digital,
+    ler_configuracao_instrumentacao,
+    normalizar_comando,
+)
+from test_banco_dados_pool import BANCO_TESTE, ConexaoFalsa
+
+
+PLANO = [{"Plan": {
+    "Node Type": "Nested Loop",
+    "Total Cost": 812.5,
+    "Plan Rows": 40,
+    "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "transacoes_financeiras", "Plan Rows": 9000},
+        {"Node Type": "Index Scan", "Relation Name": "itens", "Index Name": "itens_pkey", "Plan Rows": 1},
+    ],
+}}]
+
+
+class CursorExplain:
+    """Cursor que registra os comandos e responde ao EXPLAIN com PLANO."""
+
+    def __init__(self, conexao):
+        self.connection = conexao
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+    def execute(self, sql, parametros=None):
+        self.connection.comandos.append((sql, parametros))
+        if sql.startswith("EXPLAIN") and self.connection.explain_falha:
+            raise psycopg2.ProgrammingError("falha no explain")
+        self.connection.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+
+    def fetchone(self):
+        return (PLANO,)
+
+
+class ConexaoExplain:
+    def __init__(self, *, explain_falha=False):
+        self.comandos = []
+        self.explain_falha = explain_falha
+        self.info = SimpleNamespace(transaction_status=extensions.TRANSACTION_STATUS_IDLE)
+
+    def cursor(self):
+        return CursorExplain(self)
+
+
+def criar_app(**extras):
+    ambiente = {
+        "APP_ENV": "testing",
+        "SECRET_KEY": "segredo-ficticio-instrumentacao",
+        "DATABASE_URL": BANCO_TESTE,
+        "RATELIMIT_ENABLED": "false",
+        "DB_REPEATED_QUERY_THRESHOLD": "3",
+        **extras,
+    }
+    with patch.dict(os.environ, ambiente, clear=True):
+        app = Flask(__name__)
+        configurar_aplicacao(app)
+    provedor = app.extensions["recic3_banco_dados"]
+
+    @app.get("/itens")
+    def itens():
+        conexao = provedor.conectar()
+        with conexao.cursor() as cursor:
+            cursor.execute("SELECT id FROM itens")
+            for item_id in range(5):
+                cursor.execute("SELECT nome\n  FROM itens WHERE id = %s", (item_id,))
+        conexao.close()
+        return jsonify(ok=True)
+
+    @app.get("/sem-banco")
+    def sem_banco():
+        return jsonify(ok=True)
+
+    return app
+
+
+def eventos(registro, nome):
+    return [
+        chamada.kwargs for chamada in registro.call_args_list
+        if chamada.args[0] == nome
+    ]
+
+
+class TestInstrumentacaoBanco(unittest.TestCase):
+    def test_01_log_de_acesso_e_server_timing_trazem_o_tempo_de_banco(self):
+        app = criar_app(DB_REPEATED_QUERY_THRESHOLD="0")
+        with (
+            patch("psycopg2.connect", side_effect=lambda _dsn: ConexaoFalsa()),
+            patch("logging_operacional.registrar_evento") as registro,
+        ):
+            resposta = app.test_client().get("/itens")
+        self.assertEqual(resposta.status_code, 200)
+        concluido = eventos(registro, "request_completed")[0]
+        self.assertEqual(concluido["db_queries"], 6)
+        self.assertGreaterEqual(concluido["db_time_ms"], 0)
+        self.assertNotIn("db_repeated_statements", concluido)
+        self.assertRegex(
+            resposta.headers["Server-Timing"],
+            r'^db;dur=[\d.]+;desc="6 consultas", app;dur=[\d.]+$',
+        )
+
+    def test_02_comando_repetido_alem_do_limite_avisa_uma_vez(self):
+        app = criar_app()
+        with (
+            patch("psycopg2.connect", side_effect=lambda _dsn: ConexaoFalsa()),
+            patch("instrumentacao_banco.registrar_evento") as aviso,
+            patch("logging_operacional.registrar_evento") as registro,
+        ):
+            app.test_client().get("/itens")
+        repetidos = eventos(aviso, "database_repeated_query")
+        self.assertEqual(len(repetidos), 1)
+        self.assertEqual(repetidos[0]["statement"], "SELECT nome FROM itens WHERE id = %s")
+        self.assertEqual(repetidos[0]["threshold"], 3)
+        self.assertEqual(eventos(registro, "request_completed")[0]["db_repeated_statements"], 1)
+
+    def test_03_requisicao_sem_banco_e_producao(self):
+        app = criar_app()
+        with patch("logging_operacional.registrar_evento") as registro:
+            resposta = app.test_client().get("/sem-banco")
+        self.assertNotIn("db_queries", eventos(registro, "request_completed")[0])
+        self.assertTrue(re.fullmatch(r"app;dur=[\d.]+", resposta.headers["Server-Timing"]))
+
+        self.assertFalse(ler_configuracao_instrumentacao("production")["server_timing"])
+        invalidos = (
+            ("DB_REPEATED_QUERY_THRESHOLD", "x"),
+            ("DB_REPEATED_QUERY_THRESHOLD", "-1"),
+            ("DB_REPEATED_QUERY_THRESHOLD", "1001"),
+            ("DB_SLOW_QUERY_MS", "-5"),
+            ("DB_SLOW_QUERY_EXPLAIN_RATE", "1.5"),
+            ("DB_SLOW_QUERY_EXPLAIN_RATE", "metade"),
+        )
+        for nome, valor in invalidos:
+            with self.subTest(nome=nome, valor=valor), patch.dict(os.environ, {nome: valor}):
+                with self.assertRaisesRegex(RuntimeError, nome):
+                    ler_configuracao_instrumentacao("testing")
+
+    def test_04_cursor_fora_da_requisicao_nao_e_instrumentado(self):
+        app = criar_app()
+        provedor = app.extensions["recic3_banco_dados"]
+        with patch("psycopg2.connect", side_effect=lambda _dsn: ConexaoFalsa()):
+            with app.app_context():
+                conexao = provedor.conectar()
+                self.assertNotIsInstance(conexao.cursor(), CursorInstrumentado)
+                conexao.close()
+            with app.test_request_context("/"):
+                conexao = provedor.conectar()
+                cursor = conexao.cursor()
+                self.assertIsInstance(cursor, CursorInstrumentado)
+                cursor.execute("SELECT 1")
+                self.assertEqual(cursor.fetchone(), (1,))
+                conexao.close()
+
+    def test_05_falha_na_consulta_tambem_e_contada(self):
+        estatisticas = EstatisticasBanco(0)
+        conexao = ConexaoFalsa()
+        conexao.quebrada = True
+        cursor = CursorInstrumentado(conexao.cursor(), estatisticas)
+        with self.assertRaises(Exception):
+            cursor.execute("SELECT 1")
+        self.assertEqual(estatisticas.campos_log()["db_queries"], 1)
+
+
+class TestConsultasLentas(unittest.TestCase):
+    def executar_lenta(self, conexao, comando, parametros, *, amostra=1.0):
+        estatisticas = EstatisticasBanco(0, lenta_ms=500, amostra_explain=amostra)
+        cursor = CursorInstrumentado(conexao.cursor(), estatisticas)
+        with (
+            patch("instrumentacao_banco.time.perf_counter", side_effect=[10.0, 10.75]),
+            patch("instrumentacao_banco.registrar_evento") as registro,
+        ):
+            cursor.execute(comando, parametros)
+        return eventos(registro, "database_slow_query")
+
+    def test_06_normalizacao_agrupa_o_mesmo_comando(self):
+        primeiro = normalizar_comando(
+            "SELECT * FROM itens -- filtro\n WHERE uvr = %s AND id IN (1, 2, 3) AND nome = 'Ana'"
+        )
+        segundo = normalizar_comando(
+            "SELECT *   FROM itens WHERE uvr = %(uvr)s AND id IN (7) AND nome = 'Bia'"
+        )
+        self.assertEqual(primeiro, "SELECT * FROM itens WHERE uvr = ? AND id IN (?) AND nome = ?")
+        self.assertEqual(primeiro, segundo)
+        self.assertEqual(impressao_digital(primeiro), impressao_digital(segundo))
+        self.assertEqual(normalizar_comando("SELECT coluna2 FROM t1"), "SELECT coluna2 FROM t1")
+
+    def test_07_consulta_lenta_registra_impressao_e_parametros_redigidos(self):
+        conexao = ConexaoExplain()
+        comando = "SELECT * FROM itens WHERE nome = %(nome)s AND cpf = %(cpf)s AND ano = %(ano)s"
+        lentas = self.executar_lenta(
+            conexao, comando, {"nome": "Maria", "cpf": "123.456.789-00", "ano": 2024}, amostra=0
+        )
+        self.assertEqual(len(lentas), 1)
+        evento = lentas[0]
+        self.assertEqual(evento["duration_ms"], 750.0)
+        self.assertEqual(evento["fingerprint"], impressao_digital(normalizar_comando(comando)))
+        self.assertEqual(evento["parameters"], {"nome": "<str:5>", "cpf": "[REDACTED]", "ano": 2024})
+        self.assertNotIn("plan", evento)
+        self.assertEqual(len(conexao.comandos), 1)
+
+    def test_08_amostra_captura_o_plano_num_savepoint(self):
+        conexao = ConexaoExplain()
+        plano = self.executar_lenta(conexao, "SELECT * FROM itens WHERE id = %s", (5,))[0]["plan"]
+        self.assertEqual(plano["total_cost"], 812.5)
+        self.assertEqual(
+            plano["nodes"][1],
+            {"node": "Seq Scan", "rows": 9000, "relation": "transacoes_financeiras"},
+        )
+        self.assertEqual(plano["nodes"][2]["index"], "itens_pkey")
+        self.assertEqual(
+            [sql for sql, _ in conexao.comandos],
+            [
+                "SELECT * FROM itens WHERE id = %s",
+                "SAVEPOINT recic3_explain",
+                "EXPLAIN (FORMAT JSON) SELECT * FROM itens WHERE id = %s",
+                "RELEASE SAVEPOINT recic3_explain",
+            ],
+        )
+        self.assertEqual(conexao.comandos[2][1], (5,))
+
+    def test_09_explain_so_para_leitura_e_falha_volta_ao_savepoint(self):
+        escrita = ConexaoExplain()
+        evento = self.executar_lenta(escrita, "UPDATE itens SET nome = %s", ("x",))[0]
+        self.assertIsNone(evento["plan"])
+        self.assertEqual(len(escrita.comandos), 1)
+
+        falha = ConexaoExplain(explain_falha=True)
+        evento = self.executar_lenta(falha, "SELECT 1", None)[0]
+        self.assertIsNone(evento["plan"])
+        self.assertEqual(
+            [sql for sql, _ in falha.comandos][-2:],
+            ["ROLLBACK TO SAVEPOINT recic3_explain", "RELEASE SAVEPOINT recic3_explain"],
+        )
+
+    def test_10_comando_cancelado_apos_o_limite_tambem_e_registrado(self):
+        class CursorCancelado:
+            def execute(self, sql, parametros=None):
+                raise psycopg2.errors.QueryCanceled("canceling statement due to statement timeout")
+
+        estatisticas = EstatisticasBanco(0, lenta_ms=500, amostra_explain=1.0)
+        cursor = CursorInstrumentado(CursorCancelado(), estatisticas)
+        with (
+            patch("instrumentacao_banco.time.perf_counter", side_effect=[10.0, 12.0]),
+            patch("instrumentacao_banco.registrar_evento") as registro,
+            patch("instrumentacao_banco.capturar_plano") as plano,
+            self.assertRaises(psycopg2.errors.QueryCanceled),
+        ):
+            cursor.execute("SELECT * FROM itens WHERE id = %s", (5,))
+        lentas = eventos(registro, "database_slow_query")
+        self.assertEqual(len(lentas), 1)
+        self.assertEqual(lentas[0]["duration_ms"], 2000.0)
+        self.assertEqual(lentas[0]["error_type"], "QueryCanceled")
+        self.assertNotIn("plan", lentas[0])
+        plano.assert_not_called()
+        self.assertEqual(estatisticas.campos_log()["db_queries"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
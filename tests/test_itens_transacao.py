@@ -0,0 +1,195 @@
+"""Testes da gravação de itens de NF em lote, sem PostgreSQL real."""
+
+import unittest
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from werkzeug.datastructures import MultiDict
+
+from test_csrf_h2a2 import APP_MODULE, obter_token
+
+
+def formulario_itens(quantidade, *, ids=None, **campos):
+    dados = MultiDict(campos)
+    for indice in range(quantidade):
+        if ids is not None:
+            dados.add("produto_servico_id[]", ids[indice])
+        dados.add("produto_servico_descricao[]", f"Item {indice}")
+        dados.add("produto_servico_unidade[]", "kg")
+        dados.add("produto_servico_quantidade[]", "2")
+        dados.add("produto_servico_valor_unitario[]", "1,50")
+    return dados
+
+
+def comandos_itens(cursor):
+    return [
+        chamada for chamada in cursor.execute.call_args_list
+        if "itens_transacao" in chamada.args[0]
+    ]
+
+
+class TestSqlItens(unittest.TestCase):
+    def test_01_insercao_envia_colunas_como_arrays(self):
+        cursor = MagicMock()
+        itens = [
+            {"descricao": "Papelão", "unidade": "kg", "quantidade": Decimal("2"),
+             "valor_unitario": Decimal("1.5"), "valor_total_item": Decimal("3.0")},
+            {"descricao": "PET", "unidade": "kg", "quantidade": Decimal("1"),
+             "valor_unitario": Decimal("4"), "valor_total_item": Decimal("4")},
+        ]
+        APP_MODULE._inserir_itens_transacao(cursor, 7, itens)
+        cursor.execute.assert_called_once()
+        sql, parametros = cursor.execute.call_args.args
+        self.assertIn("UNNEST(", sql)
+        self.assertIn("WITH ORDINALITY", sql)
+        self.assertEqual(parametros[0], 7)
+        self.assertEqual(parametros[1], ["Papelão", "PET"])
+        self.assertEqual(parametros[5], [Decimal("3.0"), Decimal("4")])
+
+    def test_02_insercao_sem_itens_nao_acessa_o_banco(self):
+        cursor = MagicMock()
+        APP_MODULE._inserir_itens_transacao(cursor, 7, [])
+        cursor.execute.assert_not_called()
+
+    def test_03_sincronizacao_altera_somente_o_necessario(self):
+        cursor = MagicMock()
+        APP_MODULE._sincronizar_itens_transacao(
+            cursor,
+            9,
+            [{"id": "31", "descricao": "Vidro", "unidade": "kg", "quantidade": 1.0,
+              "valor_unitario": 2.0, "valor_total_item": 2.0}],
+        )
+        cursor.execute.assert_called_once()
+        sql, parametros = cursor.execute.call_args.args
+        self.assertIn("IS DISTINCT FROM", sql)
+        self.assertIn("it.id = novos.id", sql)
+        self.assertNotIn("ROW_NUMBER()", sql)
+        self.assertNotIn("DELETE FROM itens_transacao WHERE id_transacao", sql)
+        self.assertEqual(parametros[:2], ([31], ["Vidro"]))
+        self.assertEqual(parametros[-4:], (9, 9, 9, 9))
+
+    def test_06_ids_repetidos_ou_invalidos_viram_linhas_novas(self):
+        itens = [{"id": valor} for valor in ("4", "", "4", "x", None, "99999999999", "7")]
+        self.assertEqual(
+            APP_MODULE._ids_itens(itens), [4, None, None, None, None, None, 7]
+        )
+
+
+class TestRotasGravamItensEmLote(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = APP_MODULE.app
+        cls.carregador_original = APP_MODULE.login_manager._user_callback
+
+    @classmethod
+    def tearDownClass(cls):
+        APP_MODULE.login_manager._user_callback = cls.carregador_original
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        APP_MODULE.login_manager._user_callback = (
+            lambda user_id: APP_MODULE.User(1, "administrador", "admin", None)
+        )
+        with self.client.session_transaction() as sessao:
+            sessao["_user_id"] = "1"
+            sessao["_fresh"] = True
+
+    def registrar(self, quantidade):
+        conexao = MagicMock()
+        cursor = conexao.cursor.return_value
+        cursor.fetchone.return_value = (55,)
+        dados = formulario_itens(
+            quantidade,
+            uvr_transacao="UVR 01",
+            data_documento_transacao="2026-01-01",
+            tipo_transacao="Receita",
+            tipo_atividade_transacao="Rateio dos Associados",
+            data_hora_cadastro_transacao="01/01/2026 10:00:00",
+            nome_fornecedor_prestador_transacao="Rateio geral",
+        )
+        token, _ = obter_token(self.client)
+        dados.add("csrf_token", token)
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            resposta = self.client.post("/registrar_transacao_financeira", data=dados)
+        return resposta, conexao, cursor
+
+    def test_04_registro_usa_os_mesmos_comandos_para_qualquer_quantidade(self):
+        contagens = []
+        for quantidade in (1, 60):
+            resposta, conexao, cursor = self.registrar(quantidade)
+            self.assertEqual(resposta.status_code, 302)
+            conexao.commit.assert_called_once()
+            itens = comandos_itens(cursor)
+            self.assertEqual(len(itens), 1)
+            self.assertEqual(len(itens[0].args[1][1]), quantidade)
+            contagens.append(cursor.execute.call_count)
+        self.assertEqual(contagens[0], contagens[1])
+
+    def test_05_edicao_do_admin_sincroniza_sem_apagar_tudo(self):
+        conexao = MagicMock()
+        cursor = conexao.cursor.return_value
+        cursor.fetchone.return_value = (Decimal("0"), "Aberto")
+        cursor.rowcount = 1
+        dados = formulario_itens(
+            40,
+            id_transacao="91",
+            uvr_transacao="UVR 01",
+            data_documento_transacao="2026-07-22",
+            tipo_transacao="Despesa",
+            tipo_atividade_transacao="Serviço",
+            numero_documento_transacao="NF-1",
+            nome_fornecedor_prestador_transacao="Fornecedor",
+        )
+        token, _ = obter_token(self.client)
+        dados.add("csrf_token", token)
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            resposta = self.client.post("/editar_transacao", data=dados)
+        self.assertEqual(resposta.status_code, 302)
+        itens = [
+            chamada for chamada in comandos_itens(cursor)
+            if "valor_pago_item" not in chamada.args[0]
+        ]
+        self.assertEqual(len(itens), 1)
+        self.assertIn("WITH novos AS", itens[0].args[0])
+        self.assertEqual(len(itens[0].args[1][1]), 40)
+        self.assertEqual(itens[0].args[1][0], [None] * 40)
+        self.assertEqual(itens[0].args[1][-4:], ("91",) * 4)
+        conexao.commit.assert_called_once()
+
+    def test_07_remover_item_do_meio_mantem_os_ids_dos_demais(self):
+        conexao = MagicMock()
+        cursor = conexao.cursor.return_value
+        cursor.fetchone.return_value = (Decimal("0"), "Aberto")
+        cursor.rowcount = 1
+        # Gravados: 11, 12 e 13. O usuário apagou a linha do meio e incluiu uma.
+        dados = formulario_itens(
+            3,
+            ids=["11", "13", ""],
+            id_transacao="91",
+            uvr_transacao="UVR 01",
+            data_documento_transacao="2026-07-22",
+            tipo_transacao="Despesa",
+            tipo_atividade_transacao="Serviço",
+            numero_documento_transacao="NF-1",
+            nome_fornecedor_prestador_transacao="Fornecedor",
+        )
+        token, _ = obter_token(self.client)
+        dados.add("csrf_token", token)
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            resposta = self.client.post("/editar_transacao", data=dados)
+        self.assertEqual(resposta.status_code, 302)
+        sql, parametros = next(
+            chamada.args for chamada in comandos_itens(cursor)
+            if "WITH novos AS" in chamada.args[0]
+        )
+        self.assertEqual(parametros[0], [11, 13, None])
+        self.assertEqual(parametros[1], ["Item 0", "Item 1", "Item 2"])
+        self.assertIn(
+            "it.id NOT IN (SELECT novos.id FROM novos WHERE novos.id IS NOT NULL)", sql
+        )
+        self.assertIn("WHERE novos.id IS NULL OR novos.id NOT IN (SELECT id FROM atuais)", sql)
+        conexao.commit.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""Testes do ETag fraco e das respostas 304 das listas JSON."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from test_csrf_h2a2 import APP_MODULE, obter_token
+from test_dados_referencia import SUBGRUPOS, conexao_referencia
+
+
+URL_SUBGRUPOS = "/get_distinct_subgrupos?grupo=Papel"
+
+
+class TestJsonCondicional(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = APP_MODULE.app
+        cls.carregador_original = APP_MODULE.login_manager._user_callback
+
+    @classmethod
+    def tearDownClass(cls):
+        APP_MODULE.login_manager._user_callback = cls.carregador_original
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.autenticar(APP_MODULE.User(2, "usuario", "usuario", "UVR 01"))
+        self.subgrupos = list(SUBGRUPOS)
+        conectar = patch.object(APP_MODULE, "conectar_banco", side_effect=self.conectar)
+        conectar.start()
+        self.addCleanup(conectar.stop)
+
+    def autenticar(self, usuario):
+        APP_MODULE.login_manager._user_callback = lambda user_id: usuario
+        with self.client.session_transaction() as sessao:
+            sessao["_user_id"] = str(usuario.id)
+            sessao["_fresh"] = True
+
+    def conectar(self):
+        conexao, _ = conexao_referencia({"subgrupos": 1}, {"subgrupos": self.subgrupos})
+        return conexao
+
+    def test_01_mesmo_conteudo_responde_304_sem_corpo_e_sem_cache(self):
+        primeira = self.client.get(URL_SUBGRUPOS)
+        self.assertEqual(primeira.status_code, 200)
+        etag = primeira.headers["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        segunda = self.client.get(URL_SUBGRUPOS, headers={"If-None-Match": etag})
+        self.assertEqual(segunda.status_code, 304)
+        self.assertEqual(segunda.get_data(), b"")
+        self.assertEqual(segunda.headers["ETag"], etag)
+        for resposta in (primeira, segunda):
+            self.assertIn("no-store", resposta.headers["Cache-Control"])
+
+        self.subgrupos.append(("Papel branco", "Papel"))
+        terceira = self.client.get(URL_SUBGRUPOS, headers={"If-None-Match": etag})
+        self.assertEqual(terceira.status_code, 200)
+        self.assertEqual(terceira.get_json(), ["Papelão", "Papel branco"])
+        self.assertNotEqual(terceira.headers["ETag"], etag)
+
+    def test_02_etag_de_uma_uvr_nao_vale_para_outra(self):
+        etag = self.client.get(URL_SUBGRUPOS).headers["ETag"]
+        self.autenticar(APP_MODULE.User(3, "outra", "usuario", "UVR 02"))
+        resposta = self.client.get(URL_SUBGRUPOS, headers={"If-None-Match": etag})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta.headers["ETag"], etag)
+
+    def test_03_erros_e_escritas_nao_recebem_etag(self):
+        with patch.object(APP_MODULE, "conectar_banco", side_effect=RuntimeError("falha")):
+            erro = self.client.get("/get_produtos_servicos")
+        self.assertEqual(erro.status_code, 500)
+        self.assertNotIn("ETag", erro.headers)
+
+        self.autenticar(APP_MODULE.User(1, "administrador", "admin", None))
+        conexao = MagicMock()
+        conexao.cursor.return_value.fetchone.return_value = (0,)
+        conexao.cursor.return_value.rowcount = 1
+        token, _ = obter_token(self.client)
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            escrita = self.client.post(
+                "/api/subgrupos",
+                json={"acao": "excluir", "id": 3},
+                headers={"X-CSRFToken": token, "If-None-Match": "*"},
+            )
+        self.assertEqual(escrita.status_code, 200)
+        self.assertNotIn("ETag", escrita.headers)
+
+    def test_04_visitante_recebe_401_antes_da_consulta(self):
+        with self.client.session_transaction() as sessao:
+            sessao.clear()
+        resposta = self.client.get(URL_SUBGRUPOS, headers={"If-None-Match": "*"})
+        self.assertEqual(resposta.status_code, 401)
+        APP_MODULE.conectar_banco.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+"""Testes das métricas por processo e da soma entre workers."""
+
+import os
+import runpy
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from pathlib import Path
+from unittest.mock import patch
+
+from flask import Flask, abort, jsonify
+
+from configuracao_ambiente import configurar_aplicacao
+from metricas import (
+    REGISTRO,
+    RegistroMetricas,
+    agregar,
+    contar_linhas_relatorio,
+    criar_exportador,
+    formatar_prometheus,
+    preparar_pasta,
+)
+from test_banco_dados_pool import BANCO_TESTE, RAIZ, ConexaoFalsa
+
+
+TOKEN = "t" * 40
+
+
+def criar_app():
+    ambiente = {
+        "APP_ENV": "testing",
+        "SECRET_KEY": "segredo-ficticio-metricas",
+        "DATABASE_URL": BANCO_TESTE,
+        "RATELIMIT_ENABLED": "false",
+    }
+    with patch.dict(os.environ, ambiente, clear=True):
+        app = Flask(__name__)
+        configurar_aplicacao(app)
+    # O 429 em JSON dispensa a template da aplicação completa.
+    app.config["JSON_ENDPOINT_CLASSIFIER"] = lambda: True
+    provedor = app.extensions["recic3_banco_dados"]
+
+    @app.get("/consulta")
+    def consulta():
+        conexao = provedor.conectar()
+        conexao.cursor().execute("SELECT 1")
+        conexao.close()
+        return jsonify(ok=True)
+
+    @app.post("/envio")
+    def envio():
+        return jsonify(ok=True)
+
+    @app.get("/limitada")
+    def limitada():
+        abort(429)
+
+    return app
+
+
+def serie(valores, nome, **rotulos):
+    return valores.get((nome, tuple(sorted(rotulos.items()))))
+
+
+class TestRegistroMetricas(unittest.TestCase):
+    def setUp(self):
+        self.pasta = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.pasta)
+
+    def registro(self, pid):
+        registro = RegistroMetricas()
+        registro.configurar(self.pasta, 5)
+        registro._arquivo_processo = lambda: self.pasta / f"processo_{pid}.json"
+        return registro
+
+    def test_01_soma_workers_vivos_e_encerrados(self):
+        primeiro, segundo = self.registro(101), self.registro(102)
+        primeiro.incrementar("recic3_http_requests_total", endpoint="inicio", method="GET", status="200")
+        segundo.incrementar("recic3_http_requests_total", 2, endpoint="inicio", method="GET", status="200")
+        primeiro.observar("recic3_http_request_duration_seconds", 0.02, endpoint="inicio")
+        segundo.observar("recic3_http_request_duration_seconds", 3.0, endpoint="inicio")
+        primeiro.gravar()
+        segundo.gravar()
+
+        antes = agregar(self.pasta)
+        segundo.consolidar()
+        self.assertFalse((self.pasta / "processo_102.json").exists())
+        self.assertEqual(agregar(self.pasta), antes)
+
+        contagem = serie(
+            antes, "recic3_http_requests_total", endpoint="inicio", method="GET", status="200"
+        )
+        self.assertEqual(contagem, 3)
+        histograma = serie(antes, "recic3_http_request_duration_seconds", endpoint="inicio")
+        self.assertEqual(histograma[-1], 2)
+        self.assertAlmostEqual(histograma[-2], 3.02)
+
+        texto = formatar_prometheus(antes)
+        self.assertIn("# TYPE recic3_http_request_duration_seconds histogram", texto)
+        self.assertIn(
+            'recic3_http_requests_total{endpoint="inicio",method="GET",status="200"} 3\n', texto
+        )
+        self.assertIn('recic3_http_request_duration_seconds_bucket{endpoint="inicio",le="0.025"} 1\n', texto)
+        self.assertIn('recic3_http_request_duration_seconds_bucket{endpoint="inicio",le="5.0"} 2\n', texto)
+        self.assertIn('recic3_http_request_duration_seconds_bucket{endpoint="inicio",le="+Inf"} 2\n', texto)
+        self.assertIn('recic3_http_request_duration_seconds_count{endpoint="inicio"} 2\n', texto)
+
+    def test_02_nova_execucao_descarta_retratos_e_tipos_sao_conferidos(self):
+        registro = self.registro(103)
+        registro.incrementar("recic3_upload_bytes_total", 10, endpoint="envio")
+        registro.gravar()
+        registro.consolidar()
+        preparar_pasta(self.pasta)
+        self.assertEqual(agregar(self.pasta), {})
+        with self.assertRaises(ValueError):
+            registro.observar("recic3_upload_bytes_total", 1, endpoint="envio")
+        with self.assertRaises(ValueError):
+            registro.incrementar("recic3_http_request_duration_seconds", endpoint="envio")
+
+    def test_03_exportador_exige_token(self):
+        registro = self.registro(104)
+        registro.incrementar("recic3_report_rows_total", 7, report="financeiro", format="csv")
+        registro.gravar()
+        servidor = criar_exportador(self.pasta, TOKEN, host="127.0.0.1")
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        self.addCleanup(servidor.server_close)
+        self.addCleanup(servidor.shutdown)
+        url = f"http://127.0.0.1:{servidor.server_address[1]}/metrics"
+
+        with self.assertRaises(urllib.error.HTTPError) as erro:
+            urllib.request.urlopen(url, timeout=5)
+        self.assertEqual(erro.exception.code, 401)
+        erro.exception.close()
+        pedido = urllib.request.Request(url, headers={"Authorization": f"Bearer {TOKEN}"})
+        with urllib.request.urlopen(pedido, timeout=5) as resposta:
+            corpo = resposta.read().decode("utf-8")
+            self.assertTrue(resposta.headers["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn('recic3_report_rows_total{format="csv",report="financeiro"} 7\n', corpo)
+
+
+class TestMetricasRequisicao(unittest.TestCase):
+    def setUp(self):
+        self.app = criar_app()
+        self.antes = REGISTRO.valores()
+
+    def aumento(self, nome, **rotulos):
+        atual = serie(REGISTRO.valores(), nome, **rotulos)
+        anterior = serie(self.antes, nome, **rotulos)
+        if isinstance(atual, list):
+            return atual[-1] - (anterior[-1] if anterior else 0)
+        return (atual or 0) - (anterior or 0)
+
+    def test_04_requisicao_registra_status_duracao_banco_e_upload(self):
+        cliente = self.app.test_client()
+        with patch("psycopg2.connect", side_effect=lambda _dsn: ConexaoFalsa()):
+            self.assertEqual(cliente.get("/consulta").status_code, 200)
+        cliente.post("/envio", data={"arquivo": (tempfile.SpooledTemporaryFile(), "a.pdf")})
+        self.assertEqual(cliente.get("/limitada").status_code, 429)
+
+        self.assertEqual(
+            self.aumento("recic3_http_requests_total", endpoint="consulta", method="GET", status="200"), 1
+        )
+        self.assertEqual(self.aumento("recic3_http_request_duration_seconds", endpoint="consulta"), 1)
+        self.assertEqual(self.aumento("recic3_db_queries_total", endpoint="consulta"), 1)
+        self.assertGreater(self.aumento("recic3_upload_bytes_total", endpoint="envio"), 0)
+        self.assertEqual(self.aumento("recic3_rate_limit_rejections_total", endpoint="limitada"), 1)
+        self.assertEqual(
+            self.aumento("recic3_http_requests_total", endpoint="limitada", method="GET", status="429"), 1
+        )
+
+    def test_05_linhas_de_exportacao_contadas_mesmo_se_interrompida(self):
+        linhas = contar_linhas_relatorio(iter(range(10)), "extrato", "csv")
+        for _ in range(4):
+            next(linhas)
+        linhas.close()
+        self.assertEqual(self.aumento("recic3_report_rows_total", report="extrato", format="csv"), 4)
+
+
+class TestConfiguracaoGunicornMetricas(unittest.TestCase):
+    def test_06_porta_de_metricas_validada_e_pasta_exportada(self):
+        base = {"APP_ENV": "production", "PORT": "10000"}
+        with patch.dict(os.environ, {**base, "METRICS_PORT": "9100", "METRICS_TOKEN": TOKEN}, clear=True):
+            config = runpy.run_path(str(RAIZ / "gunicorn.conf.py"))
+            pasta = os.environ["METRICS_DIR"]
+        self.addCleanup(shutil.rmtree, pasta, True)
+        self.assertEqual(config["metrics_port"], 9100)
+        self.assertTrue(callable(config["when_ready"]))
+
+        invalidos = (
+            {"METRICS_PORT": "10000", "METRICS_TOKEN": TOKEN},
+            {"METRICS_PORT": "9100", "METRICS_TOKEN": "curto"},
+        )
+        for extras in invalidos:
+            with self.subTest(extras=extras), patch.dict(os.environ, {**base, **extras}, clear=True):
+                with self.assertRaisesRegex(RuntimeError, "METRICS_"):
+                    runpy.run_path(str(RAIZ / "gunicorn.conf.py"))
+
+        with patch.dict(os.environ, base, clear=True):
+            self.assertIsNone(runpy.run_path(str(RAIZ / "gunicorn.conf.py"))["metrics_port"])
+
+
+if __name__ == "__main__":
+    unittest.main()
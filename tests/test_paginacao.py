@@ -0,0 +1,205 @@
+"""Testes da paginação por chave das buscas de gestão, sem banco real."""
+
+import unittest
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from werkzeug.datastructures import MultiDict
+
+from paginacao import (
+    CursorInvalido,
+    OrdemKeyset,
+    codificar_cursor,
+    consultar_pagina,
+    decodificar_cursor,
+    estimar_total,
+    ler_parametros_pagina,
+)
+from test_csrf_h2a2 import APP_MODULE
+
+
+ORDEM_TESTE = OrdemKeyset(
+    "teste", (("data_documento", "data", 1), ("id", "inteiro", 0)), descendente=True
+)
+
+
+def linhas_transacoes(quantidade, inicio=100):
+    return [(inicio - indice, date(2026, 1, 1)) for indice in range(quantidade)]
+
+
+class TestPaginacao(unittest.TestCase):
+    def setUp(self):
+        self.contexto = APP_MODULE.app.app_context()
+        self.contexto.push()
+
+    def tearDown(self):
+        self.contexto.pop()
+
+    def test_01_primeira_pagina_busca_uma_linha_a_mais(self):
+        cursor = MagicMock()
+        cursor.fetchall.return_value = linhas_transacoes(4)
+        pagina = consultar_pagina(
+            cursor, "SELECT id, data_documento FROM t WHERE 1=1", ["UVR 01"],
+            ORDEM_TESTE, limite=3,
+        )
+        sql, parametros = cursor.execute.call_args.args
+        self.assertTrue(sql.endswith("ORDER BY data_documento DESC, id DESC LIMIT %s"))
+        self.assertNotIn("OFFSET", sql)
+        self.assertEqual(parametros, ("UVR 01", 4))
+        self.assertEqual(len(pagina.linhas), 3)
+        self.assertIsNotNone(pagina.proximo_cursor)
+        self.assertEqual(
+            decodificar_cursor(ORDEM_TESTE, pagina.proximo_cursor),
+            [date(2026, 1, 1), 98],
+        )
+
+    def test_02_pagina_seguinte_continua_depois_da_ultima_chave(self):
+        token = codificar_cursor(ORDEM_TESTE, (98, date(2026, 1, 1)), {"uvr": "UVR 01"})
+        cursor = MagicMock()
+        cursor.fetchall.return_value = linhas_transacoes(2, inicio=97)
+        pagina = consultar_pagina(
+            cursor, "SELECT id, data_documento FROM t WHERE 1=1", [],
+            ORDEM_TESTE, limite=3, cursor=token, filtros={"uvr": "UVR 01"},
+        )
+        sql, parametros = cursor.execute.call_args.args
+        self.assertIn("AND (data_documento, id) < (%s, %s)", sql)
+        self.assertEqual(parametros, (date(2026, 1, 1), 98, 4))
+        self.assertIsNone(pagina.proximo_cursor)
+        self.assertEqual(pagina.resposta([1, 2]), {"itens": [1, 2], "next_cursor": None})
+
+    def test_03_cursor_adulterado_ou_de_outra_busca_e_recusado(self):
+        token = codificar_cursor(ORDEM_TESTE, (98, date(2026, 1, 1)), {"uvr": "UVR 01"})
+        outra = OrdemKeyset("outra", (("nome", "texto", 1), ("id", "inteiro", 0)))
+        for ordem, valor, filtros in (
+            (ORDEM_TESTE, token[:-2] + "xx", {"uvr": "UVR 01"}),
+            (ORDEM_TESTE, token, {"uvr": "UVR 02"}),
+            (outra, token, {"uvr": "UVR 01"}),
+            (ORDEM_TESTE, "nao-e-um-cursor", None),
+        ):
+            with self.subTest(valor=valor, filtros=filtros):
+                with self.assertRaises(CursorInvalido):
+                    decodificar_cursor(ordem, valor, filtros)
+
+    def test_04_parametros_de_pagina(self):
+        self.assertEqual(
+            ler_parametros_pagina(MultiDict(), limite_padrao=50, limite_maximo=200),
+            (50, None, False),
+        )
+        self.assertEqual(
+            ler_parametros_pagina(
+                MultiDict({"limite": "20", "cursor": "abc", "total": "1"}),
+                limite_padrao=50, limite_maximo=200,
+            ),
+            (20, "abc", True),
+        )
+        for limite in ("0", "201", "-1", "dez"):
+            with self.subTest(limite=limite):
+                with self.assertRaises(ValueError):
+                    ler_parametros_pagina(
+                        MultiDict({"limite": limite}), limite_padrao=50, limite_maximo=200
+                    )
+
+    def test_05_total_estimado_vem_do_planejador(self):
+        cursor = MagicMock()
+        cursor.fetchone.return_value = ([{"Plan": {"Plan Rows": 1234}}],)
+        self.assertEqual(estimar_total(cursor, "SELECT 1 FROM t WHERE uvr = %s", ["U"]), 1234)
+        self.assertTrue(cursor.execute.call_args.args[0].startswith("EXPLAIN (FORMAT JSON) "))
+        cursor.fetchone.return_value = None
+        self.assertIsNone(estimar_total(cursor, "SELECT 1", []))
+
+
+class TestBuscasPaginadas(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = APP_MODULE.app
+        cls.carregador_original = APP_MODULE.login_manager._user_callback
+
+    @classmethod
+    def tearDownClass(cls):
+        APP_MODULE.login_manager._user_callback = cls.carregador_original
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        APP_MODULE.login_manager._user_callback = (
+            lambda user_id: APP_MODULE.User(2, "usuario", "usuario", "UVR 01")
+        )
+        with self.client.session_transaction() as sessao:
+            sessao["_user_id"] = "2"
+            sessao["_fresh"] = True
+
+    def test_06_patrimonio_deixa_de_ser_ilimitado(self):
+        conexao = MagicMock()
+        cursor = conexao.cursor.return_value
+        cursor.fetchall.return_value = [
+            (indice, f"Bem {indice:03d}", "Veículo", None, "Ativo", None, None, "km", "Frota", None)
+            for indice in range(1, 52)
+        ]
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            resposta = self.client.get("/buscar_patrimonio")
+        self.assertEqual(resposta.status_code, 200)
+        corpo = resposta.get_json()
+        self.assertEqual(len(corpo["itens"]), 50)
+        self.assertIsNotNone(corpo["next_cursor"])
+        sql, parametros = cursor.execute.call_args.args
+        self.assertIn("ORDER BY COALESCE(descricao, '') ASC, id ASC LIMIT %s", sql)
+        self.assertEqual(parametros, ("UVR 01", 51))
+
+        cursor.fetchall.return_value = []
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            seguinte = self.client.get(
+                "/buscar_patrimonio", query_string={"cursor": corpo["next_cursor"]}
+            )
+        self.assertEqual(seguinte.status_code, 200)
+        sql, parametros = cursor.execute.call_args.args
+        self.assertIn("(COALESCE(descricao, ''), id) > (%s, %s)", sql)
+        self.assertEqual(parametros, ("UVR 01", "Bem 050", 50, 51))
+
+    def test_07_cursor_nao_vale_para_outros_filtros(self):
+        conexao = MagicMock()
+        conexao.cursor.return_value.fetchall.return_value = [
+            (indice, f"Associado {indice}", "000", "UVR 01", "Ativo", "A", None)
+            for indice in range(3)
+        ]
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            corpo = self.client.get(
+                "/buscar_associados", query_string={"limite": "2", "status": "Ativo"}
+            ).get_json()
+            resposta = self.client.get(
+                "/buscar_associados",
+                query_string={"limite": "2", "status": "Inativo", "cursor": corpo["next_cursor"]},
+            )
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn("error", resposta.get_json())
+
+    def test_08_limite_invalido_responde_400_sem_acessar_o_banco(self):
+        with patch.object(APP_MODULE, "conectar_banco") as conectar:
+            for rota in (
+                "/buscar_associados", "/buscar_cadastros",
+                "/buscar_transacoes_gestao", "/buscar_patrimonio",
+            ):
+                with self.subTest(rota=rota):
+                    resposta = self.client.get(rota, query_string={"limite": "5000"})
+                    self.assertEqual(resposta.status_code, 400)
+        conectar.assert_not_called()
+
+    def test_09_total_estimado_somente_quando_pedido(self):
+        conexao = MagicMock()
+        cursor = conexao.cursor.return_value
+        cursor.fetchone.return_value = ([{"Plan": {"Plan Rows": 7}}],)
+        cursor.fetchall.return_value = []
+        with patch.object(APP_MODULE, "conectar_banco", return_value=conexao):
+            sem_total = self.client.get("/buscar_cadastros").get_json()
+            com_total = self.client.get("/buscar_cadastros", query_string={"total": "1"}).get_json()
+        self.assertNotIn("total_estimado", sem_total)
+        self.assertEqual(com_total, {"itens": [], "next_cursor": None, "total_estimado": 7})
+
+    def test_10_indices_de_ordenacao_chegam_pela_atualizacao_do_esquema(self):
+        cursor = MagicMock()
+        APP_MODULE.preparar_paginacao(cursor)
+        comandos = [chamada.args[0] for chamada in cursor.execute.call_args_list]
+        self.assertEqual(comandos, list(APP_MODULE.DDL_INDICES_PAGINACAO))
+        self.assertTrue(any("(uvr, data_documento DESC, id DESC)" in comando for comando in comandos))
+
+
+if __name__ == "__main__":
+    unittest.main()
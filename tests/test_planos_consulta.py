@@ -0,0 +1,74 @@
+"""Testes da conferência de planos das consultas críticas."""
+
+import os
+import subprocess
+import sys
+import unittest
+
+from instrumentacao_banco import CursorInstrumentado
+from planos_consulta import REGISTRO, GravadorLeituras, chave_consulta, violacoes
+from postgres_efemero import RAIZ, localizar_binarios
+from test_banco_dados_pool import ConexaoFalsa
+from test_instrumentacao_banco import PLANO
+
+
+TAMANHOS = {"transacoes_financeiras": 40000.0, "itens": 120000.0, "usuarios": 3.0}
+
+
+class TestPlanosConsulta(unittest.TestCase):
+    def test_01_seq_scan_em_tabela_grande_e_custo_acima_do_teto_falham(self):
+        plano = PLANO[0]["Plan"]
+        self.assertEqual(
+            violacoes(plano, TAMANHOS, limite_linhas=10000, teto=800),
+            ["Seq Scan em transacoes_financeiras (40000 linhas)", "custo 812 acima do teto 800"],
+        )
+        self.assertEqual(violacoes(plano, TAMANHOS, limite_linhas=50000, teto=900), [])
+        self.assertEqual(
+            violacoes(
+                plano, TAMANHOS, limite_linhas=10000,
+                seq_scan_permitido=frozenset({"transacoes_financeiras"}),
+            ),
+            [],
+        )
+
+    def test_02_gravador_guarda_so_leituras_com_parametros(self):
+        gravador = GravadorLeituras()
+        cursor = CursorInstrumentado(ConexaoFalsa().cursor(), gravador)
+        cursor.execute("SELECT * FROM itens WHERE id = %s", (7,))
+        cursor.execute("UPDATE itens SET nome = %s", ("x",))
+        cursor.execute("  with base AS (SELECT 1) SELECT * FROM base")
+        self.assertEqual(gravador.consultas, 3)
+        self.assertEqual(
+            gravador.leituras,
+            [("SELECT * FROM itens WHERE id = %s", (7,)), ("  with base AS (SELECT 1) SELECT * FROM base", None)],
+        )
+        self.assertEqual(
+            chave_consulta("busca", "SELECT * FROM itens WHERE id = 1"),
+            chave_consulta("busca", "SELECT *  FROM itens WHERE id = %s"),
+        )
+        self.assertEqual(len({consulta.nome for consulta in REGISTRO}), len(REGISTRO))
+
+
+class TestPlanosBancoSemeado(unittest.TestCase):
+    """Executa o guarda completo quando há PostgreSQL local para um cluster efêmero."""
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            localizar_binarios()
+        except RuntimeError as erro:
+            raise unittest.SkipTest(str(erro))
+        if hasattr(os, "geteuid") and os.geteuid() == 0:
+            raise unittest.SkipTest("initdb não roda como root.")
+
+    def test_03_consultas_registradas_usam_indices_e_respeitam_tetos(self):
+        ambiente = {chave: valor for chave, valor in os.environ.items() if chave != "DATABASE_URL"}
+        resultado = subprocess.run(
+            [sys.executable, str(RAIZ / "planos_consulta.py"), "--escala", os.getenv("PLANOS_ESCALA", "media")],
+            cwd=RAIZ, env=ambiente, capture_output=True, text=True, timeout=1800,
+        )
+        self.assertEqual(resultado.returncode, 0, resultado.stdout + resultado.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""Testes do renderizador paginado de relatórios em PDF."""
+
+import re
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Table
+
+import relatorio_pdf
+from relatorio_pdf import (
+    FONTE,
+    RETICENCIAS,
+    TAMANHO_FONTE,
+    ColunaPdf,
+    _Cortador,
+    linhas_por_pagina,
+    renderizar_tabela_paginada,
+)
+from test_csrf_h2a2 import APP_MODULE
+
+
+MARGENS = (1.5 * inch, 1 * inch, 0.3 * inch, 0.3 * inch)
+COLUNAS = (
+    ColunaPdf("Descrição", 300),
+    ColunaPdf("Valor", 100, "RIGHT", formatar=lambda v: f"{Decimal(v):.2f}", somar=True),
+)
+
+
+def contar_paginas(conteudo):
+    return len(re.findall(rb"/Type /Page\b", conteudo))
+
+
+def capacidade_a4_paisagem():
+    altura = landscape(A4)[1] - MARGENS[0] - MARGENS[1] - 12
+    return linhas_por_pagina(altura), linhas_por_pagina(altura, linhas_rodape=2)
+
+
+class TestRelatorioPdf(unittest.TestCase):
+    def renderizar(self, quantidade):
+        linhas = [(f"Item {i}", "1.50") for i in range(quantidade)]
+        with patch.object(relatorio_pdf, "Table", wraps=Table) as tabela:
+            conteudo = renderizar_tabela_paginada(
+                linhas, COLUNAS, pagesize=landscape(A4), margens=MARGENS
+            )
+        return conteudo, [chamada.args[0] for chamada in tabela.call_args_list]
+
+    def test_01_cada_pagina_recebe_uma_tabela_que_cabe_inteira(self):
+        capacidade, _ = capacidade_a4_paisagem()
+        conteudo, tabelas = self.renderizar(2 * capacidade + 5)
+        self.assertTrue(conteudo.startswith(b"%PDF"))
+        # Se alguma tabela não coubesse, o ReportLab a dividiria em mais páginas.
+        self.assertEqual(contar_paginas(conteudo), 3)
+        self.assertEqual([len(dados) - 2 for dados in tabelas[:2]], [capacidade] * 2)
+        for dados in tabelas:
+            self.assertEqual(dados[0], ["Descrição", "Valor"])
+
+    def test_02_subtotal_por_pagina_e_total_geral_no_fim(self):
+        capacidade, _ = capacidade_a4_paisagem()
+        _, tabelas = self.renderizar(capacidade + 3)
+        self.assertEqual(tabelas[0][-1], ["Subtotal da página", f"{Decimal('1.50') * capacidade:.2f}"])
+        self.assertEqual(tabelas[-1][-2], ["Subtotal da página", "4.50"])
+        self.assertEqual(
+            tabelas[-1][-1], ["Total geral", f"{Decimal('1.50') * (capacidade + 3):.2f}"]
+        )
+
+    def test_03_total_sem_espaco_vai_para_pagina_propria(self):
+        capacidade, capacidade_ultima = capacidade_a4_paisagem()
+        self.assertEqual(capacidade_ultima, capacidade - 1)
+        conteudo, tabelas = self.renderizar(capacidade)
+        self.assertEqual(contar_paginas(conteudo), 2)
+        self.assertEqual(len(tabelas[-1]), 3)
+        self.assertEqual(tabelas[-1][-2], ["Subtotal da página", "0.00"])
+
+    def test_04_texto_longo_e_cortado_na_largura_da_coluna(self):
+        cortar = _Cortador(60)
+        self.assertEqual(cortar("Curto"), "Curto")
+        cortado = cortar("Cooperativa de Reciclagem Muito Comprida")
+        self.assertTrue(cortado.endswith(RETICENCIAS))
+        self.assertLessEqual(stringWidth(cortado, FONTE, TAMANHO_FONTE), 60)
+        self.assertIs(cortar("Cooperativa de Reciclagem Muito Comprida"), cortado)
+        self.assertEqual(cortar("@" * 8), "@" * 8)
+
+    def test_05_relatorio_financeiro_desenha_texto_sem_marcacao(self):
+        linha = {
+            "data_documento": "2026-01-05", "data_efetiva_pag_rec": "2026-01-06",
+            "uvr": "UVR 01", "nome_cadastro_origem": "A & B <Ltda>",
+            "numero_documento": "12", "tipo_transacao": "Receita",
+            "tipo_atividade_transacao": "Venda", "item_descricao": "Papelão",
+            "item_grupo_catalogo": "Papel", "item_subgrupo_catalogo": "Ondulado",
+            "quantidade": "10", "valor_unitario": "1.50", "valor_total_item": "15.00",
+            "status_pagamento": "Pago", "valor_pago_neste_item": "15.00",
+        }
+        filtros = {"uvr": "UVR 01", "data_inicial": "2026-01-01", "data_final": "2026-01-31"}
+        with (
+            patch.object(APP_MODULE, "fetch_report_data", return_value=[linha] * 3),
+            patch.object(relatorio_pdf, "Table", wraps=Table) as tabela,
+        ):
+            _, _, conteudo = APP_MODULE._gerar_pdf_relatorio_financeiro(filtros)
+        self.assertTrue(conteudo.startswith(b"%PDF"))
+        dados = tabela.call_args.args[0]
+        self.assertEqual(dados[1][:4], ["05/01/26", "06/01/26", "UVR 01", "A & B <Ltda>"])
+        self.assertEqual(dados[-1][12], APP_MODULE._format_decimal(Decimal("45.00")))
+        self.assertEqual(dados[-1][14], APP_MODULE._format_decimal(Decimal("45.00")))
+
+
+if __name__ == "__main__":
+    unittest.main()
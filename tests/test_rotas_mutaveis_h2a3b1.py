@@ -225,7 +225,16 @@ class TestRotasMutaveisH2A3B1(unittest.TestCase):
 
     def test_09_usuario_da_uvr_pode_chegar_as_operacoes_de_relatorio(self):
         self.autenticar(2)
-        with patch.object(APP_MODULE, "fetch_report_data", return_value=[]) as relatorio:
+        with (
+            patch.object(APP_MODULE, "fetch_report_data", return_value=[]) as relatorio,
+            patch.object(
+                APP_MODULE, "stream_report_rows", return_value=iter([])
+            ) as exportacao,
+            patch.object(APP_MODULE, "conectar_banco", return_value=MagicMock()),
+            patch.object(
+                APP_MODULE, "enfileirar_relatorio", return_value=5
+            ) as fila,
+        ):
             respostas = {
                 rota: self.post_com_csrf(rota, json={"uvr": "UVR 01"})
                 for rota in (
@@ -236,10 +245,14 @@ class TestRotasMutaveisH2A3B1(unittest.TestCase):
             }
         self.assertEqual(respostas["/gerar_relatorio"].status_code, 200)
         self.assertEqual(respostas["/baixar_csv_relatorio"].status_code, 404)
-        self.assertEqual(respostas["/baixar_pdf_relatorio_financeiro"].status_code, 404)
-        self.assertEqual(relatorio.call_count, 3)
-        for chamada in relatorio.call_args_list:
+        self.assertEqual(respostas["/baixar_pdf_relatorio_financeiro"].status_code, 202)
+        self.assertEqual(relatorio.call_count, 1)
+        self.assertEqual(exportacao.call_count, 1)
+        self.assertEqual(fila.call_count, 1)
+        self.assertEqual(fila.call_args.args[1], "pdf_relatorio_financeiro")
+        for chamada in relatorio.call_args_list + exportacao.call_args_list:
             self.assertEqual(chamada.args[0]["uvr"], "UVR 01")
+        self.assertEqual(fila.call_args.args[2]["uvr"], "UVR 01")
 
     def test_10_usuario_da_uvr_pode_consultar_extrato_da_propria_conta(self):
         self.autenticar(2)
@@ -253,6 +266,12 @@ class TestRotasMutaveisH2A3B1(unittest.TestCase):
                 APP_MODULE, "conectar_banco", return_value=conexao_com_uvr("UVR 01")
             ),
             patch.object(APP_MODULE, "fetch_extrato_data", return_value=None) as extrato,
+            patch.object(
+                APP_MODULE, "stream_extrato_data", return_value=iter([])
+            ) as exportacao,
+            patch.object(
+                APP_MODULE, "enfileirar_relatorio", return_value=6
+            ) as fila,
         ):
             respostas = {
                 rota: self.post_com_csrf(rota, json=filtros)
@@ -264,8 +283,12 @@ class TestRotasMutaveisH2A3B1(unittest.TestCase):
             }
         self.assertEqual(respostas["/gerar_extrato_bancario"].status_code, 200)
         self.assertEqual(respostas["/baixar_csv_extrato"].status_code, 404)
-        self.assertEqual(respostas["/baixar_pdf_extrato"].status_code, 404)
-        self.assertEqual(extrato.call_count, 3)
+        self.assertEqual(respostas["/baixar_pdf_extrato"].status_code, 202)
+        self.assertEqual(extrato.call_count, 1)
+        self.assertEqual(exportacao.call_count, 1)
+        tipo, parametros = fila.call_args.args[1:3]
+        self.assertEqual(tipo, "pdf_extrato")
+        self.assertEqual(parametros["_uvr_autorizada"], "UVR 01")
 
     def test_11_operacoes_formulario_autorizadas_preservam_fluxo(self):
         self.autenticar(2)
@@ -328,11 +351,11 @@ class TestRotasMutaveisH2A3B1(unittest.TestCase):
         self.autenticar(2)
         autorizacao = conexao_com_uvr("UVR 01")
         negocio = MagicMock()
-        negocio.cursor.return_value.fetchone.side_effect = [
-            (Decimal("100.00"),),
-            (30,),
-            (Decimal("0"), Decimal("100"), Decimal("100")),
+        negocio.cursor.return_value.fetchall.return_value = [
+            (2, Decimal("0"), Decimal("100.00")),
         ]
+        negocio.cursor.return_value.fetchone.return_value = (30,)
+        negocio.cursor.return_value.rowcount = 1
         dados = {
             "uvr": "UVR 01",
             "id_conta_corrente": 1,
@@ -0,0 +1,106 @@
+"""Testes dos saldos mensais usados como ponto de partida do extrato."""
+
+import io
+import sys
+import unittest
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from test_csrf_h2a2 import APP_MODULE
+
+
+def sqls_executados(cursor):
+    return [" ".join(chamada.args[0].split()) for chamada in cursor.execute.call_args_list]
+
+
+class TestSaldosConta(unittest.TestCase):
+    def test_01_saldo_inicial_parte_do_ultimo_fechamento(self):
+        cursor = MagicMock()
+        cursor.fetchone.side_effect = [
+            ("UVR 01", "Associação", "Banco", "0001", "12345", None),
+            (Decimal("250.00"),),
+        ]
+        conta, saldo, _ = APP_MODULE._consultar_cabecalho_extrato(
+            cursor,
+            {
+                "id_conta_corrente_extrato": 7,
+                "data_inicial_extrato": "2026-03-15",
+                "data_final_extrato": "2026-03-31",
+                "_uvr_autorizada": "UVR 01",
+            },
+        )
+        self.assertEqual(saldo, Decimal("250.00"))
+        self.assertEqual(conta["uvr"], "UVR 01")
+        sql, parametros = cursor.execute.call_args_list[1].args
+        self.assertIn("FROM saldos_conta_mensais", sql)
+        self.assertIn("LIMIT 1", sql)
+        self.assertIn("INTERVAL '1 month'", sql)
+        self.assertEqual(
+            parametros,
+            (7, date(2026, 3, 15), "UVR 01", "UVR 01") * 2,
+        )
+
+    def test_02_atualizacao_trava_a_conta_antes_de_recalcular(self):
+        cursor = MagicMock()
+        APP_MODULE._atualizar_saldos_conta(cursor, 7, date(2026, 2, 10), uvr="UVR 01")
+        sqls = sqls_executados(cursor)
+        self.assertEqual(len(sqls), 2)
+        self.assertIn("FROM contas_correntes", sqls[0])
+        self.assertIn("FOR UPDATE", sqls[0])
+        self.assertEqual(cursor.execute.call_args_list[0].args[1], (7, "UVR 01", "UVR 01"))
+        self.assertIn("ON CONFLICT (id_conta_corrente, mes)", sqls[1])
+        self.assertEqual(cursor.execute.call_args_list[1].args[1], (7, date(2026, 2, 10)))
+
+    def test_03_reconstrucao_substitui_os_fechamentos(self):
+        conexao = MagicMock()
+        with (
+            patch.object(APP_MODULE, "conectar_banco", return_value=conexao),
+            patch.object(APP_MODULE, "registrar_evento"),
+        ):
+            APP_MODULE.recalcular_saldos_conta()
+        sqls = sqls_executados(conexao.cursor.return_value)
+        self.assertEqual(sqls[0], "LOCK TABLE saldos_conta_mensais IN EXCLUSIVE MODE")
+        self.assertEqual(sqls[-2], "DELETE FROM saldos_conta_mensais")
+        self.assertFalse(any(sql.startswith("CREATE ") for sql in sqls))
+        self.assertTrue(sqls[-1].startswith("WITH movimento AS"))
+        self.assertFalse(any("fluxo_caixa" in sql and sql.startswith("DELETE") for sql in sqls))
+        conexao.commit.assert_called_once()
+
+    def test_04_falha_na_reconstrucao_desfaz_tudo(self):
+        conexao = MagicMock()
+        conexao.cursor.return_value.execute.side_effect = [None, None, RuntimeError("falha")]
+        with (
+            patch.object(APP_MODULE, "conectar_banco", return_value=conexao),
+            patch.object(APP_MODULE, "registrar_evento"),
+            self.assertRaises(RuntimeError),
+        ):
+            APP_MODULE.recalcular_saldos_conta()
+        conexao.rollback.assert_called_once()
+        conexao.commit.assert_not_called()
+
+    def test_05_script_exige_confirmacao(self):
+        import recalcular_saldos_conta as script
+
+        recalcular = MagicMock()
+        with (
+            patch.object(sys, "argv", ["recalcular_saldos_conta.py"]),
+            patch.object(sys, "stderr", io.StringIO()),
+            patch.dict(sys.modules, {"app": SimpleNamespace(recalcular_saldos_conta=recalcular)}),
+            self.assertRaises(SystemExit),
+        ):
+            script.main()
+        recalcular.assert_not_called()
+        with (
+            patch.object(
+                sys, "argv", ["recalcular_saldos_conta.py", "--confirmar", script.CONFIRMACAO_EXIGIDA]
+            ),
+            patch.dict(sys.modules, {"app": SimpleNamespace(recalcular_saldos_conta=recalcular)}),
+        ):
+            script.main()
+        recalcular.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""Processo que gera os relatórios enfileirados pelas rotas de PDF.
+
+Executado ao lado do Gunicorn (`worker:` no Procfile). Pode haver mais de um:
+cada tarefa é reservada com `FOR UPDATE SKIP LOCKED`.
+"""
+
+import argparse
+import signal
+import time
+
+
+INTERVALO_LIMPEZA_S = 600
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Consome a fila de relatórios do banco configurado."
+    )
+    parser.add_argument(
+        "--uma-vez",
+        action="store_true",
+        help="Processa as tarefas pendentes e encerra, sem aguardar novas.",
+    )
+    argumentos = parser.parse_args()
+
+    from app import app, executar_proxima_tarefa_relatorio, limpar_tarefas_relatorio
+    from fila_relatorios import ler_configuracao_fila
+    from metricas import REGISTRO
+
+    configuracao = ler_configuracao_fila()
+    encerrar = []
+    signal.signal(signal.SIGTERM, lambda *_: encerrar.append(True))
+    signal.signal(signal.SIGINT, lambda *_: encerrar.append(True))
+
+    proxima_limpeza = 0.0
+    while not encerrar:
+        try:
+            if time.monotonic() >= proxima_limpeza:
+                removidas = limpar_tarefas_relatorio(configuracao)
+                if removidas:
+                    app.logger.info("Tarefas de relatorio removidas: %s", removidas)
+                proxima_limpeza = time.monotonic() + INTERVALO_LIMPEZA_S
+            if executar_proxima_tarefa_relatorio(configuracao):
+                REGISTRO.gravar_se_necessario()
+                continue
+        except Exception as e:
+            # Banco indisponível não derruba o worker; tenta de novo no intervalo.
+            app.logger.error(
+                "Falha no worker de relatorios. erro_tipo=%s", type(e).__name__
+            )
+        if argumentos.uma_vez:
+            break
+        time.sleep(configuracao["intervalo_s"])
+    # Com METRICS_DIR compartilhada com o Gunicorn, as linhas dos PDFs entram no /metrics.
+    REGISTRO.consolidar()
+
+
+if __name__ == "__main__":
+    main()